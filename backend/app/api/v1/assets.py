@@ -1,5 +1,6 @@
 from flask import Blueprint, request
 from ...services.asset_service import AssetService
+from ...services.asset_health_service import AssetHealthService
 from ...services.config_service import ConfigService
 from ...utils.logger import setup_logger
 from ...utils.validators import validate_asset_create
@@ -26,6 +27,7 @@ def create_asset():
     asset = AssetService.create_asset(asset_data)
     if not asset:
         return error_json(2001, "创建资产失败")
+    AssetHealthService.invalidate(asset.id)
     return response_template("created", data=asset.dict())
 
 @assets_bp.route('/<int:asset_id>', methods=['PUT'])
@@ -55,7 +57,8 @@ def update_asset(asset_id):
     if not asset:
         logger.warning(f"资产不存在或更新失败: {asset_id}")
         return response_template("not_found", code=2002, msg="资产不存在或更新失败")
-        
+    
+    AssetHealthService.invalidate(asset_id)
     return response_template("updated", data=asset.dict())
 
 @assets_bp.route('/<int:asset_id>', methods=['DELETE'])
@@ -63,6 +66,7 @@ def update_asset(asset_id):
 def delete_asset(asset_id):
     """删除资产"""
     if AssetService.delete_asset(asset_id):
+        AssetHealthService.invalidate(asset_id)
         return response_template("deleted")
     return error_json(2003, "删除资产失败")
 
@@ -73,8 +77,34 @@ def verify_capabilities(asset_id):
     logger.info(f"开始验证资产 {asset_id} 的能力")
     results = AssetService.verify_capabilities(asset_id)
     logger.info(f"验证资产 {asset_id} 能力成功: {results}")
+    AssetHealthService.record_results(asset_id, results)
     return success_json(results)
 
+@assets_bp.route('/health', methods=['GET'])
+@exception_handler
+def get_assets_health():
+    """获取资产健康状态（后台探测的缓存结果）"""
+    asset_id = request.args.get('asset_id', type=int)
+    return success_json(AssetHealthService.get_health(asset_id))
+
+@assets_bp.route('/health/refresh', methods=['POST'])
+@exception_handler
+def refresh_assets_health():
+    """强制立即刷新资产健康状态"""
+    data = request.get_json(silent=True) or {}
+    results = AssetHealthService.refresh(
+        asset_id=data.get('asset_id'),
+        capability_type=data.get('capability_type')
+    )
+    return success_json(results)
+
+@assets_bp.route('/<int:asset_id>/slots', methods=['GET'])
+@exception_handler
+def get_asset_slots(asset_id):
+    """获取资产当前的并发槽位占用"""
+    from ...services.task_services.slot_service import SlotService
+    return success_json(SlotService.list_slots(asset_id))
+
 @assets_bp.route('/verify-ssh', methods=['POST'])
 @exception_handler
 def verify_ssh_connection():
@@ -147,4 +177,5 @@ def toggle_asset(asset_id):
     if not asset:
         return response_template("not_found", code=2002, msg="资产不存在")
     
+    AssetHealthService.invalidate(asset_id)
     return success_json(asset.dict(), f"资产已{'启用' if enabled else '禁用'}") 
\ No newline at end of file
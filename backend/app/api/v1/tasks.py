@@ -87,6 +87,70 @@ def get_stats():
     with get_db() as db:
         return success_json(TaskService.get_stats(db))
 
+@tasks_bp.route('/queue', methods=['GET'])
+@exception_handler
+def get_task_queue():
+    """获取等待资产的任务队列，按调度顺序排列"""
+    return success_json(TaskService.get_queue())
+
+@tasks_bp.route('/scheduler/leader', methods=['GET'])
+@exception_handler
+def get_scheduler_leader():
+    """获取调度器领导者选举状态，当前进程是否为领导者以及租约持有者"""
+    from ...services.leader_election import LeaderElection
+    return success_json(LeaderElection.get_status())
+
+@tasks_bp.route('/eta', methods=['GET'])
+@exception_handler
+def get_eta_forecast():
+    """获取所有未完成任务的预计开始/完成时间和资产吞吐量"""
+    from ...services.task_services.eta_service import EtaService
+    return success_json(EtaService.get_forecast())
+
+@tasks_bp.route('/<int:task_id>/eta', methods=['GET'])
+@exception_handler
+def get_task_eta(task_id):
+    """获取任务的预计开始/完成时间"""
+    from ...services.task_services.eta_service import EtaService
+    eta = EtaService.get_task_eta(task_id)
+    if eta:
+        return success_json(eta)
+    return response_template("not_found", code=1001, msg=f"任务 {task_id} 不在等待或运行中")
+
+@tasks_bp.route('/jobs', methods=['GET'])
+@exception_handler
+def get_jobs():
+    """获取流水线作业（暂存、监控、完成处理），可按任务ID和状态过滤"""
+    from ...services.task_services.job_queue import JobQueue
+    return success_json(JobQueue.list_jobs(
+        task_id=request.args.get('task_id', type=int),
+        state=request.args.get('state'),
+        limit=request.args.get('limit', 100, type=int)
+    ))
+
+@tasks_bp.route('/<int:task_id>/jobs', methods=['GET'])
+@exception_handler
+def get_task_jobs(task_id):
+    """获取任务的流水线作业"""
+    from ...services.task_services.job_queue import JobQueue
+    return success_json(JobQueue.list_jobs(task_id=task_id))
+
+@tasks_bp.route('/staging', methods=['GET'])
+@exception_handler
+def get_staging_progress():
+    """获取所有任务的数据暂存进度（包括训练数据预取）"""
+    from ...services.task_services.staging_service import StagingService
+    from ...services.task_services.prefetch_service import PrefetchService
+    return success_json(StagingService.get_progress() + PrefetchService.get_progress())
+
+@tasks_bp.route('/<int:task_id>/staging', methods=['GET'])
+@exception_handler
+def get_task_staging_progress(task_id):
+    """获取任务的数据暂存进度（包括训练数据预取）"""
+    from ...services.task_services.staging_service import StagingService
+    from ...services.task_services.prefetch_service import PrefetchService
+    return success_json(StagingService.get_progress(task_id) + PrefetchService.get_progress(task_id))
+
 @tasks_bp.route('/<int:task_id>', methods=['GET'])
 @exception_handler
 def get_task(task_id):
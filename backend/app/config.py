@@ -40,6 +40,9 @@ class Config:
     PORT = int(os.getenv('PORT', 5000))
     DEBUG = os.getenv('FLASK_ENV', 'dev') == 'dev'
     
+    # 调度器运行模式: embedded 在API进程内运行调度器; external 由独立的 worker 进程(python -m app.worker)运行
+    SCHEDULER_MODE = os.getenv('SCHEDULER_MODE', 'embedded')
+    
     # 安全配置
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-here')
     TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
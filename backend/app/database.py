@@ -40,9 +40,14 @@ def init_db():
     from .models import task  # noqa
     from .models import training  # noqa
     from .models import asset  # noqa
+    from .models import leader_lease  # noqa
+    from .models import runtime_state  # noqa
+    from .models import job  # noqa
     
     # 创建所有表
     Base.metadata.create_all(bind=engine)
+    # 为已存在的表补充新增的列
+    _add_missing_columns()
     # 初始化本地资产
     try:
         from .services.local_asset_service import LocalAssetService
@@ -57,4 +62,27 @@ def init_db():
         from .services.config_service import ConfigService
         ConfigService.init_settings()
     except Exception as e:
-        logger.error(f"初始化本地资产时出错: {str(e)}", exc_info=True) 
\ No newline at end of file
+        logger.error(f"初始化本地资产时出错: {str(e)}", exc_info=True)
+
+
+def _add_missing_columns():
+    """
+    为已存在的表补充模型中新增的列
+
+    create_all 只会创建不存在的表，升级后已有数据库中缺少的可空列在这里通过 ALTER TABLE 补上，
+    新列的值为空，模型代码需要按默认值处理空值。
+    """
+    from sqlalchemy import inspect
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns or not column.nullable or column.primary_key:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+                logger.info(f"数据表 {table.name} 已添加列 {column.name}")
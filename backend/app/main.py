@@ -10,6 +10,8 @@ from .services.config_service import ConfigService  # 添加这行
 from .services.task_services.scheduler_service import SchedulerService
 from .utils.json_encoder import CustomJSONEncoder
 from .utils.ssh import close_ssh_connection_pool
+from .services.async_engine import AsyncEngine
+from .services.leader_election import LeaderElection
 import os
 import atexit
 
@@ -74,13 +76,19 @@ def create_app():
             
         return send_from_directory(directory, filename)
     
-    # 初始化任务服务和调度器
-    SchedulerService.init_scheduler()
-    logger.info("任务服务已启动")
+    # 初始化任务服务和调度器，external 模式下调度器由独立的 worker 进程运行
+    if config.SCHEDULER_MODE == 'external':
+        logger.info("调度器运行在独立的 worker 进程中，API进程不启动调度器")
+    else:
+        SchedulerService.init_scheduler()
+        logger.info("任务服务已启动")
     
     # 注册应用关闭处理函数
     atexit.register(close_ssh_connection_pool)
-    logger.info("注册了SSH连接池关闭函数")
+    atexit.register(AsyncEngine.stop)
+    # 后注册的先执行：先释放调度器租约，其他进程可以立即接管
+    atexit.register(LeaderElection.stop)
+    logger.info("注册了SSH连接池、异步执行引擎和领导者选举关闭函数")
     
     # 定义Vue前端静态文件目录
     dist_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dist')
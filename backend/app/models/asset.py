@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, JSON, ForeignKey, UniqueConstraint
 from ..database import Base
 
 class Asset(Base):
@@ -72,4 +72,28 @@ class Asset(Base):
             'max_concurrent_tasks': self.max_concurrent_tasks,
             'is_local': self.is_local,
             'enabled': self.enabled
-        }
\ No newline at end of file
+        }
+
+class AssetSlot(Base):
+    """资产并发占用槽位，每个运行中的任务在每个阶段占用一个槽位"""
+    __tablename__ = 'asset_slots'
+    __table_args__ = (
+        UniqueConstraint('task_id', 'capability', name='uq_asset_slot_task_capability'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    asset_id = Column(Integer, ForeignKey('assets.id', ondelete='CASCADE'), nullable=False, index=True)
+    capability = Column(String(20), nullable=False, comment='占用的能力: marking / training')
+    task_id = Column(Integer, nullable=False, index=True)
+    lease_expires_at = Column(DateTime, nullable=False, index=True, comment='租约到期时间，监控线程定期续约')
+    created_at = Column(DateTime, default=datetime.now)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'asset_id': self.asset_id,
+            'capability': self.capability,
+            'task_id': self.task_id,
+            'lease_expires_at': self.lease_expires_at.isoformat() if self.lease_expires_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
@@ -88,4 +88,12 @@ DOMAIN_ACCESS_CONFIG = {
     
     # 默认协议前缀，可以是http或https
     'DEFAULT_PROTOCOL': 'https://'
-} 
\ No newline at end of file
+}
+
+# 任务优先级类别，数值越大越优先调度
+TASK_PRIORITY_CLASSES = {
+    'low': -1,
+    'normal': 0,
+    'high': 1,
+    'urgent': 2
+}
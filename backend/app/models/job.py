@@ -0,0 +1,47 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Text, Index
+from ..database import Base
+
+
+class Job(Base):
+    """任务流水线中的一个阶段作业，领取后在可见性超时内由领取者续约，超时未完成会被重新投递"""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        Index('ix_jobs_state_visible_after', 'state', 'visible_after'),
+        Index('ix_jobs_task_stage', 'task_id', 'stage'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    stage = Column(String(20), nullable=False, comment='阶段: staging / monitor / complete')
+    capability = Column(String(20), nullable=False, comment='任务阶段: marking / training')
+    task_id = Column(Integer, nullable=False)
+    asset_id = Column(Integer)
+    payload = Column(JSON, comment='阶段参数')
+    state = Column(String(20), nullable=False, default='pending', comment='pending / running / done / failed')
+    attempts = Column(Integer, nullable=False, default=0, comment='已投递次数')
+    max_attempts = Column(Integer, nullable=False, default=5)
+    visible_after = Column(DateTime, nullable=False, default=datetime.now, comment='可被领取的时间，运行中时为租约到期时间')
+    lease_owner = Column(String(200), comment='领取者标识')
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    finished_at = Column(DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'stage': self.stage,
+            'capability': self.capability,
+            'task_id': self.task_id,
+            'asset_id': self.asset_id,
+            'payload': self.payload,
+            'state': self.state,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'visible_after': self.visible_after.isoformat() if self.visible_after else None,
+            'lease_owner': self.lease_owner,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -0,0 +1,26 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime
+from ..database import Base
+
+
+class LeaderLease(Base):
+    """集群内单实例组件的领导者租约，持有者定期续约，过期后其他进程可以接管"""
+    __tablename__ = 'leader_leases'
+
+    name = Column(String(50), primary_key=True, comment='租约名称，如 scheduler')
+    holder = Column(String(200), nullable=False, comment='持有者标识: 主机名:进程号:随机串')
+    term = Column(Integer, nullable=False, default=1, comment='任期，每次换主加1')
+    acquired_at = Column(DateTime, nullable=False, default=datetime.now, comment='当前持有者取得租约的时间')
+    renewed_at = Column(DateTime, nullable=False, default=datetime.now, comment='最近一次续约(心跳)时间')
+    expires_at = Column(DateTime, nullable=False, comment='租约到期时间')
+    wakeup_at = Column(DateTime, comment='非领导者进程请求唤醒调度器的时间')
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'holder': self.holder,
+            'term': self.term,
+            'acquired_at': self.acquired_at.isoformat() if self.acquired_at else None,
+            'renewed_at': self.renewed_at.isoformat() if self.renewed_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
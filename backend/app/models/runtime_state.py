@@ -0,0 +1,12 @@
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, JSON
+from ..database import Base
+
+
+class RuntimeState(Base):
+    """调度器领导者进程发布的运行时状态快照，以及其他进程发给领导者的请求"""
+    __tablename__ = 'runtime_states'
+
+    name = Column(String(50), primary_key=True, comment='状态名称，如 staging / asset_health')
+    data = Column(JSON, comment='状态内容')
+    updated_at = Column(DateTime, nullable=False, default=datetime.now, comment='发布时间')
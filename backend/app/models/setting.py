@@ -25,6 +25,26 @@ class Setting(Base):
                 'value': '5',
                 'description': '标记任务轮询间隔(秒)'
             },
+            'adaptive_poll_floor': {
+                'type': 'integer',
+                'value': '5',
+                'description': '自适应轮询间隔下限(秒)，任务接近预计完成时按此间隔轮询'
+            },
+            'adaptive_poll_ceiling': {
+                'type': 'integer',
+                'value': '300',
+                'description': '自适应轮询间隔上限(秒)，长时间任务远未完成时按此间隔轮询'
+            },
+            'mark_seconds_per_image': {
+                'type': 'integer',
+                'value': '2',
+                'description': '预计每张图片的打标耗时(秒)，用于估算打标完成时间'
+            },
+            'mark_reconcile_interval': {
+                'type': 'integer',
+                'value': '60',
+                'description': 'ComfyUI事件订阅连接正常时，标记任务 /history 对账间隔(秒)'
+            },
             'train_poll_interval': {
                 'type': 'integer',
                 'value': '15',
@@ -35,6 +55,191 @@ class Setting(Base):
                 'value': '5',
                 'description': '调度间隔(分钟)'
             },
+            'scheduler_fallback_interval': {
+                'type': 'integer',
+                'value': '300',
+                'description': '调度器兜底检查间隔(秒)，任务提交和资产释放会立即唤醒调度器'
+            },
+            'asset_health_interval': {
+                'type': 'integer',
+                'value': '30',
+                'description': '资产健康探测间隔(秒)'
+            },
+            'asset_health_ttl': {
+                'type': 'integer',
+                'value': '90',
+                'description': '资产健康探测结果有效期(秒)'
+            },
+            'asset_health_max_backoff': {
+                'type': 'integer',
+                'value': '600',
+                'description': '资产探测失败最大退避间隔(秒)'
+            },
+            'slot_lease_seconds': {
+                'type': 'integer',
+                'value': '1800',
+                'description': '资产槽位租约时长(秒)，监控失效超过该时长的槽位将被回收'
+            },
+            'asset_selection_policy': {
+                'type': 'string',
+                'value': 'least_loaded',
+                'description': '资产选择策略: least_loaded / most_free_vram / weighted_round_robin'
+            },
+            'asset_selection_weights': {
+                'type': 'json',
+                'value': '{}',
+                'description': '加权轮询的资产权重，格式 {"资产ID": 权重}，未配置时按GPU显存计算'
+            },
+            'priority_aging_seconds': {
+                'type': 'integer',
+                'value': '600',
+                'description': '任务等待多少秒有效优先级提升一级，0表示不老化'
+            },
+            'fair_share_weights': {
+                'type': 'json',
+                'value': '{}',
+                'description': '公平调度的用户权重，格式 {"用户": 权重}，未配置的用户权重为1'
+            },
+            'training_queue_mode': {
+                'type': 'string',
+                'value': 'fair_share',
+                'description': '训练队列排序模式: fair_share(按等待时间) / sjf(按历史估算的训练时长最短优先)'
+            },
+            'sjf_aging_factor': {
+                'type': 'integer',
+                'value': '1',
+                'description': '最短作业优先模式下每等待1秒抵消的预计训练时长(秒)，避免长任务饿死'
+            },
+            'eta_cache_seconds': {
+                'type': 'integer',
+                'value': '30',
+                'description': '任务ETA预测结果的缓存时间(秒)'
+            },
+            'eta_throughput_window_hours': {
+                'type': 'integer',
+                'value': '24',
+                'description': '统计资产训练吞吐量(任务/小时)的时间窗口(小时)'
+            },
+            'leader_lease_seconds': {
+                'type': 'integer',
+                'value': '15',
+                'description': '调度器领导者租约时长(秒)，持有者每1/3租约时长续约一次，进程失联后其他进程最多等待该时长接管'
+            },
+            'leader_wakeup_poll_interval': {
+                'type': 'integer',
+                'value': '1',
+                'description': '调度器领导者检查其他进程唤醒请求的间隔(秒)，0表示只在续约时检查'
+            },
+            'job_visibility_timeout': {
+                'type': 'integer',
+                'value': '120',
+                'description': '流水线作业的可见性超时(秒)，领取者在此期间内持续续约，进程崩溃后作业在超时后重新投递'
+            },
+            'job_max_attempts': {
+                'type': 'integer',
+                'value': '5',
+                'description': '流水线作业的最大投递次数，超过后作业失败并把任务标记为错误'
+            },
+            'job_retry_backoff': {
+                'type': 'integer',
+                'value': '30',
+                'description': '流水线作业重试的基础退避时间(秒)，每次重试翻倍，最长30分钟'
+            },
+            'job_poll_interval': {
+                'type': 'integer',
+                'value': '5',
+                'description': '作业执行线程检查可领取作业和续约的间隔(秒)'
+            },
+            'placement_bandwidth_mbps': {
+                'type': 'integer',
+                'value': '100',
+                'description': '估算数据集传输时间使用的带宽(Mbps)，用于训练资产的数据本地性评分'
+            },
+            'placement_locality_weight': {
+                'type': 'integer',
+                'value': '1',
+                'description': '数据本地性收益的权重，0表示分配训练资产时不考虑数据本地性'
+            },
+            'placement_model_transfer_seconds': {
+                'type': 'integer',
+                'value': '0',
+                'description': '资产已有任务底模时视为节省的时间(秒)，0表示不考虑底模'
+            },
+            'placement_cached_models': {
+                'type': 'json',
+                'value': '{}',
+                'description': '资产上已有的底模文件，格式 {"资产ID": ["底模路径"]}'
+            },
+            'staging_workers': {
+                'type': 'integer',
+                'value': '4',
+                'description': '数据暂存线程数，即同时向资产上传数据并提交请求的任务数'
+            },
+            'sftp_transfer_sessions': {
+                'type': 'integer',
+                'value': '4',
+                'description': '目录上传/下载时每个任务并行使用的SFTP会话数'
+            },
+            'bulk_transfer_threshold': {
+                'type': 'integer',
+                'value': '200',
+                'description': '打标数据集需要传输的文件数达到该值时改用tar流批量传输，0表示不使用'
+            },
+            'bulk_transfer_compress': {
+                'type': 'integer',
+                'value': '0',
+                'description': 'tar流批量传输是否使用gzip压缩，1表示压缩（带宽受限且文本较多时开启）'
+            },
+            'sync_manifest_enabled': {
+                'type': 'integer',
+                'value': '1',
+                'description': '上传数据集时按同步清单和内容哈希判断文件是否变化（可发现大小不变的修改），0表示只比较大小'
+            },
+            'dataset_cache_enabled': {
+                'type': 'integer',
+                'value': '1',
+                'description': '训练数据通过训练资产上的内容寻址缓存同步（只上传资产上没有的文件，训练目录为硬链接），0表示每次清空后重新上传'
+            },
+            'remote_dataset_cache_dir': {
+                'type': 'string',
+                'value': f'{config.REMOTE_DATA_DIR}/dataset_cache',
+                'description': '训练资产上的数据集缓存目录，需要与远程打标目录在同一文件系统上'
+            },
+            'direct_asset_transfer': {
+                'type': 'integer',
+                'value': '1',
+                'description': '打标和训练资产不同时，打标结果直接从打标资产复制到训练资产（打标资产能免密SSH到训练资产时直连，否则经后端管道中转），0表示从后端上传'
+            },
+            'dataset_cache_retention_hours': {
+                'type': 'integer',
+                'value': '72',
+                'description': '数据集缓存中不再被任何训练目录引用的文件保留的小时数'
+            },
+            'training_prefetch_workers': {
+                'type': 'integer',
+                'value': '2',
+                'description': '训练数据预取线程数，等待训练资产的任务提前上传数据到预测的资产，0表示关闭'
+            },
+            'async_blocking_workers': {
+                'type': 'integer',
+                'value': '8',
+                'description': '异步引擎执行数据库和SSH等同步操作的线程数'
+            },
+            'async_http_limit': {
+                'type': 'integer',
+                'value': '100',
+                'description': '异步HTTP客户端的总连接数上限'
+            },
+            'async_http_limit_per_host': {
+                'type': 'integer',
+                'value': '4',
+                'description': '异步HTTP客户端对单个资产的连接数上限'
+            },
+            'async_http_timeout': {
+                'type': 'integer',
+                'value': '30',
+                'description': '异步HTTP请求超时时间(秒)'
+            },
             'mark_pan_dir': {
                 'type': 'string',
                 'value': config.SYSTEM_CONFIG['mark_pan_dir'],
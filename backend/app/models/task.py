@@ -158,6 +158,10 @@ class Task(Base):
     # 自动训练标志
     auto_training = Column(Boolean, default=True, comment='标记完成后是否自动开始训练')
     
+    # 调度优先级和公平分配分组
+    priority = Column(Integer, default=0, comment='调度优先级，数值越大越优先')
+    owner = Column(String(100), nullable=True, comment='任务所属用户或分组，用于公平调度')
+    
     # 关联关系
     marking_asset = relationship('Asset', foreign_keys=[marking_asset_id])
     training_asset = relationship('Asset', foreign_keys=[training_asset_id])
@@ -329,6 +333,8 @@ class Task(Base):
             'marked_images_path': self.marked_images_path,
             'training_output_path': self.training_output_path,
             'auto_training':self.auto_training,
+            'priority': self.priority or 0,
+            'owner': self.owner,
             'marking_asset': self.marking_asset.to_dict() if self.marking_asset else None,
             'training_asset': self.training_asset.to_dict() if self.training_asset else None,
             'mark_config': self.mark_config,
@@ -11,6 +11,7 @@ class LoraTrainingConfig(BaseModel):
     verified: bool = False
     headers: Optional[Dict[str, str]] = {}
     use_global_config: bool = True
+    max_concurrent_tasks: Optional[int] = 1  # 最大并发训练任务数
 
     class Config:
         orm_mode = True
@@ -24,6 +25,12 @@ class LoraTrainingConfig(BaseModel):
                 raise ValueError('端口范围必须在1-65535之间')
         return v
 
+    @validator('max_concurrent_tasks')
+    def validate_max_concurrent_tasks(cls, v):
+        if v is not None and v < 1:
+            raise ValueError('最大并发任务数必须大于0')
+        return v
+
 class AIEngineConfig(BaseModel):
     enabled: bool = False
     port: Optional[int] = None
@@ -34,6 +41,7 @@ class AIEngineConfig(BaseModel):
     max_retries: Optional[int] = 3
     retry_interval: Optional[int] = 5
     use_global_config: bool = True
+    max_concurrent_tasks: Optional[int] = None  # 最大并发标记任务数，为空时使用资产的max_concurrent_tasks
 
     class Config:
         orm_mode = True
@@ -47,6 +55,12 @@ class AIEngineConfig(BaseModel):
                 raise ValueError('端口范围必须在1-65535之间')
         return v
 
+    @validator('max_concurrent_tasks')
+    def validate_max_concurrent_tasks(cls, v):
+        if v is not None and v < 1:
+            raise ValueError('最大并发任务数必须大于0')
+        return v
+
 class AssetCreate(BaseModel):
     name: str = Field(..., min_length=2, max_length=50)
     ip: str = Field(...)
@@ -14,6 +14,10 @@ class TaskBase(BaseModel):
     
     training_config: Optional[Dict[str, Any]] = None
     use_global_training_config: Optional[bool] = True
+    
+    # 调度字段，优先级可以是类别名称(low/normal/high/urgent)或数值
+    priority: Optional[Union[int, str]] = 0
+    owner: Optional[str] = None
 
 class TaskCreate(TaskBase):
     pass
@@ -32,6 +36,10 @@ class TaskUpdate(BaseModel):
     
     training_config: Optional[Dict[str, Any]] = None
     use_global_training_config: Optional[bool] = None
+    
+    # 调度字段
+    priority: Optional[Union[int, str]] = None
+    owner: Optional[str] = None
 
 class TaskStatus(BaseModel):
     status: str
@@ -0,0 +1,428 @@
+from typing import List, Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from ..models.asset import Asset as AssetModel
+from ..database import get_db
+from ..utils.logger import setup_logger
+from ..utils.mark_handler import MarkRequestHandler
+from .asset_service import AssetService
+from .config_service import ConfigService
+from .runtime_state_service import RuntimeStateService, STATE_ASSET_HEALTH, MAILBOX_HEALTH_INVALIDATIONS
+import threading
+import time
+
+logger = setup_logger('asset_health_service')
+
+# 支持探测的资产能力类型
+CAPABILITY_TYPES = ('ai_engine', 'lora_training')
+
+# 健康状态注册表，键为 (资产ID, 能力类型)
+_health_registry: Dict[Tuple[int, str], Dict] = {}
+_health_lock = threading.Lock()
+
+# 资产遥测缓存，键为资产ID，来自AI引擎的 /system_stats
+_telemetry_registry: Dict[int, Dict] = {}
+
+# 调度器运行在其他进程时，注册表是其快照的镜像，超过该秒数后重新读取
+MIRROR_TTL = 2
+_mirror_synced_at = 0.0
+
+# 后台探测线程
+_prober_thread = None
+_prober_running = False
+_prober_wakeup = threading.Event()
+
+# 探测线程池，避免单个资产超时拖慢其他资产的探测
+probe_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="AssetProbeWorker")
+
+
+class AssetHealthService:
+    """
+    资产健康状态注册表
+
+    后台探测线程按各自的间隔刷新每个资产的 ai_engine / lora_training 能力，
+    调度器只读取缓存的可用性，不再在每次调度时发起SSH和HTTP探测。
+
+    探测线程只在调度器领导者进程中运行，其他进程（如独立 worker 模式下的 API 进程）
+    的注册表从领导者发布的快照同步，缓存失效请求转发给领导者处理。
+    """
+
+    @staticmethod
+    def _get_settings() -> Dict[str, int]:
+        """获取探测相关配置"""
+        return {
+            'interval': ConfigService.get_value('asset_health_interval', 30),
+            'ttl': ConfigService.get_value('asset_health_ttl', 90),
+            'max_backoff': ConfigService.get_value('asset_health_max_backoff', 600),
+        }
+
+    @staticmethod
+    def _new_entry(asset_id: int, capability_type: str) -> Dict:
+        """创建新的注册表条目，新条目立即进入待探测状态"""
+        return {
+            'asset_id': asset_id,
+            'capability_type': capability_type,
+            'available': False,
+            'ssh_connection': None,
+            'checked_at': None,
+            'next_check_at': 0,
+            'failure_count': 0,
+            'probing': False,
+            'error': None,
+        }
+
+    @staticmethod
+    def get_available_asset_ids(capability_type: str) -> List[int]:
+        """
+        获取缓存中可用的资产ID列表，不发起任何网络请求
+
+        Args:
+            capability_type: 能力类型，可选值: 'ai_engine', 'lora_training'
+
+        Returns:
+            可用资产ID列表，超过TTL未刷新的结果视为不可用
+        """
+        AssetHealthService._sync_mirror()
+        ttl = ConfigService.get_value('asset_health_ttl', 90)
+        now = time.time()
+        with _health_lock:
+            return [
+                asset_id for (asset_id, cap), entry in _health_registry.items()
+                if cap == capability_type
+                and entry['available']
+                and entry['checked_at'] is not None
+                and now - entry['checked_at'] <= ttl
+            ]
+
+    @staticmethod
+    def is_available(asset_id: int, capability_type: str) -> bool:
+        """检查指定资产能力在缓存中是否可用"""
+        AssetHealthService._sync_mirror()
+        ttl = ConfigService.get_value('asset_health_ttl', 90)
+        with _health_lock:
+            entry = _health_registry.get((asset_id, capability_type))
+            if not entry or not entry['available'] or entry['checked_at'] is None:
+                return False
+            return time.time() - entry['checked_at'] <= ttl
+
+    @staticmethod
+    def get_telemetry(asset_id: int) -> Optional[Dict]:
+        """
+        获取资产缓存的GPU/内存遥测数据，不发起任何网络请求
+
+        Args:
+            asset_id: 资产ID
+
+        Returns:
+            遥测数据字典（字段同 MarkRequestHandler.get_system_stats），没有或已过期时返回None
+        """
+        AssetHealthService._sync_mirror()
+        ttl = ConfigService.get_value('asset_health_ttl', 90)
+        with _health_lock:
+            telemetry = _telemetry_registry.get(asset_id)
+            if not telemetry or time.time() - telemetry['collected_at'] > ttl:
+                return None
+            return dict(telemetry['stats'])
+
+    @staticmethod
+    def get_health(asset_id: Optional[int] = None) -> List[Dict]:
+        """
+        获取注册表快照
+
+        Args:
+            asset_id: 可选的资产ID，不指定则返回所有资产
+
+        Returns:
+            健康状态列表
+        """
+        AssetHealthService._sync_mirror()
+        now = time.time()
+        with _health_lock:
+            entries = [
+                dict(entry) for (aid, _), entry in _health_registry.items()
+                if asset_id is None or aid == asset_id
+            ]
+
+        for entry in entries:
+            entry.pop('probing', None)
+            if entry['capability_type'] == 'ai_engine':
+                entry['telemetry'] = AssetHealthService.get_telemetry(entry['asset_id'])
+            entry['next_check_in'] = max(0, round(entry['next_check_at'] - now, 1))
+            entry['age'] = round(now - entry['checked_at'], 1) if entry['checked_at'] else None
+        return sorted(entries, key=lambda e: (e['asset_id'], e['capability_type']))
+
+    @staticmethod
+    def refresh(asset_id: Optional[int] = None, capability_type: Optional[str] = None) -> List[Dict]:
+        """
+        强制立即刷新资产能力（同步探测）
+
+        Args:
+            asset_id: 可选的资产ID，不指定则刷新所有资产
+            capability_type: 可选的能力类型，不指定则刷新所有能力
+
+        Returns:
+            刷新后的健康状态列表
+        """
+        global _mirror_synced_at
+
+        if capability_type and capability_type not in CAPABILITY_TYPES:
+            raise ValueError(f"不支持的能力类型: {capability_type}")
+        local = RuntimeStateService.is_local()
+        if not local:
+            # 在本进程探测并返回结果，同时让领导者重新探测
+            AssetHealthService._sync_mirror()
+            AssetHealthService._forward_invalidation(asset_id)
+
+        AssetHealthService._sync_assets()
+        with _health_lock:
+            keys = [
+                key for key in _health_registry
+                if (asset_id is None or key[0] == asset_id)
+                and (capability_type is None or key[1] == capability_type)
+            ]
+
+        futures = [probe_pool.submit(AssetHealthService._probe, aid, cap) for aid, cap in keys]
+        for future in futures:
+            future.result()
+
+        if not local:
+            # 本次探测结果比快照新，暂不被快照覆盖
+            _mirror_synced_at = time.time()
+        return AssetHealthService.get_health(asset_id)
+
+    @staticmethod
+    def invalidate(asset_id: int):
+        """
+        使资产的缓存结果失效，并唤醒探测线程尽快重新探测
+        资产被创建、更新、启用或禁用后调用
+        """
+        if not RuntimeStateService.is_local():
+            AssetHealthService._forward_invalidation(asset_id)
+        with _health_lock:
+            for (aid, _), entry in _health_registry.items():
+                if aid == asset_id:
+                    entry['available'] = False
+                    entry['next_check_at'] = 0
+                    entry['failure_count'] = 0
+        _prober_wakeup.set()
+
+    @staticmethod
+    def record_results(asset_id: int, results: Dict):
+        """
+        记录外部验证结果（例如手动点击验证资产能力）
+
+        Args:
+            asset_id: 资产ID
+            results: AssetService.verify_capabilities 的返回结果
+        """
+        if not RuntimeStateService.is_local():
+            AssetHealthService._forward_invalidation(asset_id)
+            return
+        settings = AssetHealthService._get_settings()
+        now = time.time()
+        with _health_lock:
+            for cap in CAPABILITY_TYPES:
+                entry = _health_registry.get((asset_id, cap))
+                if entry is None:
+                    continue
+                AssetHealthService._apply_result(entry, bool(results.get(cap)), results.get('ssh_connection'), None, settings, now)
+
+    @staticmethod
+    def _forward_invalidation(asset_id: Optional[int]):
+        """把缓存失效请求转发给领导者，asset_id 为空表示所有资产"""
+        RuntimeStateService.send(MAILBOX_HEALTH_INVALIDATIONS, asset_id)
+
+    @staticmethod
+    def process_invalidations():
+        """领导者处理其他进程转发的缓存失效请求"""
+        asset_ids = set(RuntimeStateService.receive(MAILBOX_HEALTH_INVALIDATIONS))
+        if None in asset_ids:
+            with _health_lock:
+                asset_ids = {aid for aid, _ in _health_registry}
+        for asset_id in asset_ids:
+            AssetHealthService.invalidate(asset_id)
+
+    @staticmethod
+    def export_state() -> Dict:
+        """导出注册表和遥测缓存，用于发布运行时状态快照"""
+        with _health_lock:
+            return {
+                'entries': [dict(entry) for entry in _health_registry.values()],
+                'telemetry': {str(asset_id): dict(item) for asset_id, item in _telemetry_registry.items()}
+            }
+
+    @staticmethod
+    def _sync_mirror():
+        """非领导者进程从领导者发布的快照同步注册表"""
+        global _mirror_synced_at
+        if RuntimeStateService.is_local() or time.time() - _mirror_synced_at < MIRROR_TTL:
+            return
+        _mirror_synced_at = time.time()
+        state = RuntimeStateService.read(STATE_ASSET_HEALTH) or {}
+        with _health_lock:
+            _health_registry.clear()
+            _telemetry_registry.clear()
+            for entry in state.get('entries', []):
+                entry['probing'] = False
+                _health_registry[(entry['asset_id'], entry['capability_type'])] = entry
+            for asset_id, item in (state.get('telemetry') or {}).items():
+                _telemetry_registry[int(asset_id)] = item
+
+    @staticmethod
+    def _apply_result(entry: Dict, available: bool, ssh_connection: Optional[bool],
+                      error: Optional[str], settings: Dict[str, int], now: float):
+        """根据探测结果更新条目，连续失败时按指数退避延长探测间隔（调用方需持有锁）"""
+        entry['available'] = available
+        entry['ssh_connection'] = ssh_connection
+        entry['checked_at'] = now
+        entry['error'] = error
+        if available:
+            entry['failure_count'] = 0
+            entry['next_check_at'] = now + settings['interval']
+        else:
+            entry['failure_count'] += 1
+            backoff = settings['interval'] * (2 ** (entry['failure_count'] - 1))
+            entry['next_check_at'] = now + min(backoff, settings['max_backoff'])
+
+    @staticmethod
+    def _sync_assets():
+        """同步数据库中的资产列表，新增资产加入注册表，删除或禁用的资产移出注册表"""
+        with get_db() as db:
+            assets = db.query(AssetModel).filter(AssetModel.enabled == True).all()
+            wanted = set()
+            for asset in assets:
+                for cap in CAPABILITY_TYPES:
+                    cap_config = getattr(asset, cap) or {}
+                    if cap_config.get('enabled'):
+                        wanted.add((asset.id, cap))
+
+        with _health_lock:
+            for key in list(_health_registry.keys()):
+                if key not in wanted:
+                    del _health_registry[key]
+            for asset_id in list(_telemetry_registry.keys()):
+                if (asset_id, 'ai_engine') not in wanted:
+                    del _telemetry_registry[asset_id]
+            for key in wanted:
+                if key not in _health_registry:
+                    _health_registry[key] = AssetHealthService._new_entry(*key)
+
+    @staticmethod
+    def _probe(asset_id: int, capability_type: str):
+        """探测单个资产能力并更新注册表"""
+        with _health_lock:
+            entry = _health_registry.get((asset_id, capability_type))
+            if entry is None or entry['probing']:
+                return
+            entry['probing'] = True
+
+        available = False
+        ssh_connection = None
+        error = None
+        try:
+            results = AssetService.verify_capabilities(asset_id, capability_type)
+            ssh_connection = results.get('ssh_connection')
+            available = bool(results.get(capability_type))
+        except Exception as e:
+            error = str(e)
+            logger.warning(f"探测资产 {asset_id} 的 {capability_type} 能力失败: {error}")
+
+        if available and capability_type == 'ai_engine':
+            AssetHealthService._collect_telemetry(asset_id)
+
+        settings = AssetHealthService._get_settings()
+        with _health_lock:
+            entry = _health_registry.get((asset_id, capability_type))
+            if entry is None:
+                return
+            was_available = entry['available']
+            entry['probing'] = False
+            AssetHealthService._apply_result(entry, available, ssh_connection, error, settings, time.time())
+            failure_count = entry['failure_count']
+
+        if was_available != available:
+            logger.info(f"资产 {asset_id} 的 {capability_type} 能力状态变更为: {'可用' if available else '不可用'}")
+            if available:
+                # 资产恢复可用，唤醒调度器分配等待中的任务
+                from .task_services.scheduler_events import notify_scheduler, REASON_ASSET_AVAILABLE
+                notify_scheduler(REASON_ASSET_AVAILABLE)
+        elif not available and failure_count > 1:
+            logger.debug(f"资产 {asset_id} 的 {capability_type} 能力连续 {failure_count} 次不可用")
+
+    @staticmethod
+    def _collect_telemetry(asset_id: int):
+        """采集AI引擎的系统状态作为资产遥测数据，供负载感知的资产选择使用"""
+        try:
+            with get_db() as db:
+                asset = db.query(AssetModel).filter(AssetModel.id == asset_id).first()
+                if not asset:
+                    return
+                stats = MarkRequestHandler(asset).get_system_stats()
+            if stats:
+                with _health_lock:
+                    _telemetry_registry[asset_id] = {'stats': stats, 'collected_at': time.time()}
+        except Exception as e:
+            logger.debug(f"采集资产 {asset_id} 遥测数据失败: {str(e)}")
+
+    @staticmethod
+    def _prober_loop():
+        """后台探测循环，按条目各自的下次探测时间进行探测"""
+        while _prober_running:
+            try:
+                AssetHealthService._sync_assets()
+                now = time.time()
+                with _health_lock:
+                    due_keys = [
+                        key for key, entry in _health_registry.items()
+                        if not entry['probing'] and entry['next_check_at'] <= now
+                    ]
+                    pending = [
+                        entry['next_check_at'] for entry in _health_registry.values()
+                        if not entry['probing']
+                    ]
+
+                for asset_id, capability_type in due_keys:
+                    probe_pool.submit(AssetHealthService._probe, asset_id, capability_type)
+
+                # 等待到下一个条目到期，期间资产变更会唤醒探测线程
+                interval = ConfigService.get_value('asset_health_interval', 30)
+                wait_time = min(pending) - now if pending and not due_keys else interval
+                _prober_wakeup.wait(timeout=max(1, min(wait_time, interval)))
+                _prober_wakeup.clear()
+            except Exception as e:
+                logger.error(f"资产健康探测循环出错: {str(e)}", exc_info=True)
+                time.sleep(10)
+
+        logger.info("资产健康探测线程已停止")
+
+    @staticmethod
+    def start_prober():
+        """启动后台探测线程"""
+        global _prober_thread, _prober_running
+
+        if not _prober_running and _prober_thread is not None and _prober_thread.is_alive():
+            # 停止后很快再次启动时，等待上一个探测循环退出
+            _prober_thread.join(timeout=30)
+        if _prober_thread is not None and _prober_thread.is_alive():
+            logger.warning("资产健康探测线程已经在运行中")
+            return False
+
+        _prober_running = True
+        _prober_thread = threading.Thread(
+            target=AssetHealthService._prober_loop,
+            name="asset_health_prober",
+            daemon=True
+        )
+        _prober_thread.start()
+        logger.info("资产健康探测线程已启动")
+        return True
+
+    @staticmethod
+    def stop_prober():
+        """停止后台探测线程"""
+        global _prober_running
+
+        if not _prober_running:
+            return False
+        _prober_running = False
+        _prober_wakeup.set()
+        return True
@@ -0,0 +1,189 @@
+from typing import Any, Awaitable, Callable, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor, Future
+from ..utils.logger import setup_logger
+from .config_service import ConfigService
+import asyncio
+import functools
+import threading
+import aiohttp
+
+logger = setup_logger('async_engine')
+
+# 后台事件循环及其线程
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+_loop_lock = threading.Lock()
+
+# 共享的HTTP会话，只能在事件循环线程中创建和使用
+_http_session: Optional[aiohttp.ClientSession] = None
+
+# 同步操作（SSH、数据库、旧的requests调用）使用的有界线程池
+_blocking_pool: Optional[ThreadPoolExecutor] = None
+
+
+class AsyncEngine:
+    """
+    异步执行引擎
+
+    在一个后台线程中运行asyncio事件循环，调度派发和任务监控以协程方式运行在该循环上，
+    远程HTTP状态查询使用共享的aiohttp会话，按主机限制连接数并设置超时，
+    慢速或无响应的资产只会占用一个协程而不是一个线程。
+    SSH和数据库等同步操作通过 run_blocking 放到有界线程池中执行，线程总数保持固定。
+
+    Flask路由等同步代码通过 run_sync / submit 调用协程。
+    """
+
+    @staticmethod
+    def get_loop() -> asyncio.AbstractEventLoop:
+        """获取后台事件循环，首次调用时启动循环线程"""
+        global _loop, _loop_thread, _blocking_pool
+        with _loop_lock:
+            if _loop is None or _loop.is_closed() or not _loop_thread.is_alive():
+                _blocking_pool = ThreadPoolExecutor(
+                    max_workers=ConfigService.get_value('async_blocking_workers', 8),
+                    thread_name_prefix="AsyncBlocking"
+                )
+                _loop = asyncio.new_event_loop()
+                _loop_thread = threading.Thread(
+                    target=AsyncEngine._run_loop,
+                    args=(_loop,),
+                    name="async_engine",
+                    daemon=True
+                )
+                _loop_thread.start()
+                logger.info("异步执行引擎已启动")
+            return _loop
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop):
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+            logger.info("异步执行引擎已停止")
+
+    @staticmethod
+    def in_loop() -> bool:
+        """当前线程是否为事件循环线程"""
+        return threading.current_thread() is _loop_thread
+
+    @staticmethod
+    def submit(coro: Awaitable) -> Future:
+        """
+        从任意线程提交协程到事件循环，不等待结果
+
+        Args:
+            coro: 协程对象
+
+        Returns:
+            concurrent.futures.Future
+        """
+        return asyncio.run_coroutine_threadsafe(coro, AsyncEngine.get_loop())
+
+    @staticmethod
+    def run_sync(coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """
+        兼容层：在同步代码（Flask路由、调度线程）中执行协程并等待结果
+        不能在事件循环线程中调用，否则会死锁
+
+        Args:
+            coro: 协程对象
+            timeout: 等待超时时间(秒)
+
+        Returns:
+            协程返回值
+        """
+        if AsyncEngine.in_loop():
+            raise RuntimeError("不能在事件循环线程中同步等待协程")
+        return AsyncEngine.submit(coro).result(timeout=timeout)
+
+    @staticmethod
+    def call_soon(callback: Callable, *args):
+        """从任意线程在事件循环中执行回调，例如设置 asyncio.Event"""
+        AsyncEngine.get_loop().call_soon_threadsafe(callback, *args)
+
+    @staticmethod
+    async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+        """
+        在有界线程池中执行同步函数，供协程等待
+
+        Args:
+            func: 同步函数
+            *args, **kwargs: 函数参数
+
+        Returns:
+            函数返回值
+        """
+        return await AsyncEngine.run_in_executor(_blocking_pool, func, *args, **kwargs)
+
+    @staticmethod
+    async def run_in_executor(executor: ThreadPoolExecutor, func: Callable, *args, **kwargs) -> Any:
+        """在指定线程池中执行同步函数，用于不应占用公共线程池的长耗时操作"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+    @staticmethod
+    def get_http_session() -> aiohttp.ClientSession:
+        """
+        获取共享的HTTP会话（仅限事件循环线程）
+
+        连接池总上限、单主机连接上限和请求超时分别取自
+        async_http_limit、async_http_limit_per_host、async_http_timeout 配置
+        """
+        global _http_session
+        if _http_session is None or _http_session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=ConfigService.get_value('async_http_limit', 100),
+                limit_per_host=ConfigService.get_value('async_http_limit_per_host', 4),
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=ConfigService.get_value('async_http_timeout', 30),
+                connect=10
+            )
+            _http_session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return _http_session
+
+    @staticmethod
+    async def get_json(url: str, headers: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        异步GET请求并解析JSON响应
+
+        Args:
+            url: 请求地址
+            headers: 请求头
+
+        Returns:
+            解析后的JSON数据
+
+        Raises:
+            aiohttp.ClientError / asyncio.TimeoutError: 请求失败或超时
+        """
+        session = AsyncEngine.get_http_session()
+        async with session.get(url, headers=headers or {}) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    @staticmethod
+    def stop():
+        """关闭HTTP会话并停止事件循环"""
+        global _loop
+        with _loop_lock:
+            loop = _loop
+            _loop = None
+        if loop is None or loop.is_closed():
+            return
+
+        async def _shutdown():
+            global _http_session
+            if _http_session is not None and not _http_session.closed:
+                await _http_session.close()
+            _http_session = None
+
+        try:
+            asyncio.run_coroutine_threadsafe(_shutdown(), loop).result(timeout=5)
+        except Exception as e:
+            logger.warning(f"关闭HTTP会话失败: {str(e)}")
+        loop.call_soon_threadsafe(loop.stop)
+        if _blocking_pool is not None:
+            _blocking_pool.shutdown(wait=False)
@@ -0,0 +1,342 @@
+from typing import Callable, Dict, Optional, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy import or_, case
+from sqlalchemy.exc import IntegrityError
+from ..models.leader_lease import LeaderLease
+from ..database import get_db
+from ..utils.logger import setup_logger
+from .config_service import ConfigService
+import threading
+import socket
+import time
+import uuid
+import os
+
+logger = setup_logger('leader_election')
+
+# 调度器租约名称
+LEASE_SCHEDULER = 'scheduler'
+
+# 本进程的持有者标识
+HOLDER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# 选举线程及其唤醒事件
+_election_thread: Optional[threading.Thread] = None
+_election_running = False
+_election_wakeup = threading.Event()
+
+# 选举状态
+_state: Dict = {
+    'is_leader': False,
+    'term': None,
+    'renewed_at': 0.0,           # 本地最近一次续约成功的时间戳
+    'last_wakeup_at': None,      # 已处理的最近一次唤醒请求时间
+    'wakeup_pending': False,     # 本进程有待转发给领导者的唤醒请求
+}
+_state_lock = threading.Lock()
+
+# 当选和卸任时的回调
+_on_elected: Optional[Callable[[], None]] = None
+_on_demoted: Optional[Callable[[], None]] = None
+_on_wakeup: Optional[Callable[[], None]] = None
+_on_heartbeat: Optional[Callable[[], None]] = None
+
+
+class LeaderElection:
+    """
+    基于数据库租约的领导者选举
+
+    多个后端进程共享同一数据库时，只有持有调度器租约的进程运行调度器、任务监控和资产健康探测。
+    租约是 leader_leases 表中的一行，取得和续约都是一条条件 UPDATE：
+    仅当租约已过期或本进程就是持有者时才会更新成功，因此同一时刻只有一个进程能成为领导者。
+
+    - 每 leader_lease_seconds / 3 秒续约一次；领导者进程退出时主动释放租约，其他进程在下一次心跳时接管
+    - 领导者进程失联时，其他进程在租约过期后接管，最长等待 leader_lease_seconds + 一个心跳间隔
+    - 续约失败（如数据库不可用）且本地记录的租约即将过期时，领导者主动卸任，避免与新领导者同时运行
+    - 非领导者进程（包括不参与选举的 API 进程）上的任务提交等事件通过租约行的 wakeup_at 转发给领导者的调度器，
+      领导者在两次续约之间每 leader_wakeup_poll_interval 秒读取一次 wakeup_at，不必等到下一次心跳
+
+    要求各主机时钟大致同步。
+    """
+
+    @staticmethod
+    def get_lease_seconds() -> int:
+        """租约时长(秒)"""
+        return max(3, ConfigService.get_value('leader_lease_seconds', 15) or 15)
+
+    @staticmethod
+    def get_wakeup_poll_interval() -> Optional[float]:
+        """领导者检查唤醒请求的间隔(秒)，为空时只在续约时检查"""
+        interval = ConfigService.get_value('leader_wakeup_poll_interval', 1)
+        return interval if interval and interval > 0 else None
+
+    @staticmethod
+    def is_leader() -> bool:
+        """本进程是否为领导者"""
+        return _state['is_leader']
+
+    @staticmethod
+    def start(on_elected: Callable[[], None], on_demoted: Callable[[], None],
+              on_wakeup: Optional[Callable[[], None]] = None,
+              on_heartbeat: Optional[Callable[[], None]] = None):
+        """
+        开始参与选举
+
+        立即尝试一次取得租约（单进程部署时启动后即成为领导者），之后由后台线程定期续约或竞选。
+
+        Args:
+            on_elected: 成为领导者时调用，启动调度器等组件
+            on_demoted: 失去领导权时调用，停止调度器等组件
+            on_wakeup: 领导者收到其他进程的唤醒请求时调用
+            on_heartbeat: 领导者每次续约成功后调用
+        """
+        global _election_thread, _election_running, _on_elected, _on_demoted, _on_wakeup, _on_heartbeat
+
+        if _election_thread is not None and _election_thread.is_alive():
+            logger.warning("领导者选举线程已经在运行中")
+            return False
+
+        _on_elected, _on_demoted, _on_wakeup, _on_heartbeat = on_elected, on_demoted, on_wakeup, on_heartbeat
+        _election_running = True
+        LeaderElection._tick()
+        _election_thread = threading.Thread(
+            target=LeaderElection._election_loop,
+            name="leader_election",
+            daemon=True
+        )
+        _election_thread.start()
+        logger.info(f"领导者选举已启动，持有者标识: {HOLDER_ID}")
+        return True
+
+    @staticmethod
+    def stop():
+        """停止参与选举，领导者会停止组件并释放租约，其他进程可以立即接管"""
+        global _election_running
+
+        if not _election_running:
+            return False
+        _election_running = False
+        _election_wakeup.set()
+        if _election_thread is not None and _election_thread is not threading.current_thread():
+            _election_thread.join(timeout=5)
+        if LeaderElection.is_leader():
+            LeaderElection._demote("进程退出")
+        LeaderElection._release()
+        return True
+
+    @staticmethod
+    def request_wakeup():
+        """
+        非领导者进程请求唤醒领导者的调度器
+
+        参与选举的进程由选举线程写入租约行，不参与选举的 API 进程直接写入
+        """
+        if LeaderElection.is_leader():
+            return
+        with _state_lock:
+            _state['wakeup_pending'] = True
+        if _election_running:
+            _election_wakeup.set()
+        else:
+            LeaderElection._forward_wakeup()
+
+    @staticmethod
+    def _election_loop():
+        """后台选举循环，按心跳间隔续约或竞选，领导者在心跳之间按较短的间隔检查唤醒请求"""
+        next_tick = time.time() + LeaderElection.get_lease_seconds() / 3
+        while _election_running:
+            timeout = max(0.0, next_tick - time.time())
+            poll_interval = LeaderElection.get_wakeup_poll_interval()
+            if poll_interval and LeaderElection.is_leader():
+                timeout = min(timeout, poll_interval)
+            woken = _election_wakeup.wait(timeout=timeout)
+            _election_wakeup.clear()
+            if not _election_running:
+                break
+            if woken or time.time() >= next_tick:
+                LeaderElection._tick()
+                next_tick = time.time() + LeaderElection.get_lease_seconds() / 3
+            else:
+                LeaderElection._poll_wakeup()
+        logger.info("领导者选举线程已停止")
+
+    @staticmethod
+    def _tick():
+        """执行一次续约或竞选，并处理领导权变化和唤醒请求"""
+        lease_seconds = LeaderElection.get_lease_seconds()
+        try:
+            held, term, wakeup_at = LeaderElection._try_acquire(lease_seconds)
+        except Exception as e:
+            logger.error(f"续约调度器租约失败: {str(e)}")
+            # 无法确认租约状态时，领导者在本地记录的租约过期前一个心跳间隔主动卸任
+            deadline = _state['renewed_at'] + lease_seconds * 2 / 3
+            if LeaderElection.is_leader() and time.time() >= deadline:
+                LeaderElection._demote("无法续约租约")
+            return
+
+        if held:
+            with _state_lock:
+                _state['renewed_at'] = time.time()
+            if not LeaderElection.is_leader():
+                LeaderElection._elect(term, wakeup_at)
+            else:
+                LeaderElection._handle_wakeup(wakeup_at)
+            if _on_heartbeat and LeaderElection.is_leader():
+                try:
+                    _on_heartbeat()
+                except Exception as e:
+                    logger.error(f"领导者心跳回调出错: {str(e)}", exc_info=True)
+        else:
+            if LeaderElection.is_leader():
+                LeaderElection._demote("租约已被其他进程接管")
+            LeaderElection._forward_wakeup()
+
+    @staticmethod
+    def _poll_wakeup():
+        """领导者在两次续约之间读取租约行的唤醒请求时间"""
+        try:
+            with get_db() as db:
+                row = db.query(LeaderLease.wakeup_at).filter(
+                    LeaderLease.name == LEASE_SCHEDULER,
+                    LeaderLease.holder == HOLDER_ID
+                ).first()
+        except Exception as e:
+            logger.error(f"读取调度器唤醒请求失败: {str(e)}")
+            return
+        if row:
+            LeaderElection._handle_wakeup(row.wakeup_at)
+
+    @staticmethod
+    def _handle_wakeup(wakeup_at: Optional[datetime]):
+        """领导者收到新的唤醒请求时唤醒调度器"""
+        with _state_lock:
+            if not _state['is_leader'] or not wakeup_at or wakeup_at == _state['last_wakeup_at']:
+                return
+            _state['last_wakeup_at'] = wakeup_at
+        if _on_wakeup:
+            _on_wakeup()
+
+    @staticmethod
+    def _try_acquire(lease_seconds: int) -> Tuple[bool, Optional[int], Optional[datetime]]:
+        """
+        取得或续约租约
+
+        Returns:
+            (是否持有租约, 当前任期, 最近的唤醒请求时间)
+        """
+        now = datetime.now()
+        expires_at = now + timedelta(seconds=lease_seconds)
+        with get_db() as db:
+            updated = db.query(LeaderLease).filter(
+                LeaderLease.name == LEASE_SCHEDULER,
+                or_(LeaderLease.holder == HOLDER_ID, LeaderLease.expires_at < now)
+            ).update({
+                LeaderLease.term: case((LeaderLease.holder == HOLDER_ID, LeaderLease.term), else_=LeaderLease.term + 1),
+                LeaderLease.acquired_at: case((LeaderLease.holder == HOLDER_ID, LeaderLease.acquired_at), else_=now),
+                LeaderLease.holder: HOLDER_ID,
+                LeaderLease.renewed_at: now,
+                LeaderLease.expires_at: expires_at
+            }, synchronize_session=False)
+            db.commit()
+
+            if not updated:
+                lease = db.query(LeaderLease).filter(LeaderLease.name == LEASE_SCHEDULER).first()
+                if lease:
+                    return False, lease.term, lease.wakeup_at
+                try:
+                    db.add(LeaderLease(
+                        name=LEASE_SCHEDULER,
+                        holder=HOLDER_ID,
+                        term=1,
+                        acquired_at=now,
+                        renewed_at=now,
+                        expires_at=expires_at
+                    ))
+                    db.commit()
+                except IntegrityError:
+                    # 其他进程同时创建了租约
+                    db.rollback()
+                    return False, None, None
+
+            lease = db.query(LeaderLease).filter(LeaderLease.name == LEASE_SCHEDULER).first()
+            return True, lease.term, lease.wakeup_at
+
+    @staticmethod
+    def _release():
+        """释放本进程持有的租约"""
+        try:
+            with get_db() as db:
+                db.query(LeaderLease).filter(
+                    LeaderLease.name == LEASE_SCHEDULER,
+                    LeaderLease.holder == HOLDER_ID
+                ).update({LeaderLease.expires_at: datetime.now()}, synchronize_session=False)
+                db.commit()
+        except Exception as e:
+            logger.error(f"释放调度器租约失败: {str(e)}")
+
+    @staticmethod
+    def _forward_wakeup():
+        """把本进程积累的唤醒请求写入租约行，由领导者在下一次检查唤醒请求时读取"""
+        with _state_lock:
+            if not _state['wakeup_pending']:
+                return
+            _state['wakeup_pending'] = False
+        try:
+            with get_db() as db:
+                db.query(LeaderLease).filter(
+                    LeaderLease.name == LEASE_SCHEDULER
+                ).update({LeaderLease.wakeup_at: datetime.now()}, synchronize_session=False)
+                db.commit()
+        except Exception as e:
+            logger.error(f"转发调度器唤醒请求失败: {str(e)}")
+
+    @staticmethod
+    def _elect(term: Optional[int], wakeup_at: Optional[datetime]):
+        """成为领导者，启动组件"""
+        with _state_lock:
+            _state['is_leader'] = True
+            _state['term'] = term
+            _state['last_wakeup_at'] = wakeup_at
+            _state['wakeup_pending'] = False
+        logger.info(f"本进程成为调度器领导者，任期: {term}")
+        try:
+            if _on_elected:
+                _on_elected()
+        except Exception as e:
+            logger.error(f"领导者启动组件失败，释放租约: {str(e)}", exc_info=True)
+            LeaderElection._demote("启动组件失败")
+            LeaderElection._release()
+
+    @staticmethod
+    def _demote(reason: str):
+        """失去领导权，停止组件"""
+        with _state_lock:
+            if not _state['is_leader']:
+                return
+            _state['is_leader'] = False
+        logger.warning(f"本进程不再是调度器领导者: {reason}")
+        try:
+            if _on_demoted:
+                _on_demoted()
+        except Exception as e:
+            logger.error(f"停止领导者组件失败: {str(e)}", exc_info=True)
+
+    @staticmethod
+    def get_status() -> Dict:
+        """获取选举状态和当前租约"""
+        lease = None
+        try:
+            with get_db() as db:
+                row = db.query(LeaderLease).filter(LeaderLease.name == LEASE_SCHEDULER).first()
+                if row:
+                    lease = row.to_dict()
+                    lease['expired'] = row.expires_at < datetime.now()
+        except Exception as e:
+            logger.error(f"读取调度器租约失败: {str(e)}")
+        return {
+            'holder_id': HOLDER_ID,
+            'is_leader': LeaderElection.is_leader(),
+            'term': _state['term'],
+            'lease_seconds': LeaderElection.get_lease_seconds(),
+            'lease': lease
+        }
@@ -0,0 +1,109 @@
+from typing import Any, Dict, List
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from ..models.runtime_state import RuntimeState
+from ..database import get_db
+from ..utils.logger import setup_logger
+from .leader_election import LeaderElection
+
+logger = setup_logger('runtime_state_service')
+
+# 运行时状态快照名称
+STATE_STAGING = 'staging'
+STATE_PREFETCH = 'prefetch'
+STATE_MONITOR_PROGRESS = 'monitor_progress'
+STATE_ASSET_HEALTH = 'asset_health'
+
+# 发给领导者的请求
+MAILBOX_HEALTH_INVALIDATIONS = 'mailbox:health_invalidations'
+MAILBOX_CANCELLATIONS = 'mailbox:cancellations'
+
+# 快照超过多少个租约时长未更新视为过期（领导者已失联）
+STALE_LEASES = 3
+
+
+class RuntimeStateService:
+    """
+    运行时状态快照
+
+    暂存进度、监控进度和资产健康注册表等运行时状态只存在于调度器领导者进程（worker 或嵌入模式的 API 进程）的内存中。
+    领导者在每次续约租约时把这些状态发布到 runtime_states 表，API 进程读取快照，
+    因此 API 进程本身不持有调度状态，可以用多进程 WSGI 服务器运行。
+    API 进程发给领导者的请求（如资产健康缓存失效、任务取消）写入邮箱行，由领导者在下一次续约时取出处理。
+    """
+
+    @staticmethod
+    def is_local() -> bool:
+        """运行时状态是否在本进程内（本进程是调度器领导者）"""
+        return LeaderElection.is_leader()
+
+    @staticmethod
+    def publish(states: Dict[str, Any]):
+        """
+        发布运行时状态快照
+
+        Args:
+            states: {状态名称: 可JSON序列化的状态内容}
+        """
+        now = datetime.now()
+        with get_db() as db:
+            existing = {
+                row.name: row for row in db.query(RuntimeState).filter(RuntimeState.name.in_(list(states))).all()
+            }
+            for name, data in states.items():
+                row = existing.get(name)
+                if row is None:
+                    db.add(RuntimeState(name=name, data=data, updated_at=now))
+                else:
+                    row.data = data
+                    row.updated_at = now
+            db.commit()
+
+    @staticmethod
+    def read(name: str, default: Any = None) -> Any:
+        """
+        读取运行时状态快照
+
+        Args:
+            name: 状态名称
+            default: 快照不存在或已过期时的返回值
+        """
+        with get_db() as db:
+            row = db.query(RuntimeState).filter(RuntimeState.name == name).first()
+            if row is None or row.data is None:
+                return default
+            age = (datetime.now() - row.updated_at).total_seconds()
+            if age > LeaderElection.get_lease_seconds() * STALE_LEASES:
+                return default
+            return row.data
+
+    @staticmethod
+    def send(mailbox: str, item: Any):
+        """向领导者发送请求"""
+        try:
+            with get_db() as db:
+                row = db.query(RuntimeState).filter(RuntimeState.name == mailbox).with_for_update().first()
+                if row is None:
+                    db.add(RuntimeState(name=mailbox, data=[item], updated_at=datetime.now()))
+                else:
+                    row.data = list(row.data or []) + [item]
+                    row.updated_at = datetime.now()
+                db.commit()
+        except IntegrityError:
+            # 其他进程同时创建了邮箱行，重试一次
+            RuntimeStateService.send(mailbox, item)
+        except Exception as e:
+            logger.error(f"发送请求到 {mailbox} 失败: {str(e)}")
+
+    @staticmethod
+    def receive(mailbox: str) -> List[Any]:
+        """取出并清空邮箱中的请求"""
+        with get_db() as db:
+            row = db.query(RuntimeState).filter(RuntimeState.name == mailbox).with_for_update().first()
+            if row is None or not row.data:
+                return []
+            items = list(row.data)
+            row.data = []
+            row.updated_at = datetime.now()
+            db.commit()
+            return items
@@ -64,4 +64,5 @@ class TaskService:
     init_scheduler = SchedulerService.init_scheduler
     start_scheduler = SchedulerService.start_scheduler
     stop_scheduler = SchedulerService.stop_scheduler
+    get_queue = SchedulerService.get_queue
     run_scheduler_once = SchedulerService.run_scheduler_once
\ No newline at end of file
@@ -0,0 +1,116 @@
+from typing import Dict, Optional, Tuple
+from ...utils.logger import setup_logger
+from .assignment_planner import AssetCapacity
+import threading
+
+logger = setup_logger('asset_selection_policy')
+
+
+class SelectionPolicy:
+    """
+    资产选择策略基类
+
+    规划器对每个待分配任务选择 key 最小的资产，分配后资产的 remaining/assigned
+    会被更新并重新计算 key，因此策略只需根据容量快照和遥测数据给出排序键。
+    """
+    name = 'most_remaining'
+
+    def key(self, capacity: AssetCapacity) -> Tuple:
+        """返回资产的排序键，越小越优先"""
+        return (-capacity.remaining,)
+
+    def on_assigned(self, capacity: AssetCapacity):
+        """资产被分配一个任务后的回调"""
+        pass
+
+
+class LeastLoadedPolicy(SelectionPolicy):
+    """
+    最小负载策略
+    按已占用并发比例选择，比例相同时优先选择GPU利用率和显存占用更低的资产
+    """
+    name = 'least_loaded'
+
+    def key(self, capacity: AssetCapacity) -> Tuple:
+        limit = capacity.limit or (capacity.remaining + capacity.assigned) or 1
+        load_ratio = (limit - capacity.remaining) / limit
+        telemetry = capacity.telemetry or {}
+        return (
+            round(load_ratio, 4),
+            telemetry.get('gpu_utilization', 0),
+            telemetry.get('gpu_usage', 0),
+        )
+
+
+class MostFreeVramPolicy(SelectionPolicy):
+    """
+    最大空闲显存策略
+    按空闲显存除以本轮已规划任务数选择，避免同一轮调度把所有任务都压到显存最大的资产上，
+    没有遥测数据的资产排在有数据的资产之后
+    """
+    name = 'most_free_vram'
+
+    def key(self, capacity: AssetCapacity) -> Tuple:
+        telemetry = capacity.telemetry or {}
+        total = telemetry.get('gpu_memory_total')
+        if not total:
+            return (1, 0, -capacity.remaining)
+        free = max(0.0, total - telemetry.get('gpu_memory_used', 0))
+        return (0, -free / (1 + capacity.assigned), -capacity.remaining)
+
+
+class WeightedRoundRobinPolicy(SelectionPolicy):
+    """
+    加权轮询策略
+    每个资产按权重分摊任务，已分配次数/权重 最小的资产优先。
+    权重取自 asset_selection_weights 配置，未配置时使用GPU显存总量，均无则为1
+    """
+    name = 'weighted_round_robin'
+
+    def __init__(self):
+        self._served: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def key(self, capacity: AssetCapacity) -> Tuple:
+        with self._lock:
+            served = self._served.get(capacity.asset_id, 0)
+        return (served / max(capacity.weight, 0.001), -capacity.remaining)
+
+    def on_assigned(self, capacity: AssetCapacity):
+        with self._lock:
+            self._served[capacity.asset_id] = self._served.get(capacity.asset_id, 0) + 1
+            # 计数整体平移，避免长期运行后数值无限增长
+            floor = min(self._served.values())
+            if floor >= 1000:
+                for asset_id in self._served:
+                    self._served[asset_id] -= floor
+
+
+# 可用的选择策略，策略实例在进程内复用以保存轮询状态
+SELECTION_POLICIES: Dict[str, SelectionPolicy] = {
+    policy.name: policy for policy in (
+        SelectionPolicy(),
+        LeastLoadedPolicy(),
+        MostFreeVramPolicy(),
+        WeightedRoundRobinPolicy(),
+    )
+}
+
+DEFAULT_POLICY = 'least_loaded'
+
+
+def get_selection_policy(name: Optional[str]) -> SelectionPolicy:
+    """
+    根据名称获取选择策略
+
+    Args:
+        name: 策略名称，未知名称回退到默认策略
+
+    Returns:
+        选择策略实例
+    """
+    policy = SELECTION_POLICIES.get(name or DEFAULT_POLICY)
+    if policy is None:
+        logger.warning(f"未知的资产选择策略: {name}，使用默认策略 {DEFAULT_POLICY}")
+        policy = SELECTION_POLICIES[DEFAULT_POLICY]
+    return policy
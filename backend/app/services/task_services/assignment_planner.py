@@ -0,0 +1,124 @@
+from typing import List, Tuple, Dict, Optional
+from dataclasses import dataclass
+import heapq
+
+
+@dataclass
+class AssetCapacity:
+    """资产剩余容量快照"""
+    asset_id: int
+    remaining: int
+    limit: int = 0                      # 资产并发上限
+    assigned: int = 0                   # 本轮规划中已分配的任务数
+    telemetry: Optional[Dict] = None    # 缓存的GPU/内存遥测数据
+    weight: float = 1.0                 # 加权轮询权重
+
+
+@dataclass
+class Assignment:
+    """任务分配结果"""
+    task_id: int
+    asset_id: int
+
+
+class AssignmentPlanner:
+    """
+    批量任务分配规划器
+
+    基于一次调度开始时的任务和资产容量快照，一次性计算所有分配结果。
+    规划过程不访问数据库和网络，调度器负责在同一个事务中提交规划结果。
+    """
+
+    @staticmethod
+    def plan(task_ids: List[int], capacities: List[AssetCapacity], policy=None,
+             affinity: Optional[Dict[int, Dict[int, float]]] = None,
+             waits: Optional[Dict[int, float]] = None) -> Tuple[List[Assignment], List[int]]:
+        """
+        按剩余容量装箱分配任务
+
+        每个任务分配给选择策略排序键最小的资产（默认为剩余容量最大的资产），
+        排序键相同时按资产在快照中的顺序选择，分配后扣减容量，
+        保证同一次规划中不会超额分配。
+
+        Args:
+            task_ids: 待分配任务ID列表，按调度优先级排序
+            capacities: 资产剩余容量快照
+            policy: 资产选择策略，见 asset_selection_policy
+            affinity: 数据本地性收益 {任务ID: {资产ID: 节省的时间(秒)}}
+            waits: 已满资产的预计等待时间 {资产ID: 秒}，未知时不包含该资产
+
+        Returns:
+            (分配结果列表, 未分配的任务ID列表)
+        """
+        if policy is None:
+            from .asset_selection_policy import SelectionPolicy
+            policy = SelectionPolicy()
+        if affinity:
+            return AssignmentPlanner._plan_with_affinity(task_ids, capacities, policy, affinity, waits or {})
+
+        # 最小堆：(策略排序键, 快照顺序)，只有被选中的资产排序键会变化
+        heap = [
+            (policy.key(capacity), index)
+            for index, capacity in enumerate(capacities)
+            if capacity.remaining > 0
+        ]
+        heapq.heapify(heap)
+
+        assignments = []
+        for position, task_id in enumerate(task_ids):
+            if not heap:
+                return assignments, list(task_ids[position:])
+
+            _, index = heapq.heappop(heap)
+            capacity = capacities[index]
+            assignments.append(Assignment(task_id=task_id, asset_id=capacity.asset_id))
+
+            AssignmentPlanner._consume(capacity, policy)
+            if capacity.remaining > 0:
+                heapq.heappush(heap, (policy.key(capacity), index))
+
+        return assignments, []
+
+    @staticmethod
+    def _consume(capacity: AssetCapacity, policy):
+        """扣减资产容量"""
+        capacity.remaining -= 1
+        capacity.assigned += 1
+        policy.on_assigned(capacity)
+
+    @staticmethod
+    def _plan_with_affinity(task_ids: List[int], capacities: List[AssetCapacity], policy,
+                            affinity: Dict[int, Dict[int, float]],
+                            waits: Dict[int, float]) -> Tuple[List[Assignment], List[int]]:
+        """
+        考虑数据本地性的分配
+
+        有空闲容量的资产中优先选择本地性收益最大的资产，收益相同时按选择策略排序；
+        如果某个已满资产的 收益-预计等待时间 仍高于最佳空闲资产的收益，任务继续等待该资产。
+        """
+        assignments = []
+        waiting = []
+        for task_id in task_ids:
+            gains = affinity.get(task_id, {})
+            free = [capacity for capacity in capacities if capacity.remaining > 0]
+            best = min(
+                free,
+                key=lambda capacity: (-gains.get(capacity.asset_id, 0), policy.key(capacity)),
+                default=None
+            )
+            best_gain = gains.get(best.asset_id, 0) if best else 0
+
+            # 等待已满的本地资产是否比立即使用空闲资产更快
+            hold = any(
+                gain - waits[asset_id] > best_gain
+                for asset_id, gain in gains.items()
+                if asset_id in waits and (best is None or asset_id != best.asset_id)
+            )
+            if best is None or hold:
+                waiting.append(task_id)
+                continue
+
+            assignments.append(Assignment(task_id=task_id, asset_id=best.asset_id))
+            AssignmentPlanner._consume(best, policy)
+
+        return assignments, waiting
@@ -11,6 +11,10 @@ from ...config import config
 from ...services.common_service import CommonService
 from ...utils.train_handler import TrainRequestHandler
 from ...utils.mark_handler import MarkRequestHandler
+from .scheduler_events import notify_scheduler, REASON_CAPACITY_RELEASED
+from .slot_service import SlotService, CAPABILITY_MARKING, CAPABILITY_TRAINING
+from .fair_share_queue import FairShareQueue
+from .cancellation import CancellationRegistry
 import shutil
 
 logger = setup_logger('base_task_service')
@@ -45,10 +49,13 @@ class BaseTaskService:
     def create_task(db: Session, task_data: Dict) -> Optional[Dict]:
         """创建新任务"""
         # 只保留模型中定义的字段
-        valid_fields = ['name', 'description', 'auto_training']
+        valid_fields = ['name', 'description', 'auto_training', 'priority', 'owner']
         filtered_data = {k: v for k, v in task_data.items() if k in valid_fields}
-        task = Task(**filtered_data)
         try:
+            # 优先级支持类别名称(low/normal/high/urgent)或数值
+            filtered_data['priority'] = FairShareQueue.normalize_priority(filtered_data.get('priority'))
+            task = Task(**filtered_data)
+            
             # 将任务名称翻译为英文作为触发词
             if 'name' in filtered_data and filtered_data['name']:
                 task_name = filtered_data['name']
@@ -86,9 +93,13 @@ class BaseTaskService:
         try:
             # 只允许更新特定字段
             valid_fields = ['name', 'description', 'mark_config', 'training_config', 
-                           'use_global_mark_config', 'use_global_training_config', 'auto_training']
+                           'use_global_mark_config', 'use_global_training_config', 'auto_training',
+                           'priority', 'owner']
             filtered_data = {k: v for k, v in update_data.items() if k in valid_fields}
             
+            if 'priority' in filtered_data:
+                filtered_data['priority'] = FairShareQueue.normalize_priority(filtered_data['priority'])
+            
             # 对训练配置进行类型转换和验证
             if 'training_config' in filtered_data:
                 from ..config_service import ConfigService
@@ -317,6 +328,7 @@ class BaseTaskService:
         """
         终止任务并回滚到前一个状态
         
+        先取消任务的取消令牌，立即停止监控和进行中的暂存，再中断远程任务；
         根据任务类型使用不同的终止逻辑：
         - 对于训练中的任务，使用TrainHandler的cancel_training方法，回滚到MARKED状态
         - 对于打标中的任务，使用ComfyUIAPI工具中的中断方法，回滚到NEW状态
@@ -337,6 +349,9 @@ class BaseTaskService:
             # 确定目标回滚状态
             target_status = TaskStatus.NEW if task.status == TaskStatus.MARKING else TaskStatus.MARKED
 
+            # 先停止本地的监控和暂存，远程中断引起的失败状态不会再被当作任务结果处理
+            CancellationRegistry.cancel(task_id, '任务已终止')
+
             # 根据任务类型执行不同的终止逻辑
             if task.status == TaskStatus.TRAINING and task.training_asset and task.prompt_id:
                 # 训练任务终止
@@ -526,15 +541,17 @@ class BaseTaskService:
                 
                 # 清除资产关联
             if clear_assets:
-                if target_status == TaskStatus.NEW and task.marking_asset:
-                    task.marking_asset.marking_tasks_count = max(0, task.marking_asset.marking_tasks_count - 1)
+                if target_status == TaskStatus.NEW and task.marking_asset_id:
+                    SlotService.release(db, task.id, CAPABILITY_MARKING)
                     task.marking_asset_id = None
                 
-                if task.training_asset:
-                    task.training_asset.training_tasks_count = max(0, task.training_asset.training_tasks_count - 1)
+                if task.training_asset_id:
+                    SlotService.release(db, task.id, CAPABILITY_TRAINING)
                     task.training_asset_id = None
                 
             db.commit()
+            # 资产计数释放或任务重新进入待调度状态后唤醒调度器
+            notify_scheduler(REASON_CAPACITY_RELEASED)
             return True
         
         except Exception as e:
@@ -579,6 +596,10 @@ class BaseTaskService:
                 # 对于其他状态（SUBMITTED, MARKED, NEW），直接回滚到NEW状态
                 target_status = TaskStatus.NEW
                 
+                # 已分配资产、正在暂存的任务立即停止上传
+                if task.status == TaskStatus.SUBMITTED and task.marking_asset_id:
+                    CancellationRegistry.cancel(task_id, '任务已取消')
+                
                 # 使用公共回滚方法
                 rollback_success = BaseTaskService._rollback_task_state(
                     db=db,
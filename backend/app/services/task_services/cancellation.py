@@ -0,0 +1,131 @@
+from typing import Callable, Dict, List, Optional
+from dataclasses import dataclass, field
+from datetime import datetime
+from ...utils.logger import setup_logger
+from ..runtime_state_service import RuntimeStateService, MAILBOX_CANCELLATIONS
+import threading
+import time
+
+logger = setup_logger('cancellation')
+
+# 令牌保留时间(秒)，超时后清理
+TOKEN_RETENTION = 86400
+
+# 任务ID -> 取消令牌
+_tokens: Dict[int, 'CancellationToken'] = {}
+_tokens_lock = threading.Lock()
+
+# 任务被取消时立即调用的回调，参数为任务ID
+_listeners: List[Callable[[int], None]] = []
+
+
+class TaskCancelled(Exception):
+    """任务已被取消，暂存和提交过程中途退出"""
+    pass
+
+
+@dataclass
+class CancellationToken:
+    """单个任务的取消令牌，任务每次分配资产时重新创建"""
+    task_id: int
+    created_at: float = field(default_factory=time.time)
+    event: threading.Event = field(default_factory=threading.Event, repr=False)
+    cancelled_at: Optional[float] = None
+    reason: Optional[str] = None
+
+    def is_cancelled(self) -> bool:
+        return self.event.is_set()
+
+
+class CancellationRegistry:
+    """
+    任务取消令牌注册表
+
+    终止或取消任务时先取消令牌，再中断远程任务和回滚状态：
+    - 令牌取消时立即调用注册的回调，监控引擎停止该任务的监控并结束监控作业，不再等待下一次轮询
+    - 暂存中的上传在下一个文件完成时中止，提交请求前检查令牌，已取消的任务不会再提交到资产
+    - 监控结束后排队中的完成处理被跳过，远程中断引起的失败状态不会覆盖回滚后的任务状态
+
+    令牌只存在于本进程内存中；本进程不是调度器领导者时，取消请求同时转发给领导者，
+    在领导者下一次续约时生效。
+    """
+
+    @staticmethod
+    def reset(task_id: int):
+        """任务分配到资产时创建新令牌，之前的取消不再影响本次执行"""
+        with _tokens_lock:
+            CancellationRegistry._prune(time.time())
+            _tokens[task_id] = CancellationToken(task_id=task_id)
+
+    @staticmethod
+    def cancel(task_id: int, reason: str = '任务已取消', cancelled_at: Optional[float] = None) -> bool:
+        """
+        取消任务
+
+        Args:
+            task_id: 任务ID
+            reason: 取消原因
+            cancelled_at: 取消时间戳，为空表示现在；早于令牌创建时间的取消请求会被忽略
+
+        Returns:
+            是否取消了令牌（令牌已取消或取消请求已过期时返回False）
+        """
+        now = time.time()
+        cancelled_at = cancelled_at or now
+        with _tokens_lock:
+            token = _tokens.get(task_id)
+            if token is None:
+                token = _tokens[task_id] = CancellationToken(task_id=task_id, created_at=cancelled_at)
+            elif token.is_cancelled() or cancelled_at < token.created_at:
+                return False
+            token.cancelled_at = cancelled_at
+            token.reason = reason
+            token.event.set()
+
+        logger.info(f"任务 {task_id} 已取消: {reason}")
+        if not RuntimeStateService.is_local():
+            RuntimeStateService.send(MAILBOX_CANCELLATIONS, {
+                'task_id': task_id,
+                'reason': reason,
+                'cancelled_at': datetime.fromtimestamp(cancelled_at).isoformat()
+            })
+        for listener in list(_listeners):
+            try:
+                listener(task_id)
+            except Exception as e:
+                logger.error(f"处理任务 {task_id} 的取消回调出错: {str(e)}", exc_info=True)
+        return True
+
+    @staticmethod
+    def is_cancelled(task_id: int) -> bool:
+        """任务当前的执行是否已被取消"""
+        with _tokens_lock:
+            token = _tokens.get(task_id)
+        return bool(token and token.is_cancelled())
+
+    @staticmethod
+    def check(task_id: int):
+        """任务已被取消时抛出 TaskCancelled"""
+        with _tokens_lock:
+            token = _tokens.get(task_id)
+        if token and token.is_cancelled():
+            raise TaskCancelled(token.reason or '任务已取消')
+
+    @staticmethod
+    def add_listener(listener: Callable[[int], None]):
+        """注册取消回调，在调用 cancel 的线程中执行，需要快速返回"""
+        _listeners.append(listener)
+
+    @staticmethod
+    def process_remote():
+        """领导者处理其他进程转发的取消请求"""
+        for item in RuntimeStateService.receive(MAILBOX_CANCELLATIONS):
+            cancelled_at = datetime.fromisoformat(item['cancelled_at']).timestamp()
+            CancellationRegistry.cancel(item['task_id'], item.get('reason') or '任务已取消', cancelled_at)
+
+    @staticmethod
+    def _prune(now: float):
+        """清理过期的令牌（调用方需持有锁）"""
+        expired = [task_id for task_id, token in _tokens.items() if now - token.created_at > TOKEN_RETENTION]
+        for task_id in expired:
+            del _tokens[task_id]
@@ -0,0 +1,166 @@
+from typing import Callable, Dict, Optional, Set
+from ...utils.logger import setup_logger
+from ..async_engine import AsyncEngine
+import asyncio
+import json
+import aiohttp
+
+logger = setup_logger('comfyui_event_stream')
+
+# 表示prompt执行结束（成功、失败或被中断）的消息类型
+TERMINAL_EVENTS = ('execution_success', 'execution_error', 'execution_interrupted')
+
+# 资产ID -> 订阅协程 / 已连接的资产
+_streams: Dict[int, asyncio.Task] = {}
+_connected: Set[int] = set()
+
+# prompt_id -> 最近一次 progress 事件中的进度 {value, max, node}，prompt结束时移除
+_progress: Dict[str, Dict] = {}
+
+# 连接断开后的最大重连等待时间(秒)
+MAX_RECONNECT_DELAY = 60
+
+
+class ComfyUIEventStream:
+    """
+    ComfyUI WebSocket 事件订阅
+
+    每个有打标任务的资产保持一条到 ComfyUI /ws 的长连接，运行在异步执行引擎上。
+    ComfyUI 只把执行事件推送给提交prompt时使用的 client_id，因此订阅使用与
+    MarkRequestHandler 相同的 client_id。收到prompt结束事件后立即通知监控引擎检查该prompt，
+    连接正常时 /history 轮询只作为低频对账，连接断开时监控引擎恢复按原间隔轮询。
+
+    执行中的 progress 事件只记录在内存中，供监控引擎组装打标进度，不需要为进度单独请求 ComfyUI。
+
+    除 is_connected、get_progress 和 discard_progress 外，所有方法只能在事件循环线程中调用。
+    """
+
+    @staticmethod
+    def is_connected(asset_id: int) -> bool:
+        """资产的事件订阅当前是否已连接"""
+        return asset_id in _connected
+
+    @staticmethod
+    def get_progress(prompt_id: str) -> Optional[Dict]:
+        """prompt最近一次上报的执行进度 {value, max, node}，没有收到过进度事件时返回None"""
+        return _progress.get(prompt_id)
+
+    @staticmethod
+    def discard_progress(prompt_id: str):
+        """停止监控prompt时清除其进度，断线期间错过结束事件的prompt不会一直留在内存中"""
+        _progress.pop(prompt_id, None)
+
+    @staticmethod
+    def ensure(asset_id: int, ws_url: str, has_interest: Callable[[], bool],
+               on_prompt_done: Callable[[Optional[str]], None]):
+        """
+        确保资产的事件订阅在运行
+
+        Args:
+            asset_id: 资产ID
+            ws_url: ComfyUI WebSocket 地址
+            has_interest: 资产是否仍有需要订阅的打标任务，返回False时订阅退出
+            on_prompt_done: prompt结束时的回调，参数为prompt_id；
+                            (重新)连接成功时以None调用，表示可能错过了事件需要全部对账
+        """
+        task = _streams.get(asset_id)
+        if task is not None and not task.done():
+            return
+        _streams[asset_id] = asyncio.ensure_future(
+            ComfyUIEventStream._run(asset_id, ws_url, has_interest, on_prompt_done)
+        )
+
+    @staticmethod
+    def parse_prompt_done(message: Dict) -> Optional[str]:
+        """
+        判断消息是否表示prompt执行结束
+
+        Args:
+            message: WebSocket 消息
+
+        Returns:
+            结束的prompt_id，不是结束事件时返回None
+        """
+        msg_type = message.get('type', '')
+        data = message.get('data') or {}
+        if msg_type in TERMINAL_EVENTS:
+            return data.get('prompt_id')
+        # 旧版本ComfyUI没有 execution_success，以 node 为空的 executing 消息表示执行结束
+        if msg_type == 'executing' and data.get('node') is None:
+            return data.get('prompt_id')
+        return None
+
+    @staticmethod
+    def record_progress(message: Dict):
+        """记录 progress 消息中的执行进度，prompt结束时清除"""
+        msg_type = message.get('type', '')
+        data = message.get('data') or {}
+        if msg_type == 'progress' and data.get('prompt_id'):
+            _progress[data['prompt_id']] = {
+                'value': data.get('value', 0),
+                'max': data.get('max', 0),
+                'node': data.get('node')
+            }
+            return
+        prompt_id = ComfyUIEventStream.parse_prompt_done(message)
+        if prompt_id:
+            _progress.pop(prompt_id, None)
+
+    @staticmethod
+    async def _run(asset_id: int, ws_url: str, has_interest: Callable[[], bool],
+                   on_prompt_done: Callable[[Optional[str]], None]):
+        """订阅协程，断线后指数退避重连，资产没有打标任务时退出"""
+        delay = 1
+        logger.info(f"资产 {asset_id} 开始订阅ComfyUI事件: {ws_url}")
+        try:
+            while has_interest():
+                try:
+                    session = AsyncEngine.get_http_session()
+                    async with session.ws_connect(ws_url, heartbeat=30) as ws:
+                        _connected.add(asset_id)
+                        delay = 1
+                        logger.info(f"资产 {asset_id} ComfyUI事件订阅已连接")
+                        # 断线期间可能错过了结束事件，连接后全部对账一次
+                        on_prompt_done(None)
+                        await ComfyUIEventStream._receive(ws, has_interest, on_prompt_done)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"资产 {asset_id} ComfyUI事件订阅出错: {str(e) or type(e).__name__}")
+                finally:
+                    _connected.discard(asset_id)
+
+                if not has_interest():
+                    break
+                logger.info(f"资产 {asset_id} ComfyUI事件订阅已断开，{delay}秒后重连")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+        finally:
+            if _streams.get(asset_id) is asyncio.current_task():
+                _streams.pop(asset_id, None)
+            logger.info(f"资产 {asset_id} ComfyUI事件订阅已退出")
+
+    @staticmethod
+    async def _receive(ws: aiohttp.ClientWebSocketResponse, has_interest: Callable[[], bool],
+                       on_prompt_done: Callable[[Optional[str]], None]):
+        """读取消息直到连接关闭或资产没有打标任务"""
+        while has_interest():
+            try:
+                msg = await ws.receive(timeout=30)
+            except asyncio.TimeoutError:
+                continue
+
+            if msg.type == aiohttp.WSMsgType.TEXT:
+                try:
+                    message = json.loads(msg.data)
+                except ValueError:
+                    continue
+                ComfyUIEventStream.record_progress(message)
+                prompt_id = ComfyUIEventStream.parse_prompt_done(message)
+                if prompt_id:
+                    logger.info(f"ComfyUI事件: prompt {prompt_id} 执行结束 ({message.get('type')})")
+                    on_prompt_done(prompt_id)
+            elif msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED,
+                              aiohttp.WSMsgType.CLOSING, aiohttp.WSMsgType.ERROR):
+                return
+            # 二进制消息是预览图，直接忽略
@@ -0,0 +1,177 @@
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from ...models.task import Task, TaskImage, TaskExecutionHistory
+from ...utils.logger import setup_logger
+from ..config_service import ConfigService
+import statistics
+import threading
+import time
+
+logger = setup_logger('duration_estimator')
+
+# 模型重新拟合的间隔(秒)
+REFIT_INTERVAL = 600
+
+# 参与拟合的最近训练记录数
+HISTORY_LIMIT = 500
+
+# 模型缓存: {'fitted_at': 时间戳, 'rates': {(资产ID, 训练类型): 每步秒数}}
+_model: Dict = {'fitted_at': 0, 'rates': {}}
+_model_lock = threading.Lock()
+
+
+class DurationEstimator:
+    """
+    训练时长估算
+
+    训练工作量按步数计算：图片数 × repeat_num × max_train_epochs / train_batch_size。
+    从已完成的执行历史中拟合每个 (训练资产, 模型训练类型) 的每步耗时（取中位数），
+    估算时依次使用 资产+类型、类型、资产、全部历史 的每步耗时，都没有时无法估算。
+    """
+
+    @staticmethod
+    def _number(value, default: float) -> float:
+        try:
+            return float(value) if value not in ('', None) else default
+        except (TypeError, ValueError):
+            return default
+
+    @staticmethod
+    def training_steps(config: Optional[Dict], image_count: int) -> Optional[float]:
+        """
+        计算训练总步数
+
+        Args:
+            config: 训练配置
+            image_count: 图片数量
+
+        Returns:
+            总步数，缺少图片数量或训练轮次时返回None
+        """
+        config = config or {}
+        epochs = DurationEstimator._number(config.get('max_train_epochs'), 0)
+        if not image_count or epochs <= 0:
+            return None
+        repeat_num = DurationEstimator._number(config.get('repeat_num'), 10)
+        batch_size = max(1.0, DurationEstimator._number(config.get('train_batch_size'), 1))
+        return image_count * repeat_num * epochs / batch_size
+
+    @staticmethod
+    def image_counts(db: Session, task_ids) -> Dict[int, int]:
+        """批量统计任务的图片数量"""
+        if not task_ids:
+            return {}
+        rows = db.query(TaskImage.task_id, func.count(TaskImage.id)).filter(
+            TaskImage.task_id.in_(set(task_ids))
+        ).group_by(TaskImage.task_id).all()
+        return {task_id: count for task_id, count in rows}
+
+    @staticmethod
+    def fit(samples: List[Tuple[Optional[int], Optional[str], float, float]]) -> Dict[Tuple, float]:
+        """
+        根据历史样本拟合每步耗时
+
+        Args:
+            samples: [(资产ID, 训练类型, 总步数, 耗时秒数)]
+
+        Returns:
+            {(资产ID, 训练类型): 每步秒数}，资产ID为None表示该类型的全部资产，
+            训练类型为None表示该资产的全部类型，两者都为None表示全部历史
+        """
+        groups: Dict[Tuple, List[float]] = {}
+        for asset_id, model_type, steps, seconds in samples:
+            if not steps or steps <= 0 or seconds <= 0:
+                continue
+            rate = seconds / steps
+            for key in ((asset_id, model_type), (None, model_type), (asset_id, None), (None, None)):
+                groups.setdefault(key, []).append(rate)
+        return {key: statistics.median(rates) for key, rates in groups.items()}
+
+    @staticmethod
+    def get_rates(db: Session) -> Dict[Tuple, float]:
+        """获取拟合的每步耗时，超过 REFIT_INTERVAL 后重新拟合"""
+        now = time.time()
+        with _model_lock:
+            if now - _model['fitted_at'] < REFIT_INTERVAL:
+                return _model['rates']
+
+        histories = db.query(TaskExecutionHistory).filter(
+            TaskExecutionHistory.status == 'COMPLETED',
+            TaskExecutionHistory.training_asset_id.isnot(None),
+            TaskExecutionHistory.end_time.isnot(None)
+        ).order_by(TaskExecutionHistory.end_time.desc()).limit(HISTORY_LIMIT).all()
+        image_counts = DurationEstimator.image_counts(db, [h.task_id for h in histories])
+
+        samples = []
+        for history in histories:
+            config = history.training_config or {}
+            steps = DurationEstimator.training_steps(config, image_counts.get(history.task_id, 0))
+            seconds = (history.end_time - history.start_time).total_seconds() if history.start_time else 0
+            samples.append((history.training_asset_id, config.get('model_train_type'), steps, seconds))
+
+        rates = DurationEstimator.fit(samples)
+        with _model_lock:
+            _model['fitted_at'] = now
+            _model['rates'] = rates
+        logger.debug(f"训练时长模型已拟合，样本数: {len(samples)}")
+        return rates
+
+    @staticmethod
+    def lookup_rate(rates: Dict[Tuple, float], asset_id: Optional[int], model_type: Optional[str]) -> Optional[float]:
+        """按 资产+类型 > 类型 > 资产 > 全部 的顺序查找每步耗时"""
+        for key in ((asset_id, model_type), (None, model_type), (asset_id, None), (None, None)):
+            if key in rates:
+                return rates[key]
+        return None
+
+    @staticmethod
+    def estimate_tasks(db: Session, tasks: List[Task], asset_id: Optional[int] = None) -> Dict[int, float]:
+        """
+        估算任务的训练时长
+
+        Args:
+            db: 数据库会话
+            tasks: 任务列表
+            asset_id: 训练资产ID，为空时按所有资产的历史估算
+
+        Returns:
+            {任务ID: 预计秒数}，无法估算的任务不出现在结果中
+        """
+        if not tasks:
+            return {}
+        rates = DurationEstimator.get_rates(db)
+        if not rates:
+            return {}
+
+        estimates = {}
+        workloads = DurationEstimator.task_steps(db, tasks)
+        for task in tasks:
+            steps, model_type = workloads[task.id]
+            rate = DurationEstimator.lookup_rate(rates, asset_id or task.training_asset_id, model_type)
+            if steps and rate:
+                estimates[task.id] = steps * rate
+        return estimates
+
+    @staticmethod
+    def task_steps(db: Session, tasks: List[Task]) -> Dict[int, Tuple[Optional[float], Optional[str]]]:
+        """
+        计算任务的训练总步数和模型训练类型
+
+        任务使用全局训练配置时按全局配置计算，否则以任务配置覆盖全局配置
+
+        Returns:
+            {任务ID: (总步数, 训练类型)}
+        """
+        global_config = ConfigService.get_global_lora_training_config() or {}
+        image_counts = DurationEstimator.image_counts(db, [task.id for task in tasks])
+        workloads = {}
+        for task in tasks:
+            config = dict(global_config)
+            if not task.use_global_training_config and task.training_config:
+                config.update(task.training_config)
+            workloads[task.id] = (
+                DurationEstimator.training_steps(config, image_counts.get(task.id, 0)),
+                config.get('model_train_type')
+            )
+        return workloads
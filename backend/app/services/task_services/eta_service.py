@@ -0,0 +1,333 @@
+from typing import Callable, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from ...models.task import Task, TaskStatus, TaskExecutionHistory
+from ...models.asset import Asset
+from ...database import get_db
+from ...utils.logger import setup_logger
+from ..config_service import ConfigService
+from ..asset_health_service import AssetHealthService
+from .slot_service import SlotService, CAPABILITY_MARKING, CAPABILITY_TRAINING
+from .duration_estimator import DurationEstimator
+from .poll_policy import AdaptivePollPolicy
+from .monitor_engine import MonitorEngine, WATCH_MARKING, WATCH_TRAINING
+import statistics
+import threading
+import math
+import time
+
+logger = setup_logger('eta_service')
+
+# 资产吞吐量汇总的刷新间隔(秒)
+ROLLUP_INTERVAL = 600
+
+# 预测结果缓存，调度器每轮调度后标记为过期
+_forecast: Dict = {'generated_at': 0, 'stale': True, 'data': None}
+_rollups: Dict = {'computed_at': 0, 'data': {}}
+_cache_lock = threading.Lock()
+_compute_lock = threading.Lock()
+
+
+class EtaService:
+    """
+    任务完成时间(ETA)和资产吞吐量预测
+
+    - 运行中的任务：训练使用监控引擎按loss曲线步数估算的剩余时间，打标按图片数量估算，
+      都没有时用历史训练时长减去已运行时间
+    - 等待中的任务：按调度器的队列顺序做列表调度，依次放到最早空闲的资产槽位上，
+      训练时长由 DurationEstimator 按资产和训练类型估算
+    - 资产吞吐量：统计窗口内每个资产完成的训练任务数(任务/小时)、平均耗时和历史每秒步数
+
+    预测结果缓存 eta_cache_seconds 秒，调度器每轮调度后标记过期；吞吐量汇总每 ROLLUP_INTERVAL 秒重新统计。
+    """
+
+    @staticmethod
+    def invalidate():
+        """队列发生变化，下次请求时重新预测"""
+        with _cache_lock:
+            _forecast['stale'] = True
+
+    @staticmethod
+    def simulate(slots: Dict[int, List[float]], queue: List[int],
+                 duration: Callable[[int, int], Optional[float]]) -> Dict[int, Tuple[int, float, float]]:
+        """
+        列表调度：按队列顺序把任务放到最早空闲的槽位
+
+        Args:
+            slots: {资产ID: [各槽位空闲时刻(距现在的秒数)]}
+            queue: 按调度顺序排列的任务ID
+            duration: 估算任务在资产上运行时长的函数，无法估算时返回None
+
+        Returns:
+            {任务ID: (资产ID, 开始时刻, 结束时刻)}，无法估算的时刻为 math.inf
+        """
+        timeline = {asset_id: list(times) for asset_id, times in slots.items() if times}
+        result = {}
+        for task_id in queue:
+            if not timeline:
+                break
+            asset_id, index = min(
+                ((asset_id, index) for asset_id, times in timeline.items() for index in range(len(times))),
+                key=lambda slot: (timeline[slot[0]][slot[1]], slot[0])
+            )
+            start = timeline[asset_id][index]
+            seconds = duration(task_id, asset_id)
+            finish = start + seconds if seconds is not None else math.inf
+            result[task_id] = (asset_id, start, finish)
+            timeline[asset_id][index] = finish
+        return result
+
+    @staticmethod
+    def get_forecast() -> Dict:
+        """
+        获取所有未完成任务的ETA和资产吞吐量
+
+        Returns:
+            {'generated_at', 'summary', 'tasks': [...], 'assets': [...]}
+        """
+        cache_seconds = ConfigService.get_value('eta_cache_seconds', 30)
+        with _cache_lock:
+            if _forecast['data'] and not _forecast['stale'] and time.time() - _forecast['generated_at'] < cache_seconds:
+                return _forecast['data']
+
+        with _compute_lock:
+            # 等待锁期间其他线程可能已经完成计算
+            with _cache_lock:
+                if _forecast['data'] and not _forecast['stale'] and time.time() - _forecast['generated_at'] < cache_seconds:
+                    return _forecast['data']
+                _forecast['stale'] = False
+            data = EtaService._compute()
+            with _cache_lock:
+                _forecast['data'] = data
+                _forecast['generated_at'] = time.time()
+            return data
+
+    @staticmethod
+    def get_task_eta(task_id: int) -> Optional[Dict]:
+        """获取单个任务的ETA，任务已结束或不存在时返回None"""
+        for item in EtaService.get_forecast()['tasks']:
+            if item['task_id'] == task_id:
+                return item
+        return None
+
+    @staticmethod
+    def _compute() -> Dict:
+        # 避免与调度器循环导入
+        from .scheduler_service import SchedulerService
+
+        now = time.time()
+        submitted_tasks, waiting_training = SchedulerService.get_pending_tasks()
+        items: List[Dict] = []
+
+        with get_db() as db:
+            assets = {asset.id: asset for asset in db.query(Asset).filter(Asset.enabled == True).all()}
+            running_marking = db.query(Task).filter(
+                Task.status.in_([TaskStatus.SUBMITTED, TaskStatus.MARKING]),
+                Task.marking_asset_id.isnot(None)
+            ).all()
+            running_training = db.query(Task).filter(
+                Task.status == TaskStatus.TRAINING,
+                Task.training_asset_id.isnot(None)
+            ).all()
+
+            EtaService._marking_slots(db, assets, running_marking, submitted_tasks, now, items)
+            training_slots, training_plan = EtaService._training_slots(
+                db, assets, running_training, waiting_training, now, items
+            )
+            rollups = EtaService._get_rollups(db)
+
+        # 所有等待的训练任务都能估算时才给出队列清空时间
+        finishes = [finish for _, _, finish in training_plan.values()]
+        drain = max(finishes) if waiting_training and len(finishes) == len(waiting_training) else math.inf
+        summary = {
+            'marking_queue': len(submitted_tasks),
+            'training_queue': len(waiting_training),
+            'training_drain_at': EtaService._timestamp(now, drain),
+            'fleet_tasks_per_hour': round(sum(r['tasks_per_hour'] for r in rollups.values()), 2),
+        }
+
+        asset_items = []
+        for asset_id in sorted(set(training_slots) | set(rollups)):
+            rollup = rollups.get(asset_id, {})
+            slots = training_slots.get(asset_id, [])
+            asset = assets.get(asset_id)
+            asset_items.append({
+                'asset_id': asset_id,
+                'name': asset.name if asset else None,
+                'training_slots': len(slots),
+                'running': sum(1 for task in running_training if task.training_asset_id == asset_id),
+                'queued': sum(1 for planned in training_plan.values() if planned[0] == asset_id),
+                'completed_in_window': rollup.get('completed', 0),
+                'tasks_per_hour': rollup.get('tasks_per_hour', 0),
+                'avg_duration': rollup.get('avg_duration'),
+                'steps_per_second': rollup.get('steps_per_second'),
+            })
+
+        items.sort(key=lambda item: (item['finish_at'] is None, item['finish_at'] or ''))
+        return {
+            'generated_at': datetime.fromtimestamp(now).isoformat(),
+            'summary': summary,
+            'tasks': items,
+            'assets': asset_items,
+        }
+
+    @staticmethod
+    def _timestamp(now: float, offset: float) -> Optional[str]:
+        """把距现在的秒数转换为ISO时间，无法估算时返回None"""
+        if offset is None or math.isinf(offset):
+            return None
+        return datetime.fromtimestamp(now + offset).isoformat()
+
+    @staticmethod
+    def _item(task: Task, stage: str, state: str, asset_id: Optional[int], start: float, finish: float,
+              now: float, position: Optional[int] = None, progress: Optional[Dict] = None) -> Dict:
+        progress = progress or {}
+        return {
+            'task_id': task.id,
+            'name': task.name,
+            'status': task.status.value if task.status else None,
+            'stage': stage,
+            'state': state,
+            'position': position,
+            'asset_id': asset_id,
+            'start_at': EtaService._timestamp(now, start),
+            'finish_at': EtaService._timestamp(now, finish),
+            'remaining_seconds': None if math.isinf(finish) else round(max(0.0, finish)),
+            'current_step': progress.get('current_step'),
+            'total_steps': progress.get('total_steps'),
+        }
+
+    @staticmethod
+    def _build_slots(assets: Dict[int, Asset], capability: str, health_type: str,
+                     busy: Dict[int, List[float]]) -> Dict[int, List[float]]:
+        """按健康可用的资产和并发上限构建槽位空闲时刻，已占用的槽位使用运行中任务的剩余时间"""
+        slots = {}
+        for asset_id in AssetHealthService.get_available_asset_ids(health_type):
+            asset = assets.get(asset_id)
+            if not asset:
+                continue
+            limit = SlotService.get_limit(asset, capability)
+            remaining = sorted(busy.get(asset_id, []))[:limit]
+            slots[asset_id] = remaining + [0.0] * (limit - len(remaining))
+        return slots
+
+    @staticmethod
+    def _marking_slots(db: Session, assets: Dict[int, Asset], running: List[Task], queued: List[Task],
+                       now: float, items: List[Dict]) -> Dict[int, List[float]]:
+        """预测打标任务的完成时间"""
+        seconds_per_image = ConfigService.get_value('mark_seconds_per_image', 2)
+        progress = MonitorEngine.get_progress(WATCH_MARKING)
+        image_counts = DurationEstimator.image_counts(db, [task.id for task in running + queued])
+
+        busy: Dict[int, List[float]] = {}
+        for task in running:
+            watch = progress.get(task.id, {})
+            remaining = None
+            if watch.get('started_at'):
+                remaining = AdaptivePollPolicy.estimate_marking_remaining(
+                    watch.get('image_count') or image_counts.get(task.id, 0), watch['started_at'], now
+                )
+            if remaining is None:
+                remaining = image_counts.get(task.id, 0) * seconds_per_image
+            busy.setdefault(task.marking_asset_id, []).append(remaining)
+            items.append(EtaService._item(task, 'marking', 'running', task.marking_asset_id, 0, remaining, now))
+
+        slots = EtaService._build_slots(assets, CAPABILITY_MARKING, 'ai_engine', busy)
+        plan = EtaService.simulate(
+            slots, [task.id for task in queued],
+            lambda task_id, asset_id: image_counts.get(task_id, 0) * seconds_per_image
+        )
+        for position, task in enumerate(queued, start=1):
+            asset_id, start, finish = plan.get(task.id, (None, math.inf, math.inf))
+            items.append(EtaService._item(task, 'marking', 'queued', asset_id, start, finish, now, position))
+        return slots
+
+    @staticmethod
+    def _training_slots(db: Session, assets: Dict[int, Asset], running: List[Task], queued: List[Task],
+                        now: float, items: List[Dict]) -> Tuple[Dict[int, List[float]], Dict]:
+        """预测训练任务的完成时间"""
+        rates = DurationEstimator.get_rates(db)
+        workloads = DurationEstimator.task_steps(db, running + queued)
+        progress = MonitorEngine.get_progress(WATCH_TRAINING)
+
+        def _duration(task_id: int, asset_id: int) -> Optional[float]:
+            steps, model_type = workloads.get(task_id, (None, None))
+            rate = DurationEstimator.lookup_rate(rates, asset_id, model_type)
+            return steps * rate if steps and rate else None
+
+        # 运行中任务的开始时间取当前执行历史的开始时间
+        history_ids = [task.execution_history_id for task in running if task.execution_history_id]
+        started = dict(db.query(TaskExecutionHistory.id, TaskExecutionHistory.start_time).filter(
+            TaskExecutionHistory.id.in_(history_ids)
+        ).all()) if history_ids else {}
+
+        busy: Dict[int, List[float]] = {}
+        for task in running:
+            watch = progress.get(task.id, {})
+            remaining = watch.get('remaining')
+            if remaining is None:
+                expected = _duration(task.id, task.training_asset_id)
+                start_time = started.get(task.execution_history_id) if task.prompt_id else None
+                if expected is not None:
+                    elapsed = now - start_time.timestamp() if start_time else 0
+                    remaining = max(0.0, expected - elapsed)
+            busy.setdefault(task.training_asset_id, []).append(remaining if remaining is not None else 0.0)
+            items.append(EtaService._item(
+                task, 'training', 'running', task.training_asset_id, 0,
+                remaining if remaining is not None else math.inf, now, progress=watch
+            ))
+
+        slots = EtaService._build_slots(assets, CAPABILITY_TRAINING, 'lora_training', busy)
+        # 无法估算的任务使用队列中已知时长的中位数
+        known = [d for d in (_duration(task.id, None) for task in queued) if d is not None]
+        default = statistics.median(known) if known else None
+        plan = EtaService.simulate(
+            slots, [task.id for task in queued],
+            lambda task_id, asset_id: _duration(task_id, asset_id) or default
+        )
+        for position, task in enumerate(queued, start=1):
+            asset_id, start, finish = plan.get(task.id, (None, math.inf, math.inf))
+            items.append(EtaService._item(task, 'training', 'queued', asset_id, start, finish, now, position))
+        return slots, plan
+
+    @staticmethod
+    def _get_rollups(db: Session) -> Dict[int, Dict]:
+        """按资产汇总统计窗口内的训练吞吐量，每 ROLLUP_INTERVAL 秒重新统计"""
+        now = time.time()
+        with _cache_lock:
+            if now - _rollups['computed_at'] < ROLLUP_INTERVAL:
+                return _rollups['data']
+
+        window_hours = ConfigService.get_value('eta_throughput_window_hours', 24) or 24
+        since = datetime.now() - timedelta(hours=window_hours)
+        rows = db.query(
+            TaskExecutionHistory.training_asset_id,
+            TaskExecutionHistory.start_time,
+            TaskExecutionHistory.end_time
+        ).filter(
+            TaskExecutionHistory.status == 'COMPLETED',
+            TaskExecutionHistory.training_asset_id.isnot(None),
+            TaskExecutionHistory.end_time >= since
+        ).all()
+
+        durations: Dict[int, List[float]] = {}
+        for asset_id, start_time, end_time in rows:
+            if start_time and end_time:
+                durations.setdefault(asset_id, []).append((end_time - start_time).total_seconds())
+
+        rates = DurationEstimator.get_rates(db)
+        data = {}
+        for asset_id in set(durations) | {key[0] for key in rates if key[0] is not None}:
+            values = durations.get(asset_id, [])
+            rate = rates.get((asset_id, None))
+            data[asset_id] = {
+                'completed': len(values),
+                'tasks_per_hour': round(len(values) / window_hours, 2),
+                'avg_duration': round(sum(values) / len(values)) if values else None,
+                'steps_per_second': round(1 / rate, 3) if rate else None,
+            }
+
+        with _cache_lock:
+            _rollups['computed_at'] = now
+            _rollups['data'] = data
+        return data
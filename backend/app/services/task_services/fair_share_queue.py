@@ -0,0 +1,176 @@
+from typing import Dict, List, Optional, Union
+from dataclasses import dataclass
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from ...models.task import Task
+from ...models.asset import AssetSlot
+from ...models.constants import TASK_PRIORITY_CLASSES
+from ..config_service import ConfigService
+import statistics
+
+# 未设置所属用户的任务共用的分组
+DEFAULT_OWNER = 'default'
+
+
+@dataclass
+class QueueEntry:
+    """等待队列中的任务"""
+    task_id: int
+    priority: int = 0
+    owner: str = DEFAULT_OWNER
+    since: Optional[datetime] = None   # 开始等待的时间
+    cost: Optional[float] = None       # 预计运行时长(秒)，最短作业优先模式下使用
+
+
+class FairShareQueue:
+    """
+    等待队列排序：优先级 + 按用户公平分配 + 老化
+
+    - 有效优先级 = 任务优先级 + 等待时长 / priority_aging_seconds（取整），低优先级任务等待足够久后会被提升，不会饿死
+    - 有效优先级最高的任务先出队；优先级相同时轮流从各用户中选取，
+      选择 (正在运行的任务数 + 本轮已排在前面的任务数) / 用户权重 最小的用户，
+      因此某个用户批量提交大量任务时不会阻塞其他用户的任务
+    - 同一用户内按有效优先级、等待时间排序
+    - 提供预计运行时长时为最短作业优先(SJF)：同一优先级内先按用户份额，再按
+      老化后的时长(预计时长 - 等待秒数 × cost_aging)从短到长排序，长任务等待越久越靠前；
+      无法估算时长的任务按已知时长的中位数处理
+    """
+
+    @staticmethod
+    def normalize_priority(value: Union[int, str, None]) -> int:
+        """
+        把优先级名称(low/normal/high/urgent)或数值转换为整数优先级
+
+        Raises:
+            ValueError: 无法识别的优先级
+        """
+        if value is None or value == '':
+            return TASK_PRIORITY_CLASSES['normal']
+        if isinstance(value, str) and not value.lstrip('-').isdigit():
+            if value not in TASK_PRIORITY_CLASSES:
+                raise ValueError(f"无效的优先级: {value}，可选: {', '.join(TASK_PRIORITY_CLASSES)}")
+            return TASK_PRIORITY_CLASSES[value]
+        return int(value)
+
+    @staticmethod
+    def effective_priority(entry: QueueEntry, now: datetime, aging_seconds: float) -> int:
+        """计算包含老化加成的有效优先级"""
+        priority = entry.priority or 0
+        if aging_seconds and aging_seconds > 0 and entry.since:
+            waited = max(0.0, (now - entry.since).total_seconds())
+            priority += int(waited // aging_seconds)
+        return priority
+
+    @staticmethod
+    def order(entries: List[QueueEntry], running: Optional[Dict[str, int]] = None,
+              now: Optional[datetime] = None, aging_seconds: float = 0,
+              weights: Optional[Dict[str, float]] = None, cost_aging: float = 1) -> List[QueueEntry]:
+        """
+        对等待队列排序
+
+        Args:
+            entries: 等待中的任务
+            running: 各用户当前占用资产的任务数
+            now: 当前时间，默认为 datetime.now()
+            aging_seconds: 每等待多少秒有效优先级加1，0表示不老化
+            weights: 用户权重，未配置的用户权重为1
+            cost_aging: 每等待1秒抵消的预计运行时长(秒)
+
+        Returns:
+            排序后的任务列表
+        """
+        now = now or datetime.now()
+        usage = dict(running or {})
+        weights = weights or {}
+
+        effective = {entry.task_id: FairShareQueue.effective_priority(entry, now, aging_seconds) for entry in entries}
+        costs = FairShareQueue._aged_costs(entries, now, cost_aging)
+        queues: Dict[str, List[QueueEntry]] = {}
+        for entry in entries:
+            queues.setdefault(entry.owner or DEFAULT_OWNER, []).append(entry)
+        for queue in queues.values():
+            queue.sort(key=lambda e: (-effective[e.task_id], costs[e.task_id], e.since or now, e.task_id))
+
+        def _owner_key(owner: str):
+            head = queues[owner][0]
+            weight = float(weights.get(owner, 1) or 1)
+            return (-effective[head.task_id], usage.get(owner, 0) / max(weight, 1e-6),
+                    costs[head.task_id], head.since or now, head.task_id)
+
+        ordered = []
+        while queues:
+            owner = min(queues, key=_owner_key)
+            ordered.append(queues[owner].pop(0))
+            usage[owner] = usage.get(owner, 0) + 1
+            if not queues[owner]:
+                del queues[owner]
+        return ordered
+
+    @staticmethod
+    def _aged_costs(entries: List[QueueEntry], now: datetime, cost_aging: float) -> Dict[int, float]:
+        """计算老化后的预计运行时长，所有任务都没有时长时全部为0（退化为按等待时间排序）"""
+        known = [entry.cost for entry in entries if entry.cost is not None]
+        if not known:
+            return {entry.task_id: 0 for entry in entries}
+        default = statistics.median(known)
+        costs = {}
+        for entry in entries:
+            waited = max(0.0, (now - entry.since).total_seconds()) if entry.since else 0
+            cost = entry.cost if entry.cost is not None else default
+            costs[entry.task_id] = cost - waited * (cost_aging or 0)
+        return costs
+
+    @staticmethod
+    def get_running_by_owner(db: Session, capability: str) -> Dict[str, int]:
+        """按用户统计当前占用指定能力槽位的任务数"""
+        rows = db.query(Task.owner, func.count(AssetSlot.id)).join(
+            AssetSlot, AssetSlot.task_id == Task.id
+        ).filter(AssetSlot.capability == capability).group_by(Task.owner).all()
+        running: Dict[str, int] = {}
+        for owner, count in rows:
+            owner = owner or DEFAULT_OWNER
+            running[owner] = running.get(owner, 0) + count
+        return running
+
+    @staticmethod
+    def order_tasks(db: Session, tasks: List[Task], capability: str, since_attr: str,
+                    costs: Optional[Dict[int, float]] = None) -> List[Task]:
+        """
+        按优先级和公平分配规则对待处理任务排序
+
+        Args:
+            db: 数据库会话
+            tasks: 待处理任务
+            capability: 任务需要的槽位类型 marking / training
+            since_attr: 表示开始等待时间的任务字段
+            costs: 任务的预计运行时长 {任务ID: 秒}，提供时按最短作业优先排序
+
+        Returns:
+            排序后的任务列表
+        """
+        if len(tasks) < 2:
+            return tasks
+        by_id = {task.id: task for task in tasks}
+        ordered = FairShareQueue.order(
+            FairShareQueue.to_entries(tasks, since_attr, costs),
+            running=FairShareQueue.get_running_by_owner(db, capability),
+            aging_seconds=ConfigService.get_value('priority_aging_seconds', 600),
+            weights=ConfigService.get_value('fair_share_weights', {}) or {},
+            cost_aging=ConfigService.get_value('sjf_aging_factor', 1)
+        )
+        return [by_id[entry.task_id] for entry in ordered]
+
+    @staticmethod
+    def to_entries(tasks: List[Task], since_attr: str, costs: Optional[Dict[int, float]] = None) -> List[QueueEntry]:
+        """把任务转换为队列条目"""
+        return [
+            QueueEntry(
+                task_id=task.id,
+                priority=task.priority or 0,
+                owner=task.owner or DEFAULT_OWNER,
+                since=getattr(task, since_attr),
+                cost=(costs or {}).get(task.id)
+            )
+            for task in tasks
+        ]
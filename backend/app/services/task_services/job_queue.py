@@ -0,0 +1,437 @@
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from ...models.job import Job
+from ...database import get_db
+from ...utils.logger import setup_logger
+from ..config_service import ConfigService
+from ..leader_election import LeaderElection, HOLDER_ID
+import threading
+import time
+
+logger = setup_logger('job_queue')
+
+# 流水线阶段：暂存(上传数据并提交请求) -> 监控 -> 完成处理(下载结果和后处理)
+STAGE_STAGING = 'staging'
+STAGE_MONITOR = 'monitor'
+STAGE_COMPLETE = 'complete'
+
+# 作业状态
+JOB_PENDING = 'pending'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+ACTIVE_STATES = (JOB_PENDING, JOB_RUNNING)
+
+# 重试退避上限(秒)
+MAX_BACKOFF = 1800
+
+# 每轮最多领取的作业数
+CLAIM_BATCH = 50
+
+# 作业执行线程
+_runner_thread: Optional[threading.Thread] = None
+_runner_running = False
+_runner_wakeup = threading.Event()
+
+# 本进程领取后尚未结束的作业，执行线程定期为其续约
+_inflight: Dict[int, Job] = {}
+_inflight_lock = threading.Lock()
+
+# 各阶段的执行函数，以及作业最终失败时的处理函数
+_handlers: Dict[str, Callable[[Job], None]] = {}
+_on_failed: Optional[Callable[[Job], None]] = None
+
+
+class RetryableError(Exception):
+    """作业执行中的暂时性错误（如同步结果时网络中断），作业按退避时间重试，次数用完后交给作业失败处理函数"""
+    pass
+
+
+class JobQueue:
+    """
+    持久化的流水线作业队列
+
+    每个任务的暂存、监控和完成处理都是 jobs 表中的一条作业，至少投递一次：
+    - 领取是一条条件 UPDATE（状态和可见时间未变时才成功），多个消费者不会同时领取同一作业
+    - 领取后作业在 job_visibility_timeout 秒内不可见，领取者定期续约；进程崩溃后作业在超时后被重新投递
+    - 执行出错的作业按 job_retry_backoff × 2^(次数-1) 退避后重试，超过 job_max_attempts 次后失败
+    - 一个阶段完成时在同一事务中创建下一阶段的作业，进程在阶段之间崩溃也不会丢失后续步骤
+
+    作业处理函数必须是幂等的：重新投递时需要根据任务当前状态跳过已完成的步骤。
+    """
+
+    @staticmethod
+    def backoff(attempts: int, base: float) -> float:
+        """第 attempts 次失败后的重试等待时间(秒)"""
+        return min(MAX_BACKOFF, base * (2 ** max(0, attempts - 1)))
+
+    @staticmethod
+    def _visibility_timeout() -> int:
+        return ConfigService.get_value('job_visibility_timeout', 120)
+
+    @staticmethod
+    def enqueue(db: Session, stage: str, capability: str, task_id: int,
+                asset_id: Optional[int] = None, payload: Optional[Dict] = None) -> Job:
+        """
+        创建作业，不提交事务，调用方与任务状态的变更一起提交
+
+        同一任务同一阶段已有未结束的作业时直接返回该作业
+
+        Args:
+            db: 数据库会话
+            stage: 阶段 staging / monitor / complete
+            capability: 任务阶段 marking / training
+            task_id: 任务ID
+            asset_id: 资产ID
+            payload: 阶段参数，必须可以JSON序列化
+        """
+        existing = JobQueue.get_active(db, task_id, capability, stage)
+        if existing:
+            return existing
+        job = Job(
+            stage=stage,
+            capability=capability,
+            task_id=task_id,
+            asset_id=asset_id,
+            payload=payload or {},
+            state=JOB_PENDING,
+            attempts=0,
+            max_attempts=ConfigService.get_value('job_max_attempts', 5),
+            visible_after=datetime.now()
+        )
+        db.add(job)
+        db.flush()
+        return job
+
+    @staticmethod
+    def get_active(db: Session, task_id: int, capability: str, stage: Optional[str] = None) -> Optional[Job]:
+        """获取任务未结束的作业"""
+        query = db.query(Job).filter(
+            Job.task_id == task_id,
+            Job.capability == capability,
+            Job.state.in_(ACTIVE_STATES)
+        )
+        if stage:
+            query = query.filter(Job.stage == stage)
+        return query.first()
+
+    @staticmethod
+    def active_task_ids(db: Session, capability: str, stage: Optional[str] = None) -> Set[int]:
+        """有未结束作业的任务ID"""
+        query = db.query(Job.task_id).filter(Job.capability == capability, Job.state.in_(ACTIVE_STATES))
+        if stage:
+            query = query.filter(Job.stage == stage)
+        return {task_id for task_id, in query.all()}
+
+    @staticmethod
+    def claim(owner: str, stages: List[str], limit: int = CLAIM_BATCH) -> Tuple[List[Job], List[Job]]:
+        """
+        领取可见的作业
+
+        Args:
+            owner: 领取者标识
+            stages: 可领取的阶段
+            limit: 最多领取数量
+
+        Returns:
+            (领取成功的作业, 超过最大投递次数而失败的作业)，作业已从会话分离
+        """
+        now = datetime.now()
+        lease_until = now + timedelta(seconds=JobQueue._visibility_timeout())
+        with get_db() as db:
+            candidates = db.query(Job.id, Job.state).filter(
+                Job.state.in_(ACTIVE_STATES),
+                Job.stage.in_(stages),
+                Job.visible_after <= now
+            ).order_by(Job.visible_after.asc(), Job.id.asc()).limit(limit).all()
+
+            claimed_ids = []
+            for job_id, state in candidates:
+                updated = db.query(Job).filter(
+                    Job.id == job_id,
+                    Job.state == state,
+                    Job.visible_after <= now
+                ).update({
+                    Job.state: JOB_RUNNING,
+                    Job.lease_owner: owner,
+                    Job.visible_after: lease_until,
+                    Job.attempts: Job.attempts + 1
+                }, synchronize_session=False)
+                db.commit()
+                if updated:
+                    claimed_ids.append(job_id)
+                    if state == JOB_RUNNING:
+                        logger.warning(f"作业 {job_id} 的租约已过期，重新投递")
+            if not claimed_ids:
+                return [], []
+
+            jobs = db.query(Job).filter(Job.id.in_(claimed_ids)).all()
+            exhausted = [job for job in jobs if job.attempts > job.max_attempts]
+            for job in exhausted:
+                job.state = JOB_FAILED
+                job.finished_at = now
+                job.last_error = f"超过最大投递次数 {job.max_attempts}: {job.last_error or '租约过期'}"
+            db.commit()
+            for job in jobs:
+                db.refresh(job)
+                db.expunge(job)
+        return [job for job in jobs if job not in exhausted], exhausted
+
+    @staticmethod
+    def extend(job_ids: List[int], owner: str) -> int:
+        """为领取者持有的作业续约，返回续约成功的数量"""
+        if not job_ids:
+            return 0
+        lease_until = datetime.now() + timedelta(seconds=JobQueue._visibility_timeout())
+        with get_db() as db:
+            updated = db.query(Job).filter(
+                Job.id.in_(job_ids),
+                Job.state == JOB_RUNNING,
+                Job.lease_owner == owner
+            ).update({Job.visible_after: lease_until}, synchronize_session=False)
+            db.commit()
+            return updated
+
+    @staticmethod
+    def complete(job: Job, owner: str, next_stage: Optional[str] = None, payload: Optional[Dict] = None):
+        """
+        完成作业，并在同一事务中创建下一阶段的作业
+
+        Args:
+            job: 已领取的作业
+            owner: 领取者标识
+            next_stage: 下一阶段，为空表示流水线结束
+            payload: 下一阶段的参数
+        """
+        now = datetime.now()
+        with get_db() as db:
+            updated = db.query(Job).filter(
+                Job.id == job.id,
+                Job.state == JOB_RUNNING,
+                Job.lease_owner == owner
+            ).update({
+                Job.state: JOB_DONE,
+                Job.finished_at: now,
+                Job.visible_after: now
+            }, synchronize_session=False)
+            if not updated:
+                logger.warning(f"作业 {job.id} 的租约已丢失，可能已被重新投递")
+            if next_stage:
+                JobQueue.enqueue(db, next_stage, job.capability, job.task_id, job.asset_id, payload)
+            db.commit()
+
+    @staticmethod
+    def fail(job: Job, owner: str, error: str, retry: bool = True) -> str:
+        """
+        记录作业执行失败，可重试时按退避时间重新投递
+
+        Returns:
+            作业的新状态 pending / failed
+        """
+        now = datetime.now()
+        with get_db() as db:
+            row = db.query(Job).filter(Job.id == job.id, Job.lease_owner == owner).first()
+            if not row or row.state != JOB_RUNNING:
+                return row.state if row else JOB_FAILED
+            row.last_error = error
+            row.lease_owner = None
+            if retry and row.attempts < row.max_attempts:
+                delay = JobQueue.backoff(row.attempts, ConfigService.get_value('job_retry_backoff', 30))
+                row.state = JOB_PENDING
+                row.visible_after = now + timedelta(seconds=delay)
+                logger.warning(f"作业 {job.id} ({job.stage}) 第 {row.attempts} 次执行失败，{delay:.0f} 秒后重试: {error}")
+            else:
+                row.state = JOB_FAILED
+                row.finished_at = now
+                logger.error(f"作业 {job.id} ({job.stage}) 执行失败: {error}")
+            db.commit()
+            return row.state
+
+    @staticmethod
+    def release(job_ids: List[int], owner: str) -> int:
+        """
+        交还领取者持有的作业，立即重新可见，不计入投递次数
+
+        Returns:
+            交还的作业数量
+        """
+        if not job_ids:
+            return 0
+        with get_db() as db:
+            updated = db.query(Job).filter(
+                Job.id.in_(job_ids),
+                Job.state == JOB_RUNNING,
+                Job.lease_owner == owner
+            ).update({
+                Job.state: JOB_PENDING,
+                Job.lease_owner: None,
+                Job.visible_after: datetime.now(),
+                Job.attempts: Job.attempts - 1
+            }, synchronize_session=False)
+            db.commit()
+            return updated
+
+    @staticmethod
+    def release_others(stage: str, owner: str) -> int:
+        """
+        立即重新投递其他领取者持有的某阶段作业，不等待租约过期
+
+        用于只能由领导者执行的监控作业：新领导者当选时前任已经停止监控
+
+        Returns:
+            重新投递的作业数量
+        """
+        with get_db() as db:
+            updated = db.query(Job).filter(
+                Job.stage == stage,
+                Job.state == JOB_RUNNING,
+                Job.lease_owner != owner
+            ).update({
+                Job.state: JOB_PENDING,
+                Job.lease_owner: None,
+                Job.visible_after: datetime.now(),
+                Job.attempts: Job.attempts - 1
+            }, synchronize_session=False)
+            db.commit()
+            return updated
+
+    @staticmethod
+    def list_jobs(task_id: Optional[int] = None, state: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """查询作业，按创建时间倒序"""
+        with get_db() as db:
+            query = db.query(Job)
+            if task_id is not None:
+                query = query.filter(Job.task_id == task_id)
+            if state:
+                query = query.filter(Job.state == state)
+            return [job.to_dict() for job in query.order_by(Job.id.desc()).limit(limit).all()]
+
+
+class JobRunner:
+    """
+    作业执行线程
+
+    领导者进程领取可见的作业并交给各阶段的执行函数；所有进程为本进程领取后尚未结束的作业续约，
+    因此卸任后仍在进行的暂存和完成处理不会被重复投递。
+    执行函数异步完成，结束时调用 JobRunner.finish。
+    """
+
+    @staticmethod
+    def start(handlers: Dict[str, Callable[[Job], None]], on_failed: Optional[Callable[[Job], None]] = None):
+        """
+        启动作业执行线程
+
+        Args:
+            handlers: {阶段: 执行函数}
+            on_failed: 作业最终失败时调用
+        """
+        global _runner_thread, _runner_running, _handlers, _on_failed
+
+        if _runner_thread is not None and _runner_thread.is_alive():
+            logger.warning("作业执行线程已经在运行中")
+            return False
+
+        _handlers, _on_failed = dict(handlers), on_failed
+        _runner_running = True
+        _runner_thread = threading.Thread(
+            target=JobRunner._runner_loop,
+            name="job_runner",
+            daemon=True
+        )
+        _runner_thread.start()
+        logger.info("作业执行线程已启动")
+        return True
+
+    @staticmethod
+    def stop():
+        """停止作业执行线程"""
+        global _runner_running
+
+        if not _runner_running:
+            return False
+        _runner_running = False
+        _runner_wakeup.set()
+        return True
+
+    @staticmethod
+    def wakeup():
+        """有新作业时唤醒执行线程"""
+        _runner_wakeup.set()
+
+    @staticmethod
+    def _runner_loop():
+        """领取和续约循环"""
+        last_extended = 0.0
+        while _runner_running:
+            try:
+                now = time.time()
+                if now - last_extended >= JobQueue._visibility_timeout() / 3:
+                    with _inflight_lock:
+                        job_ids = list(_inflight)
+                    JobQueue.extend(job_ids, HOLDER_ID)
+                    last_extended = now
+
+                if LeaderElection.is_leader():
+                    JobRunner._claim_and_dispatch()
+
+                _runner_wakeup.wait(timeout=ConfigService.get_value('job_poll_interval', 5))
+                _runner_wakeup.clear()
+            except Exception as e:
+                logger.error(f"作业执行循环出错: {str(e)}", exc_info=True)
+                time.sleep(10)
+
+        logger.info("作业执行线程已停止")
+
+    @staticmethod
+    def _claim_and_dispatch():
+        """领取可见的作业并交给执行函数"""
+        jobs, exhausted = JobQueue.claim(HOLDER_ID, list(_handlers))
+        for job in exhausted:
+            logger.error(f"任务 {job.task_id} 的{job.stage}作业 {job.id} 超过最大投递次数")
+            if _on_failed:
+                _on_failed(job)
+
+        for job in jobs:
+            with _inflight_lock:
+                _inflight[job.id] = job
+            try:
+                _handlers[job.stage](job)
+            except Exception as e:
+                logger.error(f"分派作业 {job.id} ({job.stage}) 失败: {str(e)}", exc_info=True)
+                JobRunner.finish(job, error=str(e), retry=True)
+
+    @staticmethod
+    def finish(job: Job, error: Optional[str] = None, retry: bool = False,
+               next_stage: Optional[str] = None, payload: Optional[Dict] = None):
+        """
+        结束本进程领取的作业
+
+        Args:
+            job: 作业
+            error: 错误信息，为空表示成功
+            retry: 出错时是否按退避时间重试，业务失败（任务已被标记为错误）时不重试
+            next_stage: 成功时创建的下一阶段作业
+            payload: 下一阶段的参数
+        """
+        with _inflight_lock:
+            _inflight.pop(job.id, None)
+        try:
+            if error is None:
+                JobQueue.complete(job, HOLDER_ID, next_stage, payload)
+                if next_stage:
+                    JobRunner.wakeup()
+            elif JobQueue.fail(job, HOLDER_ID, error, retry) == JOB_FAILED and retry and _on_failed:
+                _on_failed(job)
+        except Exception as e:
+            # 未能记录结果时作业会在租约过期后重新投递
+            logger.error(f"记录作业 {job.id} 结果失败: {str(e)}", exc_info=True)
+
+    @staticmethod
+    def release_local(stage: str) -> int:
+        """交还本进程持有的某阶段作业（如卸任时的监控作业），由新的领导者立即领取"""
+        with _inflight_lock:
+            job_ids = [job_id for job_id, job in _inflight.items() if job.stage == stage]
+            for job_id in job_ids:
+                del _inflight[job_id]
+        return JobQueue.release(job_ids, HOLDER_ID)
@@ -1,7 +1,7 @@
 from typing import List, Dict, Optional
 from datetime import datetime
 from sqlalchemy.orm import Session
-from ...models.task import Task, TaskStatus, TaskExecutionHistory
+from ...models.task import Task, TaskStatus, TaskExecutionHistory, TaskImage
 from ...models.asset import Asset
 from ...database import get_db
 from ...utils.logger import setup_logger
@@ -9,9 +9,16 @@ from ...services.config_service import ConfigService
 from ...utils.file_handler import generate_unique_folder_path
 from ...utils.mark_handler import MarkRequestHandler, MarkConfig
 from ...utils.common import copy_attributes
-from ...services.asset_service import AssetService
+from ...services.asset_health_service import AssetHealthService
+from .slot_service import SlotService, CAPABILITY_MARKING
+from .scheduler_events import notify_scheduler, REASON_TASK_SUBMITTED, REASON_TASK_TRAINING, REASON_CAPACITY_RELEASED
+from .poll_policy import AdaptivePollPolicy
+from .staging_service import StagingService
+from .cancellation import CancellationRegistry, TaskCancelled
+from .job_queue import RetryableError
 from ...config import Config
 from ...utils.ssh import create_ssh_client_from_asset
+import functools
 import json
 import traceback
 import os
@@ -24,9 +31,17 @@ class MarkingService:
     def get_available_marking_assets() -> List[Asset]:
         """获取可用于标记的资产"""
         try:
-            assets = AssetService.verify_all_assets('ai_engine')
-            # 标记资产最大并发数固定为10
-            return [asset for asset in assets if asset.marking_tasks_count < 10]
+            # 使用健康注册表中缓存的可用性，避免每次调度都探测所有资产
+            asset_ids = AssetHealthService.get_available_asset_ids('ai_engine')
+            if not asset_ids:
+                return []
+            with get_db() as db:
+                assets = db.query(Asset).filter(
+                    Asset.id.in_(asset_ids),
+                    Asset.enabled == True
+                ).all()
+            # 按资产配置的并发上限过滤已满的资产
+            return [asset for asset in assets if SlotService.get_remaining(asset, CAPABILITY_MARKING) > 0]
         except Exception as e:
             logger.error(f"获取可用标记资产失败: {str(e)}")
             return []
@@ -55,6 +70,7 @@ class MarkingService:
 
             # 更新任务状态为已提交，并传递数据库会话
             task.update_status(TaskStatus.SUBMITTED, '任务已提交', db=db)
+            notify_scheduler(REASON_TASK_SUBMITTED)
 
             return task.to_dict()
             
@@ -121,12 +137,15 @@ class MarkingService:
             # 记录成功提交的任务ID
             succeeded_ids.append(task_id)
         
+        if succeeded_ids:
+            notify_scheduler(REASON_TASK_SUBMITTED)
         return succeeded_ids
             
     @staticmethod
     def _process_marking(task_id: int, asset_id: int):
-        """处理标记任务"""
+        """处理标记任务，任务被取消时抛出 TaskCancelled"""
         try:
+            CancellationRegistry.check(task_id)
             with get_db() as db:
                 task = db.query(Task).filter(Task.id == task_id).first()
                 asset = db.query(Asset).filter(Asset.id == asset_id).first()
@@ -174,10 +193,18 @@ class MarkingService:
                     # 创建SSH客户端工具
                     ssh_client = create_ssh_client_from_asset(asset)
                     # 下载打标结果
-                    success, message, stats = ssh_client.upload_directory(
-                        local_path=input_dir,
-                        remote_path=remote_input_dir
-                    )
+                    with SlotService.keep_alive(task_id, CAPABILITY_MARKING):
+                        success, message, stats = ssh_client.upload_directory(
+                            local_path=input_dir,
+                            remote_path=remote_input_dir,
+                            progress_callback=StagingService.progress_callback(CAPABILITY_MARKING, task_id),
+                            sessions=ConfigService.get_value('sftp_transfer_sessions', 4),
+                            bulk_threshold=ConfigService.get_value('bulk_transfer_threshold', 200),
+                            compress=bool(ConfigService.get_value('bulk_transfer_compress', 0)),
+                            use_manifest=bool(ConfigService.get_value('sync_manifest_enabled', 1))
+                        )
+                    # 上传中途取消时不再提交标记请求
+                    CancellationRegistry.check(task_id)
                     
                     if not success:
                         raise Exception(f"同步图片失败: {message}")
@@ -213,9 +240,9 @@ class MarkingService:
                     error_json = json.dumps(error_detail, indent=2)
                     task.update_status(TaskStatus.ERROR, f'标记请求失败: {str(req_error)}', db=db)
                     task.add_log(error_json, db=db)
-                    if task.marking_asset:
-                        task.marking_asset.marking_tasks_count = max(0, task.marking_asset.marking_tasks_count - 1)
+                    if SlotService.release(db, task.id, CAPABILITY_MARKING):
                         db.commit()
+                        notify_scheduler(REASON_CAPACITY_RELEASED)
                     raise ValueError(f"标记请求失败: {str(req_error)}")
 
                 if not prompt_id:
@@ -231,6 +258,10 @@ class MarkingService:
 
                 return prompt_id
 
+        except TaskCancelled:
+            # 任务已由终止/取消操作回滚，不再标记为错误
+            logger.info(f"标记任务 {task_id} 已取消，停止处理")
+            raise
         except Exception as e:
             logger.error(f"标记任务 {task_id} 处理失败: {str(e)}", exc_info=True)
             # 详细记录错误
@@ -243,138 +274,189 @@ class MarkingService:
                         "type": type(e).__name__,
                         "traceback": str(traceback.format_exc())
                     }, indent=2), db=db)
-                    if task.marking_asset:
-                        task.marking_asset.marking_tasks_count = max(0, task.marking_asset.marking_tasks_count - 1)
+                    if SlotService.release(db, task.id, CAPABILITY_MARKING):
                         db.commit()
+                        notify_scheduler(REASON_CAPACITY_RELEASED)
             raise
             
     @staticmethod
-    def _monitor_mark_status(task_id: int, asset_id: int, prompt_id: str):
-        """监控标记任务状态"""
+    def _poll_mark_status(watch, context):
+        """
+        检查一次标记任务状态，由监控引擎在资产的每个轮询周期调用
+        
+        Args:
+            watch: 监控项，remote_id 为 prompt_id
+            context: 资产轮询周期的共享上下文
+            
+        Returns:
+            None 继续监控；True 停止监控；可调用对象 停止监控并执行完成处理
+        """
+        task_id = watch.task_id
+        prompt_id = watch.remote_id
         try:
+            if context.asset is None:
+                raise ValueError("任务或资产不存在")
+            
+            # 首次轮询时记录开始监控并加载打标配置
+            if 'mark_config' not in watch.state:
+                with get_db() as db:
+                    task = db.query(Task).filter(Task.id == task_id).first()
+                    if not task:
+                        raise ValueError("任务或资产不存在")
+                    task.add_log(f'开始监控标记任务状态, prompt_id={prompt_id}', db=db)
+                    watch.state['image_count'] = db.query(TaskImage).filter(TaskImage.task_id == task_id).count()
+                watch.state['started_at'] = time.time()
+                watch.state['mark_config'] = ConfigService.get_task_mark_config(task_id)
+            
+            completed, success, task_info = context.check_mark_status(prompt_id, watch.state['mark_config'])
+            logger.info(f"检查标记任务状态: completed={completed}, success={success}, task_info={task_info}")
+            
             with get_db() as db:
                 task = db.query(Task).filter(Task.id == task_id).first()
-                asset = db.query(Asset).filter(Asset.id == asset_id).first()
-
-                if not task or not asset:
-                    raise ValueError("任务或资产不存在")
+                # 可能在打标过程中取消了任务，不再继续监听
+                if not task or task.status != TaskStatus.MARKING:
+                    logger.info("任务状态为非打标状态，退出监听")
+                    return True
                 
-                # 记录开始监控
-                task.add_log(f'开始监控标记任务状态, prompt_id={prompt_id}', db=db)
-                handler = MarkRequestHandler(asset)
-                poll_interval = ConfigService.get_value('mark_poll_interval', 5)
-                mark_config = ConfigService.get_task_mark_config(task.id)
-                last_progress = 0
-                error_count = 0
+                # 由预取的 /history 和事件流中的实时进度组装进度数据并保存到数据库
+                try:
+                    progress_data = context.marking_progress(prompt_id)
+                    if progress_data and task.execution_history_id:
+                        execution_history = db.query(TaskExecutionHistory).filter(
+                            TaskExecutionHistory.id == task.execution_history_id
+                        ).first()
+                        if execution_history:
+                            execution_history.marking_progress_data = progress_data
+                            db.commit()
+                except Exception as progress_err:
+                    logger.warning(f"收集标记进度数据失败: {str(progress_err)}")
+            
+            # 重置错误计数
+            watch.error_count = 0
+            
+            if completed:
+                return functools.partial(MarkingService._complete_marking, task_id, watch.asset_id, success, task_info)
+            
+            # 按图片数量估算剩余时间，调整下次轮询间隔
+            floor, ceiling = AdaptivePollPolicy.get_bounds()
+            remaining = AdaptivePollPolicy.estimate_marking_remaining(
+                watch.state.get('image_count'), watch.state['started_at']
+            )
+            watch.adaptive_interval = AdaptivePollPolicy.interval_for_remaining(remaining, watch.interval, floor, ceiling)
+            return None
+            
+        except Exception as check_err:
+            # 处理检查状态的错误
+            watch.error_count += 1
+            # 记录错误并在多次失败后停止监控
+            with get_db() as err_db:
+                task = err_db.query(Task).filter(Task.id == task_id).first()
+                if task:
+                    task.add_log(f'检查任务状态出错 ({watch.error_count}/3): {str(check_err)}', db=err_db)
+                if watch.error_count >= 3:
+                    if task:
+                        task.update_status(TaskStatus.ERROR, f'连续3次检查状态失败，停止监控: {str(check_err)}', db=err_db)
+                        if SlotService.release(err_db, task.id, CAPABILITY_MARKING):
+                            err_db.commit()
+                            notify_scheduler(REASON_CAPACITY_RELEASED)
+                    return True
+            return None
+    
+    @staticmethod
+    def _complete_marking(task_id: int, asset_id: int, success: bool, task_info: Dict, retry: bool = False):
+        """
+        处理已结束的标记任务：同步远程结果、更新状态并释放资产槽位
+        
+        Args:
+            task_id: 任务ID
+            asset_id: 资产ID
+            success: 是否执行成功
+            task_info: check_status 返回的任务信息
+            retry: 由完成处理作业执行，同步结果失败时抛出 RetryableError 由作业队列重试，
+                   重试次数用完后由作业失败处理函数标记错误
+        """
+        try:
+            with get_db() as db:
+                task = db.query(Task).filter(Task.id == task_id).first()
+                asset = db.query(Asset).filter(Asset.id == asset_id).first()
+                # 可能在等待完成处理期间取消了任务
+                if not task or task.status != TaskStatus.MARKING:
+                    logger.info("任务状态为非打标状态，跳过完成处理")
+                    return
                 
-                while True:
-                    try:
-                        completed, success, task_info = handler.check_status(prompt_id, mark_config)
-                        logger.info(f"检查标记任务状态: completed={completed}, success={success}, task_info={task_info}")
+                if success:
+                    # 如果是非本地资产，需要下载结果
+                    if asset and not asset.is_local and task.mark_config and task.mark_config.get('remote_output_dir'):
+                        task.add_log('打标完成，开始从远程服务器同步结果...', db=db)
                         
-                        # 收集实时进度数据并保存到数据库
-                        try:
-                            progress_data = handler.get_marking_progress_data(prompt_id)
-                            if progress_data and task.execution_history_id:
-                                with get_db() as progress_db:
-                                    execution_history = progress_db.query(TaskExecutionHistory).filter(
-                                        TaskExecutionHistory.id == task.execution_history_id
-                                    ).first()
-                                    if execution_history:
-                                        execution_history.marking_progress_data = progress_data
-                                        progress_db.commit()
-                        except Exception as progress_err:
-                            logger.warning(f"收集标记进度数据失败: {str(progress_err)}")
+                        # 创建SSH客户端工具
+                        ssh_client = create_ssh_client_from_asset(asset)
+                        # 下载打标结果
+                        with SlotService.keep_alive(task_id, CAPABILITY_MARKING):
+                            synced, message, stats = ssh_client.download_directory(
+                                local_path=task.marked_images_path,
+                                remote_path=task.mark_config['remote_output_dir'],
+                                sessions=ConfigService.get_value('sftp_transfer_sessions', 4),
+                                bulk_threshold=ConfigService.get_value('bulk_transfer_threshold', 200),
+                                compress=bool(ConfigService.get_value('bulk_transfer_compress', 0)),
+                                # 记录打标结果的哈希，训练时可以直接从打标资产复制
+                                use_manifest=bool(ConfigService.get_value('sync_manifest_enabled', 1))
+                                and bool(ConfigService.get_value('direct_asset_transfer', 1))
+                            )
                         
-                        with get_db() as complete_db:
-                            task = complete_db.query(Task).filter(Task.id == task_id).first()
-                            # 可能在打标过程中取消了任务，不再继续监听
-                            if task and task.status != TaskStatus.MARKING:
-                                logger.info("任务状态为非打标状态，退出监听")
-                                break
-                                
-                            if completed and task:
-                                if success:
-                                    # 如果是非本地资产，需要下载结果
-                                    if not asset.is_local and task.mark_config and task.mark_config.get('remote_output_dir'):
-                                        task.add_log('打标完成，开始从远程服务器同步结果...', db=complete_db)
-                                        
-                                        # 创建SSH客户端工具
-                                        ssh_client = create_ssh_client_from_asset(asset)
-                                        # 下载打标结果
-                                        success, message, stats = ssh_client.download_directory(
-                                            local_path=task.marked_images_path,
-                                            remote_path=task.mark_config['remote_output_dir']
-                                        )
-                                        
-                                        if not success:
-                                            task.add_log(f'同步结果失败: {message}', db=complete_db)
-                                            task.update_status(TaskStatus.ERROR, f'同步打标结果失败: {message}', db=complete_db)
-                                            break
-                                        
-                                        task.add_log(f'打标结果同步成功: {message}', db=complete_db)
-                                    
-                                    task.update_status(TaskStatus.MARKED, '标记完成', db=complete_db)
-                                    task.progress = 100
-                                    task.add_log('标记任务成功完成', db=complete_db)
-                                    
-                                    # 检查是否自动开始训练
-                                    if task.auto_training:
-                                        logger.info(f"任务 {task_id} 启用自动训练，将自动开始训练流程")
-                                        task.add_log('启用自动训练，设置状态为训练中，等待调度器分配资产', db=complete_db)
-                                        task.update_status(TaskStatus.TRAINING, '准备开始训练', db=complete_db)
-                                    else:
-                                        task.add_log('未启用自动训练，请手动提交训练任务', db=complete_db)
-                                else:
-                                    # 处理失败情况
-                                    error_info = task_info.get("error_info", {})
-                                    task.update_status(
-                                        TaskStatus.ERROR,
-                                        f'标记失败: {error_info.get("error_message")}',
-                                        db=complete_db
-                                    )
-                                    task.add_log(json.dumps({
-                                        "message": error_info.get("error_message"),
-                                        "type": error_info.get("error_type"),
-                                        "node": error_info.get("node_type"),
-                                        "details": {
-                                            "inputs": error_info.get("inputs"),
-                                            "traceback": error_info.get("traceback")
-                                        }
-                                    }, indent=2), db=complete_db)
-                                
-                                # 更新资产任务计数
-                                if task.marking_asset:
-                                    task.marking_asset.marking_tasks_count = max(0, task.marking_asset.marking_tasks_count - 1)
-                                    complete_db.commit()
-                                break
+                        if not synced:
+                            task.add_log(f'同步结果失败: {message}', db=db)
+                            if retry:
+                                raise RetryableError(f'同步打标结果失败: {message}')
+                            task.update_status(TaskStatus.ERROR, f'同步打标结果失败: {message}', db=db)
+                            if SlotService.release(db, task.id, CAPABILITY_MARKING):
+                                db.commit()
+                                notify_scheduler(REASON_CAPACITY_RELEASED)
+                            return
                         
-                        time.sleep(poll_interval)
-                        # 重置错误计数
-                        error_count = 0
-                    except Exception as check_err:
-                        # 处理检查状态的错误
-                        error_count += 1
-                        # 记录错误并在多次失败后停止监控
-                        with get_db() as err_db:
-                            task = err_db.query(Task).filter(Task.id == task_id).first()
-                            if task:
-                                task.add_log(f'检查任务状态出错 ({error_count}/3): {str(check_err)}', db=err_db)
-                            if error_count >= 3:
-                                task = err_db.query(Task).filter(Task.id == task_id).first()
-                                if task:
-                                    task.update_status(TaskStatus.ERROR, f'连续3次检查状态失败，停止监控: {str(check_err)}', db=err_db)
-                                    if task.marking_asset:
-                                        task.marking_asset.marking_tasks_count = max(0, task.marking_asset.marking_tasks_count - 1)
-                                        err_db.commit()
-                                break
+                        task.add_log(f'打标结果同步成功: {message}', db=db)
+                    
+                    task.update_status(TaskStatus.MARKED, '标记完成', db=db)
+                    task.progress = 100
+                    task.add_log('标记任务成功完成', db=db)
+                    
+                    # 检查是否自动开始训练
+                    if task.auto_training:
+                        logger.info(f"任务 {task_id} 启用自动训练，将自动开始训练流程")
+                        task.add_log('启用自动训练，设置状态为训练中，等待调度器分配资产', db=db)
+                        task.update_status(TaskStatus.TRAINING, '准备开始训练', db=db)
+                        notify_scheduler(REASON_TASK_TRAINING)
+                    else:
+                        task.add_log('未启用自动训练，请手动提交训练任务', db=db)
+                else:
+                    # 处理失败情况
+                    error_info = task_info.get("error_info", {})
+                    task.update_status(
+                        TaskStatus.ERROR,
+                        f'标记失败: {error_info.get("error_message")}',
+                        db=db
+                    )
+                    task.add_log(json.dumps({
+                        "message": error_info.get("error_message"),
+                        "type": error_info.get("error_type"),
+                        "node": error_info.get("node_type"),
+                        "details": {
+                            "inputs": error_info.get("inputs"),
+                            "traceback": error_info.get("traceback")
+                        }
+                    }, indent=2), db=db)
                 
-                    time.sleep(poll_interval)
-
+                # 释放资产槽位
+                if SlotService.release(db, task.id, CAPABILITY_MARKING):
+                    db.commit()
+                    notify_scheduler(REASON_CAPACITY_RELEASED)
+                    
                 logger.info("已退出监听标记任务状态")
 
+        except RetryableError:
+            raise
         except Exception as e:
-            # 处理整体监控异常
+            # 处理完成阶段的异常
             logger.error(f"监控标记任务状态失败: {str(e)}")
             with get_db() as db:
                 task = db.query(Task).filter(Task.id == task_id).first()
@@ -385,6 +467,6 @@ class MarkingService:
                         "type": type(e).__name__,
                         "traceback": str(traceback.format_exc())
                     }, indent=2), db=db)
-                    if task.marking_asset:
-                        task.marking_asset.marking_tasks_count = max(0, task.marking_asset.marking_tasks_count - 1)
-                        db.commit() 
\ No newline at end of file
+                    if SlotService.release(db, task.id, CAPABILITY_MARKING):
+                        db.commit()
+                        notify_scheduler(REASON_CAPACITY_RELEASED)
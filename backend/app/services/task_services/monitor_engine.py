@@ -0,0 +1,567 @@
+from typing import Dict, List, Optional, Callable, Any
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, Future
+from ...models.asset import Asset
+from ...database import get_db
+from ...utils.logger import setup_logger
+from ...utils.mark_handler import MarkRequestHandler
+from ...utils.train_handler import TrainRequestHandler
+from ...services.config_service import ConfigService
+from ...services.async_engine import AsyncEngine
+from ...services.runtime_state_service import RuntimeStateService, STATE_MONITOR_PROGRESS
+from .marking_service import MarkingService
+from .training_service import TrainingService
+from .slot_service import SlotService, CAPABILITY_MARKING, CAPABILITY_TRAINING
+from .comfyui_event_stream import ComfyUIEventStream
+from .job_queue import JobRunner, STAGE_COMPLETE
+from .cancellation import CancellationRegistry
+import functools
+import asyncio
+import threading
+import time
+
+logger = setup_logger('monitor_engine')
+
+# 监控类型
+WATCH_MARKING = CAPABILITY_MARKING
+WATCH_TRAINING = CAPABILITY_TRAINING
+
+# 资产ID -> {(监控类型, 任务ID): 监控项}
+_watches: Dict[int, Dict[tuple, 'MonitorWatch']] = {}
+_watches_lock = threading.Lock()
+
+# 资产ID -> 轮询协程 / 唤醒事件（唤醒事件只在事件循环线程中创建和设置）
+_pollers: Dict[int, Future] = {}
+_poller_wakeups: Dict[int, asyncio.Event] = {}
+_engine_running = True
+
+# 任务完成后的结果同步等耗时操作在独立线程池中执行，不阻塞资产的轮询
+completion_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="MonitorCompletion")
+
+
+@dataclass
+class MonitorWatch:
+    """单个任务的监控项"""
+    task_id: int
+    asset_id: int
+    kind: str                            # 监控类型: marking / training
+    remote_id: str                       # 打标的prompt_id或训练任务ID
+    interval: float                      # 轮询间隔(秒)
+    next_poll_at: float = 0
+    next_poll_in: Optional[float] = None  # 本次轮询后单次覆盖的等待时间，例如出错后快速重试
+    adaptive_interval: Optional[float] = None  # 状态处理函数按预计剩余时间给出的轮询间隔
+    error_count: int = 0
+    state: Dict[str, Any] = field(default_factory=dict)
+    job: Optional[Any] = field(default=None, repr=False)  # 对应的监控作业，监控结束时完成作业
+
+
+class MonitorContext:
+    """
+    单个资产一次轮询周期内的共享上下文
+    同一周期内该资产上的所有监控项共用同一个资产对象和请求处理器
+    """
+
+    def __init__(self, asset: Optional[Asset]):
+        self.asset = asset
+        self.cache: Dict[str, Any] = {}
+        # (监控类型, remote_id) -> 异步预取的远程响应或异常
+        self.remote: Dict[tuple, Any] = {}
+        # 训练引擎任务列表快照，按训练任务ID索引，本周期内该资产上所有训练监控项共用
+        self.training_tasks: Optional[Dict[str, Dict]] = None
+        self.training_error: Optional[BaseException] = None
+        self._mark_handler = None
+        self._train_handler = None
+
+    @property
+    def mark_handler(self) -> MarkRequestHandler:
+        if self._mark_handler is None:
+            self._mark_handler = MarkRequestHandler(self.asset)
+        return self._mark_handler
+
+    @property
+    def train_handler(self) -> TrainRequestHandler:
+        if self._train_handler is None:
+            self._train_handler = TrainRequestHandler(self.asset)
+        return self._train_handler
+
+    def check_mark_status(self, prompt_id: str, mark_config) -> tuple:
+        """
+        获取打标prompt状态，优先使用本周期异步预取的 /history 响应
+
+        Returns:
+            (is_completed, is_success, task_info)
+        """
+        key = (WATCH_MARKING, prompt_id)
+        if key not in self.remote:
+            return self.mark_handler.check_status(prompt_id, mark_config)
+        data = self.remote[key]
+        if isinstance(data, BaseException):
+            logger.error(f"检查任务状态出错: {_describe_error(data)}")
+            return False, False, {"status": "error_checking", "error": _describe_error(data), "progress": 0}
+        return self.mark_handler.parse_history(prompt_id, data)
+
+    def marking_progress(self, prompt_id: str) -> Dict:
+        """
+        组装打标进度数据，不发起请求
+
+        使用本周期异步预取的 /history、队列和系统状态响应以及 WebSocket progress 事件中的实时进度，
+        连接正常时这些请求只按对账间隔发起，进度不会增加对 ComfyUI 的请求
+        """
+        history = self.remote.get((WATCH_MARKING, prompt_id))
+        if isinstance(history, BaseException):
+            history = None
+        return MarkRequestHandler.build_progress_data(
+            prompt_id,
+            self.cache.get('comfyui_queue'),
+            self.cache.get('comfyui_system_stats'),
+            history,
+            ComfyUIEventStream.get_progress(prompt_id)
+        )
+
+    def set_training_snapshot(self, data: Any):
+        """
+        保存训练引擎 /api/tasks 响应，解析为按任务ID索引的快照
+
+        Args:
+            data: 响应数据，请求失败时为异常对象
+        """
+        try:
+            if isinstance(data, BaseException):
+                raise data
+            tasks = TrainRequestHandler.parse_tasks(data)
+            self.training_tasks = {str(task.get('id')): task for task in tasks}
+            self.training_error = None
+        except Exception as e:
+            self.training_tasks = None
+            self.training_error = e
+
+    def check_training_status(self, training_task_id: str, train_headers: Optional[Dict] = None) -> str:
+        """
+        获取训练任务状态
+
+        本周期内第一次调用时获取训练引擎任务列表（通常已由引擎异步预取），
+        之后该资产上的训练任务都从快照中按ID查找，每个周期每个资产只请求一次 /api/tasks
+
+        Returns:
+            训练引擎返回的任务状态，未找到时为 NOT_FOUND
+        """
+        if self.training_tasks is None and self.training_error is None:
+            try:
+                self.set_training_snapshot(self.train_handler.get_tasks_response(train_headers))
+            except Exception as e:
+                self.training_error = e
+        if self.training_error is not None:
+            raise ValueError(f"获取训练任务列表失败: {_describe_error(self.training_error)}")
+
+        task = self.training_tasks.get(str(training_task_id))
+        if not task:
+            return "NOT_FOUND"
+        return task.get('status', '')
+
+
+def _describe_error(error: BaseException) -> str:
+    """超时等异常的 str() 可能为空，补充异常类型"""
+    return str(error) or type(error).__name__
+
+
+# 监控类型 -> 单次轮询函数
+# 轮询函数返回 None 继续监控，返回 True 停止监控，
+# 返回可调用对象时停止监控并在完成线程池中执行该对象
+POLL_HANDLERS: Dict[str, Callable[[MonitorWatch, MonitorContext], Any]] = {
+    WATCH_MARKING: MarkingService._poll_mark_status,
+    WATCH_TRAINING: TrainingService._poll_training_status,
+}
+
+
+class MonitorEngine:
+    """
+    任务监控引擎
+
+    每个资产一个轮询协程，运行在异步执行引擎的事件循环上。每个周期先用异步HTTP客户端
+    并发获取该资产上所有到期监控项的远程状态，再在有界线程池中交给对应的任务状态处理函数
+    （数据库读写和结果同步仍是同步代码）。无响应的资产只会让自己的协程等待到请求超时，
+    线程数量不随资产和任务数量增长。
+
+    有打标任务的资产同时订阅ComfyUI的WebSocket事件，prompt结束时立即检查该prompt；
+    订阅连接正常时打标任务只按 mark_reconcile_interval 低频对账 /history。
+    """
+
+    @staticmethod
+    def watch(kind: str, task_id: int, asset_id: int, remote_id: str, job=None):
+        """
+        开始监控任务
+
+        Args:
+            kind: 监控类型 marking / training
+            task_id: 任务ID
+            asset_id: 任务所在资产ID
+            remote_id: 打标的prompt_id或训练任务ID
+            job: 对应的监控作业，监控结束时完成该作业并创建完成处理作业
+        """
+        if kind == WATCH_MARKING:
+            interval = ConfigService.get_value('mark_poll_interval', 5)
+        else:
+            interval = ConfigService.get_value('train_poll_interval', 30)
+
+        watch = MonitorWatch(
+            task_id=task_id,
+            asset_id=asset_id,
+            kind=kind,
+            remote_id=str(remote_id),
+            interval=interval,
+            job=job
+        )
+        with _watches_lock:
+            _watches.setdefault(asset_id, {})[(kind, task_id)] = watch
+            MonitorEngine._ensure_poller(asset_id)
+        MonitorEngine._wakeup(asset_id)
+        logger.info(f"资产 {asset_id} 开始监控{kind}任务 {task_id}, remote_id={remote_id}")
+
+    @staticmethod
+    def unwatch(kind: str, task_id: int):
+        """停止监控任务"""
+        with _watches_lock:
+            for asset_id, watches in _watches.items():
+                watch = watches.pop((kind, task_id), None)
+                if watch:
+                    break
+            else:
+                return False
+        if watch.kind == WATCH_MARKING:
+            ComfyUIEventStream.discard_progress(watch.remote_id)
+        if watch.job is not None:
+            JobRunner.finish(watch.job)
+        MonitorEngine._wakeup(asset_id)
+        return True
+
+    @staticmethod
+    def cancel(task_id: int):
+        """任务被取消时立即停止其监控，不再等待下一次轮询发现状态变化"""
+        for kind in (WATCH_MARKING, WATCH_TRAINING):
+            if MonitorEngine.unwatch(kind, task_id):
+                logger.info(f"任务 {task_id} 已取消，停止{kind}监控")
+
+    @staticmethod
+    def is_watching(kind: str, task_id: int) -> bool:
+        """任务是否正在被监控"""
+        with _watches_lock:
+            return any((kind, task_id) in watches for watches in _watches.values())
+
+    @staticmethod
+    def get_watches() -> List[Dict]:
+        """获取当前所有监控项"""
+        now = time.time()
+        with _watches_lock:
+            return [
+                {
+                    'task_id': watch.task_id,
+                    'asset_id': watch.asset_id,
+                    'kind': watch.kind,
+                    'remote_id': watch.remote_id,
+                    'interval': watch.interval,
+                    'adaptive_interval': watch.adaptive_interval,
+                    'next_poll_in': max(0, round(watch.next_poll_at - now, 1)),
+                    'error_count': watch.error_count,
+                    'event_stream': watch.kind == WATCH_MARKING and ComfyUIEventStream.is_connected(watch.asset_id),
+                }
+                for watches in _watches.values() for watch in watches.values()
+            ]
+
+    @staticmethod
+    def estimate_wait(asset_id: int, kind: str) -> Optional[float]:
+        """
+        估算资产上最早结束的同类任务还需多久完成
+
+        使用训练监控项根据loss曲线估算的剩余时间，并按估算后经过的时间外推
+
+        Returns:
+            预计等待时间(秒)，没有可用的估算时返回None
+        """
+        now = time.time()
+        estimates = []
+        with _watches_lock:
+            for watch in _watches.get(asset_id, {}).values():
+                remaining = watch.state.get('remaining')
+                if watch.kind == kind and remaining is not None:
+                    estimates.append(max(0.0, remaining - (now - watch.state.get('progress_at', now))))
+        return min(estimates) if estimates else None
+
+    @staticmethod
+    def get_progress(kind: str) -> Dict[int, Dict]:
+        """
+        获取指定类型监控项缓存的任务进度，不发起远程请求；
+        调度器运行在其他进程时读取其发布的快照
+
+        Returns:
+            {任务ID: {'asset_id', 'remaining', 'current_step', 'total_steps', 'image_count', 'started_at'}}，
+            remaining 已按估算后经过的时间外推，没有估算时为None
+        """
+        if RuntimeStateService.is_local():
+            return MonitorEngine._local_progress(kind)
+
+        snapshot = RuntimeStateService.read(STATE_MONITOR_PROGRESS) or {}
+        elapsed = max(0.0, time.time() - snapshot.get('published_at', time.time()))
+        progress = {}
+        for task_id, item in (snapshot.get(kind) or {}).items():
+            if item.get('remaining') is not None:
+                item['remaining'] = max(0.0, item['remaining'] - elapsed)
+            progress[int(task_id)] = item
+        return progress
+
+    @staticmethod
+    def export_progress() -> Dict:
+        """导出所有类型的任务进度，用于发布运行时状态快照"""
+        return {
+            'published_at': time.time(),
+            WATCH_MARKING: MonitorEngine._local_progress(WATCH_MARKING),
+            WATCH_TRAINING: MonitorEngine._local_progress(WATCH_TRAINING)
+        }
+
+    @staticmethod
+    def _local_progress(kind: str) -> Dict[int, Dict]:
+        """读取本进程监控项缓存的任务进度"""
+        now = time.time()
+        progress = {}
+        with _watches_lock:
+            for watches in _watches.values():
+                for watch in watches.values():
+                    if watch.kind != kind:
+                        continue
+                    remaining = watch.state.get('remaining')
+                    if remaining is not None:
+                        remaining = max(0.0, remaining - (now - watch.state.get('progress_at', now)))
+                    progress[watch.task_id] = {
+                        'asset_id': watch.asset_id,
+                        'remaining': remaining,
+                        'current_step': watch.state.get('current_step'),
+                        'total_steps': watch.state.get('total_steps'),
+                        'image_count': watch.state.get('image_count'),
+                        'started_at': watch.state.get('started_at'),
+                    }
+        return progress
+
+    @staticmethod
+    def stop():
+        """停止所有资产轮询协程并清空监控项，重新启动后由调度器恢复监控"""
+        global _engine_running
+        _engine_running = False
+        with _watches_lock:
+            _watches.clear()
+            asset_ids = list(_pollers.keys())
+        for asset_id in asset_ids:
+            MonitorEngine._wakeup(asset_id)
+
+    @staticmethod
+    def _wakeup(asset_id: int):
+        """从任意线程唤醒资产的轮询协程"""
+        def _set():
+            event = _poller_wakeups.get(asset_id)
+            if event is not None:
+                event.set()
+        AsyncEngine.call_soon(_set)
+
+    @staticmethod
+    def _ensure_poller(asset_id: int):
+        """确保资产的轮询协程在运行（调用方需持有锁）"""
+        global _engine_running
+        _engine_running = True
+        future = _pollers.get(asset_id)
+        if future is None or future.done():
+            _pollers[asset_id] = AsyncEngine.submit(MonitorEngine._poll_loop(asset_id))
+
+    @staticmethod
+    def _load_context(asset_id: int, due: List[MonitorWatch]) -> MonitorContext:
+        """加载资产本周期的共享上下文"""
+        with get_db() as db:
+            asset = db.query(Asset).filter(Asset.id == asset_id).first()
+        context = MonitorContext(asset)
+        if asset is not None and any(watch.kind == WATCH_TRAINING for watch in due):
+            context.cache['lora_headers'] = ConfigService.get_asset_lora_headers(asset_id)
+        context.cache['mark_reconcile_interval'] = ConfigService.get_value('mark_reconcile_interval', 60)
+        return context
+
+    @staticmethod
+    async def _prefetch(context: MonitorContext, due: List[MonitorWatch]):
+        """
+        并发获取本周期所有到期监控项的远程状态，失败的结果以异常形式保存
+
+        每个打标prompt请求一次 /history，有打标监控项时再请求一次队列和系统状态供所有打标任务的进度共用，
+        训练任务无论多少个只请求一次 /api/tasks
+        """
+        if context.asset is None:
+            return
+        marking = [watch for watch in due if watch.kind == WATCH_MARKING]
+        has_training = any(watch.kind == WATCH_TRAINING for watch in due)
+
+        fetches = []
+        for watch in marking:
+            fetches.append(MonitorEngine._fetch_json(lambda w=watch: context.mark_handler.history_url(w.remote_id)))
+        if marking:
+            fetches.append(MonitorEngine._fetch_json(lambda: context.mark_handler.queue_url()))
+            fetches.append(MonitorEngine._fetch_json(lambda: context.mark_handler.system_stats_url()))
+        if has_training:
+            fetches.append(MonitorEngine._fetch_json(
+                lambda: f"{context.train_handler.api_base_url}/tasks",
+                context.cache.get('lora_headers')
+            ))
+
+        results = await asyncio.gather(*fetches, return_exceptions=True)
+        for watch, result in zip(marking, results):
+            context.remote[(WATCH_MARKING, watch.remote_id)] = result
+        if marking:
+            # 队列和系统状态只用于展示进度，请求失败时进度中不包含这部分数据
+            queue_data, stats_data = results[len(marking):len(marking) + 2]
+            context.cache['comfyui_queue'] = None if isinstance(queue_data, BaseException) else queue_data
+            context.cache['comfyui_system_stats'] = None if isinstance(stats_data, BaseException) else stats_data
+        if has_training:
+            context.set_training_snapshot(results[-1])
+
+    @staticmethod
+    async def _fetch_json(url_factory: Callable[[], str], headers: Optional[Dict] = None) -> Any:
+        """异步获取JSON，请求地址在协程中生成以便把处理器构造失败也作为请求结果保存"""
+        return await AsyncEngine.get_json(url_factory(), headers)
+
+    @staticmethod
+    def _has_marking_watches(asset_id: int) -> bool:
+        """资产上是否还有打标监控项"""
+        with _watches_lock:
+            return _engine_running and any(
+                watch.kind == WATCH_MARKING for watch in _watches.get(asset_id, {}).values()
+            )
+
+    @staticmethod
+    def _ensure_event_stream(asset_id: int, context: MonitorContext):
+        """为有打标任务的资产启动ComfyUI事件订阅（事件循环线程中调用）"""
+        if context.asset is None or not MonitorEngine._has_marking_watches(asset_id):
+            return
+        try:
+            ws_url = context.mark_handler.ws_url()
+        except Exception as e:
+            logger.warning(f"资产 {asset_id} 无法生成ComfyUI事件订阅地址: {str(e)}")
+            return
+
+        def on_prompt_done(prompt_id: Optional[str]):
+            # prompt结束时立即轮询对应的监控项，prompt_id为None时轮询该资产全部打标监控项
+            with _watches_lock:
+                for watch in _watches.get(asset_id, {}).values():
+                    if watch.kind == WATCH_MARKING and (prompt_id is None or watch.remote_id == prompt_id):
+                        watch.next_poll_at = 0
+            event = _poller_wakeups.get(asset_id)
+            if event is not None:
+                event.set()
+
+        ComfyUIEventStream.ensure(
+            asset_id, ws_url,
+            lambda: MonitorEngine._has_marking_watches(asset_id),
+            on_prompt_done
+        )
+
+    @staticmethod
+    def _next_delay(watch: MonitorWatch, context: MonitorContext) -> float:
+        """计算监控项下次轮询的等待时间"""
+        if watch.next_poll_in is not None:
+            return watch.next_poll_in
+        if watch.kind == WATCH_MARKING and ComfyUIEventStream.is_connected(watch.asset_id):
+            # 事件订阅已连接，/history 轮询只用于对账
+            return max(watch.interval, context.cache['mark_reconcile_interval'])
+        if watch.adaptive_interval is not None:
+            return watch.adaptive_interval
+        return watch.interval
+
+    @staticmethod
+    def _handle(watch: MonitorWatch, context: MonitorContext) -> Any:
+        """在线程池中执行监控项的状态处理函数"""
+        # 续约资产槽位，监控失效后槽位会在租约过期时被回收
+        SlotService.renew(watch.task_id, watch.kind)
+        try:
+            return POLL_HANDLERS[watch.kind](watch, context)
+        except Exception as e:
+            logger.error(f"轮询{watch.kind}任务 {watch.task_id} 出错: {str(e)}", exc_info=True)
+            return None
+
+    @staticmethod
+    async def _poll_once(asset_id: int, due: List[MonitorWatch]):
+        """执行一个轮询周期，检查资产上所有到期的监控项"""
+        context = await AsyncEngine.run_blocking(MonitorEngine._load_context, asset_id, due)
+        MonitorEngine._ensure_event_stream(asset_id, context)
+        await MonitorEngine._prefetch(context, due)
+        for watch in due:
+            result = await AsyncEngine.run_blocking(MonitorEngine._handle, watch, context)
+
+            if result:
+                with _watches_lock:
+                    watches = _watches.get(asset_id, {})
+                    if watches.get((watch.kind, watch.task_id)) is watch:
+                        del watches[(watch.kind, watch.task_id)]
+                if watch.kind == WATCH_MARKING:
+                    ComfyUIEventStream.discard_progress(watch.remote_id)
+                if CancellationRegistry.is_cancelled(watch.task_id):
+                    # 轮询期间任务被取消，远程中断引起的结束状态不做完成处理，监控作业已在取消时结束
+                    continue
+                MonitorEngine._finish(watch, result)
+                continue
+
+            delay = MonitorEngine._next_delay(watch, context)
+            watch.next_poll_in = None
+            watch.next_poll_at = time.time() + delay
+
+    @staticmethod
+    def _finish(watch: MonitorWatch, result: Any):
+        """
+        监控结束：有监控作业时完成作业，完成处理作为下一阶段作业持久化后再执行；
+        否则直接在完成处理线程池中执行
+
+        状态处理函数以 functools.partial 返回完成处理函数，其参数作为完成处理作业的参数保存
+        """
+        if watch.job is None:
+            if callable(result):
+                completion_pool.submit(result)
+            return
+        if isinstance(result, functools.partial):
+            JobRunner.finish(watch.job, next_stage=STAGE_COMPLETE, payload={'args': list(result.args)})
+        else:
+            if callable(result):
+                completion_pool.submit(result)
+            JobRunner.finish(watch.job)
+
+    @staticmethod
+    async def _poll_loop(asset_id: int):
+        """资产轮询协程，没有监控项时退出"""
+        wakeup = asyncio.Event()
+        _poller_wakeups[asset_id] = wakeup
+        logger.info(f"资产 {asset_id} 轮询协程已启动")
+
+        try:
+            while _engine_running:
+                try:
+                    with _watches_lock:
+                        watches = list(_watches.get(asset_id, {}).values())
+                        if not watches:
+                            _watches.pop(asset_id, None)
+                            _pollers.pop(asset_id, None)
+                            break
+                        wakeup.clear()
+
+                    now = time.time()
+                    due = [watch for watch in watches if watch.next_poll_at <= now]
+                    if due:
+                        await MonitorEngine._poll_once(asset_id, due)
+
+                    with _watches_lock:
+                        pending = [watch.next_poll_at for watch in _watches.get(asset_id, {}).values()]
+                    if pending:
+                        try:
+                            await asyncio.wait_for(wakeup.wait(), timeout=max(0.1, min(pending) - time.time()))
+                        except asyncio.TimeoutError:
+                            pass
+                except Exception as e:
+                    logger.error(f"资产 {asset_id} 轮询协程出错: {str(e)}", exc_info=True)
+                    await asyncio.sleep(5)
+        finally:
+            if _poller_wakeups.get(asset_id) is wakeup:
+                _poller_wakeups.pop(asset_id, None)
+
+        logger.info(f"资产 {asset_id} 轮询协程已退出")
+
+
+CancellationRegistry.add_listener(MonitorEngine.cancel)
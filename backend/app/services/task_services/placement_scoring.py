@@ -0,0 +1,90 @@
+from typing import Dict, Iterable, List, Optional, Set
+from ...models.task import Task
+from ...utils.logger import setup_logger
+from ..config_service import ConfigService
+import os
+
+logger = setup_logger('placement_scoring')
+
+# 训练配置中的底模路径参数
+MODEL_PATH_KEYS = ('flux_model_path', 'sd_model_path', 'sdxl_model_path')
+
+
+class PlacementScorer:
+    """
+    训练任务的数据本地性评分
+
+    对每个待训练任务估算放到各个资产上能节省的传输时间(秒)：
+    - 打标资产上已有打标结果，训练时无需再上传数据集，节省 数据集大小/placement_bandwidth_mbps 的时间
+    - placement_cached_models 中登记了资产已有的底模文件，命中任务底模时节省
+      placement_model_transfer_seconds 秒（默认为0，即不考虑底模）
+    节省时间乘以 placement_locality_weight 后交给分配规划器，与资产的预计等待时间比较。
+    """
+
+    @staticmethod
+    def dataset_bytes(path: Optional[str]) -> int:
+        """计算本地打标结果目录的大小"""
+        if not path or not os.path.isdir(path):
+            return 0
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    @staticmethod
+    def model_paths(task: Task, global_config: Dict) -> Set[str]:
+        """获取任务使用的底模路径，任务配置优先于全局配置"""
+        task_config = task.training_config or {}
+        paths = set()
+        for key in MODEL_PATH_KEYS:
+            path = task_config.get(key) or global_config.get(key)
+            if path:
+                paths.add(path)
+        return paths
+
+    @staticmethod
+    def score(tasks: List[Task], asset_ids: Iterable[int]) -> Dict[int, Dict[int, float]]:
+        """
+        计算任务在各资产上的本地性收益
+
+        Args:
+            tasks: 待训练任务列表
+            asset_ids: 候选资产ID（包括暂时没有空闲槽位的资产）
+
+        Returns:
+            {任务ID: {资产ID: 节省的时间(秒)}}，没有收益的资产不出现在结果中
+        """
+        asset_ids = set(asset_ids)
+        bandwidth_mbps = ConfigService.get_value('placement_bandwidth_mbps', 100) or 100
+        weight = float(ConfigService.get_value('placement_locality_weight', 1) or 0)
+        model_seconds = ConfigService.get_value('placement_model_transfer_seconds', 0) or 0
+        cached_models = ConfigService.get_value('placement_cached_models', {}) or {}
+        global_config = ConfigService.get_global_lora_training_config() if model_seconds and cached_models else {}
+
+        affinity: Dict[int, Dict[int, float]] = {}
+        if weight <= 0:
+            return affinity
+
+        for task in tasks:
+            gains: Dict[int, float] = {}
+
+            # 打标结果已在打标资产上
+            if task.marking_asset_id in asset_ids:
+                size = PlacementScorer.dataset_bytes(task.marked_images_path)
+                if size:
+                    gains[task.marking_asset_id] = size * 8 / (bandwidth_mbps * 1_000_000)
+
+            # 底模已在资产上
+            if model_seconds and cached_models:
+                paths = PlacementScorer.model_paths(task, global_config)
+                for asset_id in asset_ids:
+                    if paths & set(cached_models.get(str(asset_id), [])):
+                        gains[asset_id] = gains.get(asset_id, 0) + model_seconds
+
+            if gains:
+                affinity[task.id] = {asset_id: gain * weight for asset_id, gain in gains.items()}
+        return affinity
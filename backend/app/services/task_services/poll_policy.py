@@ -0,0 +1,103 @@
+from typing import Dict, List, Optional
+from ..config_service import ConfigService
+import time
+
+# 下次轮询等待时间占预计剩余时间的比例
+REMAINING_FRACTION = 0.25
+
+# 训练进度（loss曲线）的刷新间隔(秒)，两次刷新之间按经过的时间外推剩余时间
+TRAINING_PROGRESS_REFRESH = 300
+
+
+class AdaptivePollPolicy:
+    """
+    自适应轮询间隔
+
+    按预计剩余时间的固定比例计算下次轮询的等待时间，并限制在
+    adaptive_poll_floor ~ adaptive_poll_ceiling 之间：
+    任务离完成还远时拉长间隔，接近预计完成时间时缩短到下限，
+    超过预计完成时间后保持下限，无法估算时使用原固定间隔。
+    """
+
+    @staticmethod
+    def get_bounds() -> tuple:
+        """获取轮询间隔的上下限(秒)"""
+        floor = ConfigService.get_value('adaptive_poll_floor', 5)
+        ceiling = ConfigService.get_value('adaptive_poll_ceiling', 300)
+        return floor, max(floor, ceiling)
+
+    @staticmethod
+    def interval_for_remaining(remaining: Optional[float], fallback: float, floor: float, ceiling: float) -> float:
+        """
+        根据预计剩余时间计算轮询间隔
+
+        Args:
+            remaining: 预计剩余时间(秒)，无法估算时为None
+            fallback: 无法估算时使用的间隔
+            floor: 间隔下限
+            ceiling: 间隔上限
+
+        Returns:
+            轮询间隔(秒)
+        """
+        interval = fallback if remaining is None else max(0.0, remaining) * REMAINING_FRACTION
+        return min(ceiling, max(floor, interval))
+
+    @staticmethod
+    def estimate_training_remaining(series: Optional[List[Dict]], total_steps: float,
+                                    now: Optional[float] = None) -> Optional[float]:
+        """
+        根据loss曲线的步数增长速度估算训练剩余时间
+
+        Args:
+            series: loss曲线数据点，包含 step 和 wallTime
+            total_steps: 预计总步数
+            now: 当前时间戳，默认为 time.time()
+
+        Returns:
+            预计剩余时间(秒)，数据不足时返回None
+        """
+        points = [
+            point for point in (series or [])
+            if point.get('step') is not None and point.get('wallTime') is not None
+        ]
+        if len(points) < 2 or not total_steps:
+            return None
+
+        first, last = points[0], points[-1]
+        first_time = AdaptivePollPolicy._wall_seconds(first['wallTime'])
+        last_time = AdaptivePollPolicy._wall_seconds(last['wallTime'])
+        steps = last['step'] - first['step']
+        seconds = last_time - first_time
+        if steps <= 0 or seconds <= 0:
+            return None
+
+        step_rate = steps / seconds
+        remaining = (total_steps - last['step']) / step_rate
+        # 扣除最后一个数据点之后已经过去的时间
+        elapsed = (now or time.time()) - last_time
+        return max(0.0, remaining - max(0.0, elapsed))
+
+    @staticmethod
+    def _wall_seconds(wall_time: float) -> float:
+        """TensorBoard 返回的 wallTime 可能是秒或毫秒，统一转换为秒"""
+        return wall_time / 1000 if wall_time > 1e11 else wall_time
+
+    @staticmethod
+    def estimate_marking_remaining(image_count: int, started_at: float, now: Optional[float] = None) -> Optional[float]:
+        """
+        根据图片数量估算打标剩余时间
+
+        Args:
+            image_count: 待打标图片数量
+            started_at: 开始监控的时间戳
+            now: 当前时间戳，默认为 time.time()
+
+        Returns:
+            预计剩余时间(秒)，没有图片数量时返回None
+        """
+        if not image_count:
+            return None
+        seconds_per_image = ConfigService.get_value('mark_seconds_per_image', 2)
+        expected = image_count * seconds_per_image
+        return max(0.0, expected - ((now or time.time()) - started_at))
@@ -0,0 +1,320 @@
+from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from ...models.task import Task, TaskStatus
+from ...models.asset import Asset
+from ...database import get_db
+from ...utils.logger import setup_logger
+from ...utils.ssh import create_ssh_client_from_asset
+from ..config_service import ConfigService
+from ..async_engine import AsyncEngine
+from ..runtime_state_service import RuntimeStateService, STATE_PREFETCH
+from .staging_service import STAGING_QUEUED, STAGING_RUNNING, STAGING_DONE, STAGING_FAILED, FINISHED_RETENTION
+import threading
+import hashlib
+import time
+import os
+
+logger = setup_logger('prefetch_service')
+
+# 预取记录的暂存类型，与暂存记录一起展示
+KIND_PREFETCH = 'prefetch'
+
+# 预取被取消（预测的资产变化或交接给正式暂存）
+PREFETCH_CANCELLED = 'cancelled'
+
+# 生成的预览提示词文件名，不计入数据集签名
+SAMPLE_PROMPTS_NAME = 'sample_prompts.txt'
+
+# 预取失败后重试的间隔(秒)
+RETRY_DELAY = 300
+
+# 正式暂存接管预取时等待预取线程退出的最长时间(秒)
+HANDOVER_TIMEOUT = 300
+
+# 任务ID -> 预取记录
+_jobs: Dict[int, 'PrefetchJob'] = {}
+_jobs_lock = threading.Lock()
+
+# 预取线程池，首次使用时按 training_prefetch_workers 配置创建
+_prefetch_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+class PrefetchCancelled(Exception):
+    """预取被取消"""
+    pass
+
+
+@dataclass
+class PrefetchJob:
+    """单个训练任务的预取记录"""
+    task_id: int
+    asset_id: int
+    kind: str = KIND_PREFETCH
+    state: str = STAGING_QUEUED
+    queued_at: float = 0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    files_done: int = 0
+    files_total: int = 0
+    bytes_done: int = 0
+    bytes_total: int = 0
+    error: Optional[str] = None
+    remote_dir: Optional[str] = None             # 远程训练数据目录
+    signature: Optional[Tuple] = None            # 上传时的数据集签名
+    prompts_file: Optional[str] = None           # 已上传的远程提示词文件
+    prompts_hash: Optional[str] = None           # 已上传的提示词文件内容哈希
+    assigned: bool = False                       # 调度器已把任务分配到该资产，等待正式暂存接管
+    stop: threading.Event = field(default_factory=threading.Event, repr=False)
+    finished: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def to_dict(self) -> Dict:
+        data = {
+            key: getattr(self, key) for key in (
+                'task_id', 'asset_id', 'kind', 'state', 'queued_at', 'started_at', 'finished_at',
+                'files_done', 'files_total', 'bytes_done', 'bytes_total', 'error', 'remote_dir'
+            )
+        }
+        data['percentage'] = round(self.bytes_done * 100 / self.bytes_total, 1) if self.bytes_total else (
+            100 if self.state == STAGING_DONE else 0
+        )
+        return data
+
+
+class PrefetchService:
+    """
+    训练数据预取服务
+
+    打标完成的任务在等待训练资产期间，调度器预测其最可能分配到的远程训练资产，
+    由本服务提前把打标结果和预览提示词上传过去，传输与排队等待重叠进行。
+    预测的资产变化时取消当前预取并改为上传到新资产；任务真正分配后，
+    正式暂存通过 claim 接管预取结果：同一资产上无需清空目录，只补传缺失或变化的文件。
+
+    预取使用独立的线程池（training_prefetch_workers，0表示关闭），不占用正式暂存的线程。
+    """
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """是否开启训练数据预取"""
+        return (ConfigService.get_value('training_prefetch_workers', 2) or 0) > 0
+
+    @staticmethod
+    def _get_pool() -> ThreadPoolExecutor:
+        global _prefetch_pool
+        with _pool_lock:
+            if _prefetch_pool is None:
+                _prefetch_pool = ThreadPoolExecutor(
+                    max_workers=max(1, ConfigService.get_value('training_prefetch_workers', 2) or 1),
+                    thread_name_prefix="Prefetch"
+                )
+            return _prefetch_pool
+
+    @staticmethod
+    def dataset_signature(path: Optional[str]) -> Tuple:
+        """
+        计算打标结果目录的签名（根目录下文件的名称和大小）
+
+        与 upload_directory 的非递归上传及按大小判断是否需要更新的规则一致
+        """
+        if not path or not os.path.isdir(path):
+            return ()
+        entries = []
+        for name in os.listdir(path):
+            file_path = os.path.join(path, name)
+            if name != SAMPLE_PROMPTS_NAME and os.path.isfile(file_path):
+                entries.append((name, os.path.getsize(file_path)))
+        return tuple(sorted(entries))
+
+    @staticmethod
+    def file_hash(path: Optional[str]) -> Optional[str]:
+        """计算文件内容的MD5"""
+        if not path or not os.path.isfile(path):
+            return None
+        with open(path, 'rb') as f:
+            return hashlib.md5(f.read()).hexdigest()
+
+    @staticmethod
+    def update(predictions: Dict[int, int], assigned: Dict[int, int]):
+        """
+        按本轮调度结果调整预取
+
+        Args:
+            predictions: 仍在等待的任务预测分配到的远程资产 {任务ID: 资产ID}
+            assigned: 本轮已分配训练资产的任务 {任务ID: 资产ID}
+        """
+        if not PrefetchService.is_enabled():
+            predictions = {}
+
+        now = time.time()
+        started = []
+        with _jobs_lock:
+            for task_id, job in list(_jobs.items()):
+                if task_id in assigned:
+                    if assigned[task_id] == job.asset_id:
+                        job.assigned = True
+                    else:
+                        logger.info(f"训练任务 {task_id} 分配到资产 {assigned[task_id]}，取消到资产 {job.asset_id} 的预取")
+                        PrefetchService._cancel(task_id)
+                elif job.assigned:
+                    # 等待正式暂存接管，长时间未接管的记录直接清理
+                    if now - job.queued_at > FINISHED_RETENTION:
+                        PrefetchService._cancel(task_id)
+                elif predictions.get(task_id) != job.asset_id:
+                    target = predictions.get(task_id)
+                    if target:
+                        logger.info(f"训练任务 {task_id} 预测资产由 {job.asset_id} 变为 {target}，改为预取到新资产")
+                    else:
+                        logger.info(f"训练任务 {task_id} 不再等待训练资产，取消预取")
+                    PrefetchService._cancel(task_id)
+                elif job.state == STAGING_FAILED and now - (job.finished_at or now) > RETRY_DELAY:
+                    del _jobs[task_id]
+
+            for task_id, asset_id in predictions.items():
+                if task_id in _jobs or task_id in assigned:
+                    continue
+                job = PrefetchJob(task_id=task_id, asset_id=asset_id, queued_at=now)
+                _jobs[task_id] = job
+                started.append(job)
+
+        for job in started:
+            AsyncEngine.submit(PrefetchService._run(job))
+            logger.info(f"训练任务 {job.task_id} 开始预取训练数据到资产 {job.asset_id}")
+
+    @staticmethod
+    def _cancel(task_id: int):
+        """取消并移除预取记录（调用方需持有锁）"""
+        job = _jobs.pop(task_id, None)
+        if job:
+            job.stop.set()
+
+    @staticmethod
+    def claim(task_id: int, asset_id: int, remote_dir: str, signature: Tuple) -> Optional[PrefetchJob]:
+        """
+        正式暂存接管任务的预取结果
+
+        预取仍在进行时先停止并等待其退出，由正式暂存补传剩余文件。
+
+        Args:
+            task_id: 任务ID
+            asset_id: 实际分配的训练资产ID
+            remote_dir: 远程训练数据目录
+            signature: 当前的数据集签名
+
+        Returns:
+            可复用的预取记录，资产、目录或数据集不一致时返回None
+        """
+        with _jobs_lock:
+            job = _jobs.pop(task_id, None)
+        if not job:
+            return None
+
+        job.stop.set()
+        if job.asset_id != asset_id:
+            return None
+        if not job.finished.wait(HANDOVER_TIMEOUT):
+            logger.warning(f"训练任务 {task_id} 等待预取退出超时，放弃预取结果")
+            return None
+        if job.state == STAGING_FAILED or job.remote_dir != remote_dir or job.signature != signature:
+            return None
+        return job
+
+    @staticmethod
+    async def _run(job: PrefetchJob):
+        """在预取线程池中执行预取并记录结果"""
+        try:
+            await AsyncEngine.run_in_executor(PrefetchService._get_pool(), PrefetchService._execute, job)
+            job.state = PREFETCH_CANCELLED if job.stop.is_set() else STAGING_DONE
+            if job.state == STAGING_DONE:
+                logger.info(f"训练任务 {job.task_id} 训练数据已预取到资产 {job.asset_id}")
+        except PrefetchCancelled:
+            job.state = PREFETCH_CANCELLED
+            logger.info(f"训练任务 {job.task_id} 到资产 {job.asset_id} 的预取已取消")
+        except Exception as e:
+            logger.warning(f"训练任务 {job.task_id} 预取到资产 {job.asset_id} 失败: {str(e)}")
+            job.state = STAGING_FAILED
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            job.finished.set()
+
+    @staticmethod
+    def _execute(job: PrefetchJob):
+        """上传打标结果和预览提示词到预测的训练资产"""
+        # 避免与训练服务循环导入
+        from .training_service import TrainingService
+
+        if job.stop.is_set():
+            raise PrefetchCancelled()
+        job.state = STAGING_RUNNING
+        job.started_at = time.time()
+
+        with get_db() as db:
+            task = db.query(Task).filter(Task.id == job.task_id).first()
+            asset = db.query(Asset).filter(Asset.id == job.asset_id).first()
+            if not task or task.status != TaskStatus.TRAINING:
+                raise PrefetchCancelled()
+            if not asset:
+                raise ValueError("资产不存在")
+            remote_path = (task.mark_config or {}).get('remote_output_dir')
+            input_dir = task.marked_images_path
+            marking_asset = task.marking_asset if task.marking_asset_id != asset.id else None
+            if marking_asset:
+                db.expunge(marking_asset)
+            db.expunge(asset)
+        if not remote_path:
+            raise ValueError("任务没有远程打标输出目录")
+
+        training_config = ConfigService.get_task_training_config(job.task_id)
+        repeat_num = training_config.get('repeat_num', 10)
+        remote_path = remote_path.replace('\\', '/')
+        remote_dir = os.path.join(remote_path, f"{repeat_num}_rick").replace('\\', '/')
+        job.remote_dir = remote_dir
+        job.signature = PrefetchService.dataset_signature(input_dir)
+
+        ssh_client = create_ssh_client_from_asset(asset)
+        success, message = ssh_client.mkdir(remote_dir)
+        if not success:
+            raise ValueError(f"创建远程训练数据目录失败: {message}")
+
+        def _report(progress: Dict):
+            job.files_done = progress.get('files_done', 0)
+            job.files_total = progress.get('files_total', 0)
+            job.bytes_done = progress.get('bytes_done', 0)
+            job.bytes_total = progress.get('bytes_total', 0)
+            if job.stop.is_set():
+                raise PrefetchCancelled()
+
+        success, message = TrainingService._upload_dataset(
+            ssh_client, input_dir, remote_dir, progress_callback=_report,
+            peer=TrainingService._marking_peer(marking_asset, remote_path, ssh_client)
+        )
+        if job.stop.is_set():
+            raise PrefetchCancelled()
+        if not success:
+            raise ValueError(f"上传打标结果失败: {message}")
+
+        # 预览提示词
+        if training_config.get('generate_preview'):
+            prompts_file = TrainingService._generate_sample_prompts(job.task_id, training_config)
+            if prompts_file:
+                remote_prompts_file = os.path.join(remote_path, SAMPLE_PROMPTS_NAME).replace('\\', '/')
+                success, _ = ssh_client.upload_file(local_path=prompts_file, remote_path=remote_prompts_file)
+                if success:
+                    job.prompts_file = remote_prompts_file
+                    job.prompts_hash = PrefetchService.file_hash(prompts_file)
+
+    @staticmethod
+    def get_progress(task_id: Optional[int] = None) -> List[Dict]:
+        """
+        获取预取进度，调度器运行在其他进程时读取其发布的快照
+
+        Args:
+            task_id: 任务ID，为空时返回所有预取记录
+        """
+        if RuntimeStateService.is_local():
+            with _jobs_lock:
+                jobs = [job.to_dict() for job in _jobs.values()]
+        else:
+            jobs = RuntimeStateService.read(STATE_PREFETCH, [])
+        return [job for job in jobs if task_id is None or job['task_id'] == task_id]
@@ -0,0 +1,54 @@
+from typing import Optional, Set
+from ...utils.logger import setup_logger
+from ..leader_election import LeaderElection
+import threading
+
+logger = setup_logger('scheduler_events')
+
+# 调度器唤醒事件，任务状态变更或资产容量释放时触发
+_wakeup_event = threading.Event()
+
+# 自上次调度以来累计的唤醒原因
+_pending_reasons: Set[str] = set()
+_reasons_lock = threading.Lock()
+
+# 唤醒原因
+REASON_TASK_SUBMITTED = 'task_submitted'
+REASON_TASK_TRAINING = 'task_training'
+REASON_CAPACITY_RELEASED = 'capacity_released'
+REASON_ASSET_AVAILABLE = 'asset_available'
+REASON_REMOTE_WAKEUP = 'remote_wakeup'
+
+
+def notify_scheduler(reason: str):
+    """
+    通知调度器有新的可调度工作
+    应在数据库事务提交之后调用，保证调度器被唤醒时能读取到最新状态；
+    本进程不是调度器领导者时，唤醒请求经租约行转发给领导者进程
+
+    Args:
+        reason: 唤醒原因，仅用于日志
+    """
+    with _reasons_lock:
+        _pending_reasons.add(reason)
+    _wakeup_event.set()
+    LeaderElection.request_wakeup()
+
+
+def wait_for_wakeup(timeout: Optional[float] = None) -> Set[str]:
+    """
+    阻塞等待调度器唤醒信号
+
+    Args:
+        timeout: 兜底超时时间(秒)，超时后返回空集合
+
+    Returns:
+        期间累计的唤醒原因集合
+    """
+    _wakeup_event.wait(timeout=timeout)
+    # 先清除事件再取出原因，调度过程中到达的信号会触发下一轮调度
+    _wakeup_event.clear()
+    with _reasons_lock:
+        reasons = set(_pending_reasons)
+        _pending_reasons.clear()
+    return reasons
@@ -3,28 +3,55 @@ from datetime import datetime
 from sqlalchemy.orm import Session
 from ...models.task import Task, TaskStatus
 from ...models.asset import Asset
+from ...models.job import Job
 from ...database import get_db
 from ...utils.logger import setup_logger
 import threading
 import traceback
 from .marking_service import MarkingService
 from .training_service import TrainingService
+from ..asset_health_service import AssetHealthService
+from ..config_service import ConfigService
+from ..leader_election import LeaderElection, HOLDER_ID
+from ..runtime_state_service import (
+    RuntimeStateService, STATE_STAGING, STATE_PREFETCH, STATE_MONITOR_PROGRESS, STATE_ASSET_HEALTH
+)
+from .scheduler_events import wait_for_wakeup, notify_scheduler, REASON_REMOTE_WAKEUP, REASON_CAPACITY_RELEASED
+from .assignment_planner import AssignmentPlanner, AssetCapacity, Assignment
+from .asset_selection_policy import get_selection_policy
+from .slot_service import SlotService, CAPABILITY_MARKING, CAPABILITY_TRAINING
+from .monitor_engine import MonitorEngine, WATCH_TRAINING, completion_pool
+from .staging_service import StagingService
+from .placement_scoring import PlacementScorer
+from .prefetch_service import PrefetchService
+from .fair_share_queue import FairShareQueue
+from .duration_estimator import DurationEstimator
+from .eta_service import EtaService
+from .cancellation import CancellationRegistry, TaskCancelled
+from .job_queue import JobQueue, JobRunner, RetryableError, STAGE_STAGING, STAGE_MONITOR, STAGE_COMPLETE
+import functools
 import time
 import os
-from concurrent.futures import ThreadPoolExecutor
 
 logger = setup_logger('scheduler_service')
 scheduler_lock = threading.Lock()
 scheduler_thread = None
 scheduler_running = False
 
-# 添加线程池用于监控任务
-monitor_pool = ThreadPoolExecutor(max_workers=5, thread_name_prefix="MonitorWorker")
-
 # 添加一个任务处理中的标记集合
 _processing_task_ids = set()
 _processing_lock = threading.Lock()
 
+# 上一轮调度中等待资产的任务ID，用于避免重复写等待日志
+_waiting_marking_ids = set()
+_waiting_training_ids = set()
+
+# 完成处理作业的执行函数，参数由监控作业结束时写入作业
+COMPLETION_HANDLERS = {
+    CAPABILITY_MARKING: MarkingService._complete_marking,
+    CAPABILITY_TRAINING: TrainingService._complete_training,
+}
+
 class SchedulerService:
 
     @staticmethod
@@ -32,6 +59,9 @@ class SchedulerService:
         """
         获取待处理的任务列表（提交状态和训练状态的任务）
         
+        按优先级、用户公平分配和等待时间老化排序，见 FairShareQueue；
+        training_queue_mode 为 sjf 时训练任务按历史估算的训练时长最短优先
+        
         Returns:
             (提交状态的任务列表, 训练状态的任务列表)
         """
@@ -48,197 +78,531 @@ class SchedulerService:
                 Task.training_asset_id.is_(None)  # 未分配训练资产
             ).order_by(Task.updated_at.asc()).all()
             
+            submitted_tasks = FairShareQueue.order_tasks(db, submitted_tasks, CAPABILITY_MARKING, 'created_at')
+            training_tasks = FairShareQueue.order_tasks(
+                db, training_tasks, CAPABILITY_TRAINING, 'updated_at',
+                SchedulerService._training_costs(db, training_tasks)
+            )
             return submitted_tasks, training_tasks
     
     @staticmethod
-    def process_task(task: Task):
+    def _training_costs(db: Session, tasks: List[Task]) -> Optional[Dict[int, float]]:
+        """最短作业优先模式下估算训练任务的时长，其他模式返回None"""
+        if len(tasks) < 2 or ConfigService.get_value('training_queue_mode', 'fair_share') != 'sjf':
+            return None
+        try:
+            return DurationEstimator.estimate_tasks(db, tasks)
+        except Exception as e:
+            logger.warning(f"估算训练时长失败，按等待时间排序: {str(e)}")
+            return None
+    
+    @staticmethod
+    def get_queue() -> Dict[str, List[Dict]]:
+        """
+        获取等待资产的任务队列（按调度顺序）
+        
+        Returns:
+            {'marking': [...], 'training': [...]}，每项包含位置、优先级、有效优先级和所属用户
+        """
+        submitted_tasks, training_tasks = SchedulerService.get_pending_tasks()
+        aging_seconds = ConfigService.get_value('priority_aging_seconds', 600)
+        now = datetime.now()
+        with get_db() as db:
+            training_costs = DurationEstimator.estimate_tasks(db, training_tasks)
+        
+        def _describe(tasks: List[Task], since_attr: str, costs: Optional[Dict[int, float]] = None) -> List[Dict]:
+            entries = FairShareQueue.to_entries(tasks, since_attr, costs)
+            return [
+                {
+                    'position': position,
+                    'task_id': entry.task_id,
+                    'name': task.name,
+                    'priority': entry.priority,
+                    'effective_priority': FairShareQueue.effective_priority(entry, now, aging_seconds),
+                    'owner': entry.owner,
+                    'waiting_since': entry.since.isoformat() if entry.since else None,
+                    'estimated_duration': round(entry.cost) if entry.cost is not None else None
+                }
+                for position, (task, entry) in enumerate(zip(tasks, entries), start=1)
+            ]
+        
+        return {
+            'marking': _describe(submitted_tasks, 'created_at'),
+            'training': _describe(training_tasks, 'updated_at', training_costs)
+        }
+    
+    @staticmethod
+    def _mark_waiting(db: Session, task_ids: List[int], waiting_ids: set, wait_message: str):
         """
-        根据任务状态处理单个任务
+        为本轮未分配到资产的任务记录等待日志
+        只为新进入等待的任务写日志，避免每次调度都扫描所有等待任务的日志
         
         Args:
-            task: 任务对象
+            db: 数据库会话
+            task_ids: 本轮未分配的任务ID列表
+            waiting_ids: 上一轮已处于等待的任务ID集合，会被原地更新
+            wait_message: 等待日志消息
         """
-        try:
-            if task.status == TaskStatus.SUBMITTED:
-                # 处理已提交的打标任务
-                SchedulerService._process_submitted_task(task)
-            elif task.status == TaskStatus.TRAINING:
-                # 处理训练任务
-                SchedulerService._process_training_task(task)
-        except Exception as e:
-            logger.error(f"处理任务 {task.id} 失败: {str(e)}")
-            with get_db() as db:
-                task = db.query(Task).filter(Task.id == task.id).first()
-                if task:
-                    task.update_status(TaskStatus.ERROR, f"任务调度失败: {str(e)}", db=db)
+        current = set(task_ids)
+        new_waiting = current - waiting_ids
+        waiting_ids.clear()
+        waiting_ids.update(current)
+        
+        if not new_waiting:
+            return
+            
+        tasks = db.query(Task).filter(Task.id.in_(new_waiting)).all()
+        for task in tasks:
+            # 检查最近的日志中是否已有等待资源的消息
+            recent_logs = task.get_all_logs(limit=5)
+            if not any(log.get('message') == wait_message for log in recent_logs):
+                task.add_log(wait_message, db=db)
+    
+    @staticmethod
+    def _build_capacities(assets: List[Asset], capability: str, full: bool = False) -> List[AssetCapacity]:
+        """
+        构建资产容量快照，附带缓存的遥测数据和加权轮询权重
+        
+        Args:
+            assets: 可用资产列表
+            capability: 槽位类型 marking / training
+            full: 按并发上限构建（假设资产全部空闲），用于预测等待任务的去向
+            
+        Returns:
+            资产容量快照列表
+        """
+        weights = ConfigService.get_value('asset_selection_weights', {}) or {}
+        capacities = []
+        for asset in assets:
+            telemetry = AssetHealthService.get_telemetry(asset.id)
+            weight = weights.get(str(asset.id))
+            if weight is None:
+                weight = (telemetry or {}).get('gpu_memory_total') or 1
+            capacities.append(AssetCapacity(
+                asset_id=asset.id,
+                remaining=SlotService.get_limit(asset, capability) if full else SlotService.get_remaining(asset, capability),
+                limit=SlotService.get_limit(asset, capability),
+                telemetry=telemetry,
+                weight=float(weight)
+            ))
+        return capacities
+    
+    @staticmethod
+    def _build_training_locality(tasks: List[Task], available_ids: List[int]) -> Tuple[Dict, Dict]:
+        """
+        计算训练任务的数据本地性收益，以及已满的本地资产的预计等待时间
+        
+        Args:
+            tasks: 待分配的训练任务
+            available_ids: 有空闲训练槽位的资产ID
+            
+        Returns:
+            (本地性收益, 已满资产的预计等待时间)
+        """
+        # 候选资产包括训练能力可用但暂时没有空闲槽位的资产
+        candidate_ids = set(available_ids) | set(AssetHealthService.get_available_asset_ids('lora_training'))
+        affinity = PlacementScorer.score(tasks, candidate_ids)
+        
+        waits = {}
+        busy_ids = {asset_id for gains in affinity.values() for asset_id in gains} - set(available_ids)
+        for asset_id in busy_ids:
+            wait = MonitorEngine.estimate_wait(asset_id, WATCH_TRAINING)
+            if wait is not None:
+                waits[asset_id] = wait
+        return affinity, waits
+    
+    @staticmethod
+    def _predict_training_placement(db: Session, tasks: List[Task], waiting_ids: List[int],
+                                    policy, affinity: Dict) -> Dict[int, int]:
+        """
+        预测等待中的训练任务最可能分配到的远程资产，用于预取训练数据
+        
+        假设训练资产全部空闲，按与正式分配相同的策略和本地性收益规划一次，
+        排在并发上限之外的任务近期不会开始训练，不做预测。
+        
+        Args:
+            db: 数据库会话
+            tasks: 待分配的训练任务
+            waiting_ids: 本轮未分配到资产的任务ID
+            policy: 资产选择策略
+            affinity: 本地性收益
+            
+        Returns:
+            {任务ID: 资产ID}，只包含需要传输数据的远程资产
+        """
+        if not waiting_ids or not PrefetchService.is_enabled():
+            return {}
+        
+        asset_ids = AssetHealthService.get_available_asset_ids('lora_training')
+        if not asset_ids:
+            return {}
+        assets = {asset.id: asset for asset in db.query(Asset).filter(
+            Asset.id.in_(asset_ids),
+            Asset.enabled == True
+        ).all()}
+        capacities = SchedulerService._build_capacities(list(assets.values()), CAPABILITY_TRAINING, full=True)
+        planned, _ = AssignmentPlanner.plan(waiting_ids, capacities, policy, affinity)
+        
+        tasks_by_id = {task.id: task for task in tasks}
+        predictions = {}
+        for assignment in planned:
+            asset = assets[assignment.asset_id]
+            task = tasks_by_id.get(assignment.task_id)
+            # 本地资产和打标资产上已有数据，无需预取
+            if task and not asset.is_local and task.marking_asset_id != asset.id:
+                predictions[task.id] = asset.id
+        return predictions
+    
+    @staticmethod
+    def _commit_marking_assignments(db: Session, assignments: List[Assignment]) -> List[Assignment]:
+        """
+        在一个事务中提交打标任务的分配结果
+        
+        Args:
+            db: 数据库会话
+            assignments: 规划器给出的分配结果
+            
+        Returns:
+            实际提交的分配结果（快照之后状态发生变化的任务会被跳过）
+        """
+        if not assignments:
+            return []
+            
+        tasks = {task.id: task for task in db.query(Task).filter(
+            Task.id.in_([a.task_id for a in assignments])
+        ).all()}
+        assets = {asset.id: asset for asset in db.query(Asset).filter(
+            Asset.id.in_({a.asset_id for a in assignments})
+        ).all()}
+        
+        committed = []
+        for assignment in assignments:
+            task = tasks.get(assignment.task_id)
+            asset = assets.get(assignment.asset_id)
+            if not task or not asset or task.status != TaskStatus.SUBMITTED or task.marking_asset_id:
+                continue
+            # 原子占用资产槽位，其他调度器已占满时跳过
+            if not SlotService.claim(db, asset, CAPABILITY_MARKING, task.id):
+                continue
+            task.marking_asset_id = asset.id
+            # 清空上一阶段的请求ID，暂存作业重新投递时据此判断是否已经提交
+            task.prompt_id = None
+            CancellationRegistry.reset(task.id)
+            # 暂存作业与分配结果一起提交，进程崩溃后由作业队列重新投递
+            JobQueue.enqueue(db, STAGE_STAGING, CAPABILITY_MARKING, task.id, asset.id)
+            committed.append(assignment)
+            
+        db.commit()
+        return committed
     
     @staticmethod
-    def _process_submitted_task(task: Task):
+    def _commit_training_assignments(db: Session, assignments: List[Assignment]) -> List[Assignment]:
+        """
+        在一个事务中提交训练任务的分配结果
+        
+        Args:
+            db: 数据库会话
+            assignments: 规划器给出的分配结果
+            
+        Returns:
+            实际提交的分配结果（快照之后状态发生变化的任务会被跳过）
+        """
+        if not assignments:
+            return []
+            
+        tasks = {task.id: task for task in db.query(Task).filter(
+            Task.id.in_([a.task_id for a in assignments])
+        ).all()}
+        assets = {asset.id: asset for asset in db.query(Asset).filter(
+            Asset.id.in_({a.asset_id for a in assignments})
+        ).all()}
+        
+        committed = []
+        for assignment in assignments:
+            task = tasks.get(assignment.task_id)
+            asset = assets.get(assignment.asset_id)
+            if not task or not asset or task.status != TaskStatus.TRAINING or task.training_asset_id:
+                continue
+            # 原子占用资产槽位，其他调度器已占满时跳过
+            if not SlotService.claim(db, asset, CAPABILITY_TRAINING, task.id):
+                continue
+            task.training_asset_id = asset.id
+            # 清空上一阶段的请求ID，暂存作业重新投递时据此判断是否已经提交
+            task.prompt_id = None
+            CancellationRegistry.reset(task.id)
+            # 暂存作业与分配结果一起提交，进程崩溃后由作业队列重新投递
+            JobQueue.enqueue(db, STAGE_STAGING, CAPABILITY_TRAINING, task.id, asset.id)
+            committed.append(assignment)
+            
+        db.commit()
+        return committed
+    
+    @staticmethod
+    def _run_staging_job(job: Job):
+        """暂存作业：放入暂存线程池上传数据并提交请求"""
+        if job.capability == CAPABILITY_MARKING:
+            dispatch = SchedulerService._dispatch_marking
+        else:
+            dispatch = SchedulerService._dispatch_training
+        if not StagingService.enqueue(job.capability, job.task_id, job.asset_id, functools.partial(dispatch, job)):
+            # 本进程已在暂存该任务，以正在进行的暂存为准
+            JobRunner.finish(job)
+
+    @staticmethod
+    def _check_staging_job(job: Job) -> Tuple[bool, Optional[str]]:
+        """
+        检查暂存作业对应的任务当前状态，重新投递的作业不会重复提交请求
+        
+        Returns:
+            (是否仍需处理, 任务已提交时的prompt_id或训练任务ID)
+        """
+        if job.capability == CAPABILITY_MARKING:
+            waiting, running, asset_attr = TaskStatus.SUBMITTED, TaskStatus.MARKING, 'marking_asset_id'
+        else:
+            waiting, running, asset_attr = TaskStatus.TRAINING, TaskStatus.TRAINING, 'training_asset_id'
+        with get_db() as db:
+            task = db.query(Task).filter(Task.id == job.task_id).first()
+            if not task or task.status not in (waiting, running) or getattr(task, asset_attr) != job.asset_id:
+                return False, None
+            # 分配资产时已清空prompt_id，有值说明上一次投递已经提交
+            if task.status == running and task.prompt_id:
+                return True, task.prompt_id
+            return True, None
+
+    @staticmethod
+    def _dispatch_marking(job: Job):
         """
-        处理已提交的打标任务
+        暂存并提交已分配资产的打标任务，然后创建监控作业，在暂存线程池中执行
         
         Args:
-            task: 任务对象
+            job: 暂存作业
         """
+        task_id, asset_id = job.task_id, job.asset_id
         # 检查任务是否已经在处理中
         with _processing_lock:
-            task_key = f"marking_{task.id}"
+            task_key = f"marking_{task_id}"
             if task_key in _processing_task_ids:
-                logger.info(f"标记任务 {task.id} 已在处理中，跳过本次处理")
+                logger.info(f"标记任务 {task_id} 已在处理中，跳过本次处理")
                 return
             # 标记任务为处理中
             _processing_task_ids.add(task_key)
         
         try:
-            with get_db() as db:
-                task = db.query(Task).filter(Task.id == task.id).first()
-                if not task or task.status != TaskStatus.SUBMITTED:
-                    return
-                
-                # 获取可用的标记资产
-                available_assets = MarkingService.get_available_marking_assets()
-                
-                if not available_assets:
-                    logger.info(f"没有可用于标记的资产，任务 {task.id} 将继续等待")
-                    
-                    # 检查最近的日志，避免重复添加相同的等待消息
-                    recent_logs = task.get_all_logs(limit=5)
-                    wait_message = "任务正在等待可用标记资产中..."
-                    
-                    # 检查最近的日志中是否已有等待资源的消息
-                    if not any(log.get('message') == wait_message for log in recent_logs):
-                        # 添加任务日志，记录任务正在等待可用标记资产
-                        task.add_log(wait_message, db=db)
-                    
-                    return
-                    
-                # 获取第一个可用资产
-                asset = available_assets[0]
-                
-                # 分配资产并更新任务
-                task.marking_asset_id = asset.id
-                # 更新资产的任务计数
-                asset.marking_tasks_count += 1
-                db.add(asset)
-                db.commit()
-                
-                # 启动新线程执行标记任务处理
-                logger.info(f"为标记任务 {task.id} 分配资产 {asset.id} ({asset.name})")
-                
+            pending, prompt_id = SchedulerService._check_staging_job(job)
+            if not pending:
+                logger.info(f"标记任务 {task_id} 状态已变化，跳过暂存作业 {job.id}")
+                JobRunner.finish(job)
+                return
+            if prompt_id:
+                logger.info(f"标记任务 {task_id} 已提交，prompt_id: {prompt_id}，跳过重复提交")
+            else:
+                logger.info(f"为标记任务 {task_id} 分配资产 {asset_id}")
+                # 执行标记处理
+                start_time = time.time()
                 try:
-                    # 执行标记处理
-                    start_time = time.time()
-                    prompt_id = MarkingService._process_marking(task.id, asset.id)
-                    end_time = time.time()
-                    logger.info(f"标记任务 {task.id} 提交完成，耗时: {end_time - start_time:.2f}秒")
-                    
-                    # 如果获取到prompt_id，启动监控
-                    if prompt_id:
-                        logger.info(f"标记任务 {task.id} 获取到prompt_id: {prompt_id}，启动监控")
-                        monitor_pool.submit(
-                            MarkingService._monitor_mark_status,
-                            task.id,
-                            asset.id,
-                            prompt_id
-                        )
+                    prompt_id = MarkingService._process_marking(task_id, asset_id)
+                except TaskCancelled:
+                    JobRunner.finish(job)
+                    raise
                 except Exception as e:
-                    logger.error(f"标记任务 {task.id} 处理或启动监控失败: {str(e)}", exc_info=True)
+                    # 打标处理失败时任务已被标记为错误，不再重试
+                    JobRunner.finish(job, error=str(e))
+                    raise
+                end_time = time.time()
+                logger.info(f"标记任务 {task_id} 提交完成，耗时: {end_time - start_time:.2f}秒")
+            
+            # 如果获取到prompt_id，创建监控作业
+            if prompt_id:
+                logger.info(f"标记任务 {task_id} 获取到prompt_id: {prompt_id}，启动监控")
+                JobRunner.finish(job, next_stage=STAGE_MONITOR, payload={'remote_id': prompt_id})
+            else:
+                JobRunner.finish(job)
         finally:
             # 处理完成后，移除任务处理中的标记
             with _processing_lock:
                 _processing_task_ids.discard(task_key)
     
-    
     @staticmethod
-    def _process_training_task(task: Task):
+    def _dispatch_training(job: Job):
         """
-        处理训练任务
+        暂存并提交已分配资产的训练任务，然后创建监控作业，在暂存线程池中执行
         
         Args:
-            task: 任务对象
+            job: 暂存作业
         """
+        task_id, asset_id = job.task_id, job.asset_id
         # 检查任务是否已经在处理中
         with _processing_lock:
-            task_key = f"training_{task.id}"
+            task_key = f"training_{task_id}"
             if task_key in _processing_task_ids:
-                logger.info(f"任务 {task.id} 已在处理中，跳过本次处理")
+                logger.info(f"任务 {task_id} 已在处理中，跳过本次处理")
                 return
             # 标记任务为处理中
             _processing_task_ids.add(task_key)
-        logger.info(f"开始处理训练任务 {task.id}》》》》》")
+        
         try:
-            with get_db() as db:
-                task = db.query(Task).filter(Task.id == task.id).first()
-                if not task or task.status != TaskStatus.TRAINING or task.training_asset_id:
-                    return
-                
-                # 获取可用的训练资产
-                available_assets = TrainingService.get_available_training_assets()
-                
-                if not available_assets:
-                    logger.info(f"没有可用于训练的资产，任务 {task.id} 将继续等待")
-                    
-                    # 检查最近的日志，避免重复添加相同的等待消息
-                    recent_logs = task.get_all_logs(limit=5)
-                    wait_message = "任务正在等待可用训练资产中..."
-                    
-                    # 检查最近的日志中是否已有等待资源的消息
-                    if not any(log.get('message') == wait_message for log in recent_logs):
-                        # 添加任务日志，记录任务正在等待可用训练资产
-                        task.add_log(wait_message, db=db)
-                    return
-                    
+            pending, training_task_id = SchedulerService._check_staging_job(job)
+            if not pending:
+                logger.info(f"训练任务 {task_id} 状态已变化，跳过暂存作业 {job.id}")
+                JobRunner.finish(job)
+                return
+            if training_task_id:
+                logger.info(f"训练任务 {task_id} 已提交，training_task_id: {training_task_id}，跳过重复提交")
+            else:
+                logger.info(f"为训练任务 {task_id} 分配资产 {asset_id}")
+                # 执行训练处理并记录耗时
+                start_time = time.time()
                 try:
-                    # 获取第一个可用资产
-                    asset = available_assets[0]
-                    
-                    # 分配资产并更新任务
-                    logger.info(f"为训练任务 {task.id} 分配资产 {asset.id} ({asset.name})")
-                    task.training_asset_id = asset.id
-                    # 更新资产的任务计数
-                    asset.training_tasks_count += 1
-                    db.add(asset)
-                    db.commit()
-                    
-                    # 执行训练处理并记录耗时
-                    start_time = time.time()
-                    training_task_id = TrainingService._process_training(task.id, asset.id)
-                    end_time = time.time()
-                    logger.info(f"训练任务 {task.id} 提交完成，耗时: {end_time - start_time:.2f}秒")
-                    
-                    # 如果获取到training_task_id，启动监控
-                    if training_task_id:
-                        logger.info(f"训练任务 {task.id} 获取到training_task_id: {training_task_id}，启动监控")
-                        monitor_pool.submit(
-                            TrainingService._monitor_training_status,
-                            task.id,
-                            asset.id,
-                            training_task_id
-                        )
+                    training_task_id = TrainingService._process_training(task_id, asset_id)
+                except TaskCancelled:
+                    JobRunner.finish(job)
+                    raise
                 except Exception as e:
-                    logger.error(f"训练任务 {task.id} 处理或启动监控失败: {str(e)}", exc_info=True)
+                    # 训练处理失败时任务已被标记为错误，不再重试
+                    JobRunner.finish(job, error=str(e))
+                    raise
+                end_time = time.time()
+                logger.info(f"训练任务 {task_id} 提交完成，耗时: {end_time - start_time:.2f}秒")
+            
+            # 如果获取到training_task_id，创建监控作业
+            if training_task_id:
+                logger.info(f"训练任务 {task_id} 获取到training_task_id: {training_task_id}，启动监控")
+                JobRunner.finish(job, next_stage=STAGE_MONITOR, payload={'remote_id': training_task_id})
+            else:
+                JobRunner.finish(job)
         finally:
             # 处理完成后，移除任务处理中的标记
             with _processing_lock:
                 _processing_task_ids.discard(task_key)
+
+    @staticmethod
+    def _run_monitor_job(job: Job):
+        """监控作业：在监控引擎中监控远程任务，监控结束时由监控引擎完成作业"""
+        remote_id = (job.payload or {}).get('remote_id')
+        running = TaskStatus.MARKING if job.capability == CAPABILITY_MARKING else TaskStatus.TRAINING
+        with get_db() as db:
+            task = db.query(Task).filter(Task.id == job.task_id).first()
+            if not task or task.status != running or not remote_id or task.prompt_id != remote_id:
+                logger.info(f"任务 {job.task_id} 不再处于{job.capability}阶段，结束监控作业 {job.id}")
+                JobRunner.finish(job)
+                return
+        MonitorEngine.watch(job.capability, job.task_id, job.asset_id, remote_id, job=job)
+
+    @staticmethod
+    def _run_complete_job(job: Job):
+        """
+        完成处理作业：在完成处理线程池中下载结果并更新任务状态
+
+        同步结果失败等暂时性错误按退避时间重试，任务保持在运行状态并继续占用槽位，
+        重试次数用完后由 _on_job_failed 标记错误；其余错误已由完成处理函数标记错误，不再重试
+        """
+        handler = COMPLETION_HANDLERS[job.capability]
+        args = (job.payload or {}).get('args', [])
+
+        def _execute():
+            if CancellationRegistry.is_cancelled(job.task_id):
+                logger.info(f"任务 {job.task_id} 已取消，跳过完成处理")
+                JobRunner.finish(job)
+                return
+            try:
+                handler(*args, retry=True)
+            except RetryableError as e:
+                logger.warning(f"任务 {job.task_id} 的完成处理失败，稍后重试: {str(e)}")
+                JobRunner.finish(job, error=str(e), retry=True)
+                return
+            except Exception as e:
+                logger.error(f"任务 {job.task_id} 的完成处理出错: {str(e)}", exc_info=True)
+                JobRunner.finish(job, error=str(e))
+                return
+            JobRunner.finish(job)
+
+        completion_pool.submit(_execute)
+
+    @staticmethod
+    def _on_job_failed(job: Job):
+        """作业多次失败后放弃：任务仍停留在该阶段时标记为错误并释放资产槽位"""
+        running = (TaskStatus.SUBMITTED, TaskStatus.MARKING) if job.capability == CAPABILITY_MARKING else (TaskStatus.TRAINING,)
+        with get_db() as db:
+            task = db.query(Task).filter(Task.id == job.task_id).first()
+            if not task or task.status not in running:
+                return
+            task.update_status(TaskStatus.ERROR, f'{job.stage}作业多次失败: {job.last_error or "租约过期"}', db=db)
+            if SlotService.release(db, task.id, job.capability):
+                db.commit()
+                notify_scheduler(REASON_CAPACITY_RELEASED)
     
     @staticmethod
     def run_scheduler_once():
         """
         运行一次调度器
+        
+        基于任务和资产容量的快照一次性规划所有分配，并在一个事务中提交槽位预留，
+        和暂存作业，数据上传和请求提交由作业执行线程交给暂存线程池完成
         """
         try:
             # 使用锁保证同一时间只有一个线程在执行调度逻辑
             with scheduler_lock:
-                # 获取待处理的任务
+                # 回收租约过期的资产槽位
+                SlotService.reap_expired()
+                
+                # 获取待处理的任务快照
                 submitted_tasks, training_tasks = SchedulerService.get_pending_tasks()
-                # 处理提交的打标任务
-                for task in submitted_tasks:
-                    SchedulerService.process_task(task)
+                submitted_ids = [task.id for task in submitted_tasks]
+                training_ids = [task.id for task in training_tasks]
+                
+                marking_assignments = []
+                training_assignments = []
+                prefetch_predictions = {}
+                
+                # 资产选择策略
+                policy = get_selection_policy(ConfigService.get_value('asset_selection_policy', 'least_loaded'))
+                
+                with get_db() as db:
+                    # 规划打标任务分配
+                    if submitted_ids:
+                        capacities = SchedulerService._build_capacities(
+                            MarkingService.get_available_marking_assets(),
+                            CAPABILITY_MARKING
+                        )
+                        planned, waiting = AssignmentPlanner.plan(submitted_ids, capacities, policy)
+                        marking_assignments = SchedulerService._commit_marking_assignments(db, planned)
+                        SchedulerService._mark_waiting(db, waiting, _waiting_marking_ids, "任务正在等待可用标记资产中...")
+                        if waiting:
+                            logger.info(f"没有可用于标记的资产，{len(waiting)} 个任务将继续等待")
+                    else:
+                        _waiting_marking_ids.clear()
                     
-                # 处理训练任务
-                for task in training_tasks:
-                    SchedulerService.process_task(task)
+                    # 规划训练任务分配，优先放到已有打标结果的资产上
+                    if training_ids:
+                        training_assets = TrainingService.get_available_training_assets()
+                        capacities = SchedulerService._build_capacities(training_assets, CAPABILITY_TRAINING)
+                        affinity, waits = SchedulerService._build_training_locality(
+                            training_tasks, [asset.id for asset in training_assets]
+                        )
+                        planned, waiting = AssignmentPlanner.plan(training_ids, capacities, policy, affinity, waits)
+                        training_assignments = SchedulerService._commit_training_assignments(db, planned)
+                        SchedulerService._mark_waiting(db, waiting, _waiting_training_ids, "任务正在等待可用训练资产中...")
+                        if waiting:
+                            logger.info(f"没有可用于训练的资产，{len(waiting)} 个任务将继续等待")
+                        # 预测等待任务的去向，提前传输训练数据
+                        prefetch_predictions = SchedulerService._predict_training_placement(
+                            db, training_tasks, waiting, policy, affinity
+                        )
+                    else:
+                        _waiting_training_ids.clear()
+                
+                # 调整训练数据预取：预测变化的任务改为预取到新资产，已分配的任务交给正式暂存接管
+                PrefetchService.update(
+                    prefetch_predictions,
+                    {assignment.task_id: assignment.asset_id for assignment in training_assignments}
+                )
+                
+                # 已分配的任务有新的暂存作业
+                if marking_assignments or training_assignments:
+                    JobRunner.wakeup()
+                
+                # 队列已变化，ETA预测需要重新计算
+                EtaService.invalidate()
                     
         except Exception as e:
             logger.error(f"调度器运行失败: {str(e)}")
@@ -247,19 +611,20 @@ class SchedulerService:
     @staticmethod
     def _scheduler_loop():
         """
-        调度器循环，定期检查并分配任务
+        调度器循环，阻塞等待任务状态变更或资产释放的通知后分配任务，
+        仅在长时间没有通知时按兜底间隔执行一次
         """
-        global scheduler_running
-        
         try:
             while scheduler_running:
                 try:
                     # 执行一次调度
                     SchedulerService.run_scheduler_once()
                     
-                    # 等待一段时间再次执行
-                    time.sleep(10)  # 10秒检查一次，减少重复检查的频率
-                    # logger.info(f"调度器循环执行完成，当前线程ID: {threading.get_ident()}")
+                    # 等待唤醒信号，超时后兜底执行一次调度
+                    fallback_interval = ConfigService.get_value('scheduler_fallback_interval', 300)
+                    reasons = wait_for_wakeup(timeout=fallback_interval)
+                    if reasons:
+                        logger.debug(f"调度器被唤醒: {', '.join(sorted(reasons))}")
                 except Exception as loop_error:
                     logger.error(f"调度循环出错: {str(loop_error)}")
                     time.sleep(30)  # 错误后等待30秒再次尝试
@@ -278,6 +643,9 @@ class SchedulerService:
         global scheduler_thread, scheduler_running
         
         with scheduler_lock:
+            if not scheduler_running and scheduler_thread is not None and scheduler_thread.is_alive():
+                # 卸任后很快再次当选时，等待上一个调度循环退出
+                scheduler_thread.join(timeout=60)
             if scheduler_thread is None or not scheduler_thread.is_alive():
                 scheduler_running = True
                 scheduler_thread = threading.Thread(
@@ -303,8 +671,12 @@ class SchedulerService:
             if scheduler_running:
                 scheduler_running = False
                 logger.info("正在停止任务调度器...")
-                # 关闭监控线程池
-                monitor_pool.shutdown(wait=False)
+                # 唤醒阻塞中的调度循环使其退出
+                notify_scheduler('stop')
+                # 停止资产轮询协程
+                MonitorEngine.stop()
+                # 停止资产健康探测
+                AssetHealthService.stop_prober()
                 return True
             else:
                 logger.warning("任务调度器已经停止")
@@ -314,18 +686,71 @@ class SchedulerService:
     def init_scheduler():
         """
         初始化任务调度器，应用启动时调用
+
+        参与调度器领导者选举，只有取得租约的进程执行任务恢复并运行调度器、任务监控和资产健康探测，
+        多个后端进程共享数据库时不会重复调度，见 LeaderElection。
+        暂存、监控和完成处理以作业的形式持久化在作业队列中，由领导者的作业执行线程领取，见 JobQueue
+        """
+        JobRunner.start({
+            STAGE_STAGING: SchedulerService._run_staging_job,
+            STAGE_MONITOR: SchedulerService._run_monitor_job,
+            STAGE_COMPLETE: SchedulerService._run_complete_job,
+        }, on_failed=SchedulerService._on_job_failed)
+        return LeaderElection.start(
+            on_elected=SchedulerService._start_as_leader,
+            on_demoted=SchedulerService._stop_as_leader,
+            on_wakeup=lambda: notify_scheduler(REASON_REMOTE_WAKEUP),
+            on_heartbeat=SchedulerService._on_leader_heartbeat
+        )
+
+    @staticmethod
+    def _on_leader_heartbeat():
+        """领导者每次续约后处理其他进程转发的请求，并发布运行时状态快照供 API 进程读取"""
+        AssetHealthService.process_invalidations()
+        CancellationRegistry.process_remote()
+        RuntimeStateService.publish({
+            STATE_STAGING: StagingService.get_progress(),
+            STATE_PREFETCH: PrefetchService.get_progress(),
+            STATE_MONITOR_PROGRESS: MonitorEngine.export_progress(),
+            STATE_ASSET_HEALTH: AssetHealthService.export_state()
+        })
+
+    @staticmethod
+    def _stop_as_leader():
+        """失去领导权时停止调度器、任务监控、资产健康探测和训练数据预取"""
+        SchedulerService.stop_scheduler()
+        PrefetchService.update({}, {})
+        # 监控已停止，交还监控作业由新的领导者立即接管；进行中的暂存和完成处理继续执行并续约
+        JobRunner.release_local(STAGE_MONITOR)
+
+    @staticmethod
+    def _start_as_leader():
         """
+        成为领导者时恢复中断的任务并启动调度器
+
+        有未结束作业的任务由作业队列重新投递，不需要扫描和重置；
+        只有升级前已分配资产、没有作业记录的任务按原来的方式恢复
+        """
+        # 前任领导者已停止监控，立即重新投递其持有的监控作业
+        JobQueue.release_others(STAGE_MONITOR, HOLDER_ID)
+        
         # 检查可能中断的任务，重置状态
         with get_db() as db:
+            # 为升级前已分配资产的任务补建槽位记录
+            SlotService.backfill(db)
+            marking_job_ids = JobQueue.active_task_ids(db, CAPABILITY_MARKING)
+            training_job_ids = JobQueue.active_task_ids(db, CAPABILITY_TRAINING)
+            
             # 找到所有处于SUBMITTED状态但已分配资产的任务
             pending_mark_tasks = db.query(Task).filter(
                 Task.status == TaskStatus.SUBMITTED,
                 Task.marking_asset_id.is_not(None)  # 已分配资产
             ).all()
             
-            # 找到所有处于MARKING状态的任务
+            # 找到所有处于MARKING状态但没有prompt_id的任务
             marking_tasks = db.query(Task).filter(
-                Task.status == TaskStatus.MARKING
+                Task.status == TaskStatus.MARKING,
+                Task.prompt_id.is_(None)
             ).all()
             
             # 找到所有处于TRAINING状态但已分配资产的任务
@@ -337,53 +762,61 @@ class SchedulerService:
             
             # 重置打标任务状态
             for task in pending_mark_tasks + marking_tasks:
+                if task.id in marking_job_ids:
+                    continue
                 # 检查任务的输出目录是否存在并有文件
                 if task.marked_images_path and os.path.exists(task.marked_images_path) and os.listdir(task.marked_images_path):
                     # 有输出文件，说明打标可能已完成
+                    SlotService.release(db, task.id, CAPABILITY_MARKING)
                     task.update_status(TaskStatus.MARKED, "系统重启，检测到打标输出，标记为已完成", db=db)
                 else:
-                    # 没有输出文件，重置为SUBMITTED状态
-                    if task.marking_asset:
-                        # 减少资产的计数
-                        task.marking_asset.marking_tasks_count = max(0, task.marking_asset.marking_tasks_count - 1)
+                    # 没有输出文件，释放资产槽位并重置为SUBMITTED状态
+                    SlotService.release(db, task.id, CAPABILITY_MARKING)
                     task.marking_asset_id = None
                     task.update_status(TaskStatus.SUBMITTED, "系统重启，打标任务重置为等待状态", db=db)
             
             # 重置训练任务状态
             for task in pending_train_tasks:
-                if task.training_asset:
-                    # 减少资产的计数
-                    task.training_asset.training_tasks_count = max(0, task.training_asset.training_tasks_count - 1)
+                if task.id in training_job_ids:
+                    continue
+                # 释放资产槽位
+                SlotService.release(db, task.id, CAPABILITY_TRAINING)
                 task.training_asset_id = None
                 task.update_status(TaskStatus.TRAINING, "系统重启，训练任务重置为等待状态", db=db)
                 
-            # 恢复处理中的任务监控
-            SchedulerService._recover_task_monitors(db)
+            db.commit()
+            # 按槽位表校正资产计数
+            SlotService.reconcile_counts()
+            
+            # 为没有作业记录的处理中任务补建监控作业
+            SchedulerService._backfill_monitor_jobs(db, marking_job_ids, training_job_ids)
             
-        # 启动调度器
+        # 启动资产健康探测，调度器从注册表中读取可用资产
+        AssetHealthService.start_prober()
+            
+        # 启动调度器，作业执行线程开始领取作业
         SchedulerService.start_scheduler()
+        JobRunner.wakeup()
         
     @staticmethod
-    def _recover_task_monitors(db: Session):
-        """恢复任务状态监控"""
+    def _backfill_monitor_jobs(db: Session, marking_job_ids: set, training_job_ids: set):
+        """为升级前已提交、没有作业记录的处理中任务创建监控作业"""
         try:
-            # 恢复标记中的任务监控
+            # 标记中的任务
             marking_tasks = db.query(Task).filter(
                 Task.status == TaskStatus.MARKING,
-                Task.prompt_id.isnot(None)  # 已有prompt_id的任务
+                Task.prompt_id.isnot(None),  # 已有prompt_id的任务
+                Task.marking_asset_id.isnot(None)
             ).all()
             
             for task in marking_tasks:
-                if task.marking_asset_id and task.prompt_id:
-                    logger.info(f"恢复标记任务 {task.id} 的状态监控")
-                    monitor_pool.submit(
-                        MarkingService._monitor_mark_status,
-                        task.id,
-                        task.marking_asset_id,
-                        task.prompt_id
-                    )
+                if task.id in marking_job_ids:
+                    continue
+                logger.info(f"为标记任务 {task.id} 创建监控作业")
+                JobQueue.enqueue(db, STAGE_MONITOR, CAPABILITY_MARKING, task.id, task.marking_asset_id,
+                                 {'remote_id': task.prompt_id})
 
-            # 恢复训练中的任务监控
+            # 训练中的任务
             training_tasks = db.query(Task).filter(
                 Task.status == TaskStatus.TRAINING,
                 Task.prompt_id.isnot(None),  # 已有训练任务ID的任务
@@ -391,14 +824,14 @@ class SchedulerService:
             ).all()
             
             for task in training_tasks:
-                if task.training_asset_id and task.prompt_id:
-                    logger.info(f"恢复训练任务 {task.id} 的状态监控")
-                    monitor_pool.submit(
-                        TrainingService._monitor_training_status,
-                        task.id,
-                        task.training_asset_id,
-                        task.prompt_id
-                    )
+                if task.id in training_job_ids:
+                    continue
+                logger.info(f"为训练任务 {task.id} 创建监控作业")
+                JobQueue.enqueue(db, STAGE_MONITOR, CAPABILITY_TRAINING, task.id, task.training_asset_id,
+                                 {'remote_id': task.prompt_id})
+            
+            db.commit()
                     
         except Exception as e:
-            logger.error(f"恢复任务监控失败: {str(e)}", exc_info=True) 
\ No newline at end of file
+            db.rollback()
+            logger.error(f"创建任务监控作业失败: {str(e)}", exc_info=True)
@@ -0,0 +1,295 @@
+from typing import Dict, List, Optional
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from ...models.task import Task, TaskStatus
+from ...models.asset import Asset, AssetSlot
+from ...database import get_db
+from ...utils.logger import setup_logger
+from ...services.config_service import ConfigService
+import threading
+import time
+
+logger = setup_logger('slot_service')
+
+# 槽位类型及对应的资产计数字段
+CAPABILITY_MARKING = 'marking'
+CAPABILITY_TRAINING = 'training'
+COUNT_COLUMNS = {
+    CAPABILITY_MARKING: Asset.marking_tasks_count,
+    CAPABILITY_TRAINING: Asset.training_tasks_count,
+}
+
+# 默认并发上限
+DEFAULT_MARKING_LIMIT = 10
+DEFAULT_TRAINING_LIMIT = 1
+
+# 最近一次续约时间，避免监控线程每次轮询都写数据库
+_last_renewed = {}
+_renew_lock = threading.Lock()
+RENEW_INTERVAL = 60
+
+
+class SlotService:
+    """
+    资产并发槽位服务
+
+    asset_slots 表记录每个任务占用的资产槽位，是资产并发占用的唯一来源。
+    资产上的 marking_tasks_count / training_tasks_count 只通过条件UPDATE原子增减，
+    启动时和回收过期槽位后按槽位表重新对账，不再在各个错误分支中手动递减。
+    """
+
+    @staticmethod
+    def get_limit(asset: Asset, capability: str) -> int:
+        """
+        获取资产指定能力的并发上限
+
+        标记上限取 ai_engine.max_concurrent_tasks，未配置时使用资产的 max_concurrent_tasks；
+        训练上限取 lora_training.max_concurrent_tasks，未配置时为1。
+        """
+        if capability == CAPABILITY_MARKING:
+            limit = (asset.ai_engine or {}).get('max_concurrent_tasks') or asset.max_concurrent_tasks
+            return int(limit or DEFAULT_MARKING_LIMIT)
+        limit = (asset.lora_training or {}).get('max_concurrent_tasks')
+        return int(limit or DEFAULT_TRAINING_LIMIT)
+
+    @staticmethod
+    def get_remaining(asset: Asset, capability: str) -> int:
+        """获取资产指定能力的剩余槽位数"""
+        count = getattr(asset, COUNT_COLUMNS[capability].key) or 0
+        return max(0, SlotService.get_limit(asset, capability) - count)
+
+    @staticmethod
+    def _lease_expires_at() -> datetime:
+        lease_seconds = ConfigService.get_value('slot_lease_seconds', 1800)
+        return datetime.now() + timedelta(seconds=lease_seconds)
+
+    @staticmethod
+    def claim(db: Session, asset: Asset, capability: str, task_id: int) -> bool:
+        """
+        原子地为任务占用资产槽位，不提交事务，由调用方统一提交
+
+        通过 UPDATE ... WHERE count < limit 占用容量，并发的调度器或进程之间不会超额分配。
+        同一任务在同一阶段重复占用时直接返回成功。
+
+        Args:
+            db: 数据库会话
+            asset: 资产对象
+            capability: 槽位类型 marking / training
+            task_id: 任务ID
+
+        Returns:
+            是否占用成功
+        """
+        existing = db.query(AssetSlot).filter(
+            AssetSlot.task_id == task_id,
+            AssetSlot.capability == capability
+        ).first()
+        if existing:
+            return existing.asset_id == asset.id
+
+        column = COUNT_COLUMNS[capability]
+        limit = SlotService.get_limit(asset, capability)
+        updated = db.query(Asset).filter(
+            Asset.id == asset.id,
+            func.coalesce(column, 0) < limit
+        ).update({column: func.coalesce(column, 0) + 1}, synchronize_session=False)
+        if updated != 1:
+            return False
+
+        db.add(AssetSlot(
+            asset_id=asset.id,
+            capability=capability,
+            task_id=task_id,
+            lease_expires_at=SlotService._lease_expires_at()
+        ))
+        db.flush()
+        return True
+
+    @staticmethod
+    def release(db: Session, task_id: int, capability: str) -> bool:
+        """
+        释放任务占用的槽位，不提交事务，由调用方统一提交
+
+        释放是幂等的：只有槽位记录被删除时才递减资产计数，重复调用不会导致计数漂移。
+
+        Args:
+            db: 数据库会话
+            task_id: 任务ID
+            capability: 槽位类型 marking / training
+
+        Returns:
+            是否释放了槽位
+        """
+        slot = db.query(AssetSlot).filter(
+            AssetSlot.task_id == task_id,
+            AssetSlot.capability == capability
+        ).first()
+        if not slot:
+            return False
+
+        asset_id = slot.asset_id
+        with _renew_lock:
+            _last_renewed.pop((task_id, capability), None)
+        deleted = db.query(AssetSlot).filter(
+            AssetSlot.id == slot.id
+        ).delete(synchronize_session=False)
+        if deleted != 1:
+            return False
+        db.expunge(slot)
+
+        column = COUNT_COLUMNS[capability]
+        db.query(Asset).filter(
+            Asset.id == asset_id,
+            column > 0
+        ).update({column: column - 1}, synchronize_session=False)
+        # 会话中已加载的资产对象需要重新读取计数
+        for obj in db.identity_map.values():
+            if isinstance(obj, Asset) and obj.id == asset_id:
+                db.expire(obj, [column.key])
+        return True
+
+    @staticmethod
+    def renew(task_id: int, capability: str):
+        """
+        续约任务占用的槽位，由监控线程在每次轮询时以及 keep_alive 的后台线程中调用，
+        距离上次续约不足 RENEW_INTERVAL 秒时直接返回
+
+        Args:
+            task_id: 任务ID
+            capability: 槽位类型 marking / training
+        """
+        now = time.time()
+        with _renew_lock:
+            if now - _last_renewed.get((task_id, capability), 0) < RENEW_INTERVAL:
+                return
+            _last_renewed[(task_id, capability)] = now
+        try:
+            with get_db() as db:
+                db.query(AssetSlot).filter(
+                    AssetSlot.task_id == task_id,
+                    AssetSlot.capability == capability
+                ).update({AssetSlot.lease_expires_at: SlotService._lease_expires_at()}, synchronize_session=False)
+                db.commit()
+        except Exception as e:
+            logger.warning(f"续约任务 {task_id} 的 {capability} 槽位失败: {str(e)}")
+
+    @staticmethod
+    @contextmanager
+    def keep_alive(task_id: int, capability: str):
+        """
+        在上传数据、下载结果等耗时传输期间由后台线程定期续约槽位，
+        避免传输超过租约时长时任务被 reap_expired 误判为监控失效
+
+        Args:
+            task_id: 任务ID
+            capability: 槽位类型 marking / training
+        """
+        stop = threading.Event()
+
+        def _run():
+            while not stop.wait(RENEW_INTERVAL):
+                SlotService.renew(task_id, capability)
+
+        thread = threading.Thread(target=_run, name=f'slot-keepalive-{task_id}', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+
+    @staticmethod
+    def _holds_slot(task: Optional[Task], slot: AssetSlot) -> bool:
+        """判断任务当前是否仍应占用该槽位"""
+        if not task:
+            return False
+        if slot.capability == CAPABILITY_MARKING:
+            return task.status in (TaskStatus.SUBMITTED, TaskStatus.MARKING) and task.marking_asset_id == slot.asset_id
+        return task.status == TaskStatus.TRAINING and task.training_asset_id == slot.asset_id
+
+    @staticmethod
+    def reap_expired() -> int:
+        """
+        回收租约过期的槽位，并按槽位表重新对账资产计数
+
+        租约过期说明监控线程已经不在续约：任务已结束或被重新分配时直接回收槽位，
+        任务仍停留在运行状态时标记为错误后回收，避免容量被永久占用。
+
+        Returns:
+            回收的槽位数量
+        """
+        reclaimed = 0
+        released_ids = []
+        with get_db() as db:
+            expired = db.query(AssetSlot).filter(
+                AssetSlot.lease_expires_at < datetime.now()
+            ).all()
+            for slot in expired:
+                task = db.query(Task).filter(Task.id == slot.task_id).first()
+                if SlotService._holds_slot(task, slot):
+                    logger.warning(f"任务 {task.id} 的 {slot.capability} 槽位租约已过期，监控已失效，标记任务为错误")
+                    task.update_status(TaskStatus.ERROR, '资产槽位租约过期，任务监控已失效', db=db)
+                if SlotService.release(db, slot.task_id, slot.capability):
+                    reclaimed += 1
+                    released_ids.append(slot.task_id)
+            db.commit()
+
+        if reclaimed:
+            SlotService.reconcile_counts()
+            logger.info(f"回收了 {reclaimed} 个过期槽位, 任务: {released_ids}")
+        return reclaimed
+
+    @staticmethod
+    def reconcile_counts():
+        """按槽位表重新计算所有资产的任务计数，修复历史遗留的计数漂移"""
+        with get_db() as db:
+            counts: Dict = {}
+            rows = db.query(
+                AssetSlot.asset_id, AssetSlot.capability, func.count(AssetSlot.id)
+            ).group_by(AssetSlot.asset_id, AssetSlot.capability).all()
+            for asset_id, capability, count in rows:
+                counts[(asset_id, capability)] = count
+
+            for asset in db.query(Asset).all():
+                for capability, column in COUNT_COLUMNS.items():
+                    expected = counts.get((asset.id, capability), 0)
+                    if (getattr(asset, column.key) or 0) != expected:
+                        logger.info(f"资产 {asset.id} 的 {capability} 计数由 {getattr(asset, column.key)} 校正为 {expected}")
+                        setattr(asset, column.key, expected)
+            db.commit()
+
+    @staticmethod
+    def backfill(db: Session):
+        """
+        为已占用资产但还没有槽位记录的任务补建槽位（升级前分配的任务），不检查并发上限
+
+        Args:
+            db: 数据库会话
+        """
+        slotted = {(task_id, capability) for task_id, capability in db.query(AssetSlot.task_id, AssetSlot.capability).all()}
+        tasks = db.query(Task).filter(
+            Task.status.in_([TaskStatus.SUBMITTED, TaskStatus.MARKING, TaskStatus.TRAINING])
+        ).all()
+        for task in tasks:
+            if task.status == TaskStatus.TRAINING:
+                capability, asset_id = CAPABILITY_TRAINING, task.training_asset_id
+            else:
+                capability, asset_id = CAPABILITY_MARKING, task.marking_asset_id
+            if asset_id and (task.id, capability) not in slotted:
+                db.add(AssetSlot(
+                    asset_id=asset_id,
+                    capability=capability,
+                    task_id=task.id,
+                    lease_expires_at=SlotService._lease_expires_at()
+                ))
+        db.commit()
+
+    @staticmethod
+    def list_slots(asset_id: Optional[int] = None) -> List[Dict]:
+        """获取槽位占用列表"""
+        with get_db() as db:
+            query = db.query(AssetSlot)
+            if asset_id is not None:
+                query = query.filter(AssetSlot.asset_id == asset_id)
+            return [slot.to_dict() for slot in query.order_by(AssetSlot.id.asc()).all()]
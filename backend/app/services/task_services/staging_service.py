@@ -0,0 +1,180 @@
+from typing import Any, Callable, Dict, List, Optional
+from dataclasses import dataclass, asdict
+from concurrent.futures import ThreadPoolExecutor
+from ...utils.logger import setup_logger
+from ..config_service import ConfigService
+from ..async_engine import AsyncEngine
+from ..runtime_state_service import RuntimeStateService, STATE_STAGING
+from .cancellation import CancellationRegistry, TaskCancelled
+import threading
+import time
+
+logger = setup_logger('staging_service')
+
+# 暂存阶段状态
+STAGING_QUEUED = 'queued'
+STAGING_RUNNING = 'staging'
+STAGING_DONE = 'done'
+STAGING_FAILED = 'failed'
+STAGING_CANCELLED = 'cancelled'
+
+# 已结束的暂存记录保留时间(秒)，超时后清理
+FINISHED_RETENTION = 3600
+
+# (暂存类型, 任务ID) -> 暂存记录
+_jobs: Dict[tuple, 'StagingJob'] = {}
+_jobs_lock = threading.Lock()
+
+# 暂存线程池，首次使用时按 staging_workers 配置创建
+_staging_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+@dataclass
+class StagingJob:
+    """单个任务的暂存记录"""
+    task_id: int
+    asset_id: int
+    kind: str                          # 暂存类型: marking / training
+    state: str = STAGING_QUEUED
+    queued_at: float = 0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    files_done: int = 0
+    files_total: int = 0
+    bytes_done: int = 0
+    bytes_total: int = 0
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        data['percentage'] = round(self.bytes_done * 100 / self.bytes_total, 1) if self.bytes_total else (
+            100 if self.state == STAGING_DONE else 0
+        )
+        return data
+
+
+class StagingService:
+    """
+    数据暂存服务
+
+    调度器只负责预留资产槽位，随后把任务放入暂存队列：数据上传到资产并提交打标/训练请求
+    在独立的有界线程池中执行，并记录每个任务的传输进度。
+    大数据集的上传不会拖慢其他任务的分配。
+    """
+
+    @staticmethod
+    def _get_pool() -> ThreadPoolExecutor:
+        global _staging_pool
+        with _pool_lock:
+            if _staging_pool is None:
+                _staging_pool = ThreadPoolExecutor(
+                    max_workers=ConfigService.get_value('staging_workers', 4),
+                    thread_name_prefix="Staging"
+                )
+            return _staging_pool
+
+    @staticmethod
+    def enqueue(kind: str, task_id: int, asset_id: int, job: Callable[[], Any]) -> bool:
+        """
+        把任务加入暂存队列
+
+        Args:
+            kind: 暂存类型 marking / training
+            task_id: 任务ID
+            asset_id: 已预留槽位的资产ID
+            job: 暂存函数，负责上传数据并提交请求
+
+        Returns:
+            是否加入队列，任务已在暂存中时返回False
+        """
+        now = time.time()
+        with _jobs_lock:
+            StagingService._prune(now)
+            existing = _jobs.get((kind, task_id))
+            if existing and existing.state in (STAGING_QUEUED, STAGING_RUNNING):
+                logger.info(f"{kind}任务 {task_id} 已在暂存队列中，跳过")
+                return False
+            _jobs[(kind, task_id)] = StagingJob(task_id=task_id, asset_id=asset_id, kind=kind, queued_at=now)
+
+        AsyncEngine.submit(StagingService._run(kind, task_id, job))
+        logger.info(f"{kind}任务 {task_id} 已加入暂存队列, 资产: {asset_id}")
+        return True
+
+    @staticmethod
+    async def _run(kind: str, task_id: int, job: Callable[[], Any]):
+        """在暂存线程池中执行暂存函数并记录结果"""
+        def _execute():
+            StagingService._update(kind, task_id, state=STAGING_RUNNING, started_at=time.time())
+            return job()
+
+        try:
+            await AsyncEngine.run_in_executor(StagingService._get_pool(), _execute)
+            StagingService._update(kind, task_id, state=STAGING_DONE, finished_at=time.time())
+        except TaskCancelled as e:
+            logger.info(f"{kind}任务 {task_id} 已取消，停止暂存")
+            StagingService._update(kind, task_id, state=STAGING_CANCELLED, finished_at=time.time(), error=str(e))
+        except Exception as e:
+            logger.error(f"{kind}任务 {task_id} 暂存失败: {str(e)}", exc_info=True)
+            StagingService._update(kind, task_id, state=STAGING_FAILED, finished_at=time.time(), error=str(e))
+
+    @staticmethod
+    def _update(kind: str, task_id: int, **fields):
+        with _jobs_lock:
+            job = _jobs.get((kind, task_id))
+            if job:
+                for key, value in fields.items():
+                    setattr(job, key, value)
+
+    @staticmethod
+    def _prune(now: float):
+        """清理过期的已结束记录（调用方需持有锁）"""
+        expired = [
+            key for key, job in _jobs.items()
+            if job.finished_at and now - job.finished_at > FINISHED_RETENTION
+        ]
+        for key in expired:
+            del _jobs[key]
+
+    @staticmethod
+    def progress_callback(kind: str, task_id: int) -> Callable[[Dict], None]:
+        """
+        获取传输进度回调，传给 SSHClientTool.upload_directory；任务被取消时抛出 TaskCancelled 中止上传，
+        调用方在上传返回后需要调用 CancellationRegistry.check
+
+        Args:
+            kind: 暂存类型 marking / training
+            task_id: 任务ID
+        """
+        def _report(progress: Dict):
+            StagingService._update(
+                kind, task_id,
+                files_done=progress.get('files_done', 0),
+                files_total=progress.get('files_total', 0),
+                bytes_done=progress.get('bytes_done', 0),
+                bytes_total=progress.get('bytes_total', 0),
+            )
+            CancellationRegistry.check(task_id)
+        return _report
+
+    @staticmethod
+    def is_staging(kind: str, task_id: int) -> bool:
+        """任务是否在暂存队列中或正在暂存"""
+        with _jobs_lock:
+            job = _jobs.get((kind, task_id))
+            return bool(job and job.state in (STAGING_QUEUED, STAGING_RUNNING))
+
+    @staticmethod
+    def get_progress(task_id: Optional[int] = None) -> List[Dict]:
+        """
+        获取暂存进度，调度器运行在其他进程时读取其发布的快照
+
+        Args:
+            task_id: 任务ID，为空时返回所有暂存记录
+        """
+        if RuntimeStateService.is_local():
+            with _jobs_lock:
+                jobs = [job.to_dict() for job in _jobs.values()]
+        else:
+            jobs = RuntimeStateService.read(STATE_STAGING, [])
+        return [job for job in jobs if task_id is None or job['task_id'] == task_id]
@@ -10,8 +10,19 @@ from ...utils.file_handler import generate_unique_folder_path
 from ...utils.train_handler import TrainRequestHandler
 from ...utils.common import copy_attributes
 from ...utils.ssh import create_ssh_client_from_asset, SSHClientTool
-from ...services.asset_service import AssetService
+from ...utils.dataset_cache import RemoteDatasetCache, PeerSource
+from ...utils.asset_transfer import AssetTransfer
+from ...utils.sync_manifest import SyncManifest
+from ...services.asset_health_service import AssetHealthService
+from .slot_service import SlotService, CAPABILITY_TRAINING
+from .scheduler_events import notify_scheduler, REASON_TASK_TRAINING, REASON_CAPACITY_RELEASED
+from .poll_policy import AdaptivePollPolicy, TRAINING_PROGRESS_REFRESH
+from .staging_service import StagingService
+from .prefetch_service import PrefetchService
+from .cancellation import CancellationRegistry, TaskCancelled
+from .job_queue import RetryableError
 from ...config import Config
+import functools
 import json
 import traceback
 import os
@@ -26,9 +37,17 @@ class TrainingService:
     def get_available_training_assets() -> List[Asset]:
         """获取可用于训练的资产"""
         try:
-            assets = AssetService.verify_all_assets('lora_training')
-            # 训练资产最大并发数固定为1
-            return [asset for asset in assets if asset.training_tasks_count < 1]
+            # 使用健康注册表中缓存的可用性，避免每次调度都探测所有资产
+            asset_ids = AssetHealthService.get_available_asset_ids('lora_training')
+            if not asset_ids:
+                return []
+            with get_db() as db:
+                assets = db.query(Asset).filter(
+                    Asset.id.in_(asset_ids),
+                    Asset.enabled == True
+                ).all()
+            # 按资产配置的并发上限过滤已满的资产
+            return [asset for asset in assets if SlotService.get_remaining(asset, CAPABILITY_TRAINING) > 0]
         except Exception as e:
             logger.error(f"获取可用训练资产失败: {str(e)}")
             return []
@@ -100,6 +119,7 @@ class TrainingService:
         
         # 更新任务状态
         task.update_status(TaskStatus.TRAINING, '准备开始训练', db=db)
+        notify_scheduler(REASON_TASK_TRAINING)
         return task.to_dict()
     
     @staticmethod
@@ -267,9 +287,13 @@ class TrainingService:
         remote_output_dir = f"{Config.REMOTE_OUTPUT_DIR}{output_suffix}"
         training_config['remote_output_dir'] = remote_output_dir
         
-        # 5. 对于远程资产，同步文件
+        # 5. 对于远程资产，同步文件，等待分配期间已预取的数据直接接管
+        prefetched = None
         if asset and not asset.is_local and remote_path:
-            TrainingService._sync_files_to_remote(task, asset, input_dir, remote_path, remote_train_data_dir, db)
+            prefetched = PrefetchService.claim(
+                task_id, asset.id, remote_train_data_dir, PrefetchService.dataset_signature(input_dir)
+            )
+            TrainingService._sync_files_to_remote(task, asset, input_dir, remote_path, remote_train_data_dir, db, prefetched)
             # 更新输入目录为远程目录
             input_dir = remote_path
         
@@ -288,7 +312,11 @@ class TrainingService:
                 if asset and not asset.is_local and remote_path:
                     # 对于远程资产，上传提示词文件
                     remote_prompts_file = os.path.join(remote_path, "sample_prompts.txt").replace('\\', '/')
-                    TrainingService._upload_prompts_file(task, asset, prompts_file, remote_prompts_file, db)
+                    if (prefetched and prefetched.prompts_file == remote_prompts_file
+                            and prefetched.prompts_hash == PrefetchService.file_hash(prompts_file)):
+                        task.add_log('提示词文件已预取到训练资产，无需重新上传', db=db)
+                    else:
+                        TrainingService._upload_prompts_file(task, asset, prompts_file, remote_prompts_file, db)
                     training_config['prompt_file'] = remote_prompts_file
                 else:
                     # 本地资产，直接使用本地文件路径
@@ -348,8 +376,8 @@ class TrainingService:
                 shutil.copy2(src_path, dst_path)
     
     @staticmethod
-    def _sync_files_to_remote(task, asset, input_dir, remote_path, remote_train_data_dir, db):
-        """同步文件到远程服务器"""
+    def _sync_files_to_remote(task, asset, input_dir, remote_path, remote_train_data_dir, db, prefetched=None):
+        """同步文件到远程服务器，prefetched 为可复用的预取记录"""
         task.add_log('资产不是本地资产，需要同步文件...', db=db)
         
         # 创建SSH客户端工具
@@ -360,21 +388,30 @@ class TrainingService:
         if not success:
             raise ValueError(f"创建远程训练数据目录失败: {message}")
         
-        # 清空远程训练数据目录
-        result = ssh_client.execute_command(f"rm -rf {remote_train_data_dir}/*")
-        if result.returncode != 0:
-            task.add_log(f'清空目录警告: {result.stderr}', db=db)
-
         # 检查是否需要同步标记结果（如果训练和打标资产不同）
-        if not task.marking_asset or task.marking_asset_id != asset.id:
+        need_sync = not task.marking_asset or task.marking_asset_id != asset.id
+        if prefetched:
+            # 预取的数据与当前打标结果一致，保留已上传的文件，只补传缺失或变化的文件
+            task.add_log(f'训练数据已预取到训练资产 ({prefetched.files_done}/{prefetched.files_total} 个文件)，跳过清空目录', db=db)
+        elif not need_sync:
+            # 清空远程训练数据目录
+            result = ssh_client.execute_command(f"rm -rf {remote_train_data_dir}/*")
+            if result.returncode != 0:
+                task.add_log(f'清空目录警告: {result.stderr}', db=db)
+
+        if need_sync:
             task.add_log('训练和打标资产不同，需要同步打标结果到训练资产...', db=db)
             
             # 上传打标结果
-            success, message, stats = ssh_client.upload_directory(
-                local_path=input_dir,
-                remote_path=remote_train_data_dir,
-                recursive = False
-            )
+            with SlotService.keep_alive(task.id, CAPABILITY_TRAINING):
+                success, message = TrainingService._upload_dataset(
+                    ssh_client, input_dir, remote_train_data_dir,
+                    progress_callback=StagingService.progress_callback(CAPABILITY_TRAINING, task.id),
+                    clear=not prefetched,
+                    peer=TrainingService._marking_peer(task.marking_asset, remote_path, ssh_client)
+                )
+            # 上传中途取消时不再提交训练请求
+            CancellationRegistry.check(task.id)
             
             if not success:
                 raise ValueError(f"同步打标结果失败: {message}")
@@ -383,6 +420,87 @@ class TrainingService:
         else:
             task.add_log('训练和打标使用相同资产，无需同步打标结果', db=db)
     
+    @staticmethod
+    def _upload_dataset(ssh_client: SSHClientTool, input_dir: str, remote_dir: str,
+                        progress_callback=None, clear: bool = True, peer: Optional[PeerSource] = None):
+        """
+        上传打标结果到训练资产的训练数据目录
+        
+        开启数据集缓存时通过资产上的内容寻址缓存同步，只上传资产上没有的文件，训练目录由硬链接组成，
+        peer 上有的文件直接从打标资产复制；
+        缓存同步失败或未开启缓存时清空目录后按文件上传，clear 为 False 且未开启缓存时保留已有文件只补传差异。
+        
+        Returns:
+            Tuple[bool, str]: (成功标志, 消息)
+        """
+        sessions = ConfigService.get_value('sftp_transfer_sessions', 4)
+        bulk_threshold = ConfigService.get_value('bulk_transfer_threshold', 200)
+        compress = bool(ConfigService.get_value('bulk_transfer_compress', 0))
+        
+        if ConfigService.get_value('dataset_cache_enabled', 1):
+            cache = RemoteDatasetCache(
+                ssh_client,
+                ConfigService.get_value('remote_dataset_cache_dir', f'{Config.REMOTE_DATA_DIR}/dataset_cache')
+            )
+            success, message, _ = cache.sync(
+                input_dir, remote_dir,
+                progress_callback=progress_callback,
+                sessions=sessions,
+                bulk_threshold=bulk_threshold,
+                compress=compress,
+                retention_hours=ConfigService.get_value('dataset_cache_retention_hours', 72),
+                peer=peer
+            )
+            if success:
+                return True, message
+            logger.warning(f"数据集缓存同步失败，改为直接上传: {message}")
+            # 目录中可能是缓存对象的硬链接，必须先删除，不能原地覆盖
+            clear = True
+        
+        if clear:
+            result = ssh_client.execute_command(f"rm -rf {remote_dir}/*")
+            if result.returncode != 0:
+                logger.warning(f"清空目录警告: {result.stderr}")
+        
+        success, message, _ = ssh_client.upload_directory(
+            local_path=input_dir,
+            remote_path=remote_dir,
+            recursive=False,
+            progress_callback=progress_callback,
+            sessions=sessions,
+            bulk_threshold=bulk_threshold,
+            compress=compress,
+            use_manifest=bool(ConfigService.get_value('sync_manifest_enabled', 1))
+        )
+        return success, message
+    
+    @staticmethod
+    def _marking_peer(marking_asset, remote_marked_dir: str, ssh_client: SSHClientTool) -> Optional[PeerSource]:
+        """
+        打标资产上仍与下载时一致的打标结果文件，训练同步时可以直接复制到训练资产
+        
+        下载打标结果时记录了远程文件的哈希，这里一条命令重新获取大小和修改时间，未变化的文件才使用记录的哈希。
+        """
+        if not ConfigService.get_value('direct_asset_transfer', 1) or not marking_asset or marking_asset.is_local:
+            return None
+        try:
+            source_client = create_ssh_client_from_asset(marking_asset)
+            manifest = SyncManifest.load_remote(source_client, remote_marked_dir)
+            if not manifest.remote:
+                return None
+            remote = source_client._remote_stat(remote_marked_dir) or {}
+            files = {}
+            for rel_path, (size, mtime) in remote.items():
+                digest = manifest.remote_hash(rel_path, size, mtime) if '/' not in rel_path else None
+                if digest:
+                    files[digest] = rel_path
+            if not files:
+                return None
+            return PeerSource(AssetTransfer(source_client, ssh_client), remote_marked_dir, files)
+        except Exception as e:
+            logger.warning(f"获取打标资产 {marking_asset.id} 上的打标结果失败: {str(e)}")
+            return None
+    
     @staticmethod
     def _upload_prompts_file(task, asset, local_file, remote_file, db):
         """上传提示词文件到远程服务器"""
@@ -441,8 +559,9 @@ class TrainingService:
     
     @staticmethod
     def _process_training(task_id: int, asset_id: int):
-        """处理训练任务"""
+        """处理训练任务，任务被取消时抛出 TaskCancelled"""
         try:
+            CancellationRegistry.check(task_id)
             with get_db() as db:
                 task = db.query(Task).filter(Task.id == task_id).first()
                 asset = db.query(Asset).filter(Asset.id == asset_id).first()
@@ -467,6 +586,7 @@ class TrainingService:
                 
                 # 记录请求准备信息
                 task.add_log(f'准备发送训练请求: task_id={task_id}, asset_id={asset_id}, asset_ip={asset.ip}', db=db)
+                CancellationRegistry.check(task_id)
                 
                 try:
                     # 发送训练请求
@@ -497,11 +617,15 @@ class TrainingService:
                     error_json = json.dumps(error_detail, indent=2)
                     task.update_status(TaskStatus.ERROR, f'训练请求失败: {str(req_error)}', db=db)
                     task.add_log(error_json, db=db)
-                    if task.training_asset:
-                        task.training_asset.training_tasks_count = max(0, task.training_asset.training_tasks_count - 1)
+                    if SlotService.release(db, task.id, CAPABILITY_TRAINING):
                         db.commit()
+                        notify_scheduler(REASON_CAPACITY_RELEASED)
                     raise ValueError(f"训练请求失败: {str(req_error)}")
                     
+        except TaskCancelled:
+            # 任务已由终止/取消操作回滚，不再标记为错误
+            logger.info(f"训练任务 {task_id} 已取消，停止处理")
+            raise
         except Exception as e:
             logger.error(f"训练任务 {task_id} 处理失败: {str(e)}", exc_info=True)
             with get_db() as db:
@@ -513,207 +637,277 @@ class TrainingService:
                         "type": type(e).__name__,
                         "traceback": str(traceback.format_exc())
                     }, indent=2), db=db)
-                    if task.training_asset:
-                        task.training_asset.training_tasks_count = max(0, task.training_asset.training_tasks_count - 1)
+                    if SlotService.release(db, task.id, CAPABILITY_TRAINING):
                         db.commit()
+                        notify_scheduler(REASON_CAPACITY_RELEASED)
             raise
             
     @staticmethod
-    def _monitor_training_status(task_id: int, asset_id: int, training_task_id: str):
-        """监控训练任务状态"""
+    def _adaptive_poll_interval(watch) -> float:
+        """
+        根据loss曲线的步数增长速度估算训练剩余时间，计算下次轮询间隔
+        
+        loss曲线每 TRAINING_PROGRESS_REFRESH 秒最多获取一次，期间按经过的时间外推剩余时间
+        
+        Args:
+            watch: 训练任务监控项
+            
+        Returns:
+            轮询间隔(秒)
+        """
+        now = time.time()
+        if now - watch.state.get('progress_at', 0) >= TRAINING_PROGRESS_REFRESH:
+            watch.state['progress_at'] = now
+            watch.state['remaining'] = None
+            try:
+                from ...services.task_services.result_service import ResultService
+                loss_result = ResultService.get_training_loss_data(watch.task_id)
+                training_progress = loss_result.get('training_progress', {})
+                # 缓存当前步数，供ETA估算使用
+                watch.state['current_step'] = training_progress.get('current_step')
+                watch.state['total_steps'] = training_progress.get('total_steps')
+                watch.state['remaining'] = AdaptivePollPolicy.estimate_training_remaining(
+                    loss_result.get('series'),
+                    training_progress.get('total_steps'),
+                    now
+                )
+            except Exception as e:
+                logger.debug(f"获取训练任务 {watch.task_id} 进度失败，使用固定轮询间隔: {str(e)}")
+        
+        remaining = watch.state.get('remaining')
+        if remaining is not None:
+            remaining -= now - watch.state['progress_at']
+        floor, ceiling = AdaptivePollPolicy.get_bounds()
+        return AdaptivePollPolicy.interval_for_remaining(remaining, watch.interval, floor, ceiling)
+    
+    @staticmethod
+    def _poll_training_status(watch, context):
+        """
+        检查一次训练任务状态，由监控引擎在资产的每个轮询周期调用
+        
+        Args:
+            watch: 监控项，remote_id 为训练任务ID
+            context: 资产轮询周期的共享上下文
+            
+        Returns:
+            None 继续监控；True 停止监控；可调用对象 停止监控并执行完成处理
+        """
+        task_id = watch.task_id
+        asset_id = watch.asset_id
+        training_task_id = watch.remote_id
+        max_error_retries = 10
         try:
+            if context.asset is None:
+                raise ValueError(f"资产ID {asset_id} 不存在")
+            
+            # 首次轮询时记录开始监控
+            if not watch.state.get('started'):
+                with get_db() as db:
+                    task = db.query(Task).filter(Task.id == task_id).first()
+                    if not task:
+                        raise ValueError("任务或资产不存在")
+                    task.add_log(f'开始监控训练任务状态, training_task_id={training_task_id}', db=db)
+                watch.state['started'] = True
+            
+            # 同一周期内该资产上的训练任务共用请求头配置
+            if 'lora_headers' not in context.cache:
+                context.cache['lora_headers'] = ConfigService.get_asset_lora_headers(asset_id)
+            
+            # 获取训练状态
+            status = context.check_training_status(training_task_id, context.cache['lora_headers'])
+            logger.info(f"检查训练任务状态: {status}")
+            
+            # 判断任务状态
+            is_completed = False
+            is_success = False
+            
+            if status == "FINISHED":
+                is_completed = True
+                is_success = True
+            elif status in ["FAILED", "TERMINATED"]:
+                is_completed = True
+                is_success = False
+            elif status == "NOT_FOUND":
+                logger.warning("训练任务未找到，可能训练引擎已经重启")
+                is_completed = True
+                is_success = False
+            
             with get_db() as db:
                 task = db.query(Task).filter(Task.id == task_id).first()
-                asset = db.query(Asset).filter(Asset.id == asset_id).first()
-
-                if not task or not asset:
-                    raise ValueError("任务或资产不存在")
+                if not task:
+                    return True
+                # 检查任务是否被取消
+                if task.status != TaskStatus.TRAINING:
+                    logger.info("监听训练过程中任务被取消")
+                    
+                    # 更新执行历史记录状态为ERROR
+                    if task.execution_history_id:
+                        execution_history = db.query(TaskExecutionHistory).filter(
+                            TaskExecutionHistory.id == task.execution_history_id
+                        ).first()
+                        if execution_history:
+                            execution_history.status = 'ERROR'
+                            execution_history.end_time = datetime.now()
+                            execution_history.description += f"\n任务被取消于 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+                            db.commit()
+                    return True
+            
+            # 重置错误计数
+            if watch.error_count > 0:
+                logger.info(f"从错误状态恢复，重置错误计数器。之前错误次数: {watch.error_count}")
+            watch.error_count = 0
+            
+            if is_completed:
+                return functools.partial(TrainingService._complete_training, task_id, asset_id, is_success, status)
+            
+            watch.adaptive_interval = TrainingService._adaptive_poll_interval(watch)
+            return None
+        
+        except Exception as check_err:
+            # 处理检查状态时的错误
+            watch.error_count += 1
+            
+            # 根据错误次数决定等待时间
+            wait_time = 5 if watch.error_count <= max_error_retries // 2 else watch.interval
+            watch.next_poll_in = wait_time
+            logger.error(f"检查训练状态时出错 ({watch.error_count}/{max_error_retries}): {str(check_err)}, 将在{wait_time}秒后重试")
+            
+            with get_db() as err_db:
+                task = err_db.query(Task).filter(Task.id == task_id).first()
+                if task:
+                    task.add_log(f'检查任务状态出错 ({watch.error_count}/{max_error_retries}): {str(check_err)}', db=err_db)
                 
-                # 记录开始监控
-                task.add_log(f'开始监控训练任务状态, training_task_id={training_task_id}', db=db)
-                poll_interval = ConfigService.get_value('train_poll_interval', 30)
-                error_count = 0
-                max_error_retries = 10
+                # 如果错误次数达到上限，停止监控
+                if watch.error_count >= max_error_retries:
+                    if task:
+                        task.update_status(
+                            TaskStatus.ERROR, 
+                            f'连续{max_error_retries}次检查状态失败，停止监控: {str(check_err)}', 
+                            db=err_db
+                        )
+                        if SlotService.release(err_db, task.id, CAPABILITY_TRAINING):
+                            err_db.commit()
+                            notify_scheduler(REASON_CAPACITY_RELEASED)
+                    return True
+            return None
+    
+    @staticmethod
+    def _complete_training(task_id: int, asset_id: int, is_success: bool, status: str, retry: bool = False):
+        """
+        处理已结束的训练任务：同步远程结果、记录训练结果和loss并释放资产槽位
+        
+        Args:
+            task_id: 任务ID
+            asset_id: 资产ID
+            is_success: 是否训练成功
+            status: 训练引擎返回的任务状态
+            retry: 由完成处理作业执行，同步结果失败时抛出 RetryableError 由作业队列重试，
+                   重试次数用完后由作业失败处理函数标记错误
+        """
+        try:
+            with get_db() as complete_db:
+                task = complete_db.query(Task).filter(Task.id == task_id).first()
+                # 可能在等待完成处理期间取消了任务
+                if not task or task.status != TaskStatus.TRAINING:
+                    logger.info("任务状态为非训练状态，跳过完成处理")
+                    return
                 
-                while True:
-                    try:
-                        # 在每次循环中使用新的数据库会话获取新的asset对象
-                        with get_db() as status_db:
-                            current_asset = status_db.query(Asset).filter(Asset.id == asset_id).first()
-                            if not current_asset:
-                                raise ValueError(f"资产ID {asset_id} 不存在")
-                                
-                            # 创建训练处理器，使用新获取的资产对象
-                            handler = TrainRequestHandler(current_asset)
-                            
-                            # 获取训练状态
-                            training_headers = ConfigService.get_asset_lora_headers(asset.id)
-                            status = handler.check_status(training_task_id, training_headers)
-                            logger.info(f"检查训练任务状态: {status}")
+                # 获取执行历史记录
+                execution_history = None
+                if task.execution_history_id:
+                    execution_history = complete_db.query(TaskExecutionHistory).filter(
+                        TaskExecutionHistory.id == task.execution_history_id
+                    ).first()
+                
+                if is_success:
+                    # 获取最新的asset对象，避免会话分离问题
+                    current_asset = complete_db.query(Asset).filter(Asset.id == asset_id).first()
+                    
+                    # 如果是非本地资产，需要下载训练结果
+                    if current_asset and not current_asset.is_local and execution_history.training_config and execution_history.training_config.get('output_dir'):
+                        task.add_log('训练完成，开始从远程服务器同步结果...', db=complete_db)
                         
-                        # 判断任务状态
-                        is_completed = False
-                        is_success = False
+                        # 创建SSH客户端工具
+                        ssh_client = create_ssh_client_from_asset(current_asset)
                         
-                        if status == "FINISHED":
-                            is_completed = True
-                            is_success = True
-                        elif status in ["FAILED", "TERMINATED"]:
-                            is_completed = True
-                            is_success = False
-                        elif status == "NOT_FOUND":
-                            logger.warning("训练任务未找到，可能训练引擎已经重启")
-                            is_completed = True
-                            is_success = False
+                        # 使用SSH客户端下载远程输出目录到本地
+                        with SlotService.keep_alive(task_id, CAPABILITY_TRAINING):
+                            success, message, stats = ssh_client.download_directory(
+                                remote_path=execution_history.training_config['output_dir'],
+                                local_path=execution_history.training_output_path,
+                                sessions=ConfigService.get_value('sftp_transfer_sessions', 4)
+                            )
                         
-                        with get_db() as complete_db:
-                            task = complete_db.query(Task).filter(Task.id == task_id).first()
-                            # 检查任务是否被取消
-                            if task and task.status != TaskStatus.TRAINING:
-                                logger.info("监听训练过程中任务被取消")
-                                
-                                # 更新执行历史记录状态为ERROR
-                                if task.execution_history_id:
-                                    execution_history = complete_db.query(TaskExecutionHistory).filter(
-                                        TaskExecutionHistory.id == task.execution_history_id
-                                    ).first()
-                                    if execution_history:
-                                        execution_history.status = 'ERROR'
-                                        execution_history.end_time = datetime.now()
-                                        execution_history.description += f"\n任务被取消于 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-                                        complete_db.commit()
-                                
-                                break
-                            
-                            # 任务完成处理
-                            if is_completed and task:
-                                # 获取执行历史记录
-                                execution_history = None
-                                if task.execution_history_id:
-                                    execution_history = complete_db.query(TaskExecutionHistory).filter(
-                                        TaskExecutionHistory.id == task.execution_history_id
-                                    ).first()
-                                
-                                if is_success:
-                                    # 获取最新的asset对象，避免会话分离问题
-                                    current_asset = complete_db.query(Asset).filter(Asset.id == asset_id).first()
-                                    
-                                    # 如果是非本地资产，需要下载训练结果
-                                    if current_asset and not current_asset.is_local and execution_history.training_config and execution_history.training_config.get('output_dir'):
-                                        task.add_log('训练完成，开始从远程服务器同步结果...', db=complete_db)
-                                        
-                                        # 创建SSH客户端工具
-                                        ssh_client = create_ssh_client_from_asset(current_asset)
-                                        
-                                        # 使用SSH客户端下载远程输出目录到本地
-                                        success, message, stats = ssh_client.download_directory(
-                                            remote_path=execution_history.training_config['output_dir'],
-                                            local_path=execution_history.training_output_path
-                                        )
-                                        
-                                        if not success:
-                                            task.add_log(f'同步结果失败: {message}', db=complete_db)
-                                            task.update_status(TaskStatus.ERROR, f'同步训练结果失败: {message}', db=complete_db)
-                                            break
-                                        
-                                        task.add_log(f'训练结果同步成功: {message}', db=complete_db)
-                                    
-                                    # 更新任务状态为完成
-                                    task.update_status(TaskStatus.COMPLETED, '训练完成', db=complete_db)
-                                    task.progress = 100
-                                    task.add_log('训练任务成功完成', db=complete_db)
-                                    
-                                    # 记录输出文件路径
-                                    output_dir = execution_history.training_output_path
-                                    task.add_log(f'训练输出目录: {output_dir}', db=complete_db)
-                                    
-                                    # 获取训练结果
-                                    from ...services.task_services.result_service import ResultService
-                                    training_results = ResultService.get_training_results(task_id)
-                                    
-                                    # 获取训练loss数据
-                                    try:
-                                        loss_result = ResultService.get_training_loss_data(task_id)
-                                        if loss_result and loss_result.get('success') and loss_result.get('series'):
-                                            loss_data = {'series': loss_result.get('series')}
-                                        else:
-                                            loss_data = None
-                                    except Exception as loss_err:
-                                        logger.error(f"获取训练loss数据失败: {str(loss_err)}")
-                                        loss_data = None
-                                    
-                                    # 如果有执行历史记录，更新其状态和结果
-                                    if execution_history:
-                                        execution_history.status = 'COMPLETED'
-                                        execution_history.end_time = datetime.now()
-                                        execution_history.training_results = training_results
-                                        # 保存loss数据
-                                        if loss_data:
-                                            execution_history.loss_data = loss_data
-                                        execution_history.description += f"\n训练成功完成于 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-                                        complete_db.commit()
-                                else:
-                                    # 处理训练失败情况
-                                    task.update_status(
-                                        TaskStatus.ERROR,
-                                        f'训练失败，任务状态为: {status}',
-                                        db=complete_db
-                                    )
-                                    
-                                    # 更新执行历史记录状态
-                                    if execution_history:
-                                        execution_history.status = 'ERROR'
-                                        execution_history.end_time = datetime.now()
-                                        execution_history.description += f"\n训练失败于 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}: {status}"
-                                        complete_db.commit()
-                            
-                                # 更新资产任务计数
-                                if task.training_asset:
-                                    task.training_asset.training_tasks_count = max(0, task.training_asset.training_tasks_count - 1)
-                                    complete_db.commit()
-                                break
+                        if not success:
+                            task.add_log(f'同步结果失败: {message}', db=complete_db)
+                            if retry:
+                                raise RetryableError(f'同步训练结果失败: {message}')
+                            task.update_status(TaskStatus.ERROR, f'同步训练结果失败: {message}', db=complete_db)
+                            if SlotService.release(complete_db, task.id, CAPABILITY_TRAINING):
+                                complete_db.commit()
+                                notify_scheduler(REASON_CAPACITY_RELEASED)
+                            return
+                        
+                        task.add_log(f'训练结果同步成功: {message}', db=complete_db)
                     
-                        # 重置错误计数
-                        if error_count > 0:
-                            logger.info(f"从错误状态恢复，重置错误计数器。之前错误次数: {error_count}")
-                        error_count = 0
+                    # 更新任务状态为完成
+                    task.update_status(TaskStatus.COMPLETED, '训练完成', db=complete_db)
+                    task.progress = 100
+                    task.add_log('训练任务成功完成', db=complete_db)
                     
-                    except Exception as check_err:
-                        # 处理检查状态时的错误
-                        error_count += 1
-                        
-                        # 根据错误次数决定等待时间
-                        wait_time = 5 if error_count <= max_error_retries // 2 else poll_interval
-                        logger.error(f"检查训练状态时出错 ({error_count}/{max_error_retries}): {str(check_err)}, 将在{wait_time}秒后重试")
-                        
-                        with get_db() as err_db:
-                            task = err_db.query(Task).filter(Task.id == task_id).first()
-                            if task:
-                                task.add_log(f'检查任务状态出错 ({error_count}/{max_error_retries}): {str(check_err)}', db=err_db)
-                            
-                            # 如果错误次数达到上限，停止监控
-                            if error_count >= max_error_retries:
-                                task = err_db.query(Task).filter(Task.id == task_id).first()
-                                if task:
-                                    task.update_status(
-                                        TaskStatus.ERROR, 
-                                        f'连续{max_error_retries}次检查状态失败，停止监控: {str(check_err)}', 
-                                        db=err_db
-                                    )
-                                    if task.training_asset:
-                                        task.training_asset.training_tasks_count = max(0, task.training_asset.training_tasks_count - 1)
-                                        err_db.commit()
-                                break
-                        
-                        # 等待一段时间后重试
-                        time.sleep(wait_time)
-                        continue
-                
-                    # 正常轮询间隔
-                    time.sleep(poll_interval)
+                    # 记录输出文件路径
+                    output_dir = execution_history.training_output_path
+                    task.add_log(f'训练输出目录: {output_dir}', db=complete_db)
+                    
+                    # 获取训练结果
+                    from ...services.task_services.result_service import ResultService
+                    training_results = ResultService.get_training_results(task_id)
+                    
+                    # 获取训练loss数据
+                    try:
+                        loss_result = ResultService.get_training_loss_data(task_id)
+                        if loss_result and loss_result.get('success') and loss_result.get('series'):
+                            loss_data = {'series': loss_result.get('series')}
+                        else:
+                            loss_data = None
+                    except Exception as loss_err:
+                        logger.error(f"获取训练loss数据失败: {str(loss_err)}")
+                        loss_data = None
+                    
+                    # 如果有执行历史记录，更新其状态和结果
+                    if execution_history:
+                        execution_history.status = 'COMPLETED'
+                        execution_history.end_time = datetime.now()
+                        execution_history.training_results = training_results
+                        # 保存loss数据
+                        if loss_data:
+                            execution_history.loss_data = loss_data
+                        execution_history.description += f"\n训练成功完成于 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+                        complete_db.commit()
+                else:
+                    # 处理训练失败情况
+                    task.update_status(
+                        TaskStatus.ERROR,
+                        f'训练失败，任务状态为: {status}',
+                        db=complete_db
+                    )
+                    
+                    # 更新执行历史记录状态
+                    if execution_history:
+                        execution_history.status = 'ERROR'
+                        execution_history.end_time = datetime.now()
+                        execution_history.description += f"\n训练失败于 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}: {status}"
+                        complete_db.commit()
+            
+                # 释放资产槽位
+                if SlotService.release(complete_db, task.id, CAPABILITY_TRAINING):
+                    complete_db.commit()
+                    notify_scheduler(REASON_CAPACITY_RELEASED)
 
+        except RetryableError:
+            raise
         except Exception as e:
-            # 处理整体监控异常
+            # 处理完成阶段的异常
             logger.error(f"监控训练任务状态失败: {str(e)}")
             with get_db() as db:
                 task = db.query(Task).filter(Task.id == task_id).first()
@@ -724,6 +918,6 @@ class TrainingService:
                         "type": type(e).__name__,
                         "traceback": str(traceback.format_exc())
                     }, indent=2), db=db)
-                    if task.training_asset:
-                        task.training_asset.training_tasks_count = max(0, task.training_asset.training_tasks_count - 1)
-                        db.commit() 
\ No newline at end of file
+                    if SlotService.release(db, task.id, CAPABILITY_TRAINING):
+                        db.commit()
+                        notify_scheduler(REASON_CAPACITY_RELEASED)
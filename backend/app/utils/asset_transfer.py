@@ -0,0 +1,120 @@
+import shlex
+import threading
+from typing import List, Tuple
+from .logger import setup_logger
+
+logger = setup_logger('asset_transfer')
+
+# 中转时每次从源资产读取的块大小
+RELAY_CHUNK_SIZE = 1024 * 1024
+
+# 源资产探测能否直连目标资产的超时时间(秒)
+DIRECT_CONNECT_TIMEOUT = 10
+
+TRANSFER_DIRECT = 'direct'
+TRANSFER_RELAY = 'relay'
+
+
+class AssetTransfer:
+    """
+    在两个远程资产之间复制文件，数据不落后端磁盘
+
+    - 直连：源资产能免密 SSH 到目标资产时，在源资产上执行 tar -c | ssh 目标 tar -x，数据不经过后端
+    - 中转：否则后端同时在两个资产上执行 tar -c 和 tar -x，把源资产的输出流直接写入目标资产，
+      只经过后端内存，省去先下载到本地再逐个文件上传
+    """
+
+    def __init__(self, source, target):
+        """
+        Args:
+            source: 源资产的 SSHClientTool
+            target: 目标资产的 SSHClientTool
+        """
+        self.source = source
+        self.target = target
+
+    def _ssh_target_command(self, remote_command: str) -> str:
+        """源资产上连接目标资产执行命令的 ssh 命令行，不允许交互式输入密码"""
+        return (
+            f"ssh -p {int(self.target.port)} -o BatchMode=yes -o StrictHostKeyChecking=accept-new "
+            f"-o ConnectTimeout={DIRECT_CONNECT_TIMEOUT} "
+            f"{shlex.quote(f'{self.target.username}@{self.target.hostname}')} {shlex.quote(remote_command)}"
+        )
+
+    def can_connect_directly(self) -> bool:
+        """源资产能否不经交互直接 SSH 到目标资产"""
+        result = self.source.execute_command(self._ssh_target_command('true') + ' </dev/null')
+        return result.returncode == 0
+
+    def copy(self, source_dir: str, names: List[str], target_dir: str) -> Tuple[bool, str]:
+        """
+        把源资产目录下的文件复制到目标资产目录，能直连时直连，否则经后端中转
+
+        Args:
+            source_dir: 源资产上的目录
+            names: 相对 source_dir 的文件名
+            target_dir: 目标资产上的目录，不存在时创建
+
+        Returns:
+            Tuple[bool, str]: (是否成功, 使用的方式 direct / relay 或失败原因)，复制的文件内容由调用方核对
+        """
+        if not names:
+            return True, TRANSFER_DIRECT
+        file_list = ''.join(f"./{name}\n" for name in names)
+        extract = f"mkdir -p {shlex.quote(target_dir)} && tar -xf - -C {shlex.quote(target_dir)}"
+
+        if self.can_connect_directly():
+            result = self.source.execute_with_input(
+                f"cd {shlex.quote(source_dir)} && tar -cf - -T - | {self._ssh_target_command(extract)}",
+                file_list
+            )
+            if result.returncode == 0:
+                logger.info(f"{self.source.hostname} -> {self.target.hostname} 直连复制了 {len(names)} 个文件")
+                return True, TRANSFER_DIRECT
+            logger.warning(f"{self.source.hostname} -> {self.target.hostname} 直连复制失败，改为中转: {result.stderr}")
+        else:
+            logger.info(f"{self.source.hostname} 无法直连 {self.target.hostname}，经后端中转")
+
+        try:
+            self._relay(f"cd {shlex.quote(source_dir)} && tar -cf - -T -", file_list, extract)
+        except Exception as e:
+            logger.warning(f"{self.source.hostname} -> {self.target.hostname} 中转复制失败: {str(e)}")
+            return False, str(e)
+        logger.info(f"{self.source.hostname} -> {self.target.hostname} 中转复制了 {len(names)} 个文件")
+        return True, TRANSFER_RELAY
+
+    def _relay(self, pack_command: str, file_list: str, extract_command: str):
+        """把源资产上打包命令的输出流写入目标资产上解包命令的输入"""
+        src_stdin, src_stdout, src_stderr = self.source.get_connection().exec_command(pack_command)
+        dst_stdin, dst_stdout, dst_stderr = self.target.get_connection().exec_command(extract_command)
+        src_channel = src_stdout.channel
+        dst_channel = dst_stdin.channel
+        try:
+            # 文件列表在单独线程中写入，避免源资产的输出窗口写满时双方互相等待
+            def write_names():
+                try:
+                    src_stdin.write(file_list)
+                    src_stdin.flush()
+                finally:
+                    src_stdin.channel.shutdown_write()
+
+            writer = threading.Thread(target=write_names, name='asset-relay-names', daemon=True)
+            writer.start()
+            while True:
+                chunk = src_channel.recv(RELAY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                dst_channel.sendall(chunk)
+            writer.join()
+            dst_channel.shutdown_write()
+
+            pack_status = src_channel.recv_exit_status()
+            extract_status = dst_channel.recv_exit_status()
+            if pack_status != 0:
+                # 个别文件不存在时 tar 也以非零状态退出，其余文件已经写入，由调用方核对
+                logger.warning(f"源资产打包有错误: {src_stderr.read().decode('utf-8', 'replace').strip()}")
+            if extract_status != 0:
+                raise IOError(f"目标资产解包失败: {dst_stderr.read().decode('utf-8', 'replace').strip()}")
+        finally:
+            src_channel.close()
+            dst_channel.close()
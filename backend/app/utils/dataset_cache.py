@@ -0,0 +1,257 @@
+import os
+import shlex
+import uuid
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+from .logger import setup_logger
+from .sync_manifest import SyncManifest
+from .asset_transfer import AssetTransfer
+
+logger = setup_logger('dataset_cache')
+
+# 上传中途中断留下的临时目录超过该时间(分钟)后清理
+INCOMING_RETENTION_MINUTES = 1440
+
+
+@dataclass
+class PeerSource:
+    """另一资产上可以直接复制到缓存的文件，如打标资产上的打标结果"""
+    transfer: AssetTransfer
+    remote_dir: str
+    files: Dict[str, str]  # sha256 -> 相对 remote_dir 的文件名
+
+
+class RemoteDatasetCache:
+    """
+    训练资产上的内容寻址数据集缓存
+
+    缓存目录结构：
+    - objects/<sha256>: 文件内容，按哈希存放，同一内容在资产上只存一份
+    - incoming/<批次>/: 本次同步上传中的对象，全部上传完成后移入 objects，中断时不会留下不完整的对象
+
+    任务的训练数据目录由 objects 中对象的硬链接组成，重新同步时只上传资产上还没有的内容，
+    再重建目录中的硬链接。对象的引用计数即硬链接数减一，由文件系统维护；
+    不被任何目录引用且超过保留时间的对象由 gc 清理。
+    资产上没有的内容如果在另一资产（PeerSource）上有相同哈希的文件，优先从该资产直接复制，其余从后端上传。
+    缓存目录需要和任务目录在同一文件系统上，不能创建硬链接时退化为复制。
+    任务目录中的文件与缓存共享内容，只能整体替换，不能原地修改。
+    """
+
+    def __init__(self, ssh_client, cache_dir: str):
+        """
+        Args:
+            ssh_client: 训练资产的 SSHClientTool
+            cache_dir: 资产上的缓存目录
+        """
+        self.ssh_client = ssh_client
+        self.cache_dir = cache_dir.rstrip('/')
+        self.objects_dir = f"{self.cache_dir}/objects"
+        self.incoming_dir = f"{self.cache_dir}/incoming"
+
+    def sync(self, local_path: str, remote_path: str,
+             progress_callback: Optional[Callable[[Dict], None]] = None,
+             sessions: Optional[int] = None, bulk_threshold: int = 0,
+             compress: bool = False, retention_hours: Optional[int] = None,
+             peer: Optional[PeerSource] = None) -> Tuple[bool, str, Dict]:
+        """
+        把本地目录下的文件（不含子目录）同步为远程目录
+
+        Args:
+            local_path: 本地目录
+            remote_path: 远程目录，同步后只包含本地目录中的文件
+            progress_callback: 进度回调，参数同 SSHClientTool.upload_directory
+            sessions: 并行SFTP会话数
+            bulk_threshold: 需要上传的对象数达到该值时使用tar流批量传输，0表示不使用
+            compress: tar流是否使用gzip压缩
+            retention_hours: 同步后清理未被引用超过该小时数的对象，为空时不清理
+            peer: 可以直接复制对象的另一资产
+
+        Returns:
+            Tuple[bool, str, Dict]: (成功标志, 消息, 统计信息)
+        """
+        stats = {
+            'added': 0,      # 上传的新对象数
+            'updated': 0,
+            'unchanged': 0,  # 资产上已有对象的文件数
+            'failed': 0,     # 上传失败的对象数
+            'peer': 0        # 从另一资产直接复制的对象数
+        }
+        try:
+            files = []
+            for name in sorted(os.listdir(local_path)):
+                local_file = os.path.join(local_path, name)
+                if os.path.isfile(local_file) and '\n' not in name:
+                    files.append((name, local_file))
+
+            # 本地哈希按大小和修改时间缓存，未变化的文件不重新计算
+            manifest = SyncManifest.load(f"local:{os.path.abspath(local_path)}")
+            hashed = []
+            for name, local_file in files:
+                size, digest = manifest.local_hash(local_file)
+                hashed.append((name, local_file, size, digest))
+            manifest.retain_local({local_file for _, local_file in files})
+            manifest.save()
+
+            batch_dir = f"{self.incoming_dir}/{uuid.uuid4().hex}"
+            result = self.ssh_client.execute_command(
+                'mkdir -p ' + ' '.join(shlex.quote(d) for d in (self.objects_dir, batch_dir, remote_path))
+            )
+            if result.returncode != 0:
+                return False, f"创建缓存目录失败: {result.stderr}", stats
+
+            progress = {
+                'files_done': 0,
+                'files_total': len(hashed),
+                'bytes_done': 0,
+                'bytes_total': sum(size for _, _, size, _ in hashed),
+            }
+            if progress_callback:
+                progress_callback(dict(progress))
+
+            # 一条命令查询资产上已有的对象，同一内容只上传一次
+            existing = self._existing_objects({digest for _, _, _, digest in hashed})
+            transfers = []
+            queued = set()
+            for _, local_file, size, digest in hashed:
+                if digest in existing or digest in queued:
+                    stats['unchanged'] += 1
+                    progress['files_done'] += 1
+                    progress['bytes_done'] += size
+                else:
+                    queued.add(digest)
+                    transfers.append((local_file, f"{batch_dir}/{digest}", size, 'added'))
+            if progress_callback and stats['unchanged']:
+                progress_callback(dict(progress))
+
+            try:
+                if peer and transfers:
+                    transfers = self._fetch_from_peer(peer, transfers, batch_dir, stats, progress, progress_callback)
+                if bulk_threshold and len(transfers) >= bulk_threshold:
+                    transfers = self.ssh_client._tar_upload(
+                        transfers, batch_dir, stats, progress, progress_callback, compress
+                    )
+                self.ssh_client._transfer_files(transfers, 'put', stats, progress, progress_callback, sessions)
+                # 上传完成的对象移入 objects
+                self._run(
+                    f"cd {shlex.quote(batch_dir)} && find . -maxdepth 1 -type f -exec mv -f {{}} {shlex.quote(self.objects_dir)}/ \\;"
+                )
+            finally:
+                self.ssh_client.execute_command(f"rm -rf {shlex.quote(batch_dir)}")
+            if stats['failed']:
+                return False, f"上传缓存对象失败: {stats['failed']} 个", stats
+
+            missing = self._materialize(remote_path, [(name, digest) for name, _, _, digest in hashed])
+            if missing:
+                return False, f"创建训练数据链接失败: {', '.join(missing[:5])}", stats
+
+            summary = f"数据集缓存同步完成！上传:{stats['added'] - stats['peer']}, 资产间复制:{stats['peer']}, 复用:{stats['unchanged']}"
+            if retention_hours is not None:
+                removed = self.gc(retention_hours)
+                if removed:
+                    summary += f", 清理未引用对象:{removed}"
+            return True, summary, stats
+
+        except Exception as e:
+            logger.error(f"数据集缓存同步失败: {str(e)}")
+            return False, f"数据集缓存同步失败: {str(e)}", stats
+
+    def _fetch_from_peer(self, peer: PeerSource, transfers: List[Tuple[str, str, int, str]], batch_dir: str,
+                         stats: Dict, progress: Dict,
+                         progress_callback: Optional[Callable[[Dict], None]] = None) -> List[Tuple[str, str, int, str]]:
+        """
+        从另一资产复制待上传的对象，在本资产上核对哈希后放入本次批次目录
+
+        Returns:
+            仍需从后端上传的对象
+        """
+        # 待上传对象的目标路径为 批次目录/哈希
+        wanted = {os.path.basename(item[1]): item for item in transfers}
+        names = {peer.files[digest]: digest for digest in wanted if digest in peer.files}
+        if not names:
+            return transfers
+        peer_dir = f"{batch_dir}/peer"
+        copied, mode = peer.transfer.copy(peer.remote_dir, sorted(names), peer_dir)
+        if not copied:
+            logger.warning(f"从 {peer.transfer.source.hostname} 复制数据集失败，改为从后端上传: {mode}")
+            return transfers
+
+        # 核对复制来的文件内容，不一致（如源文件已被修改）的仍从后端上传
+        hashes = self.ssh_client._remote_sha256(peer_dir, sorted(names))
+        verified = [(name, digest) for name, digest in names.items() if hashes.get(name) == digest]
+        if verified:
+            result = self.ssh_client.execute_with_input(
+                f"cd {shlex.quote(batch_dir)} && "
+                'while IFS= read -r line; do h=${line%% *}; n=${line#* }; mv -f "peer/$n" "$h" || exit 1; done',
+                ''.join(f"{digest} {name}\n" for name, digest in verified)
+            )
+            if result.returncode != 0:
+                logger.warning(f"整理资产间复制的文件失败，改为从后端上传: {result.stderr}")
+                return transfers
+
+        done = {digest for _, digest in verified}
+        for digest in done:
+            _, _, size, action = wanted[digest]
+            stats[action] += 1
+            stats['peer'] += 1
+            progress['files_done'] += 1
+            progress['bytes_done'] += size
+        if progress_callback and done:
+            progress_callback(dict(progress))
+        logger.info(f"从 {peer.transfer.source.hostname} {'直连' if mode == 'direct' else '中转'}复制了 {len(done)} 个对象")
+        return [item for item in transfers if os.path.basename(item[1]) not in done]
+
+    def gc(self, retention_hours: int) -> int:
+        """
+        清理不再被任何目录引用（硬链接数为1）且超过保留时间的对象
+
+        对象最后一次被链接或取消链接时会更新 ctime，按 ctime 判断未被引用的时长。
+
+        Returns:
+            清理的对象数
+        """
+        result = self.ssh_client.execute_command(
+            f"find {shlex.quote(self.objects_dir)} -type f -links 1 -cmin +{max(0, int(retention_hours)) * 60} -print -delete | wc -l; "
+            f"find {shlex.quote(self.incoming_dir)} -mindepth 1 -maxdepth 1 -mmin +{INCOMING_RETENTION_MINUTES} -exec rm -rf {{}} + 2>/dev/null; true"
+        )
+        removed = int(result.stdout) if result.stdout.isdigit() else 0
+        if removed:
+            logger.info(f"{self.ssh_client.hostname} 数据集缓存清理了 {removed} 个未引用的对象")
+        return removed
+
+    def _existing_objects(self, digests) -> set:
+        """返回资产上已存在的对象哈希"""
+        if not digests:
+            return set()
+        result = self.ssh_client.execute_with_input(
+            f"cd {shlex.quote(self.objects_dir)} && xargs -r ls -1 -- 2>/dev/null; true",
+            ''.join(f"{digest}\n" for digest in sorted(digests))
+        )
+        return {line.strip() for line in result.stdout.splitlines()} & set(digests)
+
+    def _materialize(self, remote_path: str, entries: List[Tuple[str, str]]) -> List[str]:
+        """
+        清空远程目录后按 (文件名, 哈希) 创建指向对象的硬链接，一条命令完成
+
+        Returns:
+            未能创建的文件名
+        """
+        script = (
+            f"objects={shlex.quote(self.objects_dir)}; dest={shlex.quote(remote_path.rstrip('/'))}; "
+            'find "$dest" -mindepth 1 -maxdepth 1 -exec rm -rf {} +; '
+            'while IFS= read -r line; do '
+            'h=${line%% *}; n=${line#* }; '
+            'ln -f "$objects/$h" "$dest/$n" 2>/dev/null || cp -f "$objects/$h" "$dest/$n" 2>/dev/null || printf "%s\\n" "$n"; '
+            'done'
+        )
+        result = self.ssh_client.execute_with_input(
+            script, ''.join(f"{digest} {name}\n" for name, digest in entries)
+        )
+        if result.returncode != 0 and not result.stdout:
+            raise IOError(f"创建训练数据链接失败: {result.stderr}")
+        return [line for line in result.stdout.splitlines() if line]
+
+    def _run(self, command: str):
+        """执行远程命令，失败时抛出异常"""
+        result = self.ssh_client.execute_command(command)
+        if result.returncode != 0:
+            raise IOError(result.stderr or f"命令执行失败: {command}")
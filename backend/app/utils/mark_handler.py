@@ -142,7 +142,30 @@ class MarkRequestHandler:
         try:
             # 使用ComfyUIAPI获取任务历史
             history_data = self.api.get_history_by_id(prompt_id)
-            
+            return self.parse_history(prompt_id, history_data)
+        except Exception as e:
+            logger.error(f"检查任务状态出错: {str(e)}", exc_info=True)
+            # 返回处理中状态，允许后续重试
+            return False, False, {"status": "error_checking", "error": str(e), "progress": 0}
+
+    def ws_url(self) -> str:
+        """获取ComfyUI WebSocket地址，使用与提交prompt相同的client_id才能收到执行事件"""
+        base_url = self.comfy_config.base_url
+        scheme = 'wss' if base_url.startswith('https://') else 'ws'
+        return f"{scheme}://{base_url.split('://', 1)[-1]}/ws?clientId={self.comfy_config.client_id}"
+
+    def history_url(self, prompt_id: str) -> str:
+        """获取任务历史记录的请求地址，供异步客户端使用"""
+        return f"{self.comfy_config.base_url}/api/history/{prompt_id}"
+
+    def parse_history(self, prompt_id: str, history_data: Optional[Dict]) -> Tuple[bool, bool, Dict[str, Any]]:
+        """
+        解析 /api/history/{prompt_id} 的响应
+        :param prompt_id: 任务ID
+        :param history_data: 历史记录响应数据
+        :return: (is_completed, is_success, task_info)
+        """
+        try:
             # 检查响应是否为空
             if not history_data or not isinstance(history_data, dict) or prompt_id not in history_data:
                 logger.debug(f"任务 {prompt_id} 执行中...")
@@ -220,70 +243,84 @@ class MarkRequestHandler:
         :return: 进度数据字典
         """
         try:
-            progress_data = {
-                "progress": {
-                    "submitted_count": 0,
-                    "processing_count": 0,
-                    "completed_count": 0,
-                    "current_task_id": None,
-                    "total_images": 0,
-                    "percentage": 0
-                },
-                "system_stats": {},
-                "timeline": []
-            }
-            
-            # 获取队列状态
             queue_data = self.api.get_queue()
-            if queue_data:
-                queue_running = queue_data.get('queue_running', [])
-                queue_pending = queue_data.get('queue_pending', [])
-                
-                progress_data["progress"]["processing_count"] = len(queue_running)
-                progress_data["progress"]["submitted_count"] = len(queue_pending)
-                
-                # 如果有正在运行的任务，获取当前任务ID
-                if queue_running:
-                    current_task = queue_running[0]
-                    if len(current_task) > 0:
-                        progress_data["progress"]["current_task_id"] = current_task[0]
-            
-            # 获取系统状态
-            system_stats = self.get_system_stats()
-            if system_stats:
-                progress_data["system_stats"] = system_stats
-            
-            # 如果提供了prompt_id，获取具体任务的进度
-            if prompt_id:
-                history_data = self.api.get_history_by_id(prompt_id)
-                if history_data and prompt_id in history_data:
-                    task_info = history_data[prompt_id].get("status", {})
-                    if task_info.get("status_str") == "success":
-                        progress_data["progress"]["completed_count"] = 1
-                        progress_data["progress"]["percentage"] = 100
-                    elif task_info.get("status_str") == "error":
-                        progress_data["progress"]["percentage"] = 0
-                    else:
-                        # 任务进行中
-                        progress_data["progress"]["percentage"] = task_info.get("progress", 0)
-            
-            return progress_data
+            stats_data = self.api.get_system_stats()
+            history_data = self.api.get_history_by_id(prompt_id) if prompt_id else None
+            return self.build_progress_data(prompt_id, queue_data, stats_data, history_data)
             
         except Exception as e:
             logger.error(f"获取标记进度数据失败: {str(e)}")
-            return {
-                "progress": {
-                    "submitted_count": 0,
-                    "processing_count": 0,
-                    "completed_count": 0,
-                    "current_task_id": None,
-                    "total_images": 0,
-                    "percentage": 0
-                },
-                "system_stats": {},
-                "timeline": [],
-                "error": str(e)
-            }
+            progress_data = self.build_progress_data(None, None, None, None)
+            progress_data["error"] = str(e)
+            return progress_data
+
+    def queue_url(self) -> str:
+        """获取队列信息的请求地址，供异步客户端使用"""
+        return f"{self.comfy_config.base_url}/api/queue"
+
+    def system_stats_url(self) -> str:
+        """获取系统状态的请求地址，供异步客户端使用"""
+        return f"{self.comfy_config.base_url}/api/system_stats"
+
+    @staticmethod
+    def build_progress_data(prompt_id: Optional[str], queue_data: Optional[Dict], stats_data: Optional[Dict],
+                            history_data: Optional[Dict], live_progress: Optional[Dict] = None) -> Dict:
+        """
+        由已获取的响应组装标记进度数据，不发起请求
+        :param prompt_id: 任务ID
+        :param queue_data: /api/queue 响应
+        :param stats_data: /api/system_stats 响应
+        :param history_data: /api/history/{prompt_id} 响应
+        :param live_progress: WebSocket progress 事件中该任务的最新进度 {value, max}
+        :return: 进度数据字典
+        """
+        progress_data = {
+            "progress": {
+                "submitted_count": 0,
+                "processing_count": 0,
+                "completed_count": 0,
+                "current_task_id": None,
+                "total_images": 0,
+                "percentage": 0
+            },
+            "system_stats": {},
+            "timeline": []
+        }
+        
+        # 队列状态
+        if isinstance(queue_data, dict):
+            queue_running = queue_data.get('queue_running', [])
+            queue_pending = queue_data.get('queue_pending', [])
+            
+            progress_data["progress"]["processing_count"] = len(queue_running)
+            progress_data["progress"]["submitted_count"] = len(queue_pending)
+            
+            # 如果有正在运行的任务，获取当前任务ID
+            if queue_running:
+                current_task = queue_running[0]
+                if len(current_task) > 0:
+                    progress_data["progress"]["current_task_id"] = current_task[0]
+        
+        # 系统状态
+        if isinstance(stats_data, dict):
+            progress_data["system_stats"] = MarkRequestHandler.parse_system_stats(stats_data)
+        
+        # 具体任务的进度，历史记录中没有结果时使用实时事件中的进度
+        if prompt_id:
+            if isinstance(history_data, dict) and prompt_id in history_data:
+                task_info = history_data[prompt_id].get("status", {})
+                if task_info.get("status_str") == "success":
+                    progress_data["progress"]["completed_count"] = 1
+                    progress_data["progress"]["percentage"] = 100
+                elif task_info.get("status_str") == "error":
+                    progress_data["progress"]["percentage"] = 0
+                else:
+                    # 任务进行中
+                    progress_data["progress"]["percentage"] = task_info.get("progress", 0)
+            elif live_progress and live_progress.get("max"):
+                progress_data["progress"]["percentage"] = round(live_progress["value"] / live_progress["max"] * 100)
+        
+        return progress_data
     
     def get_system_stats(self) -> Dict:
         """
@@ -292,8 +329,20 @@ class MarkRequestHandler:
         """
         try:
             # 使用ComfyUI API获取系统状态
-            stats_data = self.api.get_system_stats()
+            return self.parse_system_stats(self.api.get_system_stats())
             
+        except Exception as e:
+            logger.error(f"获取系统状态失败: {str(e)}")
+            return {}
+
+    @staticmethod
+    def parse_system_stats(stats_data: Optional[Dict]) -> Dict:
+        """
+        解析 /api/system_stats 的响应
+        :param stats_data: 系统状态响应数据
+        :return: 系统状态字典
+        """
+        try:
             if not stats_data:
                 return {}
             
@@ -6,13 +6,25 @@ import time
 from typing import Tuple, Optional, NamedTuple, BinaryIO, List, Dict, Iterator, Callable
 from ..config import config
 from .logger import setup_logger
+from .sync_manifest import SyncManifest
 import paramiko
 import threading
 import select
+import shlex
+import queue
+import shutil
+import tarfile
 import json
 
 logger = setup_logger('ssh')
 
+# 目录传输的默认并行SFTP会话数和单个文件的重试次数
+DEFAULT_TRANSFER_SESSIONS = 4
+TRANSFER_RETRIES = 2
+
+# 流式tar传输的读写块大小
+TAR_CHUNK_SIZE = 1024 * 1024
+
 # 添加SSH连接缓存管理器
 class SSHConnectionManager:
     """SSH连接缓存管理器，用于复用SSH连接"""
@@ -390,7 +402,7 @@ class SSHClientTool:
     
     def __init__(self, hostname: str, port: int, username: str, 
                 key_path: Optional[str] = None, password: Optional[str] = None, 
-                timeout: int = 10):
+                timeout: int = 10, transfer_sessions: int = DEFAULT_TRANSFER_SESSIONS):
         """
         初始化SSH客户端工具
         
@@ -401,6 +413,7 @@ class SSHClientTool:
             key_path: SSH密钥路径（可选）
             password: SSH密码（可选）
             timeout: 超时时间（秒）
+            transfer_sessions: 目录传输的并行SFTP会话数
         """
         self.hostname = hostname
         self.port = port
@@ -408,6 +421,7 @@ class SSHClientTool:
         self.key_path = key_path
         self.password = password
         self.timeout = timeout
+        self.transfer_sessions = transfer_sessions
     
     def get_connection(self):
         """
@@ -457,6 +471,63 @@ class SSHClientTool:
                 stderr=str(e)
             )
     
+    def execute_with_input(self, command: str, data: str) -> CommandResult:
+        """
+        执行SSH命令并把 data 写入其标准输入，用于向远程批量传递文件列表
+        
+        Args:
+            command: 要执行的命令
+            data: 写入标准输入的内容，写完后关闭标准输入
+        
+        Returns:
+            CommandResult: 包含返回码、标准输出和标准错误的元组
+        """
+        try:
+            ssh = self.get_connection()
+            stdin, stdout, stderr = ssh.exec_command(command)
+            # 标准输入的写入和标准错误的读取各在独立线程中进行，与读取标准输出同时进行；
+            # 否则任一方向写满通道窗口时远程命令和本地互相等待
+            errors = []
+            error_output = []
+            
+            def write_input():
+                try:
+                    stdin.write(data)
+                    stdin.flush()
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    stdin.channel.shutdown_write()
+            
+            def read_errors():
+                error_output.append(stderr.read())
+            
+            threads = [
+                threading.Thread(target=write_input, name='ssh-stdin', daemon=True),
+                threading.Thread(target=read_errors, name='ssh-stderr', daemon=True)
+            ]
+            for thread in threads:
+                thread.start()
+            output = stdout.read().decode('utf-8', 'replace')
+            for thread in threads:
+                thread.join()
+            exit_status = stdout.channel.recv_exit_status()
+            if errors:
+                # 远程命令没有读完输入就退出时写入会失败，以命令的返回码为准
+                logger.warning(f"写入命令标准输入失败: {str(errors[0])}")
+            return CommandResult(
+                returncode=exit_status,
+                stdout=output.strip(),
+                stderr=b''.join(error_output).decode('utf-8', 'replace').strip()
+            )
+        except Exception as e:
+            logger.error(f"执行命令失败: {str(e)}")
+            return CommandResult(
+                returncode=1,
+                stdout='',
+                stderr=str(e)
+            )
+    
     def upload_file(self, local_path: str, remote_path: str) -> Tuple[bool, str]:
         """
         上传文件到远程服务器
@@ -891,14 +962,27 @@ class SSHClientTool:
             logger.error(f"文件流上传失败: {str(e)}")
             return False, f"文件流上传失败: {str(e)}"
     
-    def upload_directory(self, local_path: str, remote_path: str, recursive: bool = True) -> Tuple[bool, str, Dict]:
+    def upload_directory(self, local_path: str, remote_path: str, recursive: bool = True,
+                         progress_callback: Optional[Callable[[Dict], None]] = None,
+                         sessions: Optional[int] = None, bulk_threshold: int = 0,
+                         compress: bool = False, use_manifest: bool = False) -> Tuple[bool, str, Dict]:
         """
         上传本地目录到远程服务器
         
+        每个远程目录只列出一次来判断文件是否需要上传（按大小）；use_manifest 时按内容哈希判断，见 _plan_by_manifest。
+        需要上传的文件由多个SFTP会话并行传输，见 _transfer_files；
+        需要上传的文件数达到 bulk_threshold 时先通过tar流一次性传输，见 _tar_upload
+        
         Args:
             local_path: 本地目录路径
             remote_path: 远程目录路径
             recursive: 是否递归上传子目录
+            progress_callback: 进度回调，每处理完一个文件调用一次，参数为包含
+                               files_done/files_total/bytes_done/bytes_total 的字典
+            sessions: 并行SFTP会话数，为空时使用 self.transfer_sessions
+            bulk_threshold: 使用tar流批量传输的最少文件数，0表示不使用
+            compress: tar流是否使用gzip压缩
+            use_manifest: 是否使用同步清单按内容哈希判断文件是否变化
         
         Returns:
             Tuple[bool, str, Dict]: (成功标志, 消息, 统计信息)
@@ -909,6 +993,7 @@ class SSHClientTool:
             'unchanged': 0,  # 未变更文件数
             'failed': 0      # 失败文件数
         }
+        sftp = None
         
         try:
             # 确保远程目录存在
@@ -916,86 +1001,86 @@ class SSHClientTool:
             if not mkdir_result[0]:
                 return False, mkdir_result[1], stats
             
-            # 获取SSH连接
-            ssh = self.get_connection()
-            sftp = ssh.open_sftp()
-            
+            # 先收集待上传文件，便于统计总量和汇报进度
+            files = []
+            remote_dirs = [remote_path]
             if recursive:
-                # 递归上传目录
-                for root, dirs, files in os.walk(local_path):
+                for root, dirs, names in os.walk(local_path):
                     # 计算当前目录相对路径
                     rel_path = os.path.relpath(root, local_path)
                     if rel_path == '.':
                         rel_path = ''
                     
-                    # 创建远程目录
                     if rel_path:
-                        remote_dir = os.path.join(remote_path, rel_path).replace('\\', '/')
-                        try:
-                            self.mkdir(remote_dir)
-                        except Exception as e:
-                            logger.error(f"创建远程目录失败: {remote_dir}, {str(e)}")
-                            stats['failed'] += 1
+                        remote_dirs.append(os.path.join(remote_path, rel_path).replace('\\', '/'))
                     
-                    # 上传文件
-                    for file in files:
-                        local_file = os.path.join(root, file)
-                        if rel_path:
-                            remote_file = os.path.join(remote_path, rel_path, file).replace('\\', '/')
-                        else:
-                            remote_file = os.path.join(remote_path, file).replace('\\', '/')
-                        
-                        try:
-                            # 检查远程文件是否存在
-                            try:
-                                remote_stat = sftp.stat(remote_file)
-                                remote_size = remote_stat.st_size
-                                local_size = os.path.getsize(local_file)
-                                
-                                # 如果大小不同，则更新文件
-                                if remote_size != local_size:
-                                    sftp.put(local_file, remote_file)
-                                    stats['updated'] += 1
-                                else:
-                                    stats['unchanged'] += 1
-                            except FileNotFoundError:
-                                # 远程文件不存在，直接上传
-                                sftp.put(local_file, remote_file)
-                                stats['added'] += 1
-                        except Exception as e:
-                            logger.error(f"上传文件失败: {local_file} -> {remote_file}, {str(e)}")
-                            stats['failed'] += 1
+                    for name in names:
+                        files.append((
+                            os.path.join(root, name),
+                            os.path.join(remote_path, rel_path, name).replace('\\', '/')
+                        ))
             else:
                 # 非递归模式，只上传根目录下的文件
                 for item in os.listdir(local_path):
                     local_item_path = os.path.join(local_path, item)
-                    remote_item_path = os.path.join(remote_path, item).replace('\\', '/')
-                    
-                    # 只处理文件，跳过目录
                     if os.path.isfile(local_item_path):
-                        try:
-                            # 检查远程文件是否存在
-                            try:
-                                remote_stat = sftp.stat(remote_item_path)
-                                remote_size = remote_stat.st_size
-                                local_size = os.path.getsize(local_item_path)
-                                
-                                # 如果大小不同，则更新文件
-                                if remote_size != local_size:
-                                    sftp.put(local_item_path, remote_item_path)
-                                    stats['updated'] += 1
-                                else:
-                                    stats['unchanged'] += 1
-                            except FileNotFoundError:
-                                # 远程文件不存在，直接上传
-                                sftp.put(local_item_path, remote_item_path)
-                                stats['added'] += 1
-                        except Exception as e:
-                            logger.error(f"上传文件失败: {local_item_path} -> {remote_item_path}, {str(e)}")
-                            stats['failed'] += 1
+                        files.append((local_item_path, os.path.join(remote_path, item).replace('\\', '/')))
             
-            # 关闭SFTP会话
-            sftp.close()
+            # 一条命令创建所有远程子目录
+            if len(remote_dirs) > 1:
+                result = self.execute_command('mkdir -p ' + ' '.join(shlex.quote(d) for d in remote_dirs[1:]))
+                if result.returncode != 0:
+                    logger.error(f"创建远程子目录失败: {result.stderr}")
+            
+            progress = {
+                'files_done': 0,
+                'files_total': len(files),
+                'bytes_done': 0,
+                'bytes_total': sum(os.path.getsize(local_file) for local_file, _ in files),
+            }
+            if progress_callback:
+                progress_callback(dict(progress))
+            
+            manifest = None
+            transfers = None
+            if use_manifest:
+                manifest = SyncManifest.load_remote(self, remote_path)
+                transfers = self._plan_by_manifest(files, remote_path, manifest, stats, progress)
+            
+            if transfers is None:
+                manifest = None
+                # 获取SSH连接，每个远程目录列出一次已有文件的大小
+                ssh = self.get_connection()
+                sftp = ssh.open_sftp()
+                remote_sizes = self._list_remote_sizes(sftp, remote_dirs)
+                sftp.close()
+                sftp = None
+                
+                transfers = []
+                for local_file, remote_file in files:
+                    local_size = os.path.getsize(local_file)
+                    remote_size = remote_sizes.get(remote_file)
+                    if remote_size == local_size:
+                        stats['unchanged'] += 1
+                        progress['files_done'] += 1
+                        progress['bytes_done'] += local_size
+                    else:
+                        # 远程文件不存在时新增，大小不同时更新
+                        transfers.append((local_file, remote_file, local_size, 'added' if remote_size is None else 'updated'))
+            if progress_callback and stats['unchanged']:
+                progress_callback(dict(progress))
+            
+            uploaded = []
+            if bulk_threshold and len(transfers) >= bulk_threshold:
+                transfers = self._tar_upload(transfers, remote_path, stats, progress, progress_callback, compress, uploaded)
+            
+            self._transfer_files(transfers, 'put', stats, progress, progress_callback, sessions, uploaded)
+            
+            if manifest is not None:
+                # 只记录本次上传成功的文件，上传失败的文件远程仍是旧内容，下次同步时需要重新上传；
+                # 内容未变的文件已在 _plan_by_manifest 中记录
+                self._record_manifest([(local_file, remote_file) for local_file, remote_file, _, _ in uploaded],
+                                      remote_path, manifest)
             
             summary = f"目录上传完成！新增:{stats['added']}, 更新:{stats['updated']}, 未变更:{stats['unchanged']}, 失败:{stats['failed']}"
             return True, summary, stats
@@ -1003,15 +1088,29 @@ class SSHClientTool:
         except Exception as e:
             logger.error(f"上传目录失败: {str(e)}")
             return False, f"上传目录失败: {str(e)}", stats
+        finally:
+            # 关闭SFTP会话（进度回调抛出异常中止上传时也需要关闭）
+            if sftp:
+                sftp.close()
     
-    def download_directory(self, remote_path: str, local_path: str, recursive: bool = True) -> Tuple[bool, str, Dict]:
+    def download_directory(self, remote_path: str, local_path: str, recursive: bool = True,
+                           sessions: Optional[int] = None, bulk_threshold: int = 0,
+                           compress: bool = False, use_manifest: bool = False) -> Tuple[bool, str, Dict]:
         """
         从远程服务器下载目录
         
+        先列出远程目录树，需要下载的文件（本地不存在或大小不同）由多个SFTP会话并行传输；
+        需要下载的文件数达到 bulk_threshold 时先通过tar流一次性传输，见 _tar_download。
+        use_manifest 时下载完成后把本次下载的文件的哈希记录到同步清单，之后可以按内容直接在资产之间复制
+        
         Args:
             remote_path: 远程目录路径
             local_path: 本地目录路径
             recursive: 是否递归下载子目录
+            sessions: 并行SFTP会话数，为空时使用 self.transfer_sessions
+            bulk_threshold: 使用tar流批量传输的最少文件数，0表示不使用
+            compress: tar流是否使用gzip压缩
+            use_manifest: 是否把本次下载的文件记录到同步清单
         
         Returns:
             Tuple[bool, str, Dict]: (成功标志, 消息, 统计信息)
@@ -1022,6 +1121,7 @@ class SSHClientTool:
             'unchanged': 0,  # 未变更文件数
             'failed': 0      # 失败文件数
         }
+        sftp = None
         
         try:
             # 确保本地目录存在
@@ -1031,80 +1131,57 @@ class SSHClientTool:
             ssh = self.get_connection()
             sftp = ssh.open_sftp()
             
-            if recursive:
-                # 递归下载目录
-                def download_dir(sftp, remote_dir, local_dir):
-                    try:
-                        sftp.chdir(remote_dir)
-                        os.makedirs(local_dir, exist_ok=True)
-                        
-                        for entry in sftp.listdir_attr():
-                            remote_path = os.path.join(remote_dir, entry.filename).replace('\\', '/')
-                            local_path = os.path.join(local_dir, entry.filename)
-                            
-                            if stat.S_ISDIR(entry.st_mode):
-                                download_dir(sftp, remote_path, local_path)
-                            else:
-                                try:
-                                    # 检查本地文件是否存在
-                                    if os.path.exists(local_path):
-                                        local_size = os.path.getsize(local_path)
-                                        remote_size = entry.st_size
-                                        
-                                        # 如果大小不同，则更新文件
-                                        if local_size != remote_size:
-                                            sftp.get(remote_path, local_path)
-                                            stats['updated'] += 1
-                                        else:
-                                            stats['unchanged'] += 1
-                                    else:
-                                        # 本地文件不存在，直接下载
-                                        sftp.get(remote_path, local_path)
-                                        stats['added'] += 1
-                                except Exception as e:
-                                    logger.error(f"下载文件失败: {remote_path} -> {local_path}, {str(e)}")
-                                    stats['failed'] += 1
-                    except Exception as e:
-                        logger.error(f"下载目录失败: {remote_dir}, {str(e)}")
-                        stats['failed'] += 1
-                
-                # 开始递归下载
-                download_dir(sftp, remote_path, local_path)
-            else:
-                # 非递归模式，只下载根目录下的文件
+            transfers = []
+            files = []
+            
+            def collect(remote_dir, local_dir):
+                # 列出远程目录，非递归模式只处理根目录下的文件
                 try:
-                    # 列出远程目录中的文件和文件夹
-                    for entry in sftp.listdir_attr(remote_path):
-                        remote_item_path = os.path.join(remote_path, entry.filename).replace('\\', '/')
-                        local_item_path = os.path.join(local_path, entry.filename)
-                        
-                        # 只处理文件，跳过目录
-                        if not stat.S_ISDIR(entry.st_mode):
-                            try:
-                                # 检查本地文件是否存在
-                                if os.path.exists(local_item_path):
-                                    local_size = os.path.getsize(local_item_path)
-                                    remote_size = entry.st_size
-                                    
-                                    # 如果大小不同，则更新文件
-                                    if local_size != remote_size:
-                                        sftp.get(remote_item_path, local_item_path)
-                                        stats['updated'] += 1
-                                    else:
-                                        stats['unchanged'] += 1
-                                else:
-                                    # 本地文件不存在，直接下载
-                                    sftp.get(remote_item_path, local_item_path)
-                                    stats['added'] += 1
-                            except Exception as e:
-                                logger.error(f"下载文件失败: {remote_item_path} -> {local_item_path}, {str(e)}")
-                                stats['failed'] += 1
+                    entries = sftp.listdir_attr(remote_dir)
                 except Exception as e:
-                    logger.error(f"列出远程目录失败: {remote_path}, {str(e)}")
+                    logger.error(f"列出远程目录失败: {remote_dir}, {str(e)}")
                     stats['failed'] += 1
-            
-            # 关闭SFTP会话
+                    return
+                os.makedirs(local_dir, exist_ok=True)
+                for entry in entries:
+                    remote_item_path = os.path.join(remote_dir, entry.filename).replace('\\', '/')
+                    local_item_path = os.path.join(local_dir, entry.filename)
+                    if stat.S_ISDIR(entry.st_mode):
+                        if recursive:
+                            collect(remote_item_path, local_item_path)
+                        continue
+                    files.append((local_item_path, remote_item_path))
+                    if not os.path.exists(local_item_path):
+                        # 本地文件不存在，直接下载
+                        transfers.append((remote_item_path, local_item_path, entry.st_size, 'added'))
+                    elif os.path.getsize(local_item_path) != entry.st_size:
+                        # 如果大小不同，则更新文件
+                        transfers.append((remote_item_path, local_item_path, entry.st_size, 'updated'))
+                    else:
+                        stats['unchanged'] += 1
+            
+            collect(remote_path, local_path)
             sftp.close()
+            sftp = None
+            planned = list(transfers)
+            
+            if bulk_threshold and len(transfers) >= bulk_threshold:
+                transfers = self._tar_download(transfers, remote_path, local_path, stats, compress)
+            
+            self._transfer_files(transfers, 'get', stats, sessions=sessions)
+            
+            if use_manifest:
+                # 只有本次完整下载的文件内容与远程一致，其本地哈希即远程文件的哈希；
+                # 按大小跳过的文件可能内容不同或已在本地修改（如编辑过的标注），不记录
+                manifest = SyncManifest.load_remote(self, remote_path)
+                downloaded = [
+                    (local_file, remote_file) for remote_file, local_file, size, _ in planned
+                    if os.path.isfile(local_file) and os.path.getsize(local_file) == size
+                ]
+                for local_file, _ in downloaded:
+                    manifest.local_hash(local_file)
+                manifest.retain_local({local_file for local_file, _ in files if os.path.isfile(local_file)})
+                self._record_manifest(downloaded, remote_path, manifest)
             
             summary = f"目录下载完成！新增:{stats['added']}, 更新:{stats['updated']}, 未变更:{stats['unchanged']}, 失败:{stats['failed']}"
             return True, summary, stats
@@ -1112,8 +1189,377 @@ class SSHClientTool:
         except Exception as e:
             logger.error(f"下载目录失败: {str(e)}")
             return False, f"下载目录失败: {str(e)}", stats
+        finally:
+            if sftp:
+                sftp.close()
+
+    def _list_remote_sizes(self, sftp, remote_dirs: List[str]) -> Dict[str, int]:
+        """列出远程目录中文件的大小，返回 {远程文件路径: 大小}，不存在的目录跳过"""
+        remote_sizes = {}
+        for remote_dir in remote_dirs:
+            try:
+                for entry in sftp.listdir_attr(remote_dir):
+                    if not stat.S_ISDIR(entry.st_mode):
+                        remote_sizes[f"{remote_dir.rstrip('/')}/{entry.filename}"] = entry.st_size
+            except IOError:
+                # 远程目录不存在，其中的文件都需要上传
+                pass
+        return remote_sizes
+
+    def _remote_stat(self, remote_path: str) -> Optional[Dict[str, Tuple[int, int]]]:
+        """
+        一条命令列出远程目录下所有文件的大小和修改时间
+        
+        Returns:
+            {相对路径: (大小, 修改时间)}，目录不存在时为空字典，远程不支持 find/stat 时返回None
+        """
+        root = remote_path.rstrip('/')
+        result = self.execute_command(
+            f"cd {shlex.quote(root)} 2>/dev/null || exit 0; find . -type f -exec stat -c '%s %Y %n' {{}} +"
+        )
+        if result.returncode != 0:
+            logger.warning(f"批量获取远程文件信息失败: {result.stderr}")
+            return None
+        entries = {}
+        for line in result.stdout.splitlines():
+            parts = line.split(' ', 2)
+            if len(parts) == 3 and parts[0].isdigit() and parts[1].isdigit():
+                entries[parts[2][2:] if parts[2].startswith('./') else parts[2]] = (int(parts[0]), int(parts[1]))
+        return entries
+
+    def _remote_sha256(self, remote_path: str, rel_paths: List[str]) -> Dict[str, str]:
+        """一条命令计算远程目录下多个文件的SHA256，返回 {相对路径: 哈希}"""
+        if not rel_paths:
+            return {}
+        root = remote_path.rstrip('/')
+        result = self.execute_with_input(
+            f"cd {shlex.quote(root)} && xargs -0 -r sha256sum --",
+            ''.join(f"./{rel_path}\0" for rel_path in rel_paths)
+        )
+        hashes = {}
+        for line in result.stdout.splitlines():
+            digest, _, name = line.partition('  ')
+            if len(digest) == 64 and name:
+                hashes[name[2:] if name.startswith('./') else name] = digest
+        return hashes
+
+    def _plan_by_manifest(self, files: List[Tuple[str, str]], remote_path: str, manifest: SyncManifest,
+                          stats: Dict, progress: Dict) -> Optional[List[Tuple[str, str, int, str]]]:
+        """
+        按同步清单和内容哈希确定需要上传的文件
+        
+        一条命令批量获取远程所有文件的大小和修改时间：大小不同的文件直接上传；
+        大小和修改时间与清单记录一致的文件使用记录的哈希；其余文件再用一条命令批量计算远程哈希。
+        本地哈希在文件大小和修改时间未变时同样复用清单记录。
+        
+        Returns:
+            需要上传的文件 [(本地路径, 远程路径, 文件大小, 'added' / 'updated')]，远程不支持批量命令时返回None
+        """
+        root = remote_path.rstrip('/')
+        remote = self._remote_stat(root)
+        if remote is None:
+            return None
+        
+        candidates = []
+        to_hash = []
+        for local_file, remote_file in files:
+            rel_path = remote_file[len(root):].lstrip('/')
+            size, digest = manifest.local_hash(local_file)
+            remote_entry = remote.get(rel_path)
+            if remote_entry is None or remote_entry[0] != size:
+                candidates.append((local_file, remote_file, rel_path, size, digest, None))
+                continue
+            remote_digest = manifest.remote_hash(rel_path, *remote_entry)
+            if remote_digest is None:
+                to_hash.append(rel_path)
+            candidates.append((local_file, remote_file, rel_path, size, digest, remote_digest))
+        manifest.retain_local({local_file for local_file, _ in files})
+        
+        hashed = self._remote_sha256(root, to_hash)
+        transfers = []
+        for local_file, remote_file, rel_path, size, digest, remote_digest in candidates:
+            remote_entry = remote.get(rel_path)
+            remote_digest = remote_digest or hashed.get(rel_path)
+            if remote_entry is not None and remote_digest == digest:
+                stats['unchanged'] += 1
+                progress['files_done'] += 1
+                progress['bytes_done'] += size
+                manifest.record_remote(rel_path, remote_entry[0], remote_entry[1], digest)
+            else:
+                transfers.append((local_file, remote_file, size, 'added' if remote_entry is None else 'updated'))
+        return transfers
+
+    def _record_manifest(self, files: List[Tuple[str, str]], remote_path: str, manifest: SyncManifest):
+        """传输完成后一条命令获取远程文件的大小和修改时间，把 files 中已传输成功的文件记录到同步清单"""
+        root = remote_path.rstrip('/')
+        remote = self._remote_stat(root)
+        if remote is None:
+            return
+        for local_file, remote_file in files:
+            rel_path = remote_file[len(root):].lstrip('/')
+            entry = manifest.local.get(local_file)
+            remote_entry = remote.get(rel_path)
+            if entry and remote_entry and remote_entry[0] == entry[0]:
+                manifest.record_remote(rel_path, remote_entry[0], remote_entry[1], entry[2])
+        manifest.retain_remote(set(remote))
+        manifest.save()
+
+    def has_tar(self) -> bool:
+        """远程主机是否有tar命令，结果在本对象上缓存"""
+        if getattr(self, '_tar_available', None) is None:
+            self._tar_available = self.execute_command('command -v tar').returncode == 0
+            if not self._tar_available:
+                logger.warning(f"{self.hostname} 上没有tar命令，批量传输回退为SFTP")
+        return self._tar_available
+
+    def _tar_upload(self, transfers: List[Tuple[str, str, int, str]], remote_path: str, stats: Dict,
+                    progress: Dict, progress_callback: Optional[Callable[[Dict], None]] = None,
+                    compress: bool = False, done: Optional[List] = None) -> List[Tuple[str, str, int, str]]:
+        """
+        把待上传的文件打成tar流，通过一个exec通道由远程 tar -x 解包
+        
+        大量小文件时省去逐个文件的SFTP往返。解包后列出远程目录核对文件大小，
+        远程没有tar、解包失败或大小不一致的文件交给SFTP重新上传。
+        
+        Args:
+            transfers: [(本地路径, 远程路径, 文件大小, 'added' / 'updated')]，远程路径都在 remote_path 下
+            remote_path: 远程根目录，tar解包的目标目录
+            stats: 统计信息，核对通过的文件累加到 added/updated
+            progress: 进度字典
+            progress_callback: 进度回调，抛出异常时关闭通道并重新抛出
+            compress: 是否使用gzip压缩
+            done: 核对通过的文件追加到此列表
+        
+        Returns:
+            需要通过SFTP上传的文件
+        """
+        if not self.has_tar():
+            return transfers
+        
+        root = remote_path.rstrip('/')
+        flag = 'z' if compress else ''
+        files_done, bytes_done = progress['files_done'], progress['bytes_done']
+        callback_errors = []
+        channel = None
+        try:
+            ssh = self.get_connection()
+            stdin, stdout, stderr = ssh.exec_command(f"tar -x{flag}f - -C {shlex.quote(root)}")
+            channel = stdin.channel
+            with tarfile.open(fileobj=stdin, mode=f"w|{'gz' if compress else ''}", bufsize=TAR_CHUNK_SIZE) as tar:
+                for local_file, remote_file, size, _ in transfers:
+                    tar.add(local_file, arcname=remote_file[len(root):].lstrip('/'), recursive=False)
+                    progress['files_done'] += 1
+                    progress['bytes_done'] += size
+                    if progress_callback:
+                        try:
+                            progress_callback(dict(progress))
+                        except Exception as e:
+                            callback_errors.append(e)
+                            raise
+            channel.shutdown_write()
+            exit_status = channel.recv_exit_status()
+            if exit_status != 0:
+                raise IOError(f"远程tar解包失败: {stderr.read().decode('utf-8', 'replace').strip()}")
+        except Exception as e:
+            if channel is not None:
+                channel.close()
+            if callback_errors:
+                # 进度回调抛出的异常（如任务取消）中止整个上传
+                raise
+            logger.warning(f"tar流上传失败，回退为SFTP: {str(e)}")
+            progress['files_done'], progress['bytes_done'] = files_done, bytes_done
+            return transfers
+        
+        # 核对远程文件的大小
+        sftp = self.get_connection().open_sftp()
+        try:
+            remote_dirs = {remote_file.rsplit('/', 1)[0] for _, remote_file, _, _ in transfers}
+            remote_sizes = self._list_remote_sizes(sftp, sorted(remote_dirs))
+        finally:
+            sftp.close()
+        
+        retry = []
+        for item in transfers:
+            _, remote_file, size, action = item
+            if remote_sizes.get(remote_file) == size:
+                stats[action] += 1
+                if done is not None:
+                    done.append(item)
+            else:
+                retry.append(item)
+                progress['files_done'] -= 1
+                progress['bytes_done'] -= size
+        if retry:
+            logger.warning(f"tar流上传后有 {len(retry)} 个文件大小不一致，改用SFTP上传")
+        logger.info(f"tar流上传完成: {len(transfers) - len(retry)} 个文件 -> {root}")
+        return retry
+
+    def _tar_download(self, transfers: List[Tuple[str, str, int, str]], remote_path: str, local_path: str,
+                      stats: Dict, compress: bool = False) -> List[Tuple[str, str, int, str]]:
+        """
+        由远程 tar -c 把待下载的文件打成tar流，通过一个exec通道读取并在本地解包
+        
+        解包后核对本地文件大小，远程没有tar、打包失败或大小不一致的文件交给SFTP重新下载。
+        
+        Args:
+            transfers: [(远程路径, 本地路径, 文件大小, 'added' / 'updated')]，都在对应的根目录下
+            remote_path: 远程根目录
+            local_path: 本地根目录
+            stats: 统计信息，核对通过的文件累加到 added/updated
+            compress: 是否使用gzip压缩
+        
+        Returns:
+            需要通过SFTP下载的文件
+        """
+        if not self.has_tar():
+            return transfers
+        
+        root = remote_path.rstrip('/')
+        local_root = os.path.abspath(local_path)
+        flag = 'z' if compress else ''
+        channel = None
+        try:
+            ssh = self.get_connection()
+            stdin, stdout, stderr = ssh.exec_command(f"tar -c{flag}f - -C {shlex.quote(root)} -T -")
+            channel = stdin.channel
+            # 文件列表在独立线程中写入，避免远程输出填满窗口时双方互相等待；加 ./ 前缀防止以 - 开头的文件名被当作选项
+            names = ''.join(f"./{remote_file[len(root):].lstrip('/')}\n" for remote_file, _, _, _ in transfers)
+            
+            def write_names():
+                try:
+                    stdin.write(names)
+                    stdin.flush()
+                    channel.shutdown_write()
+                except Exception as e:
+                    logger.error(f"写入tar文件列表失败: {str(e)}")
+            writer = threading.Thread(target=write_names, daemon=True)
+            writer.start()
+            
+            with tarfile.open(fileobj=stdout, mode=f"r|{'gz' if compress else ''}", bufsize=TAR_CHUNK_SIZE) as tar:
+                for member in tar:
+                    if not member.isfile():
+                        continue
+                    target = os.path.abspath(os.path.join(local_root, os.path.normpath(member.name)))
+                    if not target.startswith(local_root + os.sep):
+                        logger.warning(f"跳过tar流中路径越界的文件: {member.name}")
+                        continue
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    with tar.extractfile(member) as src, open(target, 'wb') as dst:
+                        shutil.copyfileobj(src, dst, TAR_CHUNK_SIZE)
+            writer.join()
+            exit_status = channel.recv_exit_status()
+            if exit_status != 0:
+                logger.warning(f"远程tar打包返回 {exit_status}: {stderr.read().decode('utf-8', 'replace').strip()}")
+        except Exception as e:
+            if channel is not None:
+                channel.close()
+            logger.warning(f"tar流下载失败，回退为SFTP: {str(e)}")
+        
+        # 核对本地文件的大小，部分成功时只重新下载不一致的文件
+        retry = []
+        for item in transfers:
+            _, local_file, size, action = item
+            if os.path.isfile(local_file) and os.path.getsize(local_file) == size:
+                stats[action] += 1
+            else:
+                retry.append(item)
+        if retry:
+            logger.warning(f"tar流下载后有 {len(retry)} 个文件缺失或大小不一致，改用SFTP下载")
+        logger.info(f"tar流下载完成: {len(transfers) - len(retry)} 个文件 <- {root}")
+        return retry
+
+    def _transfer_files(self, transfers: List[Tuple[str, str, int, str]], direction: str, stats: Dict,
+                        progress: Optional[Dict] = None,
+                        progress_callback: Optional[Callable[[Dict], None]] = None,
+                        sessions: Optional[int] = None, done: Optional[List] = None):
+        """
+        在同一SSH连接上打开多个SFTP会话并行传输文件
+        
+        高延迟链路上逐个文件传输的耗时主要是往返等待，多个会话同时传输可以重叠这些等待。
+        每个会话由一个线程持有，从共享队列中取文件；单个文件失败时重新打开会话重试，
+        超过 TRANSFER_RETRIES 次后计入 stats['failed']。
+        进度回调在持有锁时调用，回调抛出异常时停止所有会话并在调用线程重新抛出。
+        
+        Args:
+            transfers: [(源路径, 目标路径, 文件大小, 'added' / 'updated')]
+            direction: 'put' 上传 / 'get' 下载
+            stats: 统计信息，按结果累加 added/updated/failed
+            progress: 进度字典，每完成一个文件累加 files_done/bytes_done
+            progress_callback: 进度回调
+            sessions: 并行会话数，为空时使用 self.transfer_sessions
+            done: 传输成功的文件追加到此列表
+        """
+        if not transfers:
+            return
+        
+        pending = queue.Queue()
+        for item in transfers:
+            pending.put(item)
+        lock = threading.Lock()
+        abort = threading.Event()
+        errors = []
+        ssh = self.get_connection()
+        
+        def worker():
+            sftp = None
+            try:
+                while not abort.is_set():
+                    try:
+                        item = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    source, target, size, action = item
+                    
+                    succeeded = False
+                    for attempt in range(1 + TRANSFER_RETRIES):
+                        try:
+                            if sftp is None:
+                                sftp = ssh.open_sftp()
+                            getattr(sftp, direction)(source, target)
+                            succeeded = True
+                            break
+                        except Exception as e:
+                            logger.warning(f"传输文件失败 (第 {attempt + 1} 次): {source} -> {target}, {str(e)}")
+                            # 会话可能已断开，下次重试时重新打开
+                            try:
+                                if sftp is not None:
+                                    sftp.close()
+                            except Exception:
+                                pass
+                            sftp = None
+                    
+                    with lock:
+                        if succeeded:
+                            stats[action] += 1
+                            if done is not None:
+                                done.append(item)
+                        else:
+                            logger.error(f"传输文件失败: {source} -> {target}")
+                            stats['failed'] += 1
+                        if progress is not None:
+                            progress['files_done'] += 1
+                            progress['bytes_done'] += size
+                            if progress_callback and not abort.is_set():
+                                try:
+                                    progress_callback(dict(progress))
+                                except Exception as e:
+                                    errors.append(e)
+                                    abort.set()
+            finally:
+                if sftp is not None:
+                    sftp.close()
+        
+        workers = [
+            threading.Thread(target=worker, name=f"sftp-{direction}-{i}", daemon=True)
+            for i in range(max(1, min(sessions or self.transfer_sessions, len(transfers))))
+        ]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        if errors:
+            raise errors[0]
 
-    
     def close(self):
         """
         关闭SSH连接
@@ -0,0 +1,126 @@
+import os
+import json
+import hashlib
+import threading
+from typing import Dict, Optional, Tuple
+from ..config import Config
+from .logger import setup_logger
+
+logger = setup_logger('sync_manifest')
+
+# 同步清单保存目录
+MANIFEST_DIR = os.path.join(Config.DATA_DIR, 'sync_manifests')
+
+# 清单格式版本，格式变化时旧清单作废
+MANIFEST_VERSION = 1
+
+# 读取文件计算哈希的块大小
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# 同一清单文件的读写锁
+_locks: Dict[str, threading.Lock] = {}
+_locks_lock = threading.Lock()
+
+
+def file_sha256(path: str) -> str:
+    """计算文件内容的SHA256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SyncManifest:
+    """
+    目录同步清单
+
+    每个 (资产, 远程目录) 一份，保存在本地 data/sync_manifests 下：
+    - local: 本地文件 -> (大小, 修改时间, sha256)，大小和修改时间未变的文件不重新计算哈希
+    - remote: 远程相对路径 -> (大小, 修改时间, sha256)，上次同步后远程文件的状态，
+      远程大小和修改时间未变时直接使用记录的哈希，不需要在远程重新计算
+    """
+
+    def __init__(self, key: str):
+        """
+        Args:
+            key: 清单标识，通常为 用户@主机:端口/远程目录
+        """
+        self.key = key
+        self.path = os.path.join(MANIFEST_DIR, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+        self.local: Dict[str, list] = {}
+        self.remote: Dict[str, list] = {}
+        with _locks_lock:
+            self._lock = _locks.setdefault(self.path, threading.Lock())
+
+    @classmethod
+    def load(cls, key: str) -> 'SyncManifest':
+        """读取清单，不存在或已损坏时返回空清单"""
+        manifest = cls(key)
+        with manifest._lock:
+            try:
+                if os.path.exists(manifest.path):
+                    with open(manifest.path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    if data.get('version') == MANIFEST_VERSION and data.get('key') == key:
+                        manifest.local = data.get('local') or {}
+                        manifest.remote = data.get('remote') or {}
+            except Exception as e:
+                logger.warning(f"读取同步清单失败 {manifest.path}: {str(e)}")
+        return manifest
+
+    @classmethod
+    def load_remote(cls, ssh_client, remote_path: str) -> 'SyncManifest':
+        """读取某个资产上远程目录的清单"""
+        return cls.load(f"{ssh_client.username}@{ssh_client.hostname}:{ssh_client.port}{remote_path.rstrip('/')}")
+
+    def save(self):
+        """写入清单（先写临时文件再替换，避免中途退出留下损坏的清单）"""
+        with self._lock:
+            try:
+                os.makedirs(MANIFEST_DIR, exist_ok=True)
+                tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({
+                        'version': MANIFEST_VERSION,
+                        'key': self.key,
+                        'local': self.local,
+                        'remote': self.remote
+                    }, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                logger.error(f"保存同步清单失败 {self.path}: {str(e)}")
+
+    def local_hash(self, path: str) -> Tuple[int, str]:
+        """
+        获取本地文件的大小和哈希，大小和修改时间与清单一致时使用记录的哈希
+
+        Returns:
+            (大小, sha256)
+        """
+        st = os.stat(path)
+        entry = self.local.get(path)
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime:
+            return st.st_size, entry[2]
+        digest = file_sha256(path)
+        self.local[path] = [st.st_size, st.st_mtime, digest]
+        return st.st_size, digest
+
+    def remote_hash(self, rel_path: str, size: int, mtime: int) -> Optional[str]:
+        """远程文件的大小和修改时间与上次同步时一致时返回记录的哈希"""
+        entry = self.remote.get(rel_path)
+        if entry and entry[0] == size and entry[1] == mtime:
+            return entry[2]
+        return None
+
+    def record_remote(self, rel_path: str, size: int, mtime: int, digest: str):
+        """记录远程文件的状态"""
+        self.remote[rel_path] = [size, mtime, digest]
+
+    def retain_local(self, paths):
+        """只保留本次同步涉及的本地文件记录"""
+        self.local = {path: entry for path, entry in self.local.items() if path in paths}
+
+    def retain_remote(self, rel_paths):
+        """只保留仍存在于远程的记录"""
+        self.remote = {path: entry for path, entry in self.remote.items() if path in rel_paths}
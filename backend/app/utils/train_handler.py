@@ -83,22 +83,7 @@ class TrainRequestHandler:
         try:
             # 获取所有任务列表
             tasks_data = self.get_tasks(train_headers)
-            
-            # 从任务列表中查找指定任务
-            task_info = None
-            for task in tasks_data:
-                if task.get('id') == task_id:
-                    task_info = task
-                    break
-                    
-            # 如果没有找到任务，返回处理中状态
-            if not task_info:
-                return "NOT_FOUND"
-                
-            # 提取任务状态信息
-            task_status = task_info.get('status', '')
-            # 根据状态判断任务是否完成
-            return task_status
+            return self.find_task_status(tasks_data, task_id)
                 
         except Exception as e:
             logger.error(f"检查任务状态出错: {str(e)}", exc_info=True)
@@ -198,11 +183,40 @@ class TrainRequestHandler:
         
         return data
 
-    def get_tasks(self, train_headers: Optional[Dict[str, Any]] = None) -> Dict:
+    @staticmethod
+    def find_task_status(tasks_data: List[Dict[str, Any]], task_id: str) -> str:
         """
-        获取所有训练任务列表
-        :param train_config: 可选的训练配置参数
-        :return: 任务列表数据
+        从任务列表中查找指定任务的状态
+        :param tasks_data: get_tasks 返回的任务列表
+        :param task_id: 任务ID
+        :return: 任务状态，未找到时返回 NOT_FOUND
+        """
+        for task in tasks_data:
+            if task.get('id') == task_id:
+                # 提取任务状态信息
+                return task.get('status', '')
+        return "NOT_FOUND"
+
+    @staticmethod
+    def parse_tasks(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        解析 /api/tasks 的响应
+        :param data: 响应数据
+        :return: 任务列表
+        """
+        # 检查响应是否有效
+        if not isinstance(data, dict) or data.get('status') != 'success' or 'data' not in data:
+            logger.warning(f"训练任务列表响应格式无效: {data}")
+            raise ValueError("训练任务列表响应格式无效")
+        
+        # 标准化返回格式
+        return data.get('data', {}).get('tasks', [])
+
+    def get_tasks_response(self, train_headers: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        获取 /api/tasks 的原始响应数据
+        :param train_headers: 可选的请求头
+        :return: 响应数据
         """
         url = f"{self.api_base_url}/tasks"
         logger.debug(f"获取训练任务列表: {url}")
@@ -211,18 +225,17 @@ class TrainRequestHandler:
         if train_headers:
             headers.update(train_headers)
         
+        response = requests.get(url, headers=headers, timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+    def get_tasks(self, train_headers: Optional[Dict[str, Any]] = None) -> Dict:
+        """
+        获取所有训练任务列表
+        :param train_config: 可选的训练配置参数
+        :return: 任务列表数据
+        """
         try:
-            response = requests.get(url, headers=headers, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            # 检查响应是否有效
-            if data.get('status') != 'success' or 'data' not in data:
-                logger.warning(f"训练任务列表响应格式无效: {data}")
-                raise ValueError("训练任务列表响应格式无效")
-            
-            # 标准化返回格式
-            return data.get('data', {}).get('tasks', [])
+            return self.parse_tasks(self.get_tasks_response(train_headers))
         except Exception as e:
             raise ValueError(f"获取训练任务列表失败: {str(e)}") 
\ No newline at end of file
@@ -0,0 +1,53 @@
+"""
+独立的调度 worker 进程
+
+运行调度器、数据暂存、任务监控和资产健康探测，与 API 进程通过数据库协调：
+API 进程以 SCHEDULER_MODE=external 启动后不再运行调度器，只读写数据库和读取 worker 发布的运行时状态快照。
+可以启动多个 worker，通过领导者选举保证同一时刻只有一个在调度，其余作为热备。
+
+用法:
+    cd backend
+    python -m app.worker
+"""
+from .database import init_db
+from .utils.logger import setup_logger
+from .utils.ssh import close_ssh_connection_pool
+from .services.async_engine import AsyncEngine
+from .services.leader_election import LeaderElection
+from .services.task_services.scheduler_service import SchedulerService
+from .services.task_services.job_queue import JobRunner
+import threading
+import signal
+
+logger = setup_logger('worker')
+
+_shutdown = threading.Event()
+
+
+def _handle_signal(signum, frame):
+    logger.info(f"收到信号 {signum}，正在停止 worker...")
+    _shutdown.set()
+
+
+def main():
+    """启动 worker 并阻塞直到收到退出信号"""
+    signal.signal(signal.SIGINT, _handle_signal)
+    signal.signal(signal.SIGTERM, _handle_signal)
+
+    init_db()
+    SchedulerService.init_scheduler()
+    logger.info("调度 worker 已启动")
+
+    while not _shutdown.is_set():
+        _shutdown.wait(timeout=1)
+
+    # 先释放租约，其他 worker 可以立即接管
+    LeaderElection.stop()
+    JobRunner.stop()
+    AsyncEngine.stop()
+    close_ssh_connection_pool()
+    logger.info("调度 worker 已退出")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,23 @@
+import os
+import tempfile
+import unittest
+from sqlalchemy import create_engine
+from app.database import Base, SessionLocal
+from app.models import task, asset, job, setting, leader_lease, runtime_state  # noqa
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """使用临时SQLite数据库的测试基类，测试期间 get_db 绑定到临时数据库"""
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.engine = create_engine(f'sqlite:///{self.db_path}', connect_args={'check_same_thread': False})
+        Base.metadata.create_all(self.engine)
+        self._original_bind = SessionLocal.kw.get('bind')
+        SessionLocal.configure(bind=self.engine)
+
+    def tearDown(self):
+        SessionLocal.configure(bind=self._original_bind)
+        self.engine.dispose()
+        os.remove(self.db_path)
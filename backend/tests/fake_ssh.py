@@ -0,0 +1,127 @@
+import os
+import shutil
+import subprocess
+from types import SimpleNamespace
+from app.utils.ssh import SSHClientTool
+
+
+class FakeChannel:
+    """以本地 bash 子进程模拟 exec 通道，管道缓冲区相当于通道窗口"""
+
+    def __init__(self, process: subprocess.Popen):
+        self.process = process
+
+    def recv(self, size: int) -> bytes:
+        return self.process.stdout.read1(size)
+
+    def sendall(self, data: bytes):
+        self.process.stdin.write(data)
+
+    def shutdown_write(self):
+        if not self.process.stdin.closed:
+            try:
+                self.process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    def recv_exit_status(self) -> int:
+        return self.process.wait()
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+
+
+class FakeStdin:
+    def __init__(self, channel: FakeChannel):
+        self.channel = channel
+
+    def write(self, data):
+        self.channel.sendall(data.encode('utf-8') if isinstance(data, str) else data)
+
+    def flush(self):
+        self.channel.process.stdin.flush()
+
+
+class FakeOutput:
+    def __init__(self, channel: FakeChannel, stream):
+        self.channel = channel
+        self.stream = stream
+
+    def read(self, size: int = -1) -> bytes:
+        return self.stream.read(size)
+
+
+class FakeSFTP:
+    """直接读写本地文件系统的SFTP会话，fail 中的路径在前 fail_times 次传输时失败"""
+
+    def __init__(self, connection: 'FakeConnection'):
+        self.connection = connection
+
+    def _maybe_fail(self, path: str):
+        remaining = self.connection.fail.get(path, 0)
+        if remaining:
+            self.connection.fail[path] = remaining - 1
+            raise IOError(f"模拟传输失败: {path}")
+
+    def put(self, local_path: str, remote_path: str):
+        self._maybe_fail(remote_path)
+        shutil.copyfile(local_path, remote_path)
+
+    def get(self, remote_path: str, local_path: str):
+        self._maybe_fail(remote_path)
+        shutil.copyfile(remote_path, local_path)
+
+    def listdir_attr(self, path: str):
+        return [
+            SimpleNamespace(filename=entry.name, st_mode=entry.stat().st_mode,
+                            st_size=entry.stat().st_size, st_mtime=int(entry.stat().st_mtime))
+            for entry in os.scandir(path)
+        ]
+
+    def stat(self, path: str):
+        return os.stat(path)
+
+    def mkdir(self, path: str):
+        os.mkdir(path)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """在本机执行命令和读写文件的 paramiko.SSHClient 替身，远程路径即本地路径"""
+
+    def __init__(self):
+        self.commands = []
+        self.fail = {}
+        self.env = None  # 执行命令的环境变量，可用于替换远程命令
+
+    def exec_command(self, command: str):
+        self.commands.append(command)
+        process = subprocess.Popen(['bash', '-c', command], stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=self.env)
+        channel = FakeChannel(process)
+        return FakeStdin(channel), FakeOutput(channel, process.stdout), FakeOutput(channel, process.stderr)
+
+    def open_sftp(self) -> FakeSFTP:
+        return FakeSFTP(self)
+
+
+class FakeSSHClient(SSHClientTool):
+    """使用 FakeConnection 的 SSHClientTool"""
+
+    def __init__(self, hostname: str = 'fake-host', **kwargs):
+        super().__init__(hostname=hostname, port=22, username='tester', **kwargs)
+        self.connection = FakeConnection()
+
+    def get_connection(self) -> FakeConnection:
+        return self.connection
+
+
+def write_file(path: str, content: str):
+    """写入测试文件，自动创建目录"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
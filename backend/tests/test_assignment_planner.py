@@ -0,0 +1,80 @@
+import unittest
+from app.services.task_services.assignment_planner import AssignmentPlanner, AssetCapacity
+from app.services.task_services.asset_selection_policy import LeastLoadedPolicy, MostFreeVramPolicy
+
+class AssignmentPlannerTestCase(unittest.TestCase):
+    """测试批量任务分配规划器"""
+
+    def test_assign_to_largest_remaining_capacity(self):
+        """测试任务优先分配给剩余容量最大的资产"""
+        capacities = [AssetCapacity(1, 1), AssetCapacity(2, 3)]
+        assignments, waiting = AssignmentPlanner.plan([10, 11, 12], capacities)
+
+        self.assertEqual([a.asset_id for a in assignments], [2, 2, 1])
+        self.assertEqual(waiting, [])
+
+    def test_no_over_assignment(self):
+        """测试同一次规划中不会超出资产容量"""
+        capacities = [AssetCapacity(1, 2), AssetCapacity(2, 1), AssetCapacity(3, 0)]
+        assignments, waiting = AssignmentPlanner.plan([1, 2, 3, 4, 5], capacities)
+
+        per_asset = {}
+        for assignment in assignments:
+            per_asset[assignment.asset_id] = per_asset.get(assignment.asset_id, 0) + 1
+        self.assertEqual(per_asset, {1: 2, 2: 1})
+        self.assertEqual(waiting, [4, 5])
+
+    def test_no_capacity(self):
+        """测试没有可用容量时所有任务继续等待"""
+        assignments, waiting = AssignmentPlanner.plan([1, 2], [])
+
+        self.assertEqual(assignments, [])
+        self.assertEqual(waiting, [1, 2])
+
+    def test_least_loaded_policy(self):
+        """测试最小负载策略优先选择占用比例低的资产"""
+        capacities = [
+            AssetCapacity(1, remaining=5, limit=10),
+            AssetCapacity(2, remaining=2, limit=2),
+        ]
+        assignments, _ = AssignmentPlanner.plan([1, 2], capacities, LeastLoadedPolicy())
+
+        self.assertEqual([a.asset_id for a in assignments], [2, 1])
+
+    def test_most_free_vram_policy(self):
+        """测试最大空闲显存策略按显存余量分摊任务"""
+        capacities = [
+            AssetCapacity(1, remaining=10, telemetry={'gpu_memory_total': 24, 'gpu_memory_used': 20}),
+            AssetCapacity(2, remaining=10, telemetry={'gpu_memory_total': 80, 'gpu_memory_used': 10}),
+        ]
+        assignments, _ = AssignmentPlanner.plan([1, 2, 3], capacities, MostFreeVramPolicy())
+
+        self.assertEqual([a.asset_id for a in assignments], [2, 2, 2])
+
+    def test_prefer_asset_with_local_data(self):
+        """测试训练任务优先分配到已有数据集的资产"""
+        capacities = [AssetCapacity(1, remaining=3), AssetCapacity(2, remaining=1)]
+        affinity = {11: {2: 120.0}}
+        assignments, waiting = AssignmentPlanner.plan([10, 11], capacities, affinity=affinity)
+
+        self.assertEqual([(a.task_id, a.asset_id) for a in assignments], [(10, 1), (11, 2)])
+        self.assertEqual(waiting, [])
+
+    def test_wait_for_busy_local_asset(self):
+        """测试本地资产很快空闲时继续等待，等待时间超过收益时使用其他资产"""
+        affinity = {10: {2: 300.0}}
+
+        assignments, waiting = AssignmentPlanner.plan(
+            [10], [AssetCapacity(1, remaining=1)], affinity=affinity, waits={2: 60.0}
+        )
+        self.assertEqual(assignments, [])
+        self.assertEqual(waiting, [10])
+
+        assignments, waiting = AssignmentPlanner.plan(
+            [10], [AssetCapacity(1, remaining=1)], affinity=affinity, waits={2: 600.0}
+        )
+        self.assertEqual([a.asset_id for a in assignments], [1])
+        self.assertEqual(waiting, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from app.utils import sync_manifest
+from app.utils.asset_transfer import AssetTransfer
+from app.utils.dataset_cache import RemoteDatasetCache, PeerSource
+from fake_ssh import FakeSSHClient, write_file
+
+
+def _sha256(content: str) -> str:
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class RemoteDatasetCacheTestCase(unittest.TestCase):
+    """测试数据集缓存的同步、资产间复制的哈希核对和硬链接失败时的回退"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.local_dir = os.path.join(self.root, 'local')
+        self.remote_dir = os.path.join(self.root, 'remote', 'task_1')
+        manifest_dir = mock.patch.object(sync_manifest, 'MANIFEST_DIR', os.path.join(self.root, 'manifests'))
+        manifest_dir.start()
+        self.addCleanup(manifest_dir.stop)
+        self.client = FakeSSHClient()
+        self.cache = RemoteDatasetCache(self.client, os.path.join(self.root, 'remote', 'cache'))
+        self.contents = {'a.png': 'image a', 'a.txt': 'caption a', 'b.png': 'image b', 'b.txt': 'caption a'}
+        for name, content in self.contents.items():
+            write_file(os.path.join(self.local_dir, name), content)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _remote_contents(self):
+        result = {}
+        for name in os.listdir(self.remote_dir):
+            with open(os.path.join(self.remote_dir, name), encoding='utf-8') as f:
+                result[name] = f.read()
+        return result
+
+    def test_sync_links_objects_and_reuses_content(self):
+        """测试相同内容只上传一次，重新同步只上传变化的内容"""
+        ok, message, stats = self.cache.sync(self.local_dir, self.remote_dir)
+        self.assertTrue(ok, message)
+        self.assertEqual((stats['added'], stats['unchanged']), (3, 1))
+        self.assertEqual(self._remote_contents(), self.contents)
+        self.assertEqual(os.stat(os.path.join(self.remote_dir, 'a.txt')).st_nlink, 3)
+
+        write_file(os.path.join(self.local_dir, 'b.txt'), 'caption b')
+        ok, message, stats = self.cache.sync(self.local_dir, self.remote_dir)
+        self.assertTrue(ok, message)
+        self.assertEqual((stats['added'], stats['unchanged']), (1, 3))
+        self.assertEqual(self._remote_contents()['b.txt'], 'caption b')
+        self.assertEqual(os.listdir(os.path.join(self.root, 'remote', 'cache', 'incoming')), [])
+
+    def test_peer_copy_rejects_changed_files(self):
+        """测试资产间复制的文件哈希不一致时改为从后端上传"""
+        peer_dir = os.path.join(self.root, 'peer')
+        write_file(os.path.join(peer_dir, 'a.png'), 'image a')
+        # 打标资产上的文件在记录哈希后被修改
+        write_file(os.path.join(peer_dir, 'b.png'), 'image b edited')
+        peer_client = FakeSSHClient('peer-host')
+        peer = PeerSource(AssetTransfer(peer_client, self.client), peer_dir, {
+            _sha256('image a'): 'a.png',
+            _sha256('image b'): 'b.png'
+        })
+
+        with mock.patch.object(AssetTransfer, 'can_connect_directly', return_value=False):
+            ok, message, stats = self.cache.sync(self.local_dir, self.remote_dir, peer=peer)
+
+        self.assertTrue(ok, message)
+        self.assertEqual((stats['added'], stats['peer']), (3, 1))
+        self.assertEqual(self._remote_contents(), self.contents)
+
+    def test_peer_copy_failure_falls_back_to_upload(self):
+        """测试资产间复制失败时全部从后端上传"""
+        peer = PeerSource(AssetTransfer(FakeSSHClient('peer-host'), self.client),
+                          os.path.join(self.root, 'missing'), {_sha256('image a'): 'a.png'})
+
+        with mock.patch.object(AssetTransfer, 'can_connect_directly', return_value=False), \
+                mock.patch.object(AssetTransfer, '_relay', side_effect=IOError('broken pipe')):
+            ok, message, stats = self.cache.sync(self.local_dir, self.remote_dir, peer=peer)
+
+        self.assertTrue(ok, message)
+        self.assertEqual((stats['added'], stats['peer']), (3, 0))
+        self.assertEqual(self._remote_contents(), self.contents)
+
+    def test_materialize_falls_back_to_copy(self):
+        """测试不能创建硬链接时复制对象，对象缺失时返回未能创建的文件名"""
+        self.assertTrue(self.cache.sync(self.local_dir, self.remote_dir)[0])
+        bin_dir = os.path.join(self.root, 'bin')
+        write_file(os.path.join(bin_dir, 'ln'), '#!/bin/sh\nexit 1\n')
+        os.chmod(os.path.join(bin_dir, 'ln'), 0o755)
+        self.client.connection.env = dict(os.environ, PATH=f"{bin_dir}:{os.environ['PATH']}")
+
+        entries = [('a.png', _sha256('image a')), ('gone.png', _sha256('not uploaded'))]
+        missing = self.cache._materialize(self.remote_dir, entries)
+
+        self.assertEqual(missing, ['gone.png'])
+        self.assertEqual(self._remote_contents(), {'a.png': 'image a'})
+        self.assertEqual(os.stat(os.path.join(self.remote_dir, 'a.png')).st_nlink, 1)
+
+    def test_failed_upload_leaves_no_partial_objects(self):
+        """测试上传中止（如进度回调抛出取消异常）时同步失败，批次目录被清理，不留下不完整的对象"""
+        def interrupted(transfers, *args, **kwargs):
+            shutil.copyfile(transfers[0][0], transfers[0][1])
+            raise InterruptedError('cancelled')
+
+        with mock.patch.object(FakeSSHClient, '_transfer_files', side_effect=interrupted):
+            ok, message, _ = self.cache.sync(self.local_dir, self.remote_dir)
+        self.assertFalse(ok)
+        self.assertIn('cancelled', message)
+        cache_dir = os.path.join(self.root, 'remote', 'cache')
+        self.assertEqual(os.listdir(os.path.join(cache_dir, 'objects')), [])
+        self.assertEqual(os.listdir(os.path.join(cache_dir, 'incoming')), [])
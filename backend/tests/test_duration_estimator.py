@@ -0,0 +1,31 @@
+import unittest
+from app.services.task_services.duration_estimator import DurationEstimator
+
+
+class DurationEstimatorTestCase(unittest.TestCase):
+    """测试训练时长估算"""
+
+    def test_training_steps(self):
+        """测试按图片数、重复次数、轮次和批量大小计算总步数"""
+        config = {'max_train_epochs': 10, 'repeat_num': 5, 'train_batch_size': 2}
+        self.assertEqual(DurationEstimator.training_steps(config, 20), 500)
+        self.assertIsNone(DurationEstimator.training_steps(config, 0))
+        self.assertIsNone(DurationEstimator.training_steps({'repeat_num': 5}, 20))
+
+    def test_fit_and_lookup_fallback(self):
+        """测试按资产和训练类型拟合每步耗时，并逐级回退"""
+        rates = DurationEstimator.fit([
+            (1, 'flux-lora', 100, 200),
+            (1, 'flux-lora', 100, 400),
+            (1, 'flux-lora', 100, 300),
+            (2, 'sd-lora', 100, 100),
+        ])
+
+        self.assertEqual(DurationEstimator.lookup_rate(rates, 1, 'flux-lora'), 3)
+        self.assertEqual(DurationEstimator.lookup_rate(rates, 2, 'flux-lora'), 3)
+        self.assertEqual(DurationEstimator.lookup_rate(rates, 2, 'sdxl-lora'), 1)
+        self.assertEqual(DurationEstimator.lookup_rate(rates, 3, 'sdxl-lora'), 2.5)
+        self.assertIsNone(DurationEstimator.lookup_rate({}, 1, 'flux-lora'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import math
+import unittest
+from app.services.task_services.eta_service import EtaService
+
+
+class EtaServiceTestCase(unittest.TestCase):
+    """测试ETA列表调度预测"""
+
+    def test_queue_fills_earliest_free_slot(self):
+        """测试等待任务依次放到最早空闲的槽位"""
+        slots = {1: [300.0], 2: [0.0, 600.0]}
+        durations = {10: 1000, 11: 200, 12: 100}
+        plan = EtaService.simulate(slots, [10, 11, 12], lambda task_id, asset_id: durations[task_id])
+
+        self.assertEqual(plan[10], (2, 0.0, 1000.0))
+        self.assertEqual(plan[11], (1, 300.0, 500.0))
+        self.assertEqual(plan[12], (1, 500.0, 600.0))
+
+    def test_unknown_duration_blocks_slot(self):
+        """测试无法估算时长的任务之后的槽位时间也无法估算"""
+        plan = EtaService.simulate({1: [0.0]}, [10, 11], lambda task_id, asset_id: None)
+
+        self.assertEqual(plan[10], (1, 0.0, math.inf))
+        self.assertTrue(math.isinf(plan[11][1]))
+
+    def test_no_slots(self):
+        """测试没有可用资产时不做预测"""
+        self.assertEqual(EtaService.simulate({}, [10], lambda task_id, asset_id: 100), {})
+
+if __name__ == '__main__':
+    unittest.main()
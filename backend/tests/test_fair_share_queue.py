@@ -0,0 +1,67 @@
+import unittest
+from datetime import datetime, timedelta
+from app.services.task_services.fair_share_queue import FairShareQueue, QueueEntry
+
+NOW = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def _entry(task_id, owner='a', priority=0, waited=0):
+    return QueueEntry(task_id=task_id, priority=priority, owner=owner, since=NOW - timedelta(seconds=waited))
+
+
+class FairShareQueueTestCase(unittest.TestCase):
+    """测试等待队列的优先级和公平分配排序"""
+
+    def test_bulk_owner_does_not_block_others(self):
+        """测试批量提交的用户不会阻塞其他用户的任务"""
+        entries = [_entry(i, 'bulk', waited=100 - i) for i in range(1, 6)] + [_entry(99, 'single', waited=10)]
+        ordered = FairShareQueue.order(entries, now=NOW)
+
+        self.assertEqual([e.task_id for e in ordered][:3], [1, 99, 2])
+
+    def test_higher_priority_first(self):
+        """测试高优先级任务优先，同一用户内也按优先级排序"""
+        entries = [_entry(1, 'a', waited=50), _entry(2, 'a', priority=2, waited=5), _entry(3, 'b', priority=1)]
+        ordered = FairShareQueue.order(entries, now=NOW)
+
+        self.assertEqual([e.task_id for e in ordered], [2, 3, 1])
+
+    def test_aging_prevents_starvation(self):
+        """测试低优先级任务等待足够久后提升到高优先级之前"""
+        entries = [_entry(1, 'a', priority=-1, waited=1900), _entry(2, 'b', priority=1, waited=10)]
+
+        self.assertEqual([e.task_id for e in FairShareQueue.order(entries, now=NOW)], [2, 1])
+        self.assertEqual([e.task_id for e in FairShareQueue.order(entries, now=NOW, aging_seconds=600)], [1, 2])
+
+    def test_running_tasks_and_weights(self):
+        """测试已占用资产较多的用户排在后面，权重高的用户获得更多份额"""
+        entries = [_entry(1, 'a', waited=100), _entry(2, 'b', waited=10)]
+        ordered = FairShareQueue.order(entries, running={'a': 2, 'b': 1}, now=NOW)
+        self.assertEqual([e.task_id for e in ordered], [2, 1])
+
+        ordered = FairShareQueue.order(entries, running={'a': 2, 'b': 1}, now=NOW, weights={'a': 4})
+        self.assertEqual([e.task_id for e in ordered], [1, 2])
+
+    def test_shortest_job_first_with_aging(self):
+        """测试按预计时长最短优先，长任务等待足够久后排到前面"""
+        long_job = QueueEntry(task_id=1, since=NOW - timedelta(seconds=100), cost=3600)
+        short_job = QueueEntry(task_id=2, since=NOW, cost=600)
+        unknown_job = QueueEntry(task_id=3, since=NOW - timedelta(seconds=50))
+
+        ordered = FairShareQueue.order([long_job, short_job, unknown_job], now=NOW)
+        self.assertEqual([e.task_id for e in ordered], [2, 3, 1])
+
+        long_job.since = NOW - timedelta(seconds=3500)
+        ordered = FairShareQueue.order([long_job, short_job, unknown_job], now=NOW)
+        self.assertEqual([e.task_id for e in ordered], [1, 2, 3])
+
+    def test_normalize_priority(self):
+        """测试优先级类别名称和数值的转换"""
+        self.assertEqual(FairShareQueue.normalize_priority('urgent'), 2)
+        self.assertEqual(FairShareQueue.normalize_priority('3'), 3)
+        self.assertEqual(FairShareQueue.normalize_priority(None), 0)
+        with self.assertRaises(ValueError):
+            FairShareQueue.normalize_priority('asap')
+
+if __name__ == '__main__':
+    unittest.main()
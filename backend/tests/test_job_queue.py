@@ -0,0 +1,151 @@
+import threading
+from datetime import datetime, timedelta
+from db_case import DatabaseTestCase
+from app.database import get_db
+from app.models.job import Job
+from app.models.setting import Setting
+from app.services.task_services.job_queue import (
+    JobQueue, STAGE_STAGING, STAGE_MONITOR, JOB_PENDING, JOB_RUNNING, JOB_DONE, JOB_FAILED
+)
+
+CAPABILITY = 'marking'
+
+
+class JobQueueTestCase(DatabaseTestCase):
+    """测试持久化作业队列的领取、续约、重试和重新投递"""
+
+    def setUp(self):
+        super().setUp()
+        with get_db() as db:
+            db.add(Setting(key='job_retry_backoff', value='30', type='integer'))
+            db.add(Setting(key='job_max_attempts', value='3', type='integer'))
+            db.commit()
+
+    def _enqueue(self, task_id=1, stage=STAGE_STAGING):
+        with get_db() as db:
+            job = JobQueue.enqueue(db, stage, CAPABILITY, task_id, 1)
+            db.commit()
+            return job.id
+
+    def _get(self, job_id) -> Job:
+        with get_db() as db:
+            job = db.query(Job).filter(Job.id == job_id).first()
+            db.expunge(job)
+            return job
+
+    def _expire_lease(self, job_id):
+        with get_db() as db:
+            db.query(Job).filter(Job.id == job_id).update({Job.visible_after: datetime.now() - timedelta(seconds=1)})
+            db.commit()
+
+    def test_enqueue_is_idempotent_per_stage(self):
+        """测试同一任务同一阶段只有一个未结束的作业"""
+        first = self._enqueue()
+        self.assertEqual(self._enqueue(), first)
+        self.assertNotEqual(self._enqueue(stage=STAGE_MONITOR), first)
+
+    def test_concurrent_claims_never_share_a_job(self):
+        """测试多个领取者并发领取时每个作业只被领取一次"""
+        job_ids = {self._enqueue(task_id=i) for i in range(20)}
+        claimed = {}
+        lock = threading.Lock()
+
+        def worker(owner):
+            jobs, _ = JobQueue.claim(owner, [STAGE_STAGING])
+            with lock:
+                claimed[owner] = [job.id for job in jobs]
+
+        threads = [threading.Thread(target=worker, args=(f'owner-{i}',)) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        all_claimed = [job_id for ids in claimed.values() for job_id in ids]
+        self.assertEqual(len(all_claimed), len(set(all_claimed)))
+        self.assertEqual(set(all_claimed), job_ids)
+        for owner, ids in claimed.items():
+            for job_id in ids:
+                self.assertEqual(self._get(job_id).lease_owner, owner)
+
+    def test_claimed_job_is_invisible_until_lease_expires(self):
+        """测试领取后的作业在租约内不可见，租约过期后重新投递给其他领取者"""
+        job_id = self._enqueue()
+        jobs, _ = JobQueue.claim('a', [STAGE_STAGING])
+        self.assertEqual([job.id for job in jobs], [job_id])
+        self.assertEqual(JobQueue.claim('b', [STAGE_STAGING]), ([], []))
+
+        self._expire_lease(job_id)
+        jobs, _ = JobQueue.claim('b', [STAGE_STAGING])
+        self.assertEqual([job.id for job in jobs], [job_id])
+        job = self._get(job_id)
+        self.assertEqual((job.lease_owner, job.attempts), ('b', 2))
+
+        # 原领取者的结果不再生效
+        JobQueue.complete(jobs[0], 'a')
+        self.assertEqual(self._get(job_id).state, JOB_RUNNING)
+        JobQueue.complete(jobs[0], 'b', next_stage=STAGE_MONITOR, payload={'remote_id': 'p'})
+        self.assertEqual(self._get(job_id).state, JOB_DONE)
+        with get_db() as db:
+            self.assertIsNotNone(JobQueue.get_active(db, 1, CAPABILITY, STAGE_MONITOR))
+
+    def test_extend_only_renews_own_running_jobs(self):
+        """测试续约只延长本领取者持有的运行中作业"""
+        job_id = self._enqueue()
+        JobQueue.claim('a', [STAGE_STAGING])
+        self._expire_lease(job_id)
+
+        self.assertEqual(JobQueue.extend([job_id], 'b'), 0)
+        self.assertEqual(JobQueue.claim('c', [STAGE_STAGING])[0][0].id, job_id)
+        self._expire_lease(job_id)
+        self.assertEqual(JobQueue.extend([job_id], 'c'), 1)
+        self.assertGreater(self._get(job_id).visible_after, datetime.now())
+        self.assertEqual(JobQueue.claim('d', [STAGE_STAGING]), ([], []))
+
+    def test_fail_backs_off_then_gives_up(self):
+        """测试失败后按指数退避重试，达到最大次数后作业失败"""
+        self.assertEqual([JobQueue.backoff(n, 30) for n in (1, 2, 3)], [30, 60, 120])
+        self.assertEqual(JobQueue.backoff(20, 30), 1800)
+
+        job_id = self._enqueue()
+        for attempt in (1, 2):
+            job = JobQueue.claim('a', [STAGE_STAGING])[0][0]
+            before = datetime.now()
+            self.assertEqual(JobQueue.fail(job, 'a', 'boom'), JOB_PENDING)
+            row = self._get(job_id)
+            self.assertEqual((row.attempts, row.last_error, row.lease_owner), (attempt, 'boom', None))
+            delay = (row.visible_after - before).total_seconds()
+            self.assertAlmostEqual(delay, JobQueue.backoff(attempt, 30), delta=2)
+            self._expire_lease(job_id)
+
+        job = JobQueue.claim('a', [STAGE_STAGING])[0][0]
+        self.assertEqual(JobQueue.fail(job, 'a', 'boom'), JOB_FAILED)
+        self.assertIsNotNone(self._get(job_id).finished_at)
+
+    def test_fail_without_retry(self):
+        """测试业务失败不重试"""
+        self._enqueue()
+        job = JobQueue.claim('a', [STAGE_STAGING])[0][0]
+        self.assertEqual(JobQueue.fail(job, 'a', 'bad', retry=False), JOB_FAILED)
+
+    def test_redelivery_beyond_max_attempts_fails_job(self):
+        """测试租约反复过期的作业超过最大投递次数后作为失败作业返回"""
+        job_id = self._enqueue()
+        for _ in range(3):
+            self.assertEqual(len(JobQueue.claim('a', [STAGE_STAGING])[0]), 1)
+            self._expire_lease(job_id)
+
+        jobs, exhausted = JobQueue.claim('a', [STAGE_STAGING])
+        self.assertEqual(jobs, [])
+        self.assertEqual([job.id for job in exhausted], [job_id])
+        self.assertEqual(self._get(job_id).state, JOB_FAILED)
+
+    def test_release_returns_job_without_counting_attempt(self):
+        """测试交还的作业立即可见且不计入投递次数"""
+        job_id = self._enqueue()
+        JobQueue.claim('a', [STAGE_STAGING])
+        self.assertEqual(JobQueue.release([job_id], 'b'), 0)
+        self.assertEqual(JobQueue.release([job_id], 'a'), 1)
+        job = self._get(job_id)
+        self.assertEqual((job.state, job.attempts, job.lease_owner), (JOB_PENDING, 0, None))
+        self.assertEqual(len(JobQueue.claim('b', [STAGE_STAGING])[0]), 1)
@@ -0,0 +1,44 @@
+from unittest import mock
+from db_case import DatabaseTestCase
+from app.services import leader_election
+from app.services.leader_election import LeaderElection
+
+
+class LeaderElectionTestCase(DatabaseTestCase):
+    """测试领导者在两次续约之间读取其他进程转发的唤醒请求"""
+
+    def setUp(self):
+        super().setUp()
+        state = mock.patch.dict(leader_election._state, {'is_leader': False, 'last_wakeup_at': None,
+                                                         'wakeup_pending': False})
+        state.start()
+        self.addCleanup(state.stop)
+        self.on_wakeup = mock.Mock()
+        callback = mock.patch.object(leader_election, '_on_wakeup', self.on_wakeup)
+        callback.start()
+        self.addCleanup(callback.stop)
+
+    def test_poll_wakeup_between_heartbeats(self):
+        """测试非领导者写入的唤醒请求由领导者轮询读取，同一请求只处理一次"""
+        held, term, wakeup_at = LeaderElection._try_acquire(15)
+        self.assertTrue(held)
+        leader_election._state.update(is_leader=True, term=term, last_wakeup_at=wakeup_at)
+
+        LeaderElection._poll_wakeup()
+        self.on_wakeup.assert_not_called()
+
+        # 模拟API进程转发唤醒请求
+        leader_election._state['wakeup_pending'] = True
+        LeaderElection._forward_wakeup()
+        LeaderElection._poll_wakeup()
+        LeaderElection._poll_wakeup()
+        self.on_wakeup.assert_called_once_with()
+
+    def test_poll_wakeup_ignored_when_not_leader(self):
+        """测试租约被其他进程持有时不处理唤醒请求"""
+        self.assertTrue(LeaderElection._try_acquire(15)[0])
+        leader_election._state['wakeup_pending'] = True
+        LeaderElection._forward_wakeup()
+
+        LeaderElection._poll_wakeup()
+        self.on_wakeup.assert_not_called()
@@ -0,0 +1,73 @@
+import asyncio
+import unittest
+from unittest import mock
+from app.services.async_engine import AsyncEngine
+from app.services.task_services.comfyui_event_stream import ComfyUIEventStream
+from app.services.task_services.monitor_engine import MonitorContext, MonitorEngine, MonitorWatch, WATCH_MARKING
+
+
+class MarkingProgressTestCase(unittest.TestCase):
+    """测试由事件流和预取的 /history 组装打标进度，不请求 ComfyUI"""
+
+    def tearDown(self):
+        ComfyUIEventStream.discard_progress('p1')
+
+    def test_live_progress_from_event_stream(self):
+        """测试 /history 中还没有结果时使用 progress 事件中的进度"""
+        ComfyUIEventStream.record_progress({'type': 'progress', 'data': {'prompt_id': 'p1', 'value': 3, 'max': 12}})
+        context = MonitorContext(None)
+        context.remote[(WATCH_MARKING, 'p1')] = {}
+        self.assertEqual(context.marking_progress('p1')['progress']['percentage'], 25)
+
+    def test_history_result_takes_precedence(self):
+        """测试 /history 中已有结果时以结果为准，请求失败时不影响组装"""
+        ComfyUIEventStream.record_progress({'type': 'progress', 'data': {'prompt_id': 'p1', 'value': 3, 'max': 12}})
+        context = MonitorContext(None)
+        context.remote[(WATCH_MARKING, 'p1')] = {'p1': {'status': {'status_str': 'success'}}}
+        progress = context.marking_progress('p1')['progress']
+        self.assertEqual((progress['percentage'], progress['completed_count']), (100, 1))
+
+        context.remote[(WATCH_MARKING, 'p1')] = IOError('timeout')
+        self.assertEqual(context.marking_progress('p1')['progress']['percentage'], 25)
+
+    def test_terminal_event_clears_progress(self):
+        """测试prompt结束事件清除其进度"""
+        ComfyUIEventStream.record_progress({'type': 'progress', 'data': {'prompt_id': 'p1', 'value': 1, 'max': 2}})
+        ComfyUIEventStream.record_progress({'type': 'execution_success', 'data': {'prompt_id': 'p1'}})
+        self.assertIsNone(ComfyUIEventStream.get_progress('p1'))
+
+    def test_prefetched_queue_and_system_stats(self):
+        """测试使用本周期预取的队列和系统状态"""
+        context = MonitorContext(None)
+        context.cache['comfyui_queue'] = {'queue_running': [['p1']], 'queue_pending': [['p2'], ['p3']]}
+        context.cache['comfyui_system_stats'] = {'system': {'ram_total': 8 * 1024 ** 3, 'ram_free': 2 * 1024 ** 3}}
+        data = context.marking_progress('p1')
+        self.assertEqual(data['progress']['processing_count'], 1)
+        self.assertEqual(data['progress']['submitted_count'], 2)
+        self.assertEqual(data['progress']['current_task_id'], 'p1')
+        self.assertTrue(data['system_stats'])
+
+    def test_prefetch_fetches_queue_once_per_asset(self):
+        """测试预取时同一资产的打标任务共用一次队列和系统状态请求，失败时不影响 /history"""
+        context = MonitorContext(mock.Mock())
+        context._mark_handler = mock.Mock(
+            history_url=lambda prompt_id: f'history/{prompt_id}',
+            queue_url=lambda: 'queue',
+            system_stats_url=lambda: 'system_stats'
+        )
+        due = [MonitorWatch(task_id=i, asset_id=1, kind=WATCH_MARKING, remote_id=f'p{i}', interval=10) for i in (1, 2)]
+        requested = []
+
+        async def get_json(url, headers=None):
+            requested.append(url)
+            if url == 'system_stats':
+                raise IOError('timeout')
+            return {'url': url}
+
+        with mock.patch.object(AsyncEngine, 'get_json', side_effect=get_json):
+            asyncio.run(MonitorEngine._prefetch(context, due))
+
+        self.assertEqual(sorted(requested), ['history/p1', 'history/p2', 'queue', 'system_stats'])
+        self.assertEqual(context.remote[(WATCH_MARKING, 'p2')], {'url': 'history/p2'})
+        self.assertEqual(context.cache['comfyui_queue'], {'url': 'queue'})
+        self.assertIsNone(context.cache['comfyui_system_stats'])
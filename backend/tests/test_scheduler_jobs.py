@@ -0,0 +1,113 @@
+import time
+from datetime import datetime
+from unittest import mock
+from db_case import DatabaseTestCase
+from app.database import get_db
+from app.models.task import Task, TaskStatus
+from app.models.asset import Asset, AssetSlot
+from app.models.job import Job
+from app.services.task_services import job_queue
+from app.services.task_services.job_queue import JobQueue, JobRunner, STAGE_COMPLETE, JOB_DONE, JOB_PENDING, JOB_FAILED
+from app.services.task_services.scheduler_service import SchedulerService, COMPLETION_HANDLERS
+from app.services.task_services.slot_service import SlotService, CAPABILITY_MARKING
+from app.services.task_services import marking_service, scheduler_service
+
+
+class SchedulerJobsTestCase(DatabaseTestCase):
+    """测试调度器注册的作业处理函数"""
+
+    def _wait_for_state(self, job_id, state, timeout=5):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with get_db() as db:
+                job = db.query(Job).filter(Job.id == job_id).first()
+                if job.state == state:
+                    return job
+            time.sleep(0.05)
+        self.fail(f"作业 {job_id} 未进入 {state} 状态")
+
+    def _task_status(self, task_id):
+        with get_db() as db:
+            return db.query(Task).get(task_id).status
+
+    def test_complete_job_runs_handler(self):
+        """测试完成处理作业经 JobRunner 领取后执行完成处理函数并结束作业"""
+        with get_db() as db:
+            job = JobQueue.enqueue(db, STAGE_COMPLETE, CAPABILITY_MARKING, 7, 1, {'args': [7, 1, True, {}]})
+            db.commit()
+            job_id = job.id
+
+        handler = mock.Mock()
+        with mock.patch.dict(COMPLETION_HANDLERS, {CAPABILITY_MARKING: handler}), \
+                mock.patch.object(job_queue, '_handlers', {STAGE_COMPLETE: SchedulerService._run_complete_job}):
+            JobRunner._claim_and_dispatch()
+            self._wait_for_state(job_id, JOB_DONE)
+
+        handler.assert_called_once_with(7, 1, True, {}, retry=True)
+
+    def test_sync_failure_retries_before_marking_error(self):
+        """测试同步结果失败时作业按退避重试、任务保持打标中并占用槽位，重试次数用完后才标记错误"""
+        with get_db() as db:
+            asset = Asset(name='a', ip='10.0.0.1', ssh_username='u', is_local=False, marking_tasks_count=0)
+            db.add(asset)
+            db.flush()
+            task = Task(name='t', status=TaskStatus.MARKING, marking_asset_id=asset.id,
+                        mark_config={'remote_output_dir': '/remote/output'}, marked_images_path='/tmp/marked')
+            db.add(task)
+            db.flush()
+            self.assertTrue(SlotService.claim(db, asset, CAPABILITY_MARKING, task.id))
+            job = JobQueue.enqueue(db, STAGE_COMPLETE, CAPABILITY_MARKING, task.id, asset.id,
+                                   {'args': [task.id, asset.id, True, {}]})
+            job.max_attempts = 2
+            db.commit()
+            task_id, job_id = task.id, job.id
+
+        ssh_client = mock.Mock()
+        ssh_client.download_directory.return_value = (False, '连接超时', {})
+        with mock.patch.object(marking_service, 'create_ssh_client_from_asset', return_value=ssh_client), \
+                mock.patch.object(scheduler_service, 'notify_scheduler'), \
+                mock.patch.object(job_queue, '_handlers', {STAGE_COMPLETE: SchedulerService._run_complete_job}), \
+                mock.patch.object(job_queue, '_on_failed', SchedulerService._on_job_failed):
+            JobRunner._claim_and_dispatch()
+            self._wait_for_state(job_id, JOB_PENDING)
+            with get_db() as db:
+                self.assertEqual(db.query(Task).get(task_id).status, TaskStatus.MARKING)
+                self.assertEqual(db.query(AssetSlot).count(), 1)
+                db.query(Job).filter(Job.id == job_id).update({Job.visible_after: datetime.now()})
+                db.commit()
+
+            JobRunner._claim_and_dispatch()
+            job = self._wait_for_state(job_id, JOB_FAILED)
+            # 作业状态提交后才调用失败处理函数
+            deadline = time.time() + 5
+            while self._task_status(task_id) != TaskStatus.ERROR and time.time() < deadline:
+                time.sleep(0.05)
+
+        self.assertIn('连接超时', job.last_error)
+        self.assertEqual(ssh_client.download_directory.call_count, 2)
+        self.assertEqual(self._task_status(task_id), TaskStatus.ERROR)
+        with get_db() as db:
+            self.assertEqual(db.query(AssetSlot).count(), 0)
+
+    def test_failed_job_releases_slot_and_wakes_scheduler(self):
+        """测试作业最终失败时任务标记为错误、释放槽位并唤醒调度器"""
+        with get_db() as db:
+            asset = Asset(name='a', ip='127.0.0.1', ssh_username='u', marking_tasks_count=0)
+            db.add(asset)
+            db.flush()
+            task = Task(name='t', status=TaskStatus.MARKING, marking_asset_id=asset.id)
+            db.add(task)
+            db.flush()
+            self.assertTrue(SlotService.claim(db, asset, CAPABILITY_MARKING, task.id))
+            db.commit()
+            job = Job(stage=STAGE_COMPLETE, capability=CAPABILITY_MARKING, task_id=task.id, asset_id=asset.id)
+            task_id, asset_id = task.id, asset.id
+
+        with mock.patch.object(scheduler_service, 'notify_scheduler') as notify:
+            SchedulerService._on_job_failed(job)
+
+        notify.assert_called_once_with(scheduler_service.REASON_CAPACITY_RELEASED)
+        with get_db() as db:
+            self.assertEqual(db.query(Task).get(task_id).status, TaskStatus.ERROR)
+            self.assertEqual(db.query(AssetSlot).count(), 0)
+            self.assertEqual(db.query(Asset).get(asset_id).marking_tasks_count, 0)
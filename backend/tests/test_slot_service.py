@@ -0,0 +1,146 @@
+import time
+from datetime import datetime, timedelta
+from unittest import mock
+from db_case import DatabaseTestCase
+from app.database import get_db
+from app.models.task import Task, TaskStatus
+from app.models.asset import Asset, AssetSlot
+from app.services.task_services import slot_service
+from app.services.task_services.slot_service import SlotService, CAPABILITY_MARKING, CAPABILITY_TRAINING
+
+
+class SlotServiceTestCase(DatabaseTestCase):
+    """测试资产槽位的占用、释放、续约、过期回收和计数对账"""
+
+    def setUp(self):
+        super().setUp()
+        slot_service._last_renewed.clear()
+        with get_db() as db:
+            asset = Asset(name='a', ip='127.0.0.1', ssh_username='u', max_concurrent_tasks=2,
+                          marking_tasks_count=0, training_tasks_count=0)
+            other = Asset(name='b', ip='127.0.0.2', ssh_username='u', max_concurrent_tasks=2,
+                          marking_tasks_count=0, training_tasks_count=0)
+            db.add_all([asset, other])
+            db.flush()
+            tasks = [Task(name=f't{i}', status=TaskStatus.MARKING, marking_asset_id=asset.id) for i in range(3)]
+            db.add_all(tasks)
+            db.commit()
+            self.asset_id, self.other_id = asset.id, other.id
+            self.task_ids = [task.id for task in tasks]
+
+    def _claim(self, task_id, asset_id=None, capability=CAPABILITY_MARKING):
+        with get_db() as db:
+            asset = db.query(Asset).get(asset_id or self.asset_id)
+            claimed = SlotService.claim(db, asset, capability, task_id)
+            db.commit()
+            return claimed
+
+    def _release(self, task_id, capability=CAPABILITY_MARKING):
+        with get_db() as db:
+            released = SlotService.release(db, task_id, capability)
+            db.commit()
+            return released
+
+    def _count(self, asset_id=None):
+        with get_db() as db:
+            return db.query(Asset).get(asset_id or self.asset_id).marking_tasks_count
+
+    def _lease(self, task_id):
+        with get_db() as db:
+            return db.query(AssetSlot).filter(AssetSlot.task_id == task_id).first().lease_expires_at
+
+    def _expire(self, task_id):
+        with get_db() as db:
+            db.query(AssetSlot).filter(AssetSlot.task_id == task_id).update(
+                {AssetSlot.lease_expires_at: datetime.now() - timedelta(seconds=1)}
+            )
+            db.commit()
+
+    def test_claim_is_idempotent_and_respects_limit(self):
+        """测试同一任务重复占用不重复计数，达到上限后不再分配，不能再占用其他资产"""
+        first, second, third = self.task_ids
+        self.assertTrue(self._claim(first))
+        self.assertTrue(self._claim(first))
+        self.assertEqual(self._count(), 1)
+        self.assertFalse(self._claim(first, self.other_id))
+
+        self.assertTrue(self._claim(second))
+        self.assertFalse(self._claim(third))
+        self.assertEqual(self._count(), 2)
+
+    def test_release_is_idempotent(self):
+        """测试重复释放只递减一次计数"""
+        task_id = self.task_ids[0]
+        self._claim(task_id)
+        self.assertTrue(self._release(task_id))
+        self.assertFalse(self._release(task_id))
+        self.assertFalse(self._release(task_id, CAPABILITY_TRAINING))
+        self.assertEqual(self._count(), 0)
+        self.assertTrue(self._claim(task_id))
+
+    def test_reap_expired_marks_running_task_as_error(self):
+        """测试租约过期时仍在运行的任务标记为错误，已结束任务的槽位直接回收，未过期的不回收"""
+        running, finished, healthy = self.task_ids
+        for task_id in self.task_ids[:2]:
+            self._claim(task_id)
+        self._claim(healthy, self.other_id)
+        with get_db() as db:
+            db.query(Task).filter(Task.id == finished).update({Task.status: TaskStatus.MARKED})
+            db.commit()
+        self._expire(running)
+        self._expire(finished)
+
+        self.assertEqual(SlotService.reap_expired(), 2)
+
+        with get_db() as db:
+            self.assertEqual(db.query(Task).get(running).status, TaskStatus.ERROR)
+            self.assertEqual(db.query(Task).get(finished).status, TaskStatus.MARKED)
+            self.assertEqual([slot.task_id for slot in db.query(AssetSlot).all()], [healthy])
+        self.assertEqual(self._count(), 0)
+        self.assertEqual(self._count(self.other_id), 1)
+
+    def test_reconcile_counts_fixes_drift(self):
+        """测试按槽位表校正资产计数"""
+        self._claim(self.task_ids[0])
+        with get_db() as db:
+            db.query(Asset).update({Asset.marking_tasks_count: 5, Asset.training_tasks_count: 3})
+            db.commit()
+
+        SlotService.reconcile_counts()
+
+        self.assertEqual(self._count(), 1)
+        self.assertEqual(self._count(self.other_id), 0)
+        with get_db() as db:
+            self.assertEqual(db.query(Asset).get(self.asset_id).training_tasks_count, 0)
+
+    def test_renew_extends_lease_with_throttle(self):
+        """测试续约延长租约，间隔不足 RENEW_INTERVAL 时不重复写入"""
+        task_id = self.task_ids[0]
+        self._claim(task_id)
+        self._expire(task_id)
+
+        SlotService.renew(task_id, CAPABILITY_MARKING)
+        renewed = self._lease(task_id)
+        self.assertGreater(renewed, datetime.now() + timedelta(seconds=60))
+
+        self._expire(task_id)
+        SlotService.renew(task_id, CAPABILITY_MARKING)
+        self.assertLess(self._lease(task_id), datetime.now())
+
+    def test_keep_alive_renews_lease_during_transfer(self):
+        """测试传输期间后台线程续约槽位，长时间传输中的任务不会被回收，退出后停止续约"""
+        task_id = self.task_ids[0]
+        self._claim(task_id)
+        self._expire(task_id)
+
+        with mock.patch.object(slot_service, 'RENEW_INTERVAL', 0.01):
+            with SlotService.keep_alive(task_id, CAPABILITY_MARKING):
+                deadline = time.time() + 5
+                while self._lease(task_id) < datetime.now() and time.time() < deadline:
+                    time.sleep(0.01)
+                self.assertEqual(SlotService.reap_expired(), 0)
+            time.sleep(0.05)
+            self._expire(task_id)
+            time.sleep(0.05)
+
+        self.assertLess(self._lease(task_id), datetime.now())
@@ -0,0 +1,177 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from app.utils import ssh, sync_manifest
+from app.utils.sync_manifest import SyncManifest, file_sha256
+from fake_ssh import FakeSSHClient, write_file
+
+
+class SSHTransferTestCase(unittest.TestCase):
+    """测试并行传输、tar流批量传输的重试和中止，以及带输入的命令执行"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.local_dir = os.path.join(self.root, 'local')
+        self.remote_dir = os.path.join(self.root, 'remote')
+        os.makedirs(self.remote_dir)
+        self.client = FakeSSHClient()
+        self.transfers = []
+        for i in range(6):
+            local_file = os.path.join(self.local_dir, f'{i}.txt')
+            write_file(local_file, f'content {i}')
+            self.transfers.append((local_file, f'{self.remote_dir}/{i}.txt', os.path.getsize(local_file), 'added'))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _progress(self):
+        return {'files_done': 0, 'files_total': len(self.transfers), 'bytes_done': 0, 'bytes_total': 0}
+
+    def _stats(self):
+        return {'added': 0, 'updated': 0, 'unchanged': 0, 'failed': 0}
+
+    def _run_with_timeout(self, func, timeout=10):
+        result = []
+        thread = threading.Thread(target=lambda: result.append(func()), daemon=True)
+        thread.start()
+        thread.join(timeout)
+        self.assertFalse(thread.is_alive(), "执行超时，可能死锁")
+        return result[0]
+
+    def test_execute_with_input_reads_stdout_and_stderr_concurrently(self):
+        """测试标准错误超过通道窗口时不会死锁"""
+        result = self._run_with_timeout(lambda: self.client.execute_with_input(
+            "cat >/dev/null; head -c 300000 /dev/zero | tr '\\0' e >&2; echo done", 'x\n' * 100000
+        ))
+        self.assertEqual((result.returncode, result.stdout, len(result.stderr)), (0, 'done', 300000))
+
+    def test_execute_with_input_large_output_before_reading_input(self):
+        """测试远程先大量输出再读取输入时不会死锁"""
+        result = self._run_with_timeout(lambda: self.client.execute_with_input(
+            "head -c 300000 /dev/zero | tr '\\0' o; wc -l", 'x\n' * 100000
+        ))
+        self.assertEqual(result.returncode, 0)
+        self.assertTrue(result.stdout.endswith('100000'))
+
+    def test_transfer_retries_then_counts_failure(self):
+        """测试单个文件失败后重试，超过重试次数计入失败，其余文件正常传输"""
+        flaky, broken = self.transfers[0][1], self.transfers[1][1]
+        self.client.connection.fail = {flaky: 1, broken: ssh.TRANSFER_RETRIES + 1}
+        stats = self._stats()
+        progress = self._progress()
+        done = []
+        self.client._transfer_files(self.transfers, 'put', stats, progress, sessions=3, done=done)
+
+        self.assertEqual((stats['added'], stats['failed']), (5, 1))
+        self.assertEqual(sorted(done), sorted(self.transfers[:1] + self.transfers[2:]))
+        self.assertEqual(progress['files_done'], 6)
+        self.assertTrue(os.path.exists(flaky))
+        self.assertFalse(os.path.exists(broken))
+
+    def test_progress_callback_error_aborts_all_sessions(self):
+        """测试进度回调抛出异常（如任务取消）时所有会话停止，异常在调用线程重新抛出"""
+        calls = []
+
+        def callback(progress):
+            calls.append(progress)
+            raise InterruptedError('cancelled')
+
+        with self.assertRaises(InterruptedError):
+            self.client._transfer_files(self.transfers, 'put', self._stats(), self._progress(), callback, sessions=3)
+        self.assertEqual(len(calls), 1)
+        # 每个会话最多在回调失败前后各传完手上的一个文件
+        self.assertLessEqual(len(os.listdir(self.remote_dir)), 3)
+
+    def test_tar_upload_retries_size_mismatch(self):
+        """测试tar流上传后大小不一致的文件交给SFTP重新上传，进度回退"""
+        remote_sizes = {remote_file: size for _, remote_file, size, _ in self.transfers}
+        remote_sizes[self.transfers[2][1]] = 0
+        stats = self._stats()
+        progress = self._progress()
+        done = []
+        with mock.patch.object(FakeSSHClient, '_list_remote_sizes', return_value=remote_sizes):
+            retry = self.client._tar_upload(self.transfers, self.remote_dir, stats, progress, done=done)
+
+        self.assertEqual(retry, [self.transfers[2]])
+        self.assertEqual(done, self.transfers[:2] + self.transfers[3:])
+        self.assertEqual(stats['added'], 5)
+        self.assertEqual(progress['files_done'], 5)
+        self.assertEqual(sorted(os.listdir(self.remote_dir)), [f'{i}.txt' for i in range(6)])
+
+    def test_tar_upload_falls_back_when_extract_fails(self):
+        """测试远程解包失败时全部文件交给SFTP，进度恢复到上传前"""
+        stats = self._stats()
+        progress = self._progress()
+        retry = self.client._tar_upload(self.transfers, os.path.join(self.root, 'missing'), stats, progress)
+
+        self.assertEqual(retry, self.transfers)
+        self.assertEqual((stats['added'], progress['files_done'], progress['bytes_done']), (0, 0, 0))
+
+    def test_tar_upload_callback_error_aborts(self):
+        """测试tar流上传中进度回调抛出异常时不回退为SFTP而是中止"""
+        def callback(progress):
+            raise InterruptedError('cancelled')
+
+        with self.assertRaises(InterruptedError):
+            self.client._tar_upload(self.transfers, self.remote_dir, self._stats(), self._progress(), callback)
+
+    def test_tar_download_retries_missing_files(self):
+        """测试tar流下载后缺失的文件交给SFTP重新下载"""
+        for local_file, remote_file, _, _ in self.transfers:
+            shutil.copyfile(local_file, remote_file)
+        download_dir = os.path.join(self.root, 'download')
+        os.makedirs(download_dir)
+        transfers = [
+            (remote_file, os.path.join(download_dir, os.path.basename(remote_file)), size, action)
+            for _, remote_file, size, action in self.transfers
+        ]
+        os.remove(transfers[3][0])
+        stats = self._stats()
+
+        retry = self.client._tar_download(transfers, self.remote_dir, download_dir, stats)
+
+        self.assertEqual(retry, [transfers[3]])
+        self.assertEqual(stats['added'], 5)
+        with open(transfers[0][1], encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'content 0')
+
+    def test_upload_manifest_skips_failed_files(self):
+        """测试大小不变的修改（如编辑标注）上传失败时不记录到同步清单，下次同步重新上传"""
+        edited_local, edited_remote = self.transfers[1][0], self.transfers[1][1]
+        with mock.patch.object(sync_manifest, 'MANIFEST_DIR', os.path.join(self.root, 'manifests')):
+            ok, message, stats = self.client.upload_directory(self.local_dir, self.remote_dir, use_manifest=True)
+            self.assertTrue(ok, message)
+            self.assertEqual(stats['added'], 6)
+
+            write_file(edited_local, 'content X')
+            os.utime(edited_local, (0, 0))
+            self.client.connection.fail = {edited_remote: ssh.TRANSFER_RETRIES + 1}
+            ok, message, stats = self.client.upload_directory(self.local_dir, self.remote_dir, use_manifest=True)
+            self.assertTrue(ok, message)
+            self.assertEqual((stats['updated'], stats['failed'], stats['unchanged']), (0, 1, 5))
+
+            ok, message, stats = self.client.upload_directory(self.local_dir, self.remote_dir, use_manifest=True)
+            self.assertTrue(ok, message)
+            self.assertEqual((stats['updated'], stats['failed'], stats['unchanged']), (1, 0, 5))
+        with open(edited_remote, encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'content X')
+
+    def test_download_manifest_records_only_downloaded_files(self):
+        """测试下载时只把本次下载的文件记录到同步清单，按大小跳过的本地文件（如编辑过的标注）不记录"""
+        for local_file, remote_file, _, _ in self.transfers[:2]:
+            shutil.copyfile(local_file, remote_file)
+        download_dir = os.path.join(self.root, 'download')
+        write_file(os.path.join(download_dir, '1.txt'), 'content X')
+        manifest_dir = os.path.join(self.root, 'manifests')
+
+        with mock.patch.object(sync_manifest, 'MANIFEST_DIR', manifest_dir):
+            ok, message, stats = self.client.download_directory(self.remote_dir, download_dir, use_manifest=True)
+            manifest = SyncManifest.load_remote(self.client, self.remote_dir)
+
+        self.assertTrue(ok, message)
+        self.assertEqual((stats['added'], stats['unchanged']), (1, 1))
+        self.assertEqual(list(manifest.remote), ['0.txt'])
+        self.assertEqual(manifest.remote['0.txt'][2], file_sha256(self.transfers[0][1]))
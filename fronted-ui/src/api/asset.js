@@ -69,5 +69,31 @@ export const assetApi = {
       method: 'post',
       data: { enabled }
     })
+  },
+
+  /**
+   * 获取资产健康状态（后台探测缓存）
+   * @param {number} [assetId] 资产ID，不传则返回全部
+   * @returns {Promise}
+   */
+  async getAssetHealth(assetId) {
+    return request({
+      url: `${BASE_URL}/health`,
+      method: 'get',
+      params: assetId ? { asset_id: assetId } : {}
+    })
+  },
+
+  /**
+   * 强制刷新资产健康状态
+   * @param {Object} [data] 可选参数 { asset_id, capability_type }
+   * @returns {Promise}
+   */
+  async refreshAssetHealth(data = {}) {
+    return request({
+      url: `${BASE_URL}/health/refresh`,
+      method: 'post',
+      data
+    })
   }
 } 
\ No newline at end of file
@@ -160,6 +160,66 @@ export const tasksApi = {
     return request.get(`${BASE_URL}/${taskId}/marking-progress`)
   },
   
+  /**
+   * 获取数据暂存进度
+   * @param {number|string} taskId 任务ID
+   * @returns {Promise<Array>} 暂存记录，包含状态和已传输的文件数、字节数
+   */
+  async getStagingProgress(taskId) {
+    return request.get(`${BASE_URL}/${taskId}/staging`)
+  },
+  
+  /**
+   * 获取等待资产的任务队列
+   * @returns {Promise<Object>} 按调度顺序排列的打标和训练等待队列，包含优先级和所属用户
+   */
+  async getTaskQueue() {
+    return request.get(`${BASE_URL}/queue`)
+  },
+  
+  /**
+   * 获取调度器领导者选举状态
+   * @returns {Promise<Object>} 包含 holder_id、is_leader、term 和当前租约
+   */
+  async getSchedulerLeader() {
+    return request.get(`${BASE_URL}/scheduler/leader`)
+  },
+  
+  /**
+   * 获取所有未完成任务的ETA预测和资产吞吐量
+   * @returns {Promise<Object>} 包含 summary、tasks(预计开始/完成时间) 和 assets(任务/小时、步/秒)
+   */
+  async getEtaForecast() {
+    return request.get(`${BASE_URL}/eta`)
+  },
+  
+  /**
+   * 获取任务的预计开始和完成时间
+   * @param {number|string} taskId 任务ID
+   * @returns {Promise<Object>} 任务ETA
+   */
+  async getTaskEta(taskId) {
+    return request.get(`${BASE_URL}/${taskId}/eta`)
+  },
+  
+  /**
+   * 获取流水线作业（暂存、监控、完成处理）
+   * @param {Object} params 查询参数 task_id、state、limit
+   * @returns {Promise<Array>} 作业列表，包含阶段、状态、投递次数和最近错误
+   */
+  async getJobs(params = {}) {
+    return request.get(`${BASE_URL}/jobs`, { params })
+  },
+  
+  /**
+   * 获取任务的流水线作业
+   * @param {number|string} taskId 任务ID
+   * @returns {Promise<Array>} 作业列表
+   */
+  async getTaskJobs(taskId) {
+    return request.get(`${BASE_URL}/${taskId}/jobs`)
+  },
+  
   /**
    * 批量提交任务进行标记
    * @param {Array<number>} taskIds 任务ID数组
@@ -226,6 +286,13 @@ export const batchUpdateMarkedTexts = tasksApi.batchUpdateMarkedTexts
 export const getTrainingResults = tasksApi.getTrainingResults
 export const getTrainingLoss = tasksApi.getTrainingLoss
 export const getMarkingProgress = tasksApi.getMarkingProgress
+export const getStagingProgress = tasksApi.getStagingProgress
+export const getTaskQueue = tasksApi.getTaskQueue
+export const getSchedulerLeader = tasksApi.getSchedulerLeader
+export const getEtaForecast = tasksApi.getEtaForecast
+export const getTaskEta = tasksApi.getTaskEta
+export const getJobs = tasksApi.getJobs
+export const getTaskJobs = tasksApi.getTaskJobs
 export const batchStartMarking = tasksApi.batchStartMarking
 export const getTaskTrainingHistory = tasksApi.getTaskTrainingHistory
 export const getTrainingHistoryDetails = tasksApi.getTrainingHistoryDetails